@@ -3,6 +3,7 @@
 
 import argparse
 import random
+import sys
 from pathlib import Path
 
 STYLES = [
@@ -51,6 +52,9 @@ def main():
     parser.add_argument("-s", "--style", help="Specific style to use")
     parser.add_argument("-m", "--mood", help="Specific mood to use")
     parser.add_argument("-o", "--output", help="Save prompts to file")
+    parser.add_argument("-g", "--generate", metavar="DIR", help="Generate an image per prompt into DIR")
+    parser.add_argument("-p", "--provider", default="midjourney", help="AI provider used with --generate")
+    parser.add_argument("--concurrency", type=int, help="Max in-flight requests used with --generate")
     
     args = parser.parse_args()
     
@@ -70,6 +74,17 @@ def main():
         with open(output_path, "w") as f:
             f.write("\n".join(prompts))
         print(f"\nPrompts saved to: {output_path}")
+    
+    if args.generate:
+        import logging
+        logging.basicConfig(level=logging.INFO)
+        sys.path.insert(0, str(Path(__file__).resolve().parent / "python_modules"))
+        from ai_client import AIClient, generate_images_batch
+        
+        # Overlapping prompts from earlier runs are served from cache/dedup
+        AIClient.enable_dedup()
+        results = generate_images_batch(args.provider, prompts, args.generate, args.concurrency)
+        print(f"\nGenerated {sum(results)}/{len(prompts)} images in: {args.generate}")
 
 if __name__ == "__main__":
     main()
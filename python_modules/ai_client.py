@@ -6,13 +6,23 @@ Supports Grok, Claude, Midjourney, and ComfyUI
 
 import os
 import json
-import requests
-from typing import Dict, Optional, List
+import time
+import shutil
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import IO, TYPE_CHECKING, Dict, Optional, List, Tuple
 from enum import Enum
 from pathlib import Path
 import logging
 
-logging.basicConfig(level=logging.INFO)
+from dedup_cache import DedupIndex, normalize_prompt
+from rate_limiter import RETRY_STATUSES, ProviderLimiter, get_limiter, log_metrics, parse_retry_after
+from tracing import request_bytes, span
+
+if TYPE_CHECKING:
+    import requests
+
 logger = logging.getLogger(__name__)
 
 class AIProvider(Enum):
@@ -21,13 +31,294 @@ class AIProvider(Enum):
     COMFYUI = "comfyui"
     CLAUDE = "claude"
 
+# Default cap on in-flight requests per provider for AsyncAIClient
+DEFAULT_CONCURRENCY = {
+    AIProvider.GROK: 8,
+    AIProvider.MIDJOURNEY: 4,
+    AIProvider.COMFYUI: 2,
+    AIProvider.CLAUDE: 8
+}
+
+# API endpoints per provider, built once at import
+ENDPOINTS = {
+    AIProvider.GROK: {
+        "video": "https://api.x.ai/video/process",
+        "upload": "https://api.x.ai/video/upload",
+        "imagine": "https://api.x.ai/imagine"
+    },
+    AIProvider.MIDJOURNEY: {
+        "imagine": "https://api.midjourney.com/v1/imagine",
+        "process": "https://api.midjourney.com/v1/process"
+    },
+    AIProvider.COMFYUI: {
+        "api": "http://localhost:8188/api"
+    },
+    AIProvider.CLAUDE: {
+        "messages": "https://api.anthropic.com/v1/messages"
+    }
+}
+
+# Videos at or above this size are sent through the chunked, resumable upload
+CHUNKED_UPLOAD_THRESHOLD = 64 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+def _build_session(pool_size: int) -> "requests.Session":
+    """Keep-alive session with a connection pool sized for pool_size callers"""
+    # requests is imported on first use: it is the slowest import here
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class _FileSlice:
+    """Read-only file-like view of one byte range, streamed without buffering.
+
+    Exposing __len__ lets requests send a Content-Length while http.client
+    reads the body in small blocks straight from the file.
+    """
+    
+    def __init__(self, file, offset: int, length: int):
+        file.seek(offset)
+        self._file = file
+        self._remaining = length
+        self._length = length
+    
+    def __len__(self) -> int:
+        return self._length
+    
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+class ChunkedUploader:
+    """Resumable upload of a large file in fixed-size chunks.
+    
+    Protocol: POST {"filename", "size"} to the upload endpoint to open a
+    session whose JSON reply carries an ``upload_url``. Each chunk is PUT
+    there with a ``Content-Range`` header; the server answers 308 with a
+    ``Range: bytes=0-<last>`` header while incomplete and 200/201 with the
+    stored file's JSON once done. An empty PUT with ``Content-Range:
+    bytes */<size>`` asks for the committed offset. Session state is kept in
+    ``<file>.upload.json`` so a later run resumes instead of restarting;
+    once done it also holds the stored file's JSON, which a rerun for the
+    unchanged file returns without uploading again.
+    """
+    
+    def __init__(self, session: "requests.Session", endpoint: str,
+                 headers: Optional[Dict] = None, chunk_size: int = UPLOAD_CHUNK_SIZE,
+                 max_retries: int = 5, timeout: int = 300,
+                 limiter: Optional[ProviderLimiter] = None):
+        self.session = session
+        self.endpoint = endpoint
+        self.headers = headers or {}
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.limiter = limiter
+    
+    def _send(self, method: str, url: str, **kwargs) -> "requests.Response":
+        """Send one request inside the provider limiter, if any"""
+        with self.limiter.slot() if self.limiter else nullcontext():
+            return self.session.request(method, url, **kwargs)
+    
+    @staticmethod
+    def _state_path(file_path: str) -> Path:
+        return Path(f"{file_path}.upload.json")
+    
+    def _load_state(self, file_path: str, size: int, mtime: float) -> Optional[Dict]:
+        """Return saved session state if it still matches the file"""
+        try:
+            state = json.loads(self._state_path(file_path).read_text())
+        except (OSError, ValueError):
+            return None
+        if state.get("size") != size or state.get("mtime") != mtime:
+            return None
+        return state
+    
+    def _save_state(self, file_path: str, state: Dict):
+        path = self._state_path(file_path)
+        temp_path = path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(state))
+        os.replace(temp_path, path)
+    
+    def _open_session(self, file_path: str, size: int) -> str:
+        response = self._send(
+            "post",
+            self.endpoint,
+            headers=self.headers,
+            json={"filename": os.path.basename(file_path), "size": size},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()["upload_url"]
+    
+    @staticmethod
+    def _committed_offset(response: "requests.Response") -> int:
+        """Next byte to send according to a 308 Range header"""
+        committed = response.headers.get("Range")
+        if not committed:
+            return 0
+        return int(committed.split("-")[-1]) + 1
+    
+    def _query_offset(self, upload_url: str, size: int) -> "requests.Response":
+        """Ask the server how much it has: 308 with the offset, 200/201 if complete"""
+        response = self._send(
+            "put",
+            upload_url,
+            headers={**self.headers, "Content-Range": f"bytes */{size}"},
+            timeout=self.timeout
+        )
+        if response.status_code not in (200, 201, 308):
+            response.raise_for_status()
+        return response
+    
+    def _complete(self, file_path: str, state: Dict, result: Dict) -> Dict:
+        """Record the stored file's JSON in the session state and return it"""
+        state["result"] = result
+        self._save_state(file_path, state)
+        logger.info(f"Upload complete: {file_path} ({state['size']} bytes)")
+        return result
+    
+    def upload(self, file_path: str) -> Optional[Dict]:
+        """Upload file_path, resuming a previous session if one is recorded"""
+        import requests
+
+        stat = os.stat(file_path)
+        size = stat.st_size
+        state = self._load_state(file_path, size, stat.st_mtime)
+        if state and state.get("result"):
+            logger.info(f"Already uploaded: {file_path}")
+            return state["result"]
+        resume = state is not None
+        failures = 0
+        
+        with span("upload", "provider", url=self.endpoint, bytes_out=size, resumed=resume), \
+                open(file_path, "rb") as f:
+            while True:
+                try:
+                    if state is None:
+                        state = {"upload_url": self._open_session(file_path, size),
+                                 "size": size, "mtime": stat.st_mtime, "offset": 0}
+                        self._save_state(file_path, state)
+                    elif resume:
+                        response = self._query_offset(state["upload_url"], size)
+                        if response.status_code in (200, 201):
+                            # Completed before we saw the final reply
+                            if response.content:
+                                return self._complete(file_path, state, response.json())
+                            logger.error(f"Upload of {file_path} completed but the server "
+                                         f"did not return the stored file; starting over")
+                            self._state_path(file_path).unlink(missing_ok=True)
+                            return None
+                        state["offset"] = self._committed_offset(response)
+                        resume = False
+                    
+                    offset = state["offset"]
+                    length = min(self.chunk_size, size - offset)
+                    response = self._send(
+                        "put",
+                        state["upload_url"],
+                        headers={
+                            **self.headers,
+                            "Content-Range": f"bytes {offset}-{offset + length - 1}/{size}"
+                        },
+                        data=_FileSlice(f, offset, length),
+                        timeout=self.timeout
+                    )
+                    
+                    if response.status_code in (200, 201):
+                        return self._complete(file_path, state,
+                                              response.json() if response.content else {})
+                    if response.status_code != 308:
+                        response.raise_for_status()
+                    
+                    committed = self._committed_offset(response)
+                    if committed <= offset:
+                        raise ValueError(f"server committed no bytes past {offset}")
+                    state["offset"] = committed
+                    self._save_state(file_path, state)
+                    failures = 0
+                except (requests.RequestException, KeyError, ValueError) as e:
+                    failures += 1
+                    resume = True
+                    if failures > self.max_retries:
+                        logger.error(f"Upload failed at byte {state['offset'] if state else 0}: {e}")
+                        return None
+                    
+                    response = getattr(e, "response", None)
+                    retry_after = None
+                    if response is not None:
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if self.limiter:
+                        delay = self.limiter.backoff(failures - 1, retry_after)
+                        logger.warning(f"Upload chunk failed ({e}); resuming in {delay:.1f}s")
+                        throttled = response is not None and response.status_code == 429
+                        self.limiter.wait_backoff(delay, throttled=throttled)
+                    else:
+                        delay = retry_after if retry_after is not None else min(2 ** failures, 30)
+                        logger.warning(f"Upload chunk failed ({e}); resuming in {delay:.1f}s")
+                        time.sleep(delay)
+
 class AIClient:
     """Base AI client class"""
     
-    def __init__(self, provider: AIProvider, api_key: Optional[str] = None):
+    # Shared dedup index for repeated requests; None disables it
+    dedup: Optional[DedupIndex] = None
+    
+    def __init__(self, provider: AIProvider, api_key: Optional[str] = None,
+                 pool_size: int = 1):
         self.provider = provider
         self.api_key = api_key or self._get_api_key()
         self.endpoints = self._get_endpoints()
+        self.session = _build_session(pool_size)
+        self.limiter = get_limiter(provider.value)
+    
+    @classmethod
+    def enable_dedup(cls, index: Optional[DedupIndex] = None,
+                     config_path: Optional[str] = None) -> Optional[DedupIndex]:
+        """Answer repeated prompts and near-identical frames from a persistent index"""
+        index = index or DedupIndex.from_config(config_path)
+        cls.dedup = index if index.enabled else None
+        return cls.dedup
+    
+    def _reuse_result(self, input_path: str, prompt: str) -> Optional[str]:
+        """Stored result for an equivalent earlier request, restoring any result file"""
+        if self.dedup is None:
+            return None
+        try:
+            hit = self.dedup.lookup(self.provider.value, prompt, input_path)
+            if hit is None:
+                return None
+            logger.info(f"Dedup hit for {self.provider.value}: {input_path}")
+            if not hit["asset"]:
+                return hit["result"]
+            # Result files are restored where the provider would have written them
+            restored = Path(input_path).parent / f"{self.provider.value}_outputs" / hit["result"]
+            restored.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(hit["asset"], restored)
+            return str(restored)
+        except Exception as e:
+            logger.warning(f"Dedup lookup failed: {e}")
+            return None
+    
+    def _remember_result(self, input_path: Optional[str], prompt: str, result: Optional[str]):
+        if self.dedup is None or result is None:
+            return
+        try:
+            if os.path.isfile(result):
+                self.dedup.store(self.provider.value, prompt, input_path,
+                                 result=os.path.basename(result), asset_path=result)
+            else:
+                self.dedup.store(self.provider.value, prompt, input_path, result=result)
+        except Exception as e:
+            logger.warning(f"Dedup store failed: {e}")
     
     def _get_api_key(self) -> str:
         """Get API key from environment"""
@@ -39,57 +330,105 @@ class AIClient:
     
     def _get_endpoints(self) -> Dict:
         """Get API endpoints for provider"""
-        endpoints = {
-            AIProvider.GROK: {
-                "video": "https://api.x.ai/video/process",
-                "imagine": "https://api.x.ai/imagine"
-            },
-            AIProvider.MIDJOURNEY: {
-                "imagine": "https://api.midjourney.com/v1/imagine",
-                "process": "https://api.midjourney.com/v1/process"
-            },
-            AIProvider.COMFYUI: {
-                "api": "http://localhost:8188/api"
-            },
-            AIProvider.CLAUDE: {
-                "messages": "https://api.anthropic.com/v1/messages"
-            }
-        }
-        return endpoints.get(self.provider, {})
+        return dict(ENDPOINTS.get(self.provider, {}))
+    
+    def _request(self, method: str, url: str, rewind: Optional[IO] = None,
+                 **kwargs) -> "requests.Response":
+        """Send through the provider limiter, retrying 429/5xx with jittered backoff"""
+        with span(f"{self.provider.value}.{method}", "provider", url=url) as trace:
+            response = self._send_with_retries(method, url, rewind, **kwargs)
+            trace.set(status_code=response.status_code,
+                      bytes_out=request_bytes(response.request),
+                      bytes_in=len(response.content))
+            return response
+    
+    def _send_with_retries(self, method: str, url: str, rewind: Optional[IO],
+                           **kwargs) -> "requests.Response":
+        import requests
+
+        attempt = 0
+        while True:
+            if rewind is not None:
+                rewind.seek(0)
+            try:
+                with self.limiter.slot():
+                    response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.limiter.max_retries:
+                    raise
+                delay = self.limiter.backoff(attempt)
+                logger.warning(f"{self.provider.value} request failed ({e}); retrying in {delay:.1f}s")
+                self.limiter.wait_backoff(delay)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.limiter.max_retries:
+                    return response
+                delay = self.limiter.backoff(attempt, parse_retry_after(response.headers.get("Retry-After")))
+                logger.warning(
+                    f"{self.provider.value} returned {response.status_code}; retrying in {delay:.1f}s"
+                )
+                self.limiter.wait_backoff(delay, throttled=response.status_code == 429)
+            attempt += 1
     
     def process_video(self, video_path: str, prompt: str) -> Optional[str]:
         """Process video with AI provider"""
         logger.info(f"Processing video with {self.provider.value}: {video_path}")
         
-        if not self.api_key:
+        cached = self._reuse_result(video_path, prompt)
+        if cached is not None:
+            return cached
+        
+        if not self.api_key and self.provider != AIProvider.COMFYUI:
             logger.error("API key required for processing")
             return None
         
         # Placeholder implementations
+        result = None
         if self.provider == AIProvider.GROK:
-            return self._process_grok(video_path, prompt)
+            result = self._process_grok(video_path, prompt)
         elif self.provider == AIProvider.MIDJOURNEY:
-            return self._process_midjourney(video_path, prompt)
+            result = self._process_midjourney(video_path, prompt)
         elif self.provider == AIProvider.COMFYUI:
-            return self._process_comfyui(video_path, prompt)
+            result = self._process_comfyui(video_path, prompt)
         
-        return None
+        self._remember_result(video_path, prompt, result)
+        return result
     
     def _process_grok(self, video_path: str, prompt: str) -> Optional[str]:
         """Process with Grok API"""
         try:
             headers = {"Authorization": f"Bearer {self.api_key}"}
-            with open(video_path, "rb") as f:
-                files = {"video": f}
-                data = {"prompt": prompt}
+            if os.path.getsize(video_path) >= CHUNKED_UPLOAD_THRESHOLD:
+                uploader = ChunkedUploader(
+                    self.session, self.endpoints["upload"], headers, limiter=self.limiter
+                )
+                uploaded = uploader.upload(video_path)
+                if uploaded is None:
+                    return None
+                if not uploaded.get("file_id"):
+                    logger.error(f"Upload of {video_path} returned no file_id: {uploaded}")
+                    return None
                 
-                response = requests.post(
+                response = self._request(
+                    "post",
                     self.endpoints["video"],
                     headers=headers,
-                    files=files,
-                    data=data,
+                    json={"file_id": uploaded.get("file_id"), "prompt": prompt},
                     timeout=300
                 )
+            else:
+                with open(video_path, "rb") as f:
+                    files = {"video": f}
+                    data = {"prompt": prompt}
+                    
+                    response = self._request(
+                        "post",
+                        self.endpoints["video"],
+                        rewind=f,
+                        headers=headers,
+                        files=files,
+                        data=data,
+                        timeout=300
+                    )
             
             if response.status_code == 200:
                 logger.info("Grok processing successful")
@@ -112,7 +451,8 @@ class AIClient:
                 "video_path": video_path
             }
             
-            response = requests.post(
+            response = self._request(
+                "post",
                 self.endpoints["imagine"],
                 headers=headers,
                 json=payload,
@@ -128,32 +468,47 @@ class AIClient:
         return None
     
     def _process_comfyui(self, video_path: str, prompt: str) -> Optional[str]:
-        """Process with ComfyUI (local)"""
+        """Process with ComfyUI (local); returns the first output file"""
+        return self._run_comfyui_batch([(video_path, prompt)])[0]
+    
+    def process_comfyui_batch(self, items: List[Tuple[str, str]]) -> List[Optional[str]]:
+        """Queue one ComfyUI workflow per (input_path, prompt) pair as a single batch.
+
+        Outputs land in a comfyui_outputs folder beside the first input;
+        each result is the item's first output file, or None on failure.
+        Items answered by the dedup index are not queued.
+        """
+        results = [self._reuse_result(path, prompt) for path, prompt in items]
+        pending = [i for i, result in enumerate(results) if result is None]
+        outputs = self._run_comfyui_batch([items[i] for i in pending])
+        for index, output in zip(pending, outputs):
+            results[index] = output
+            self._remember_result(*items[index], output)
+        return results
+    
+    def _run_comfyui_batch(self, items: List[Tuple[str, str]]) -> List[Optional[str]]:
+        if not items:
+            return []
+        from comfyui_client import ComfyUIClient
+
         try:
-            # ComfyUI workflow JSON
-            workflow = {
-                "prompt": prompt,
-                "input_video": video_path
-            }
-            
-            response = requests.post(
-                f"{self.endpoints['api']}/prompt",
-                json=workflow,
-                timeout=600
-            )
-            
-            if response.status_code == 200:
-                logger.info("ComfyUI processing successful")
-                return response.json().get("prompt_id")
+            client = ComfyUIClient.from_config(default_url=self.endpoints["api"])
+            output_folder = Path(items[0][0]).parent / "comfyui_outputs"
+            outputs = client.run_items(items, str(output_folder))
+            logger.info(f"ComfyUI processing finished for {sum(1 for o in outputs if o)}/{len(items)} items")
+            return [paths[0] if paths else None for paths in outputs]
         except Exception as e:
             logger.error(f"ComfyUI processing error: {e}")
         
-        return None
+        return [None] * len(items)
     
     def generate_image(self, prompt: str, output_path: str) -> bool:
         """Generate image from prompt"""
         logger.info(f"Generating image with {self.provider.value}: {prompt}")
         
+        if self._reuse_image(prompt, output_path):
+            return True
+        
         if not self.api_key:
             logger.error("API key required")
             return False
@@ -162,7 +517,8 @@ class AIClient:
             headers = {"Authorization": f"Bearer {self.api_key}"}
             payload = {"prompt": prompt}
             
-            response = requests.post(
+            response = self._request(
+                "post",
                 self.endpoints.get("imagine", ""),
                 headers=headers,
                 json=payload,
@@ -177,11 +533,107 @@ class AIClient:
                     f.write(response.content)
                 
                 logger.info(f"Image saved: {output_path}")
+                self._remember_result(None, prompt, output_path)
                 return True
         except Exception as e:
             logger.error(f"Image generation error: {e}")
         
         return False
+    
+    def _reuse_image(self, prompt: str, output_path: str) -> bool:
+        """Copy a stored image for an equivalent prompt to output_path"""
+        if self.dedup is None:
+            return False
+        try:
+            hit = self.dedup.lookup(self.provider.value, prompt)
+            if hit is None or not hit["asset"]:
+                return False
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(hit["asset"], output_path)
+            logger.info(f"Dedup hit, image reused: {output_path}")
+            return True
+        except Exception as e:
+            logger.warning(f"Dedup lookup failed: {e}")
+            return False
+
+class AsyncAIClient:
+    """Asyncio front end to AIClient with pooled connections and bounded concurrency.
+
+    Blocking provider calls run on a thread pool sharing one keep-alive
+    session; a semaphore caps how many are in flight for this provider.
+    """
+    
+    def __init__(self, provider: AIProvider, api_key: Optional[str] = None,
+                 max_concurrency: Optional[int] = None):
+        self.provider = provider
+        self.max_concurrency = max_concurrency or DEFAULT_CONCURRENCY.get(provider, 4)
+        self.client = AIClient(provider, api_key, pool_size=self.max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix=f"ai-{provider.value}"
+        )
+        # asyncio is imported by the async client only; sync callers never load it
+        import asyncio
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+    
+    async def _call(self, func, *args):
+        """Run a blocking client method once a concurrency slot is free"""
+        import asyncio
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+    
+    async def process_video(self, video_path: str, prompt: str) -> Optional[str]:
+        """Process video with AI provider"""
+        return await self._call(self.client.process_video, video_path, prompt)
+    
+    async def generate_image(self, prompt: str, output_path: str) -> bool:
+        """Generate image from prompt"""
+        return await self._call(self.client.generate_image, prompt, output_path)
+    
+    async def process_batch(self, items: List[Tuple[str, str]]) -> List[Optional[str]]:
+        """Process (video_path, prompt) pairs concurrently, results in input order"""
+        import asyncio
+        if self.provider == AIProvider.COMFYUI:
+            # One queued batch keeps the ComfyUI GPU busy and its graph loaded
+            return await self._call(self.client.process_comfyui_batch, items)
+        return await asyncio.gather(*(self.process_video(path, prompt) for path, prompt in items))
+    
+    async def generate_images(self, prompts: List[str], output_folder: str,
+                              name_pattern: str = "image_{:04d}.png") -> List[bool]:
+        """Generate one image per prompt concurrently, results in input order.
+        
+        With dedup enabled, prompts that normalize to the same text are
+        generated once and the image is copied to the other slots.
+        """
+        import asyncio
+        paths = [os.path.join(output_folder, name_pattern.format(i)) for i in range(1, len(prompts) + 1)]
+        keys = [normalize_prompt(p) if AIClient.dedup is not None else i for i, p in enumerate(prompts)]
+        leaders: Dict = {}
+        for index, key in enumerate(keys):
+            leaders.setdefault(key, index)
+        unique = list(leaders.values())
+        generated = await asyncio.gather(*(self.generate_image(prompts[i], paths[i]) for i in unique))
+        done = dict(zip(unique, generated))
+        results = []
+        for index, key in enumerate(keys):
+            leader = leaders[key]
+            if leader != index and done[leader]:
+                shutil.copyfile(paths[leader], paths[index])
+            results.append(done[leader])
+        logger.info(f"Generated {sum(results)}/{len(prompts)} images with {self.provider.value}")
+        return results
+    
+    async def close(self):
+        """Release pooled connections and worker threads"""
+        self._executor.shutdown(wait=True)
+        self.client.session.close()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
 
 def get_client(provider: str, api_key: Optional[str] = None) -> AIClient:
     """Factory function to get AI client"""
@@ -191,7 +643,29 @@ def get_client(provider: str, api_key: Optional[str] = None) -> AIClient:
     except ValueError:
         raise ValueError(f"Unknown provider: {provider}")
 
+def get_async_client(provider: str, api_key: Optional[str] = None,
+                     max_concurrency: Optional[int] = None) -> AsyncAIClient:
+    """Factory function to get async AI client"""
+    try:
+        provider_enum = AIProvider(provider.lower())
+    except ValueError:
+        raise ValueError(f"Unknown provider: {provider}")
+    return AsyncAIClient(provider_enum, api_key, max_concurrency)
+
+def generate_images_batch(provider: str, prompts: List[str], output_folder: str,
+                          max_concurrency: Optional[int] = None) -> List[bool]:
+    """Synchronous entry point: generate images for a prompt batch concurrently"""
+    import asyncio
+
+    async def run() -> List[bool]:
+        async with get_async_client(provider, max_concurrency=max_concurrency) as client:
+            return await client.generate_images(prompts, output_folder)
+    results = asyncio.run(run())
+    log_metrics()
+    return results
+
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     # Example usage
     client = get_client("grok")
     client.generate_image("A beautiful sunset", "output.png")
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the VideoProcessor and AIClient hot paths
+
+Generates synthetic clips with ffmpeg's testsrc, times each operation
+(wall and CPU time, throughput, peak RSS) and writes the results as JSON.
+Interpreter startup of the entry points the scripts spawn per item is
+timed too, against an import-time budget. A previous run can be given
+as a baseline to flag regressions.
+
+    python benchmark.py run -o results.json
+    python benchmark.py run --baseline results.json
+    python benchmark.py compare results.json new_results.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+import logging
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from ai_client import AIProvider, AsyncAIClient
+from rate_limiter import configure_limiter
+from video_processor import VideoProcessor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESOLUTIONS = ["320x240", "1280x720"]
+DEFAULT_DURATIONS = [2, 6]
+DEFAULT_FPS = 24
+
+# Relative slowdown in wall time reported as a regression
+DEFAULT_THRESHOLD = 0.10
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Entry points launched once per item, and the seconds each may take to
+# import in a fresh interpreter (interpreter startup itself not included)
+STARTUP_BUDGETS = {"ai_client": 0.15, "video_processor": 0.15, "worker": 0.2}
+# Imported on first use; an entry point loading one at import has regressed
+LAZY_IMPORTS = ("numpy", "requests", "asyncio")
+
+
+def _rusage() -> Dict[str, float]:
+    """CPU seconds and peak RSS (MB) for this process plus waited-for children"""
+    if resource is None:
+        return {"cpu": time.process_time(), "self_rss": 0.0, "child_rss": 0.0}
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss is KB on Linux and bytes on macOS
+    scale = 1 / (1024 * 1024) if sys.platform == "darwin" else 1 / 1024
+    return {
+        "cpu": own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+        "self_rss": own.ru_maxrss * scale,
+        "child_rss": children.ru_maxrss * scale,
+    }
+
+
+def measure(func: Callable[[], object], items: int = 0, unit: str = "frames",
+            repeat: int = 1) -> Dict:
+    """Run func `repeat` times and keep the fastest run's timings.
+
+    Child peak RSS is a high-water mark over every ffmpeg process waited for
+    so far, so it is only meaningful when operations are compared run to run.
+    """
+    best = None
+    for _ in range(repeat):
+        before = _rusage()
+        started = time.perf_counter()
+        ok = func()
+        wall = time.perf_counter() - started
+        after = _rusage()
+        run = {
+            "ok": ok is not False,
+            "wall_seconds": round(wall, 4),
+            "cpu_seconds": round(after["cpu"] - before["cpu"], 4),
+            "items": items,
+            "unit": unit,
+            "throughput": round(items / wall, 2) if items and wall else None,
+            "peak_rss_mb": round(after["self_rss"], 1),
+            "peak_child_rss_mb": round(after["child_rss"], 1),
+        }
+        if best is None or run["wall_seconds"] < best["wall_seconds"]:
+            best = run
+    return best
+
+
+def generate_clip(path: str, resolution: str, duration: int, fps: int = DEFAULT_FPS) -> bool:
+    """Synthetic test clip with a short GOP so it splits and seeks cleanly"""
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi",
+        "-i", f"testsrc=size={resolution}:rate={fps}:duration={duration}",
+        "-c:v", "libx264", "-preset", "ultrafast",
+        "-g", str(fps), "-pix_fmt", "yuv420p",
+        "-y", path
+    ]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+        return True
+    except Exception as e:
+        logger.error(f"Clip generation failed: {e}")
+        return False
+
+
+def benchmark_video(work_dir: str, resolution: str, duration: int,
+                    fps: int = DEFAULT_FPS, repeat: int = 1) -> Dict[str, Dict]:
+    """Time each VideoProcessor operation on one synthetic clip"""
+    name = f"{resolution}_{duration}s"
+    clip = os.path.join(work_dir, f"{name}.mp4")
+    if not generate_clip(clip, resolution, duration, fps):
+        return {}
+
+    frames = duration * fps
+    frames_dir = os.path.join(work_dir, f"{name}_frames")
+    out = lambda suffix: os.path.join(work_dir, f"{name}_{suffix}.mp4")
+
+    def extract():
+        shutil.rmtree(frames_dir, ignore_errors=True)
+        return VideoProcessor.extract_frames(clip, frames_dir, fps=fps)
+
+    results = {f"extract/{name}": measure(extract, frames, repeat=repeat)}
+    results[f"stitch/{name}"] = measure(
+        lambda: VideoProcessor.stitch_frames(frames_dir, out("stitched"), fps=fps), frames, repeat=repeat
+    )
+    results[f"convert/{name}"] = measure(
+        lambda: VideoProcessor.convert_video(clip, out("converted"), fps=fps), frames, repeat=repeat
+    )
+    results[f"upscale/{name}"] = measure(
+        lambda: VideoProcessor.upscale_video(clip, out("upscaled"), scale_factor=2), frames, repeat=repeat
+    )
+    results[f"concat/{name}"] = measure(
+        lambda: VideoProcessor.concat_videos([clip] * 3, out("concat")), frames * 3, repeat=repeat
+    )
+    return results
+
+
+class _MockProviderHandler(BaseHTTPRequestHandler):
+    """Provider stand-in: answers every request with a small image after a fixed delay"""
+
+    protocol_version = "HTTP/1.1"
+    body = b"\x89PNG\r\n\x1a\n" + bytes(4096)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def benchmark_ai(work_dir: str, requests: int = 64, concurrency: int = 8,
+                 latency: float = 0.02, repeat: int = 1) -> Dict[str, Dict]:
+    """Time an AsyncAIClient image batch against a local mock provider"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _MockProviderHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    # Measure the client, not the configured provider rate limit
+    configure_limiter(AIProvider.GROK.value)
+
+    prompts = [f"benchmark prompt {i}" for i in range(requests)]
+    output_folder = os.path.join(work_dir, "ai_images")
+
+    async def batch():
+        async with AsyncAIClient(AIProvider.GROK, "benchmark", max_concurrency=concurrency) as client:
+            client.client.endpoints = {"imagine": f"{url}/imagine"}
+            return all(await client.generate_images(prompts, output_folder))
+
+    try:
+        result = measure(lambda: asyncio.run(batch()), requests, unit="requests", repeat=repeat)
+    finally:
+        server.shutdown()
+        server.server_close()
+    result.update(concurrency=concurrency, latency_seconds=latency)
+    return {f"ai_batch/grok_{requests}x{concurrency}": result}
+
+
+def import_cost(module: str) -> Dict:
+    """Seconds a fresh interpreter takes to import module, and the LAZY_IMPORTS it loaded"""
+    code = (
+        "import json, sys, time\n"
+        "started = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(json.dumps({'seconds': time.perf_counter() - started,"
+        f" 'loaded': [m for m in {LAZY_IMPORTS!r} if m in sys.modules]}}))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=MODULE_DIR,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def benchmark_startup(repeat: int = 1) -> Dict[str, Dict]:
+    """Time a fresh interpreter importing each entry point; over budget counts as failed"""
+    results = {}
+    for module, budget in STARTUP_BUDGETS.items():
+        command = [sys.executable, "-c", f"import {module}"]
+        result = measure(lambda: subprocess.run(command, cwd=MODULE_DIR, check=True, capture_output=True),
+                         1, unit="starts", repeat=repeat)
+        cost = min((import_cost(module) for _ in range(repeat)), key=lambda c: c["seconds"])
+        result.update(import_seconds=round(cost["seconds"], 4), budget_seconds=budget,
+                      lazy_loaded=cost["loaded"])
+        result["ok"] = result["ok"] and cost["seconds"] <= budget and not cost["loaded"]
+        results[f"startup/{module}"] = result
+    return results
+
+
+def _ffmpeg_version() -> Optional[str]:
+    try:
+        output = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout
+        return output.splitlines()[0] if output else None
+    except OSError:
+        return None
+
+
+def run_benchmarks(resolutions: List[str], durations: List[int], repeat: int = 1,
+                   ai_requests: int = 64, ai_concurrency: int = 8,
+                   include_video: bool = True) -> Dict:
+    """Run every benchmark case; returns the JSON-serializable report"""
+    ffmpeg_version = _ffmpeg_version()
+    work_dir = tempfile.mkdtemp(prefix="vp_bench_")
+    results: Dict[str, Dict] = {}
+    try:
+        if include_video and ffmpeg_version is None:
+            logger.warning("ffmpeg not found; skipping video benchmarks")
+        elif include_video:
+            for resolution in resolutions:
+                for duration in durations:
+                    results.update(benchmark_video(work_dir, resolution, duration, repeat=repeat))
+        results.update(benchmark_ai(work_dir, ai_requests, ai_concurrency, repeat=repeat))
+        results.update(benchmark_startup(repeat))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "ffmpeg": ffmpeg_version,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """Cases that got slower than the baseline by more than threshold"""
+    regressions = []
+    for case, now in current.get("results", {}).items():
+        before = baseline.get("results", {}).get(case)
+        if not before or not before.get("wall_seconds"):
+            continue
+        change = now["wall_seconds"] / before["wall_seconds"] - 1
+        if change > threshold or (before.get("ok") and not now.get("ok")):
+            regressions.append({
+                "case": case,
+                "baseline_seconds": before["wall_seconds"],
+                "current_seconds": now["wall_seconds"],
+                "change": round(change, 4),
+            })
+    return regressions
+
+
+def print_report(report: Dict, regressions: Optional[List[Dict]] = None):
+    """Human-readable summary of a report"""
+    print(f"{'case':<32} {'wall s':>8} {'cpu s':>8} {'throughput':>16} {'rss MB':>8}")
+    for case, result in report["results"].items():
+        throughput = f"{result['throughput']} {result['unit']}/s" if result["throughput"] else "-"
+        rss = max(result["peak_rss_mb"], result["peak_child_rss_mb"])
+        flag = "" if result["ok"] else "  FAILED"
+        print(f"{case:<32} {result['wall_seconds']:>8.3f} {result['cpu_seconds']:>8.3f} "
+              f"{throughput:>16} {rss:>8.1f}{flag}")
+    for regression in regressions or []:
+        print(f"REGRESSION {regression['case']}: {regression['baseline_seconds']:.3f}s -> "
+              f"{regression['current_seconds']:.3f}s ({regression['change']:+.0%})")
+
+
+def _load(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    """Command-line entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the video pipeline hot paths")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run benchmarks and write JSON results")
+    run.add_argument("-o", "--output", help="Write results to this JSON file")
+    run.add_argument("--resolutions", default=",".join(DEFAULT_RESOLUTIONS),
+                     help="Comma-separated WxH list")
+    run.add_argument("--durations", default=",".join(map(str, DEFAULT_DURATIONS)),
+                     help="Comma-separated clip lengths in seconds")
+    run.add_argument("--repeat", type=int, default=1, help="Runs per case; the fastest is kept")
+    run.add_argument("--ai-requests", type=int, default=64)
+    run.add_argument("--ai-concurrency", type=int, default=8)
+    run.add_argument("--ai-only", action="store_true", help="Skip the ffmpeg benchmarks")
+    run.add_argument("--baseline", help="Earlier results file to compare against")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    diff = commands.add_parser("compare", help="Compare two results files")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+    diff.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    args = parser.parse_args()
+    # Per-request INFO logging would dominate the timings
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    if args.command == "compare":
+        current = _load(args.current)
+        regressions = compare(_load(args.baseline), current, args.threshold)
+        print_report(current, regressions)
+        sys.exit(1 if regressions else 0)
+
+    report = run_benchmarks(
+        args.resolutions.split(","),
+        [int(d) for d in args.durations.split(",")],
+        repeat=args.repeat,
+        ai_requests=args.ai_requests,
+        ai_concurrency=args.ai_concurrency,
+        include_video=not args.ai_only
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    regressions = compare(_load(args.baseline), report, args.threshold) if args.baseline else []
+    print_report(report, regressions)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
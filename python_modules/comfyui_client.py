@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+ComfyUI queue client
+
+Submits batches of workflows to a ComfyUI server, tracks completion over
+its websocket instead of polling, and downloads finished outputs
+concurrently.
+"""
+
+import os
+import copy
+import json
+import uuid
+import base64
+import socket
+import struct
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlparse
+import logging
+
+import requests
+
+from pipeline_config import load_config, resolve_path
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+ProgressCallback = Callable[[str, int, int], None]
+
+
+class ComfyUIError(Exception):
+    """Raised when the server rejects a prompt or the websocket fails"""
+
+
+class _WebSocket:
+    """Minimal RFC 6455 client: enough to read ComfyUI's status stream"""
+
+    def __init__(self, url: str, timeout: float):
+        parsed = urlparse(url)
+        port = parsed.port or (443 if parsed.scheme == "wss" else 80)
+        if parsed.scheme == "wss":
+            raise ComfyUIError("wss:// is not supported; use the local http endpoint")
+        self.sock = socket.create_connection((parsed.hostname, port), timeout=timeout)
+        self.reader = self.sock.makefile("rb")
+
+        key = base64.b64encode(os.urandom(16)).decode()
+        path = parsed.path or "/"
+        if parsed.query:
+            path += f"?{parsed.query}"
+        request = (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {parsed.hostname}:{port}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        )
+        self.sock.sendall(request.encode())
+
+        status = self.reader.readline().decode("latin-1")
+        headers = {}
+        while True:
+            line = self.reader.readline().decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        expected = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        if " 101 " not in status or headers.get("sec-websocket-accept") != expected:
+            self.close()
+            raise ComfyUIError(f"Websocket handshake failed: {status.strip()}")
+
+    def _read_exact(self, count: int) -> bytes:
+        data = self.reader.read(count)
+        if len(data) < count:
+            raise ConnectionError("Websocket closed")
+        return data
+
+    def _send(self, opcode: int, payload: bytes = b""):
+        mask = os.urandom(4)
+        header = bytes([0x80 | opcode])
+        if len(payload) < 126:
+            header += bytes([0x80 | len(payload)])
+        elif len(payload) < 65536:
+            header += bytes([0x80 | 126]) + struct.pack("!H", len(payload))
+        else:
+            header += bytes([0x80 | 127]) + struct.pack("!Q", len(payload))
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        self.sock.sendall(header + mask + masked)
+
+    def recv(self) -> Optional[str]:
+        """Next text message; binary frames (previews) are skipped, None on close"""
+        message, message_opcode = b"", None
+        while True:
+            first, second = self._read_exact(2)
+            fin, opcode = first & 0x80, first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", self._read_exact(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", self._read_exact(8))[0]
+            mask = self._read_exact(4) if second & 0x80 else None
+            payload = self._read_exact(length)
+            if mask:
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+            if opcode == 0x8:
+                return None
+            if opcode == 0x9:
+                self._send(0xA, payload)
+                continue
+            if opcode == 0xA:
+                continue
+            if opcode in (0x1, 0x2):
+                message_opcode = opcode
+            message += payload
+            if fin:
+                if message_opcode == 0x1:
+                    return message.decode("utf-8")
+                message, message_opcode = b"", None
+
+    def close(self):
+        try:
+            self._send(0x8)
+        except OSError:
+            pass
+        self.reader.close()
+        self.sock.close()
+
+
+class ComfyUIClient:
+    """Batch client for a ComfyUI server"""
+
+    def __init__(self, base_url: str = "http://127.0.0.1:8188", client_id: Optional[str] = None,
+                 timeout: float = 600, download_workers: int = 4,
+                 workflow: Optional[Dict] = None, prompt_node: Optional[str] = None,
+                 input_node: Optional[str] = None, prompt_input: str = "text",
+                 file_input: str = "image"):
+        self.base_url = base_url.rstrip("/")
+        self.client_id = client_id or uuid.uuid4().hex
+        self.timeout = timeout
+        self.download_workers = download_workers
+        self.workflow = workflow
+        self.prompt_node = prompt_node
+        self.input_node = input_node
+        self.prompt_input = prompt_input
+        self.file_input = file_input
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=download_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_config(cls, config_path: Optional[str] = None,
+                    default_url: str = "http://127.0.0.1:8188") -> "ComfyUIClient":
+        """Client for the providers.comfyui section of pipeline.config.json"""
+        settings = load_config(config_path).get("providers", {}).get("comfyui", {})
+        workflow = None
+        if settings.get("workflow"):
+            try:
+                with open(resolve_path(settings["workflow"], config_path), encoding="utf-8-sig") as f:
+                    workflow = json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading ComfyUI workflow: {e}")
+        return cls(
+            settings.get("server", default_url),
+            download_workers=settings.get("download_workers", 4),
+            workflow=workflow,
+            prompt_node=settings.get("prompt_node") or None,
+            input_node=settings.get("input_node") or None,
+            prompt_input=settings.get("prompt_input", "text"),
+            file_input=settings.get("file_input", "image")
+        )
+
+    @staticmethod
+    def workflows_from_template(template: Dict, prompts: List[str], prompt_node: str,
+                                input_name: str = "text", seed_node: Optional[str] = None,
+                                seed: int = 0) -> List[Dict]:
+        """One workflow per prompt, all sharing the template's graph.
+
+        Only the prompt (and optionally seed) inputs differ, so ComfyUI keeps
+        the loaded checkpoint and every unchanged node cached across the batch.
+        """
+        workflows = []
+        for index, prompt in enumerate(prompts):
+            workflow = copy.deepcopy(template)
+            workflow[prompt_node]["inputs"][input_name] = prompt
+            if seed_node is not None:
+                workflow[seed_node]["inputs"]["seed"] = seed + index
+            workflows.append(workflow)
+        return workflows
+
+    def _ws_url(self) -> str:
+        parsed = urlparse(self.base_url)
+        scheme = "wss" if parsed.scheme == "https" else "ws"
+        return f"{scheme}://{parsed.netloc}{parsed.path}/ws?{urlencode({'clientId': self.client_id})}"
+
+    def queue_prompt(self, workflow: Dict) -> str:
+        """Queue one workflow; returns its prompt_id"""
+        response = self.session.post(
+            f"{self.base_url}/prompt",
+            json={"prompt": workflow, "client_id": self.client_id},
+            timeout=30
+        )
+        if response.status_code != 200:
+            raise ComfyUIError(f"Prompt rejected ({response.status_code}): {response.text[:200]}")
+        return response.json()["prompt_id"]
+
+    def upload_input(self, path: str) -> str:
+        """Copy a local file into the server's input folder; returns its name there"""
+        with open(path, "rb") as f:
+            response = self.session.post(
+                f"{self.base_url}/upload/image",
+                files={"image": (Path(path).name, f)},
+                data={"overwrite": "true"},
+                timeout=self.timeout
+            )
+        response.raise_for_status()
+        result = response.json()
+        return f"{result['subfolder']}/{result['name']}" if result.get("subfolder") else result["name"]
+
+    def history(self, prompt_id: str) -> Dict:
+        """Execution record for a prompt, empty while it is still queued"""
+        response = self.session.get(f"{self.base_url}/history/{prompt_id}", timeout=30)
+        response.raise_for_status()
+        return response.json().get(prompt_id, {})
+
+    def _wait(self, ws: _WebSocket, prompt_ids: List[str],
+              progress: Optional[ProgressCallback]) -> Dict[str, str]:
+        """Read websocket events until every prompt has finished or failed"""
+        pending = set(prompt_ids)
+        status = {}
+        while pending:
+            try:
+                raw = ws.recv()
+            except (OSError, ConnectionError) as e:
+                logger.warning(f"ComfyUI websocket lost ({e}); checking history")
+                break
+            if raw is None:
+                break
+            message = json.loads(raw)
+            data = message.get("data", {})
+            prompt_id = data.get("prompt_id")
+            if prompt_id not in pending:
+                continue
+
+            kind = message.get("type")
+            if kind == "progress" and progress:
+                progress(prompt_id, data.get("value", 0), data.get("max", 0))
+            elif kind == "executing" and data.get("node") is None:
+                status[prompt_id] = "success"
+                pending.discard(prompt_id)
+            elif kind == "execution_error":
+                logger.error(f"ComfyUI prompt {prompt_id} failed: {data.get('exception_message')}")
+                status[prompt_id] = "error"
+                pending.discard(prompt_id)
+
+        for prompt_id in pending:
+            record = self.history(prompt_id)
+            completed = record.get("status", {}).get("completed", bool(record.get("outputs")))
+            status[prompt_id] = "success" if completed else "unknown"
+        return status
+
+    def _download(self, image: Dict, output_folder: str) -> str:
+        query = {key: image.get(key, "") for key in ("filename", "subfolder", "type")}
+        response = self.session.get(f"{self.base_url}/view", params=query, timeout=self.timeout)
+        response.raise_for_status()
+        target = Path(output_folder) / image["filename"]
+        partial = target.with_name(f".{target.name}.partial")
+        partial.write_bytes(response.content)
+        os.replace(partial, target)
+        return str(target)
+
+    def download_outputs(self, prompt_ids: List[str], output_folder: str) -> List[List[str]]:
+        """Fetch every output file of the given prompts concurrently"""
+        Path(output_folder).mkdir(parents=True, exist_ok=True)
+        images = []
+        for index, prompt_id in enumerate(prompt_ids):
+            for node_output in self.history(prompt_id).get("outputs", {}).values():
+                for image in node_output.get("images", []) + node_output.get("gifs", []):
+                    images.append((index, image))
+
+        results: List[List[str]] = [[] for _ in prompt_ids]
+        with ThreadPoolExecutor(max_workers=self.download_workers) as pool:
+            paths = pool.map(lambda item: self._download(item[1], output_folder), images)
+            for (index, _), path in zip(images, paths):
+                results[index].append(path)
+        return results
+
+    def run_batch(self, workflows: List[Dict], output_folder: str,
+                  progress: Optional[ProgressCallback] = None) -> List[List[str]]:
+        """Queue all workflows, wait on the websocket, download outputs in input order"""
+        with span("comfyui.batch", "provider", prompts=len(workflows)) as trace:
+            ws = _WebSocket(self._ws_url(), timeout=self.timeout)
+            try:
+                # Connected before queueing so no completion event can be missed
+                prompt_ids = [self.queue_prompt(workflow) for workflow in workflows]
+                logger.info(f"Queued {len(prompt_ids)} ComfyUI prompts")
+                status = self._wait(ws, prompt_ids, progress)
+            finally:
+                ws.close()
+
+            finished = [pid for pid in prompt_ids if status.get(pid) == "success"]
+            downloaded = dict(zip(finished, self.download_outputs(finished, output_folder)))
+            trace.set(succeeded=len(finished),
+                      bytes_in=sum(os.path.getsize(p) for paths in downloaded.values() for p in paths))
+        logger.info(f"ComfyUI batch done: {len(finished)}/{len(prompt_ids)} succeeded")
+        return [downloaded.get(pid, []) for pid in prompt_ids]
+
+    def run_items(self, items: List[Tuple[str, str]], output_folder: str,
+                  progress: Optional[ProgressCallback] = None) -> List[List[str]]:
+        """Run the configured workflow once per (input_path, prompt) pair.
+
+        Inputs are uploaded concurrently, then the whole batch is queued at
+        once so the GPU never idles between items.
+        """
+        if not self.workflow or not self.prompt_node:
+            raise ComfyUIError("No ComfyUI workflow template configured")
+
+        workflows = self.workflows_from_template(
+            self.workflow, [prompt for _, prompt in items], self.prompt_node, self.prompt_input
+        )
+        if self.input_node:
+            with ThreadPoolExecutor(max_workers=self.download_workers) as pool:
+                names = list(pool.map(self.upload_input, [path for path, _ in items]))
+            for workflow, name in zip(workflows, names):
+                workflow[self.input_node]["inputs"][self.file_input] = name
+        return self.run_batch(workflows, output_folder, progress)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Concat planning: stream-copy what matches, re-encode only what must change
+
+``-c copy`` concat needs every clip to share codec, profile, size, pixel
+format, frame rate, time base and audio layout. Clips are probed
+concurrently and grouped by that signature. The group with the most
+duration becomes the target: its clips are copied as they are, other clips
+are re-encoded to match it, and one concat-demuxer pass joins the pieces.
+
+Trim points are cut on keyframes. The keyframe-aligned middle of a trimmed
+clip is copied (concat ``inpoint``/``outpoint``), and only the partial GOPs
+before the first and after the last keyframe in range are re-encoded.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from tracing import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# Tolerance when comparing trim points with keyframe timestamps
+EPSILON = 0.001
+
+# codec_name reported by ffprobe -> encoder producing it
+VIDEO_ENCODERS = {
+    "h264": "libx264",
+    "hevc": "libx265",
+    "av1": "libsvtav1",
+    "vp9": "libvpx-vp9",
+    "vp8": "libvpx",
+    "prores": "prores_ks",
+}
+AUDIO_ENCODERS = {
+    "mp3": "libmp3lame",
+    "opus": "libopus",
+    "vorbis": "libvorbis",
+}
+
+Trim = Optional[Tuple[Optional[float], Optional[float]]]
+
+
+def probe_clip(path: str) -> Dict:
+    """Stream properties that decide whether clips can be stream-copied together"""
+    cmd = ["ffprobe", "-v", "error", "-print_format", "json", "-show_streams", "-show_format", path]
+    data = json.loads(subprocess.run(cmd, capture_output=True, text=True, check=True).stdout)
+    streams = data.get("streams", [])
+    video = next(s for s in streams if s.get("codec_type") == "video")
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    return {
+        "duration": float(data.get("format", {}).get("duration") or video.get("duration") or 0),
+        "video": {
+            "codec": video.get("codec_name"),
+            "profile": video.get("profile"),
+            "width": video.get("width"),
+            "height": video.get("height"),
+            "pix_fmt": video.get("pix_fmt"),
+            "sar": video.get("sample_aspect_ratio") or "1:1",
+            "fps": video.get("r_frame_rate"),
+            "time_base": video.get("time_base"),
+        },
+        "audio": None if audio is None else {
+            "codec": audio.get("codec_name"),
+            "sample_rate": audio.get("sample_rate"),
+            "channels": audio.get("channels"),
+        },
+    }
+
+
+def probe_clips(paths: List[str], workers: int = 8) -> List[Dict]:
+    """Probe every input at once; ffprobe runs in parallel child processes"""
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths)))) as pool:
+        return list(pool.map(probe_clip, paths))
+
+
+def signature(probe: Dict) -> str:
+    """Everything that has to match for a stream-copy concat"""
+    return json.dumps({"video": probe["video"], "audio": probe["audio"]}, sort_keys=True)
+
+
+def keyframe_times(path: str, start: float = 0.0, end: Optional[float] = None) -> List[float]:
+    """Keyframe timestamps of the first video stream, read from packet flags (no decoding)"""
+    interval = f"{start}%" + (f"{end}" if end is not None else "")
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0", "-read_intervals", interval,
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=print_section=0", path
+    ]
+    output = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    times = set()
+    for line in output.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            times.add(float(pts))
+    return sorted(times)
+
+
+def _clip_pieces(path: str, duration: float, trim: Trim, copyable: bool,
+                 keyframes: Optional[List[float]]) -> List[Dict]:
+    """Copy and encode pieces for one clip; start/end None mean the clip's own bounds"""
+    start, end = trim or (None, None)
+    start = start or None
+    if end is not None and end >= duration - EPSILON:
+        end = None
+    if not copyable:
+        return [{"path": path, "start": start, "end": end, "copy": False}]
+    if start is None and end is None:
+        return [{"path": path, "start": None, "end": None, "copy": True}]
+
+    low = start or 0.0
+    high = duration if end is None else end
+    keys = [k for k in keyframes or [] if low - EPSILON <= k <= high + EPSILON]
+    first = keys[0] if keys else None
+    last = high if end is None else (keys[-1] if keys else None)
+    if first is None or first >= high - EPSILON or last - first <= EPSILON:
+        # No whole GOP in range: the trimmed span is one partial GOP
+        return [{"path": path, "start": start, "end": end, "copy": False}]
+
+    pieces = []
+    if first > low + EPSILON:
+        pieces.append({"path": path, "start": start, "end": first, "copy": False})
+    pieces.append({"path": path, "start": first if first > EPSILON else None,
+                   "end": None if end is None else last, "copy": True})
+    if end is not None and last < end - EPSILON:
+        pieces.append({"path": path, "start": last, "end": end, "copy": False})
+    return pieces
+
+
+def plan_concat(paths: List[str], probes: List[Dict], trims: Optional[List[Trim]] = None,
+                keyframes: Optional[Dict[str, List[float]]] = None) -> Tuple[Dict, List[Dict]]:
+    """(target probe, pieces in output order).
+
+    The target is the signature covering the most (trimmed) duration; each
+    piece is copied from its source or re-encoded to the target.
+    """
+    trims = trims or [None] * len(paths)
+    weights: Dict[str, float] = {}
+    for probe, trim in zip(probes, trims):
+        start, end = trim or (None, None)
+        span = (probe["duration"] if end is None else end) - (start or 0)
+        weights[signature(probe)] = weights.get(signature(probe), 0.0) + max(span, 0.0)
+    # max() keeps the first clip's signature on ties
+    best = max(weights, key=weights.get)
+    target = next(p for p in probes if signature(p) == best)
+
+    pieces = []
+    for path, probe, trim in zip(paths, probes, trims):
+        pieces += _clip_pieces(path, probe["duration"], trim, signature(probe) == best,
+                               (keyframes or {}).get(path))
+    return target, pieces
+
+
+def _profile_name(profile: Optional[str]) -> Optional[str]:
+    """ffprobe profile ("Constrained Baseline", "Main 10") -> encoder option"""
+    if not profile:
+        return None
+    return profile.lower().replace("constrained ", "").replace(" ", "")
+
+
+def encode_command(piece: Dict, probe: Dict, target: Dict, output_path: str,
+                   threads: Optional[int] = None) -> List[str]:
+    """ffmpeg command re-encoding one piece into the target's stream format"""
+    video, audio = target["video"], target["audio"]
+    cmd = ["ffmpeg"]
+    if piece["start"] is not None:
+        cmd += ["-ss", f"{piece['start']:.6f}"]
+    cmd += ["-i", piece["path"]]
+    silent = audio is not None and probe["audio"] is None
+    if silent:
+        layout = "mono" if str(audio["channels"]) == "1" else "stereo"
+        cmd += ["-f", "lavfi", "-i", f"anullsrc=channel_layout={layout}:sample_rate={audio['sample_rate']}"]
+
+    width, height = video["width"], video["height"]
+    filters = [
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease",
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
+        f"setsar={video['sar'].replace(':', '/')}",
+        f"fps={video['fps']}",
+        f"format={video['pix_fmt']}",
+    ]
+    cmd += ["-map", "0:v:0", "-vf", ",".join(filters)]
+    if piece["end"] is not None:
+        cmd += ["-t", f"{piece['end'] - (piece['start'] or 0):.6f}"]
+    cmd += ["-c:v", VIDEO_ENCODERS.get(video["codec"], video["codec"])]
+    profile = _profile_name(video["profile"])
+    if profile and video["codec"] in ("h264", "hevc"):
+        cmd += ["-profile:v", profile]
+    if threads:
+        cmd += ["-threads", str(threads)]
+    if video["time_base"] and Path(output_path).suffix.lower() in (".mp4", ".mov", ".m4v"):
+        cmd += ["-video_track_timescale", video["time_base"].split("/")[-1]]
+
+    if audio is None:
+        cmd += ["-an"]
+    else:
+        cmd += ["-map", "1:a:0" if silent else "0:a:0",
+                "-c:a", AUDIO_ENCODERS.get(audio["codec"], audio["codec"]),
+                "-ar", str(audio["sample_rate"]), "-ac", str(audio["channels"])]
+        if silent:
+            cmd += ["-shortest"]
+    return cmd + ["-y", output_path]
+
+
+def write_list(pieces: List[Dict], list_path: str):
+    """Concat demuxer list; copied pieces carry their keyframe in/out points"""
+    with open(list_path, "w") as f:
+        for piece in pieces:
+            f.write(f"file '{os.path.abspath(piece['path'])}'\n")
+            if piece["copy"] and piece["start"] is not None:
+                f.write(f"inpoint {piece['start']:.6f}\n")
+            if piece["copy"] and piece["end"] is not None:
+                f.write(f"outpoint {piece['end']:.6f}\n")
+
+
+def concat(paths: List[str], output_path: str, trims: Optional[List[Trim]] = None,
+           workers: Optional[int] = None) -> bool:
+    """Join clips, copying compatible streams and re-encoding only the rest"""
+    from video_processor import atomic_output
+
+    work_dir = tempfile.mkdtemp(prefix="concat_")
+    try:
+        workers = workers or os.cpu_count() or 1
+        probes = probe_clips(paths, workers)
+        trims = trims or [None] * len(paths)
+        keyframes = {}
+        for path, trim in zip(paths, trims):
+            if trim and path not in keyframes:
+                start, end = trim
+                keyframes[path] = keyframe_times(path, start or 0.0, end)
+        target, pieces = plan_concat(paths, probes, trims, keyframes)
+
+        suffix = Path(output_path).suffix or ".mp4"
+        encodes = [piece for piece in pieces if not piece["copy"]]
+        by_path = dict(zip(paths, probes))
+        threads = max(1, (os.cpu_count() or 1) // max(1, min(workers, len(encodes))))
+
+        def encode(index: int, piece: Dict):
+            piece_path = os.path.join(work_dir, f"piece_{index:04d}{suffix}")
+            cmd = encode_command(piece, by_path[piece["path"]], target, piece_path, threads)
+            run_ffmpeg(cmd, "ffmpeg.concat_encode")
+            return piece_path
+
+        if encodes:
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(encodes)))) as pool:
+                encoded = list(pool.map(encode, range(len(encodes)), encodes))
+            for piece, piece_path in zip(encodes, encoded):
+                piece.update(path=piece_path, start=None, end=None, copy=True)
+
+        list_file = os.path.join(work_dir, "concat.txt")
+        write_list(pieces, list_file)
+        cmd = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", list_file, "-c", "copy", "-y", output_path]
+        with atomic_output(output_path) as partial_path:
+            run_ffmpeg(cmd[:-1] + [partial_path], "ffmpeg.concat_videos")
+        logger.info(f"Concatenated {len(paths)} clips ({len(encodes)} re-encoded pieces): {output_path}")
+        return True
+    except Exception as e:
+        logger.error(f"Video concatenation failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
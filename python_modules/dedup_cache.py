@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Persistent dedup index for provider requests
+
+Maps a normalized prompt plus the request's input to the stored result, so
+repeated or near-identical requests skip the network. Image inputs (frames)
+match by perceptual hash within ``threshold`` bits; other inputs by content
+hash; prompt-only requests (image generation) by prompt alone. Input keys
+are remembered per file (path, size, mtime), so a multi-GB video is read
+once rather than on every lookup and store. Result files are copied into
+the index's asset store, and the least recently used entries are evicted
+past ``max_entries`` or ``max_size_mb``.
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import sqlite3
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import logging
+
+from pipeline_config import load_config, resolve_path
+from result_cache import file_hash
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    provider TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    input_hash TEXT,
+    phash INTEGER,
+    result TEXT,
+    asset TEXT,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_lookup ON entries (provider, prompt);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used);
+CREATE TABLE IF NOT EXISTS input_keys (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    input_hash TEXT,
+    phash INTEGER
+);
+"""
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp", ".bmp"}
+
+MASK64 = (1 << 64) - 1
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case-, punctuation- and whitespace-insensitive form of a prompt"""
+    text = unicodedata.normalize("NFKC", prompt).casefold()
+    return " ".join(re.findall(r"\w+", text))
+
+
+def _signed(value: int) -> int:
+    """Store a uint64 hash in SQLite's signed 64-bit INTEGER"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class DedupIndex:
+    """SQLite index of provider results with an LRU-bounded asset store"""
+
+    def __init__(self, directory: str, max_entries: int = 10000, max_size_mb: float = 512,
+                 threshold: int = 6, enabled: bool = True):
+        self.directory = Path(directory)
+        self.assets_dir = self.directory / "assets"
+        self.max_entries = max_entries
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.threshold = threshold
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._conn = None
+        if enabled:
+            self.assets_dir.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.directory / "dedup.db"),
+                                         check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_config(cls, config_path: Optional[str] = None) -> "DedupIndex":
+        """Build an index from ``cache.dedup`` in pipeline.config.json"""
+        cache = load_config(config_path).get("cache", {})
+        settings = cache.get("dedup", {})
+        directory = resolve_path(cache.get("directory", "cache"), config_path) / "dedup"
+        return cls(
+            str(directory),
+            max_entries=settings.get("max_entries", 10000),
+            max_size_mb=settings.get("max_size_mb", 512),
+            threshold=settings.get("phash_threshold", 6),
+            enabled=settings.get("enabled", False)
+        )
+
+    @staticmethod
+    def _compute_key(input_path: str) -> Tuple[Optional[str], Optional[int]]:
+        if Path(input_path).suffix.lower() in IMAGE_SUFFIXES:
+            from keyframes import image_hash
+            try:
+                return None, _signed(image_hash(input_path))
+            except OSError as e:
+                logger.debug(f"Falling back to content hash for {input_path}: {e}")
+        return file_hash(input_path), None
+
+    def input_key(self, input_path: Optional[str]) -> Tuple[Optional[str], Optional[int]]:
+        """(content hash, perceptual hash) identifying a request input, memoized per file"""
+        if input_path is None:
+            return None, None
+        path = os.path.abspath(input_path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT input_hash, phash FROM input_keys WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+        if row is not None:
+            return row[0], row[1]
+        input_hash, phash = self._compute_key(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO input_keys (path, size, mtime_ns, input_hash, phash) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, input_hash, phash)
+            )
+        return input_hash, phash
+
+    def lookup(self, provider: str, prompt: str, input_path: Optional[str] = None) -> Optional[Dict]:
+        """Stored {"result", "asset"} for a matching request, or None.
+
+        ``asset`` is the path of the stored result file, if there was one.
+        """
+        input_hash, phash = self.input_key(input_path)
+        prompt = normalize_prompt(prompt)
+        with self._lock:
+            if phash is not None:
+                from keyframes import hamming
+                rows = self._conn.execute(
+                    "SELECT id, phash, result, asset FROM entries "
+                    "WHERE provider = ? AND prompt = ? AND phash IS NOT NULL",
+                    (provider, prompt)
+                ).fetchall()
+                scored = [(hamming(row[1] & MASK64, phash & MASK64), row) for row in rows]
+                scored = [item for item in scored if item[0] <= self.threshold]
+                row = min(scored, key=lambda item: item[0])[1] if scored else None
+            else:
+                row = self._conn.execute(
+                    "SELECT id, phash, result, asset FROM entries "
+                    "WHERE provider = ? AND prompt = ? AND input_hash IS ? AND phash IS NULL "
+                    "ORDER BY last_used DESC LIMIT 1",
+                    (provider, prompt, input_hash)
+                ).fetchone()
+            if row is None:
+                return None
+
+            asset = str(self.assets_dir / row[3]) if row[3] else None
+            if asset and not os.path.exists(asset):
+                self._conn.execute("DELETE FROM entries WHERE id = ?", (row[0],))
+                return None
+            self._conn.execute("UPDATE entries SET last_used = ? WHERE id = ?", (time.time(), row[0]))
+        return {"result": json.loads(row[2]) if row[2] else None, "asset": asset}
+
+    def store(self, provider: str, prompt: str, input_path: Optional[str] = None,
+              result=None, asset_path: Optional[str] = None):
+        """Record a completed request; asset_path is copied into the store"""
+        input_hash, phash = self.input_key(input_path)
+        size = os.path.getsize(asset_path) if asset_path else 0
+        now = time.time()
+        with self._lock:
+            # A re-run of the same request replaces its previous entry
+            for entry_id, asset in self._conn.execute(
+                "SELECT id, asset FROM entries WHERE provider = ? AND prompt = ? "
+                "AND input_hash IS ? AND phash IS ?",
+                (provider, normalize_prompt(prompt), input_hash, phash)
+            ).fetchall():
+                self._delete(entry_id, asset)
+            cursor = self._conn.execute(
+                "INSERT INTO entries (provider, prompt, input_hash, phash, result, asset, size, "
+                "created_at, last_used) VALUES (?, ?, ?, ?, ?, NULL, ?, ?, ?)",
+                (provider, normalize_prompt(prompt), input_hash, phash,
+                 json.dumps(result) if result is not None else None, size, now, now)
+            )
+            if asset_path:
+                name = f"{cursor.lastrowid}{Path(asset_path).suffix}"
+                shutil.copyfile(asset_path, self.assets_dir / name)
+                self._conn.execute("UPDATE entries SET asset = ? WHERE id = ?", (name, cursor.lastrowid))
+        self.evict()
+
+    def _delete(self, entry_id: int, asset: Optional[str]):
+        self._conn.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+        if asset:
+            try:
+                (self.assets_dir / asset).unlink()
+            except FileNotFoundError:
+                pass
+
+    def evict(self) -> int:
+        """Drop least recently used entries beyond the count and size limits"""
+        removed = 0
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            if count <= self.max_entries and total <= self.max_size_bytes:
+                return 0
+            for entry_id, size, asset in self._conn.execute(
+                "SELECT id, size, asset FROM entries ORDER BY last_used"
+            ).fetchall():
+                if count <= self.max_entries and total <= self.max_size_bytes:
+                    break
+                self._delete(entry_id, asset)
+                count -= 1
+                total -= size
+                removed += 1
+        if removed:
+            logger.info(f"Evicted {removed} dedup entries")
+        return removed
+
+    def clear(self):
+        """Remove every entry and stored asset"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM input_keys")
+            shutil.rmtree(self.assets_dir, ignore_errors=True)
+            self.assets_dir.mkdir(parents=True, exist_ok=True)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Encoder capability probing and per-job encoder selection
+
+Probes the local ffmpeg build once for its encoders, filters and hwaccels,
+benchmarks candidate encoder presets on a synthetic clip, and caches both
+on disk. select_encoder() then maps a speed/quality profile to concrete
+codec, preset and threading arguments.
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import threading
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from pipeline_config import load_config, resolve_path
+
+logger = logging.getLogger(__name__)
+
+# (codec, preset, extra args); presets are roughly equal quality tiers per profile
+Candidate = Tuple[str, Optional[str], Tuple[str, ...]]
+
+PROFILES: Dict[str, List[Candidate]] = {
+    "speed": [
+        ("libx264", "veryfast", ("-crf", "23")),
+        ("libx265", "ultrafast", ("-crf", "28")),
+        ("libsvtav1", "12", ("-crf", "35")),
+        ("h264_nvenc", "p1", ("-cq", "23")),
+        ("h264_qsv", "veryfast", ("-global_quality", "23")),
+        ("h264_videotoolbox", None, ("-q:v", "60")),
+        ("h264_amf", "speed", ("-qp_i", "23", "-qp_p", "23")),
+    ],
+    "balanced": [
+        ("libx264", "medium", ("-crf", "23")),
+        ("libx265", "fast", ("-crf", "26")),
+        ("libsvtav1", "8", ("-crf", "32")),
+        ("h264_nvenc", "p4", ("-cq", "21")),
+        ("hevc_nvenc", "p4", ("-cq", "24")),
+        ("h264_qsv", "medium", ("-global_quality", "21")),
+        ("h264_videotoolbox", None, ("-q:v", "65")),
+        ("h264_amf", "balanced", ("-qp_i", "21", "-qp_p", "21")),
+    ],
+    "quality": [
+        ("libx264", "slow", ("-crf", "18")),
+        ("libx265", "medium", ("-crf", "20")),
+        ("libsvtav1", "5", ("-crf", "28")),
+    ],
+}
+
+# Used when ffmpeg cannot be probed at all
+FALLBACK: Dict[str, Candidate] = {
+    "speed": ("libx264", "veryfast", ("-crf", "23")),
+    "balanced": ("libx264", "medium", ("-crf", "23")),
+    "quality": ("libx264", "slow", ("-crf", "18")),
+}
+
+HARDWARE_ENCODER = re.compile(r"_(nvenc|qsv|videotoolbox|amf|vaapi)$")
+
+BENCHMARK_SECONDS = 2
+BENCHMARK_SIZE = "1280x720"
+BENCHMARK_RATE = 30
+
+
+def _run(args: List[str]) -> str:
+    result = subprocess.run(args, capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+def _parse_table(output: str, name_column: int) -> List[str]:
+    """Names from `ffmpeg -encoders`/`-filters` listings (rows after the legend)"""
+    names = []
+    in_table = False
+    for line in output.splitlines():
+        if line.strip().startswith("---"):
+            in_table = True
+            continue
+        parts = line.split()
+        if in_table and len(parts) > name_column:
+            names.append(parts[name_column])
+    return names
+
+
+def _parse_filters(output: str) -> List[str]:
+    """`ffmpeg -filters` has no separator line; rows look like ` TSC name  V->V  desc`"""
+    names = []
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) >= 3 and "->" in parts[2]:
+            names.append(parts[1])
+    return names
+
+
+def probe_capabilities(ffmpeg: str = "ffmpeg") -> Dict:
+    """Encoders, filters and hwaccels compiled into the given ffmpeg build"""
+    version = _run([ffmpeg, "-hide_banner", "-version"]).splitlines()
+    hwaccels = _run([ffmpeg, "-hide_banner", "-hwaccels"]).splitlines()
+    return {
+        "version": version[0] if version else "",
+        "encoders": _parse_table(_run([ffmpeg, "-hide_banner", "-encoders"]), 1),
+        "filters": _parse_filters(_run([ffmpeg, "-hide_banner", "-filters"])),
+        "hwaccels": [line.strip() for line in hwaccels[1:] if line.strip()],
+    }
+
+
+def benchmark_encoder(codec: str, preset: Optional[str], extra: Tuple[str, ...] = (),
+                      threads: int = 0, ffmpeg: str = "ffmpeg") -> Optional[float]:
+    """Encode a synthetic clip to the null muxer; frames per second, None if it fails"""
+    frames = BENCHMARK_SECONDS * BENCHMARK_RATE
+    cmd = [
+        ffmpeg, "-hide_banner", "-nostdin",
+        "-f", "lavfi",
+        "-i", f"testsrc2=size={BENCHMARK_SIZE}:rate={BENCHMARK_RATE}",
+        "-frames:v", str(frames),
+        "-c:v", codec
+    ]
+    if preset:
+        cmd += ["-preset", preset]
+    cmd += list(extra)
+    if threads:
+        cmd += ["-threads", str(threads)]
+    cmd += ["-pix_fmt", "yuv420p", "-f", "null", "-"]
+
+    started = time.perf_counter()
+    try:
+        subprocess.run(cmd, capture_output=True, check=True, timeout=120)
+    except (subprocess.SubprocessError, OSError):
+        return None
+    return frames / (time.perf_counter() - started)
+
+
+class EncoderSelector:
+    """Caches probe and benchmark results for one ffmpeg binary on disk"""
+
+    def __init__(self, cache_path: str, ffmpeg: str = "ffmpeg",
+                 hwaccel: str = "auto", threads: int = 0):
+        self.cache_path = Path(cache_path)
+        self.ffmpeg = ffmpeg
+        self.hwaccel = hwaccel
+        self.threads = threads or os.cpu_count() or 1
+        self._lock = threading.Lock()
+        self._state: Optional[Dict] = None
+
+    @classmethod
+    def from_config(cls, config_path: Optional[str] = None) -> "EncoderSelector":
+        """Selector using ffmpeg_options and the cache directory from pipeline.config.json"""
+        config = load_config(config_path)
+        options = config.get("ffmpeg_options", {})
+        cache_dir = resolve_path(config.get("cache", {}).get("directory", "cache"), config_path)
+        return cls(
+            str(cache_dir / "encoder_capabilities.json"),
+            ffmpeg=options.get("ffmpeg", "ffmpeg"),
+            hwaccel=options.get("hwaccel", "auto"),
+            threads=options.get("threads", 0)
+        )
+
+    def _binary_id(self) -> Optional[str]:
+        """Identity of the ffmpeg binary; a rebuild or upgrade invalidates the cache"""
+        path = shutil.which(self.ffmpeg)
+        if path is None:
+            return None
+        stat = os.stat(path)
+        return hashlib.sha256(f"{os.path.realpath(path)}|{stat.st_size}|{stat.st_mtime_ns}".encode()).hexdigest()
+
+    def _save(self, state: Dict):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.cache_path.with_name(f".{self.cache_path.name}.{os.getpid()}.partial")
+        partial.write_text(json.dumps(state, indent=2))
+        os.replace(partial, self.cache_path)
+
+    def _load(self) -> Dict:
+        """Current state, probing ffmpeg if the cached record is stale or missing"""
+        if self._state is not None:
+            return self._state
+        binary_id = self._binary_id()
+        try:
+            state = json.loads(self.cache_path.read_text())
+        except (OSError, ValueError):
+            state = {}
+
+        if binary_id is None:
+            logger.warning(f"{self.ffmpeg} not found; using fallback encoder settings")
+            state = {"binary": None, "capabilities": {}, "benchmarks": {}}
+        elif state.get("binary") != binary_id:
+            logger.info("Probing ffmpeg encoder capabilities")
+            try:
+                capabilities = probe_capabilities(self.ffmpeg)
+            except (subprocess.SubprocessError, OSError) as e:
+                logger.error(f"Encoder probe failed: {e}")
+                capabilities = {}
+            state = {"binary": binary_id, "capabilities": capabilities, "benchmarks": {}}
+            self._save(state)
+        self._state = state
+        return state
+
+    def capabilities(self) -> Dict:
+        """Encoders, filters and hwaccels of the probed ffmpeg"""
+        with self._lock:
+            return self._load()["capabilities"]
+
+    def _allowed(self, codec: str, encoders: List[str]) -> bool:
+        if codec not in encoders:
+            return False
+        if HARDWARE_ENCODER.search(codec):
+            return self.hwaccel not in ("none", "off", False)
+        return True
+
+    def _throughput(self, candidate: Candidate) -> Optional[float]:
+        """Measured fps for a candidate, benchmarking it on first use"""
+        codec, preset, extra = candidate
+        name = f"{codec}:{preset or ''}"
+        benchmarks = self._state["benchmarks"]
+        if name not in benchmarks:
+            fps = benchmark_encoder(codec, preset, extra, self.threads, self.ffmpeg)
+            logger.info(f"Benchmarked {name}: " + (f"{fps:.1f} fps" if fps else "unusable"))
+            benchmarks[name] = fps
+            self._save(self._state)
+        return benchmarks[name]
+
+    def select(self, profile: str = "balanced", jobs: int = 1,
+               threads: Optional[int] = None) -> Dict:
+        """Fastest working encoder for a profile, with threads split across concurrent jobs"""
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown encoder profile: {profile}")
+
+        with self._lock:
+            state = self._load()
+            encoders = state["capabilities"].get("encoders", [])
+            best, best_fps = None, 0.0
+            for candidate in PROFILES[profile]:
+                if not self._allowed(candidate[0], encoders):
+                    continue
+                fps = self._throughput(candidate)
+                if fps and fps > best_fps:
+                    best, best_fps = candidate, fps
+            hwaccels = state["capabilities"].get("hwaccels", [])
+
+        codec, preset, extra = best or FALLBACK[profile]
+        per_job = threads or max(1, self.threads // max(1, jobs))
+        hwaccel = None
+        if self.hwaccel not in ("auto", "none", "off", False) and self.hwaccel in hwaccels:
+            hwaccel = self.hwaccel
+        return {
+            "codec": codec,
+            "preset": preset,
+            "extra": list(extra),
+            "threads": per_job,
+            "filter_threads": per_job,
+            "hwaccel": hwaccel,
+            "fps": best_fps or None,
+        }
+
+
+_selector: Optional[EncoderSelector] = None
+_selector_lock = threading.Lock()
+
+
+def get_selector(config_path: Optional[str] = None) -> EncoderSelector:
+    """Shared selector built from pipeline.config.json"""
+    global _selector
+    with _selector_lock:
+        if _selector is None:
+            _selector = EncoderSelector.from_config(config_path)
+        return _selector
+
+
+def select_encoder(profile: str = "balanced", jobs: int = 1,
+                   threads: Optional[int] = None) -> Dict:
+    """Encoder settings for a profile on this machine (see EncoderSelector.select)"""
+    return get_selector().select(profile, jobs, threads)
+
+
+def input_args(settings: Dict) -> List[str]:
+    """Decoder arguments that go before -i"""
+    return ["-hwaccel", settings["hwaccel"]] if settings.get("hwaccel") else []
+
+
+def encoder_args(settings: Dict) -> List[str]:
+    """Output arguments for the selected video encoder and threading"""
+    args = ["-c:v", settings["codec"]]
+    if settings.get("preset"):
+        args += ["-preset", settings["preset"]]
+    args += settings.get("extra", [])
+    args += ["-threads", str(settings["threads"]), "-filter_threads", str(settings["filter_threads"])]
+    return args
+
+
+def main():
+    """Print probed capabilities and the selection for each profile"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Probe ffmpeg encoders and pick the fastest per profile")
+    parser.add_argument("--config", help="Path to pipeline.config.json")
+    parser.add_argument("--reprobe", action="store_true", help="Discard cached probe and benchmark results")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    selector = get_selector(args.config)
+    if args.reprobe and selector.cache_path.exists():
+        selector.cache_path.unlink()
+
+    capabilities = selector.capabilities()
+    print(capabilities.get("version", "ffmpeg not available"))
+    print(f"hwaccels: {', '.join(capabilities.get('hwaccels', [])) or 'none'}")
+    for profile in PROFILES:
+        settings = selector.select(profile)
+        fps = f"{settings['fps']:.1f} fps" if settings["fps"] else "not measured"
+        print(f"{profile:>9}: {settings['codec']} preset={settings['preset']} "
+              f"threads={settings['threads']} ({fps})")
+
+
+if __name__ == "__main__":
+    main()
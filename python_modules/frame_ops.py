@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Batched NumPy frame operations
+
+Every operation takes (N, H, W, C) uint8 batches and writes into an ``out``
+array, allocating one only when none is given. Passing the input as
+``out`` works in place, and reusing the same ``out`` across batches avoids
+per-frame allocation. Each batch is split by frame across a shared thread
+pool. NumPy and Pillow release the GIL inside their loops, so the chunks
+run on all cores.
+
+    for batch in batches(read_frames("in.mp4"), 32):
+        color_grade(batch, contrast=1.1, saturation=1.2, out=batch)
+        overlay(batch, logo, x=20, y=20, opacity=0.8, out=batch)
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Pillow resampling filters by name; "nearest" is done in NumPy
+RESAMPLE = {"bilinear": 2, "bicubic": 3, "lanczos": 1, "box": 4}
+
+# ITU-R BT.601 luma weights, used for saturation
+LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1,
+                                           thread_name_prefix="frame-ops")
+    return _pool
+
+
+def parallel(func: Callable[[int, int], None], count: int, workers: Optional[int] = None):
+    """Call func(start, stop) over contiguous slices of range(count) on the pool"""
+    workers = min(workers or os.cpu_count() or 1, count)
+    if workers <= 1:
+        if count:
+            func(0, count)
+        return
+    bounds = np.linspace(0, count, workers + 1).astype(int)
+    futures = [_executor().submit(func, start, stop)
+               for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+    for future in futures:
+        future.result()
+
+
+def _check(frames: np.ndarray, name: str = "frames"):
+    if frames.ndim != 4 or frames.dtype != np.uint8:
+        raise ValueError(f"{name} must be an (N, H, W, C) uint8 array, got {frames.dtype} {frames.shape}")
+
+
+def _output(out: Optional[np.ndarray], shape: Tuple[int, ...]) -> np.ndarray:
+    if out is None:
+        return np.empty(shape, dtype=np.uint8)
+    if out.shape != shape or out.dtype != np.uint8:
+        raise ValueError(f"out must be a uint8 array of shape {shape}, got {out.dtype} {out.shape}")
+    return out
+
+
+def _frame_slice(frames: np.ndarray, start: int, stop: int) -> np.ndarray:
+    """frames[start:stop], or the single frame when it is broadcast over the batch"""
+    return frames if len(frames) == 1 else frames[start:stop]
+
+
+def allocate(count: int, height: int, width: int, channels: int = 3) -> np.ndarray:
+    """Preallocated batch buffer to pass as ``out``"""
+    return np.empty((count, height, width, channels), dtype=np.uint8)
+
+
+def batches(frames: Iterable[np.ndarray], batch_size: int) -> Iterator[np.ndarray]:
+    """Group single (H, W, C) frames into batches sharing one buffer.
+
+    Each yielded batch is a view of the same buffer, so process (or copy)
+    it before asking for the next one. The last batch may be shorter.
+    """
+    buffer = None
+    filled = 0
+    for frame in frames:
+        if frame.ndim == 2:
+            frame = frame[:, :, np.newaxis]
+        if buffer is None:
+            buffer = np.empty((batch_size,) + frame.shape, dtype=np.uint8)
+        buffer[filled] = frame
+        filled += 1
+        if filled == batch_size:
+            yield buffer
+            filled = 0
+    if filled:
+        yield buffer[:filled]
+
+
+def overlay(base: np.ndarray, top: np.ndarray, x: int = 0, y: int = 0,
+            opacity: float = 1.0, out: Optional[np.ndarray] = None,
+            workers: Optional[int] = None) -> np.ndarray:
+    """Alpha-composite ``top`` onto ``base`` with its top-left corner at (x, y).
+
+    ``top`` is (N or 1, h, w, C) or, with a trailing alpha channel,
+    (N or 1, h, w, C + 1). Parts falling outside the frame are clipped.
+    """
+    _check(base, "base")
+    _check(top, "top")
+    count, height, width, channels = base.shape
+    if top.shape[3] not in (channels, channels + 1):
+        raise ValueError(f"top has {top.shape[3]} channels, base has {channels}")
+    if len(top) not in (1, count):
+        raise ValueError(f"top has {len(top)} frames, base has {count}")
+    out = _output(out, base.shape)
+
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + top.shape[2], width), min(y + top.shape[1], height)
+    level = int(round(np.clip(opacity, 0.0, 1.0) * 255))
+
+    def run(start: int, stop: int):
+        if out is not base:
+            out[start:stop] = base[start:stop]
+        if x1 <= x0 or y1 <= y0:
+            return
+        src = _frame_slice(top, start, stop)[:, y0 - y:y1 - y, x0 - x:x1 - x]
+        dst = out[start:stop, y0:y1, x0:x1]
+        if src.shape[3] > channels:
+            alpha = np.multiply(src[..., channels:], level, dtype=np.uint16)
+            alpha += 127
+            alpha //= 255
+        else:
+            alpha = np.uint16(level)
+        # Integer blend: (top * a + base * (255 - a) + 127) // 255 stays within uint16
+        acc = np.multiply(dst, 255 - alpha, dtype=np.uint16)
+        acc += np.multiply(src[..., :channels], alpha, dtype=np.uint16)
+        acc += 127
+        acc //= 255
+        dst[...] = acc
+
+    parallel(run, count, workers)
+    return out
+
+
+def crossfade(first: np.ndarray, second: np.ndarray, weights: Optional[Sequence[float]] = None,
+              out: Optional[np.ndarray] = None, workers: Optional[int] = None) -> np.ndarray:
+    """Blend from ``first`` to ``second`` across the batch.
+
+    ``weights`` gives the share of ``second`` per frame (0..1); by default
+    it ramps evenly, excluding both endpoints. Either input may be a
+    single frame broadcast over the batch (a fade from or to a still).
+    """
+    _check(first, "first")
+    _check(second, "second")
+    count = max(len(first), len(second), len(weights) if weights is not None else 1)
+    shape = (count,) + first.shape[1:]
+    if second.shape[1:] != first.shape[1:] or {len(first), len(second)} - {1, count}:
+        raise ValueError(f"Cannot crossfade {first.shape} with {second.shape}")
+    if weights is None:
+        weights = np.arange(1, count + 1) / (count + 1)
+    if len(weights) != count:
+        raise ValueError(f"Expected {count} weights, got {len(weights)}")
+    levels = np.rint(np.clip(np.asarray(weights, dtype=np.float32), 0, 1) * 255).astype(np.uint16)
+    levels = levels.reshape(-1, 1, 1, 1)
+    out = _output(out, shape)
+
+    def run(start: int, stop: int):
+        level = levels[start:stop]
+        acc = np.multiply(_frame_slice(second, start, stop), level, dtype=np.uint16)
+        acc += np.multiply(_frame_slice(first, start, stop), 255 - level, dtype=np.uint16)
+        acc += 127
+        acc //= 255
+        out[start:stop] = acc
+
+    parallel(run, count, workers)
+    return out
+
+
+def _resize_into(src: np.ndarray, dst: np.ndarray, method: str):
+    """Resize every frame of src into the (possibly non-contiguous) dst view"""
+    height, width = dst.shape[1:3]
+    if method == "nearest":
+        rows = ((np.arange(height) + 0.5) * src.shape[1] / height).astype(np.intp)
+        cols = ((np.arange(width) + 0.5) * src.shape[2] / width).astype(np.intp)
+        dst[...] = src[:, rows[:, np.newaxis], cols]
+        return
+
+    from PIL import Image
+
+    for index in range(len(src)):
+        frame = src[index]
+        image = Image.fromarray(frame[:, :, 0] if frame.shape[2] == 1 else frame)
+        resized = np.asarray(image.resize((width, height), RESAMPLE[method]))
+        dst[index] = resized.reshape(dst.shape[1:])
+
+
+def resize(frames: np.ndarray, size: Tuple[int, int], method: str = "bilinear",
+           out: Optional[np.ndarray] = None, workers: Optional[int] = None) -> np.ndarray:
+    """Resize a batch to size=(width, height)"""
+    _check(frames)
+    if method != "nearest" and method not in RESAMPLE:
+        raise ValueError(f"Unknown resize method: {method}")
+    width, height = size
+    out = _output(out, (len(frames), height, width, frames.shape[3]))
+    parallel(lambda start, stop: _resize_into(frames[start:stop], out[start:stop], method),
+             len(frames), workers)
+    return out
+
+
+def grade_lut(brightness: float = 0.0, contrast: float = 1.0, gamma: float = 1.0) -> np.ndarray:
+    """256-entry lookup table for brightness (-1..1), contrast and gamma"""
+    levels = np.arange(256, dtype=np.float32) / 255
+    levels = np.clip((levels - 0.5) * contrast + 0.5 + brightness, 0, 1)
+    levels = levels ** (1.0 / gamma)
+    return np.rint(levels * 255).astype(np.uint8)
+
+
+def color_grade(frames: np.ndarray, brightness: float = 0.0, contrast: float = 1.0,
+                gamma: float = 1.0, saturation: float = 1.0, lut: Optional[np.ndarray] = None,
+                out: Optional[np.ndarray] = None, workers: Optional[int] = None) -> np.ndarray:
+    """Apply a tone curve (or a custom 256-entry or (256, C) lut), then saturation"""
+    _check(frames)
+    out = _output(out, frames.shape)
+    if lut is None:
+        lut = grade_lut(brightness, contrast, gamma)
+    lut = np.asarray(lut, dtype=np.uint8)
+    identity = lut.ndim == 1 and np.array_equal(lut, np.arange(256))
+    color = frames.shape[3] >= 3 and saturation != 1.0
+
+    def run(start: int, stop: int):
+        src, dst = frames[start:stop], out[start:stop]
+        if lut.ndim == 2:
+            for channel in range(frames.shape[3]):
+                np.take(lut[:, channel], src[..., channel], out=dst[..., channel])
+        elif not identity:
+            np.take(lut, src, out=dst)
+        elif dst is not src:
+            dst[...] = src
+        if color:
+            rgb = dst[..., :3].astype(np.float32)
+            luma = (rgb @ LUMA)[..., np.newaxis]
+            rgb -= luma
+            rgb *= saturation
+            rgb += luma
+            np.clip(rgb, 0, 255, out=rgb)
+            dst[..., :3] = np.rint(rgb)
+
+    parallel(run, len(frames), workers)
+    return out
+
+
+def letterbox(frames: np.ndarray, size: Tuple[int, int], color: Sequence[int] = (0, 0, 0),
+              method: str = "bilinear", out: Optional[np.ndarray] = None,
+              workers: Optional[int] = None) -> np.ndarray:
+    """Fit frames inside size=(width, height) keeping aspect ratio, padding with color"""
+    _check(frames)
+    width, height = size
+    count, src_height, src_width, channels = frames.shape
+    scale = min(width / src_width, height / src_height)
+    fit_width = max(1, min(width, round(src_width * scale)))
+    fit_height = max(1, min(height, round(src_height * scale)))
+    left, top = (width - fit_width) // 2, (height - fit_height) // 2
+    fill = np.resize(np.asarray(color, dtype=np.uint8), channels)
+    out = _output(out, (count, height, width, channels))
+
+    def run(start: int, stop: int):
+        dst = out[start:stop]
+        dst[:, :top] = fill
+        dst[:, top + fit_height:] = fill
+        dst[:, top:top + fit_height, :left] = fill
+        dst[:, top:top + fit_height, left + fit_width:] = fill
+        inner = dst[:, top:top + fit_height, left:left + fit_width]
+        if (fit_width, fit_height) == (src_width, src_height):
+            inner[...] = frames[start:stop]
+        else:
+            _resize_into(frames[start:stop], inner, method)
+
+    parallel(run, count, workers)
+    return out
+
+
+def load_images(paths: Sequence[str], out: Optional[np.ndarray] = None,
+                workers: Optional[int] = None) -> np.ndarray:
+    """Decode same-sized images into one RGB batch"""
+    from PIL import Image
+
+    if not paths:
+        raise ValueError("No images to load")
+    with Image.open(paths[0]) as image:
+        width, height = image.size
+    out = _output(out, (len(paths), height, width, 3))
+
+    def run(start: int, stop: int):
+        for index in range(start, stop):
+            with Image.open(paths[index]) as image:
+                if image.size != (width, height):
+                    raise ValueError(f"{paths[index]} is {image.size}, expected {(width, height)}")
+                out[index] = np.asarray(image.convert("RGB"))
+
+    parallel(run, len(paths), workers)
+    return out
+
+
+def save_images(frames: np.ndarray, paths: Sequence[str], workers: Optional[int] = None) -> List[str]:
+    """Encode each frame of a batch to the matching path"""
+    from PIL import Image
+
+    _check(frames)
+    if len(paths) != len(frames):
+        raise ValueError(f"Got {len(paths)} paths for {len(frames)} frames")
+
+    def run(start: int, stop: int):
+        for index in range(start, stop):
+            frame = frames[index]
+            Image.fromarray(frame[:, :, 0] if frame.shape[2] == 1 else frame).save(paths[index])
+
+    parallel(run, len(frames), workers)
+    return list(paths)
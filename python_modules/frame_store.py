@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped frame store for large intermediate sequences
+
+One file instead of thousands of PNGs:
+
+    [4 KiB header: magic + JSON] [frame 0] [frame 1] ... [index: 1 byte per frame]
+
+Frames share one fixed (H, W, C) uint8 shape, so frame i lives at a
+computed offset and ``store[i]`` is a zero-copy NumPy view of the mapped
+file. The index marks which slots have been written, so stores created
+up front can be filled out of order (or by several processes) and checked
+for gaps. Pickled stores reopen the file by path, so a store passed to a
+worker process is shared through the page cache rather than copied.
+
+    python frame_store.py pack input.mp4 temp/input.vpf --fps 24
+    python frame_store.py export temp/input.vpf output/frames
+    python frame_store.py export temp/input.vpf output/preview.mp4
+"""
+
+import os
+import sys
+import json
+from fractions import Fraction
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from frame_ops import batches, load_images, save_images
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"VPFRAME1"
+HEADER_SIZE = 4096
+FRAME_PATTERN = "frame_%06d.png"
+
+
+def _header_bytes(header: Dict) -> bytes:
+    encoded = json.dumps(header).encode()
+    if len(MAGIC) + 4 + len(encoded) > HEADER_SIZE:
+        raise ValueError("Frame store metadata does not fit in the header")
+    block = MAGIC + len(encoded).to_bytes(4, "little") + encoded
+    return block.ljust(HEADER_SIZE, b"\0")
+
+
+def _read_header(path: str) -> Dict:
+    with open(path, "rb") as f:
+        block = f.read(HEADER_SIZE)
+    if len(block) < HEADER_SIZE or not block.startswith(MAGIC):
+        raise ValueError(f"Not a frame store: {path}")
+    length = int.from_bytes(block[len(MAGIC):len(MAGIC) + 4], "little")
+    return json.loads(block[len(MAGIC) + 4:len(MAGIC) + 4 + length])
+
+
+def _make_header(count: int, shape: Tuple[int, int, int], fps: float,
+                 metadata: Optional[Dict]) -> Dict:
+    frame_bytes = int(np.prod(shape))
+    return {
+        "version": 1,
+        "count": count,
+        "shape": list(shape),
+        "fps": fps,
+        "data_offset": HEADER_SIZE,
+        "index_offset": HEADER_SIZE + count * frame_bytes,
+        "metadata": metadata or {}
+    }
+
+
+class FrameStore:
+    """Fixed-shape uint8 frames in one memory-mapped file"""
+
+    def __init__(self, path: str, mode: str = "r"):
+        if mode not in ("r", "r+"):
+            raise ValueError(f"Unsupported mode: {mode}")
+        self.path = str(path)
+        self.mode = mode
+        self.header = _read_header(self.path)
+        self.shape = tuple(self.header["shape"])
+        self.fps = self.header["fps"]
+        self.metadata = self.header["metadata"]
+        count = self.header["count"]
+        if count:
+            self.frames = np.memmap(self.path, dtype=np.uint8, mode=mode,
+                                    offset=self.header["data_offset"], shape=(count,) + self.shape)
+            self.filled = np.memmap(self.path, dtype=np.uint8, mode=mode,
+                                    offset=self.header["index_offset"], shape=(count,))
+        else:
+            self.frames = np.empty((0,) + self.shape, dtype=np.uint8)
+            self.filled = np.empty(0, dtype=np.uint8)
+
+    @classmethod
+    def open(cls, path: str, mode: str = "r") -> "FrameStore":
+        """Map an existing store; "r" is read-only, "r+" allows writing frames"""
+        return cls(path, mode)
+
+    @classmethod
+    def create(cls, path: str, count: int, shape: Tuple[int, int, int], fps: float = 24,
+               metadata: Optional[Dict] = None) -> "FrameStore":
+        """Preallocate an empty store for random-access (or parallel) filling"""
+        header = _make_header(count, tuple(shape), fps, metadata)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(_header_bytes(header))
+            # Sparse on most filesystems until frames are written
+            f.truncate(header["index_offset"] + count)
+        return cls(path, "r+")
+
+    @classmethod
+    def from_batches(cls, path: str, frame_batches: Iterable[np.ndarray], fps: float = 24,
+                     metadata: Optional[Dict] = None) -> "FrameStore":
+        """Write (N, H, W, C) batches sequentially; the store appears atomically when done"""
+        partial = f"{path}.partial"
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        count, shape = 0, None
+        try:
+            with open(partial, "wb") as f:
+                f.write(b"\0" * HEADER_SIZE)
+                for batch in frame_batches:
+                    if shape is None:
+                        shape = batch.shape[1:]
+                    elif batch.shape[1:] != shape:
+                        raise ValueError(f"Frame shape {batch.shape[1:]} does not match {shape}")
+                    f.write(np.ascontiguousarray(batch, dtype=np.uint8).data)
+                    count += len(batch)
+                if shape is None:
+                    raise ValueError("No frames to store")
+                f.write(b"\1" * count)
+                f.seek(0)
+                f.write(_header_bytes(_make_header(count, shape, fps, metadata)))
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        logger.info(f"Stored {count} frames of {shape} in {path}")
+        return cls(path)
+
+    @classmethod
+    def from_frames(cls, path: str, frames: Iterable[np.ndarray], fps: float = 24,
+                    metadata: Optional[Dict] = None, batch_size: int = 32) -> "FrameStore":
+        """Write single (H, W, C) frames sequentially"""
+        return cls.from_batches(path, batches(frames, batch_size), fps, metadata)
+
+    @classmethod
+    def from_video(cls, video_path: str, path: str, fps: Optional[float] = None,
+                   size: Optional[Tuple[int, int]] = None, pix_fmt: str = "rgb24") -> "FrameStore":
+        """Decode a video straight into a store, without intermediate images"""
+        from frame_stream import read_frames
+        from video_processor import VideoProcessor
+
+        if fps is None:
+            rate = VideoProcessor.get_video_info(video_path).get("fps") or "24/1"
+            fps = float(Fraction(rate)) if not rate.endswith("/0") else 24
+        metadata = {"source": os.path.abspath(video_path), "pix_fmt": pix_fmt}
+        frames = read_frames(video_path, fps=fps, size=size, pix_fmt=pix_fmt)
+        return cls.from_frames(path, frames, fps=fps, metadata=metadata)
+
+    @classmethod
+    def from_images(cls, folder: str, path: str, fps: float = 24, pattern: str = "frame_*.png",
+                    batch_size: int = 64, workers: Optional[int] = None) -> "FrameStore":
+        """Pack a numbered image sequence, decoding batches on a thread pool"""
+        paths = sorted(str(p) for p in Path(folder).glob(pattern))
+        if not paths:
+            raise ValueError(f"No images matching {pattern} in {folder}")
+
+        def decoded() -> Iterator[np.ndarray]:
+            buffer = None
+            for start in range(0, len(paths), batch_size):
+                chunk = paths[start:start + batch_size]
+                if buffer is not None and len(chunk) == len(buffer):
+                    yield load_images(chunk, out=buffer, workers=workers)
+                else:
+                    buffer = load_images(chunk, workers=workers)
+                    yield buffer
+
+        return cls.from_batches(path, decoded(), fps, {"source": os.path.abspath(folder)})
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        """Zero-copy view of one frame or a slice of frames"""
+        return self.frames[index]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        return iter(self.frames)
+
+    def write(self, index: int, frame: np.ndarray):
+        """Store one frame and mark its slot as filled"""
+        self.frames[index] = frame
+        self.filled[index] = 1
+
+    def missing(self) -> List[int]:
+        """Slots that have not been written yet"""
+        return np.flatnonzero(self.filled == 0).tolist()
+
+    def flush(self):
+        if isinstance(self.frames, np.memmap):
+            self.frames.flush()
+            self.filled.flush()
+
+    def close(self):
+        """Flush pending writes and drop the mapping"""
+        if self.mode == "r+":
+            self.flush()
+        self.frames = self.filled = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __getstate__(self) -> Dict:
+        # Workers map the file themselves instead of receiving pickled pixels
+        if self.mode == "r+":
+            self.flush()
+        return {"path": self.path, "mode": self.mode}
+
+    def __setstate__(self, state: Dict):
+        self.__init__(state["path"], state["mode"])
+
+    def export_images(self, folder: str, start: int = 0, stop: Optional[int] = None,
+                      batch_size: int = 64, workers: Optional[int] = None) -> List[str]:
+        """Write frames as frame_%06d.png (numbered from 1) for PNG-based tools"""
+        Path(folder).mkdir(parents=True, exist_ok=True)
+        stop = len(self) if stop is None else stop
+        written = []
+        for first in range(start, stop, batch_size):
+            last = min(first + batch_size, stop)
+            paths = [os.path.join(folder, FRAME_PATTERN % (i + 1)) for i in range(first, last)]
+            written += save_images(self.frames[first:last], paths, workers)
+        logger.info(f"Exported {len(written)} frames to {folder}")
+        return written
+
+    def export_video(self, output_path: str, fps: Optional[float] = None, **writer_options) -> bool:
+        """Encode the stored frames through ffmpeg"""
+        from frame_stream import FrameWriter
+
+        options = dict(writer_options)
+        options.setdefault("pix_fmt", self.metadata.get("pix_fmt", "rgb24"))
+        writer = FrameWriter(output_path, fps=fps or self.fps, **options)
+        try:
+            for frame in self.frames:
+                writer.write(frame)
+        except Exception as e:
+            logger.error(f"Frame store export failed: {e}")
+            writer.close()
+            return False
+        return writer.close()
+
+
+def main():
+    """Command-line entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pack and export memory-mapped frame stores")
+    commands = parser.add_subparsers(dest="command", required=True)
+    pack = commands.add_parser("pack", help="Video file or frame folder -> frame store")
+    pack.add_argument("source", help="Video file or folder of frame_*.png")
+    pack.add_argument("store", help="Frame store to write")
+    pack.add_argument("--fps", type=float, help="Resample a video to this rate / rate of an image folder")
+    export = commands.add_parser("export", help="Frame store -> PNG folder or video file")
+    export.add_argument("store", help="Frame store to read")
+    export.add_argument("output", help="Folder for PNGs, or a video path such as out.mp4")
+    info = commands.add_parser("info", help="Show a store's header")
+    info.add_argument("store", help="Frame store to read")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "pack":
+        if os.path.isdir(args.source):
+            store = FrameStore.from_images(args.source, args.store, fps=args.fps or 24)
+        else:
+            store = FrameStore.from_video(args.source, args.store, fps=args.fps)
+        print(f"{len(store)} frames of {store.shape} -> {args.store}")
+    elif args.command == "export":
+        store = FrameStore.open(args.store)
+        if Path(args.output).suffix:
+            return 0 if store.export_video(args.output) else 1
+        store.export_images(args.output)
+    else:
+        header = _read_header(args.store)
+        header["missing"] = len(FrameStore.open(args.store).missing())
+        print(json.dumps(header, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
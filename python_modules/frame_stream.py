@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Streaming frame I/O between ffmpeg pipes and NumPy arrays"""
+
+import subprocess
+from typing import Callable, Iterator, Optional, Tuple
+import logging
+
+import numpy as np
+
+from video_processor import VideoProcessor
+
+logger = logging.getLogger(__name__)
+
+# Bytes per pixel for the raw pixel formats we exchange with ffmpeg
+PIXEL_FORMATS = {
+    "rgb24": 3,
+    "bgr24": 3,
+    "rgba": 4,
+    "gray": 1
+}
+
+
+def _read_exact(stream, buffer: memoryview) -> bool:
+    """Fill buffer from stream; False on clean EOF before the first byte"""
+    filled = 0
+    while filled < len(buffer):
+        count = stream.readinto(buffer[filled:])
+        if not count:
+            if filled:
+                logger.warning(f"Dropped truncated frame ({filled}/{len(buffer)} bytes)")
+            return False
+        filled += count
+    return True
+
+
+def read_frames(video_path: str, fps: Optional[float] = None,
+                size: Optional[Tuple[int, int]] = None,
+                pix_fmt: str = "rgb24") -> Iterator[np.ndarray]:
+    """Yield decoded frames one by one as (H, W, C) uint8 arrays"""
+    channels = PIXEL_FORMATS[pix_fmt]
+    if size:
+        width, height = size
+    else:
+        info = VideoProcessor.get_video_info(video_path)
+        width, height = info.get("width"), info.get("height")
+        if not width or not height:
+            raise ValueError(f"Could not determine frame size: {video_path}")
+
+    filters = []
+    if fps:
+        filters.append(f"fps={fps}")
+    if size:
+        filters.append(f"scale={width}:{height}")
+
+    cmd = ["ffmpeg", "-v", "error", "-i", video_path]
+    if filters:
+        cmd += ["-vf", ",".join(filters)]
+    cmd += ["-f", "rawvideo", "-pix_fmt", pix_fmt, "-"]
+
+    frame_bytes = width * height * channels
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, bufsize=frame_bytes)
+    try:
+        while True:
+            buffer = bytearray(frame_bytes)
+            if not _read_exact(process.stdout, memoryview(buffer)):
+                break
+            yield np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, channels)
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+
+
+class FrameWriter:
+    """Encode a stream of (H, W, C) uint8 arrays through ffmpeg's stdin"""
+
+    def __init__(self, output_path: str, fps: float = 24, codec: str = "libx264",
+                 preset: str = "medium", crf: Optional[int] = None,
+                 pix_fmt: str = "rgb24", size: Optional[Tuple[int, int]] = None):
+        self.output_path = output_path
+        self.fps = fps
+        self.codec = codec
+        self.preset = preset
+        self.crf = crf
+        self.pix_fmt = pix_fmt
+        self.size = size
+        self.frames_written = 0
+        self._process = None
+
+    def _open(self, width: int, height: int):
+        """Start the encoder once the frame size is known"""
+        self.size = (width, height)
+        cmd = [
+            "ffmpeg",
+            "-v", "error",
+            "-f", "rawvideo",
+            "-pix_fmt", self.pix_fmt,
+            "-s", f"{width}x{height}",
+            "-framerate", str(self.fps),
+            "-i", "-",
+            "-c:v", self.codec,
+            "-preset", self.preset,
+            "-pix_fmt", "yuv420p"
+        ]
+        if self.crf is not None:
+            cmd += ["-crf", str(self.crf)]
+        cmd += ["-y", self.output_path]
+        self._process = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def write(self, frame: np.ndarray):
+        """Send one frame to the encoder"""
+        height, width = frame.shape[:2]
+        if self._process is None:
+            self._open(*(self.size or (width, height)))
+
+        channels = PIXEL_FORMATS[self.pix_fmt]
+        expected = (self.size[1], self.size[0], channels)
+        if frame.shape != expected and not (channels == 1 and frame.shape == expected[:2]):
+            raise ValueError(f"Frame shape {frame.shape} does not match {expected}")
+
+        self._process.stdin.write(np.ascontiguousarray(frame, dtype=np.uint8).data)
+        self.frames_written += 1
+
+    def close(self) -> bool:
+        """Flush the encoder and wait for it to finish"""
+        if self._process is None:
+            return False
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self._process.wait()
+        self._process = None
+        if returncode != 0:
+            logger.error(f"Encoder exited with code {returncode}: {self.output_path}")
+            return False
+        logger.info(f"Video created: {self.output_path} ({self.frames_written} frames)")
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def transform_video(input_path: str, output_path: str,
+                    transform: Callable[[np.ndarray], np.ndarray],
+                    fps: Optional[float] = None, **writer_options) -> bool:
+    """Decode, transform and re-encode frame by frame with bounded memory"""
+    out_fps = fps or VideoProcessor.get_video_info(input_path).get("fps") or 24
+    writer = FrameWriter(output_path, fps=out_fps, **writer_options)
+    try:
+        for frame in read_frames(input_path, fps=fps):
+            writer.write(transform(frame))
+    except Exception as e:
+        logger.error(f"Frame transform failed: {e}")
+        writer.close()
+        return False
+    return writer.close()
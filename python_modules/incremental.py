@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Incremental re-rendering: re-encode only the segments whose content changed
+
+An output is rendered as a run of independently encoded segments, each
+starting on its own keyframe, and spliced with one stream-copy concat.
+Segments are stored content-addressed beside the output
+(``<dir>/.segments/<output name>/``): the file name is a hash of the
+segment's input content plus the encoder settings. On a rerun every
+segment whose inputs and settings are unchanged already exists and is
+reused; only the changed ones are encoded before the splice.
+
+- Frame sequences (stitch) are cut every ``segment_frames`` frames and
+  keyed by the content hashes of their frames. Hashes are remembered per
+  file (size, mtime) in the manifest, so only rewritten frames are read.
+- Videos (convert) are split by stream copy at the first keyframe after
+  every ``segment_seconds``, and each piece is keyed by its bytes. An edit
+  that keeps timing intact changes only the pieces it touches; inserting
+  or removing time shifts every later cut, which re-encodes the rest.
+  Pieces carry video only: the source audio is encoded once, in one piece,
+  while splicing, so there are no priming gaps at the cuts.
+
+Missing segments are encoded concurrently, the cores split between them
+the way segmented encodes in video_processor split them, unless the
+caller fixed a thread count.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+
+from concat_plan import write_list
+from result_cache import file_hash
+from tracing import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# Defaults: roughly ten seconds of 24 fps frames, or of source video
+SEGMENT_FRAMES = 240
+SEGMENT_SECONDS = 10
+
+# convert options that only affect the audio muxed in at the splice
+AUDIO_OPTIONS = ("audio_codec", "audio_bitrate")
+
+
+def _key(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _without_threads(args: List[str]) -> List[str]:
+    """Encoder arguments minus -threads, which changes speed but not the output's content"""
+    kept, skip = [], False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg == "-threads":
+            skip = True
+        else:
+            kept.append(arg)
+    return kept
+
+
+class SegmentStore:
+    """Content-addressed segments of one output plus their manifest"""
+
+    def __init__(self, output_path: str, root: Optional[str] = None):
+        output = Path(output_path)
+        self.dir = Path(root) if root else output.parent / ".segments" / output.name
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.suffix = output.suffix or ".mp4"
+        self.manifest_path = self.dir / "manifest.json"
+        try:
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.manifest = {}
+        self.hashes: Dict[str, list] = self.manifest.get("hashes", {})
+        self.used = set()
+
+    def content_hash(self, path: str) -> str:
+        """File hash, recomputed only when its size or mtime changed"""
+        key = os.path.abspath(path)
+        self.used.add(key)
+        stat = os.stat(key)
+        known = self.hashes.get(key)
+        if known and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return known[2]
+        digest = file_hash(key)
+        self.hashes[key] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def segment_path(self, key: str) -> str:
+        return str(self.dir / f"{key[:32]}{self.suffix}")
+
+    def save(self, segments: List[str]):
+        """Record the current segment list and delete segments no longer used"""
+        keep = {os.path.basename(path) for path in segments}
+        for child in self.dir.iterdir():
+            if child.is_file() and child.suffix == self.suffix and child.name not in keep:
+                child.unlink()
+        hashes = {path: entry for path, entry in self.hashes.items() if path in self.used}
+        manifest = {"segments": [os.path.basename(path) for path in segments], "hashes": hashes}
+        partial = self.manifest_path.with_name("manifest.json.partial")
+        with open(partial, "w") as f:
+            json.dump(manifest, f)
+        os.replace(partial, self.manifest_path)
+        self.manifest = manifest
+
+
+def splice(segments: List[str], output_path: str, audio_source: Optional[str] = None,
+           audio_codec: str = "aac", audio_bitrate: Optional[str] = None):
+    """Join encoded segments into output_path with a stream-copy concat.
+
+    With ``audio_source`` the video-only segments get that file's audio,
+    encoded with ``audio_codec`` (at ``audio_bitrate``, if given) in one pass.
+    """
+    from video_processor import atomic_output
+
+    handle, list_file = tempfile.mkstemp(prefix="segments_", suffix=".txt")
+    os.close(handle)
+    try:
+        write_list([{"path": path, "start": None, "end": None, "copy": True} for path in segments], list_file)
+        cmd = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", list_file]
+        if audio_source:
+            cmd += ["-i", audio_source, "-map", "0:v:0", "-map", "1:a?", "-c:v", "copy", "-c:a", audio_codec]
+            if audio_bitrate:
+                cmd += ["-b:a", str(audio_bitrate)]
+        else:
+            cmd += ["-c", "copy"]
+        cmd += ["-y", output_path]
+        with atomic_output(output_path) as partial_path:
+            run_ffmpeg(cmd[:-1] + [partial_path], "ffmpeg.splice_segments")
+    finally:
+        os.remove(list_file)
+
+
+def _encode_missing(jobs: List[tuple], encode, workers: Optional[int] = None) -> int:
+    """Run encode(job, threads) for every job whose segment file is missing; returns the count.
+
+    Up to ``workers`` (default: all cores) run at once, each offered an
+    equal share of those cores as its thread count.
+    """
+    missing = [job for job in jobs if not os.path.exists(job[-1])]
+    if missing:
+        workers = workers or os.cpu_count() or 1
+        concurrent = max(1, min(workers, len(missing)))
+        share = max(1, workers // concurrent)
+        with ThreadPoolExecutor(max_workers=concurrent) as pool:
+            list(pool.map(lambda job: encode(job, share), missing))
+    return len(missing)
+
+
+def _frame_number(path: Path) -> Optional[int]:
+    try:
+        return int(path.stem.rsplit("_", 1)[-1])
+    except ValueError:
+        return None
+
+
+def stitch_incremental(frame_folder: str, output_video: str, fps: float, codec_args: List[str],
+                       segment_frames: Optional[int] = None,
+                       workers: Optional[int] = None) -> Optional[bool]:
+    """Stitch frame_%06d.png into output_video, re-encoding only changed segments.
+
+    Returns None when the sequence has gaps in its numbering (the caller
+    falls back to a single-pass stitch).
+    """
+    frames = sorted(Path(frame_folder).glob("frame_*.png"))
+    numbers = [_frame_number(frame) for frame in frames]
+    if not frames or None in numbers or numbers != list(range(numbers[0], numbers[0] + len(frames))):
+        return None
+
+    segment_frames = max(1, segment_frames or SEGMENT_FRAMES)
+    store = SegmentStore(output_video)
+    settings = {"fps": fps, "codec": _without_threads(codec_args)}
+    pattern = os.path.join(frame_folder, "frame_%06d.png")
+    jobs = []
+    for offset in range(0, len(frames), segment_frames):
+        chunk = frames[offset:offset + segment_frames]
+        key = _key("stitch", settings, [store.content_hash(str(frame)) for frame in chunk])
+        jobs.append((numbers[offset], len(chunk), store.segment_path(key)))
+
+    def encode(job: tuple, threads: int):
+        start, count, path = job
+        args = codec_args if "-threads" in codec_args else codec_args + ["-threads", str(threads)]
+        cmd = [
+            "ffmpeg", "-framerate", str(fps), "-start_number", str(start), "-i", pattern,
+            "-frames:v", str(count), *args, "-pix_fmt", "yuv420p", "-y", path
+        ]
+        partial = f"{path}.partial{store.suffix}"
+        run_ffmpeg(cmd[:-1] + [partial], "ffmpeg.stitch_segment")
+        os.replace(partial, path)
+
+    encoded = _encode_missing(jobs, encode, workers)
+    segments = [job[-1] for job in jobs]
+    splice(segments, output_video)
+    store.save(segments)
+    logger.info(f"Stitched {output_video}: re-encoded {encoded}/{len(segments)} segments")
+    return True
+
+
+def split_at_keyframes(input_path: str, output_folder: str, segment_seconds: float) -> List[str]:
+    """Stream-copy input_path's video into pieces cut at the first keyframe after every segment_seconds.
+
+    Metadata and muxer version tags are left out so an unchanged stretch of
+    the source yields byte-identical pieces across runs.
+    """
+    Path(output_folder).mkdir(parents=True, exist_ok=True)
+    suffix = Path(input_path).suffix or ".mp4"
+    cmd = [
+        "ffmpeg", "-i", input_path, "-map", "0:v:0", "-c", "copy",
+        "-map_metadata", "-1", "-fflags", "+bitexact", "-f", "segment",
+        "-segment_time", str(segment_seconds), "-reset_timestamps", "1",
+        "-y", os.path.join(output_folder, f"piece_%05d{suffix}")
+    ]
+    run_ffmpeg(cmd, "ffmpeg.split_keyframes")
+    return sorted(str(p) for p in Path(output_folder).glob(f"piece_*{suffix}"))
+
+
+def convert_incremental(input_path: str, output_path: str, options: Dict,
+                        segment_seconds: Optional[float] = None, workers: Optional[int] = None) -> bool:
+    """convert_video over keyframe-aligned pieces, re-encoding only changed ones.
+
+    ``audio_codec``/``audio_bitrate`` in options apply to the source audio
+    muxed in at the splice; the pieces themselves are video only.
+    """
+    from video_processor import VideoProcessor
+
+    store = SegmentStore(output_path)
+    pieces_dir = tempfile.mkdtemp(prefix="pieces_", dir=store.dir)
+    try:
+        pieces = split_at_keyframes(input_path, pieces_dir, segment_seconds or SEGMENT_SECONDS)
+        if not pieces:
+            raise RuntimeError(f"no segments split from {input_path}")
+        audio = {name: options[name] for name in AUDIO_OPTIONS if options.get(name)}
+        video_options = {name: value for name, value in options.items() if name not in AUDIO_OPTIONS}
+        settings = {name: value for name, value in video_options.items() if name != "threads"}
+        jobs = [(piece, store.segment_path(_key("convert", settings, file_hash(piece)))) for piece in pieces]
+
+        def encode(job: tuple, threads: int):
+            piece, path = job
+            if not VideoProcessor.convert_video(
+                    piece, path, **dict(video_options, threads=video_options.get("threads") or threads)):
+                raise RuntimeError(f"segment {os.path.basename(piece)} failed")
+
+        encoded = _encode_missing(jobs, encode, workers)
+        segments = [job[-1] for job in jobs]
+        splice(segments, output_path, audio_source=input_path, **audio)
+        store.save(segments)
+        logger.info(f"Converted {output_path}: re-encoded {encoded}/{len(segments)} segments")
+        return True
+    except Exception as e:
+        logger.error(f"Incremental conversion failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(pieces_dir, ignore_errors=True)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Persistent journal of completed pipeline stages for resumable batch jobs"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import logging
+
+from pipeline_config import load_config, resolve_path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stages (
+    job TEXT NOT NULL,
+    input TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    output_hash TEXT NOT NULL,
+    outputs TEXT NOT NULL,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (job, input, stage)
+)
+"""
+
+
+def fingerprint(path: str) -> Optional[str]:
+    """Cheap hash of a file or directory's current state; None if missing.
+
+    Based on names, sizes and mtimes rather than contents: outputs are only
+    ever moved into place once complete (see video_processor.atomic_output),
+    so any rewrite or truncation changes the fingerprint.
+    """
+    target = Path(path)
+    digest = hashlib.sha256()
+    if target.is_file():
+        stat = target.stat()
+        digest.update(f"{stat.st_size}|{stat.st_mtime_ns}".encode())
+    elif target.is_dir():
+        for child in sorted(p for p in target.rglob("*") if p.is_file()):
+            stat = child.stat()
+            digest.update(f"{child.relative_to(target)}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    else:
+        return None
+    return digest.hexdigest()
+
+
+def _output_paths(outputs: Dict) -> Dict[str, str]:
+    """Context values that point at files or directories on disk"""
+    return {
+        key: value for key, value in outputs.items()
+        if isinstance(value, str) and value and os.path.exists(value)
+    }
+
+
+class JobJournal:
+    """SQLite record of each stage's completion per input.
+
+    A stage is considered done for an input when a row exists with the same
+    input hash and every output path it recorded still has the recorded
+    fingerprint.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(SCHEMA)
+
+    @classmethod
+    def from_config(cls, config_path: Optional[str] = None) -> "JobJournal":
+        """Journal stored in the configured paths.temp directory"""
+        temp = load_config(config_path).get("paths", {}).get("temp", "temp")
+        return cls(str(resolve_path(temp, config_path) / "job_journal.db"))
+
+    @staticmethod
+    def _output_hash(outputs: Dict) -> str:
+        paths = _output_paths(outputs)
+        state = {key: fingerprint(path) for key, path in sorted(paths.items())}
+        return hashlib.sha256(json.dumps(state, sort_keys=True).encode()).hexdigest()
+
+    def lookup(self, job: str, input_key: str, stage: str,
+               input_hash: str) -> Optional[Tuple[Dict, str]]:
+        """(outputs, output_hash) if the stage is complete and its outputs intact"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT input_hash, output_hash, outputs FROM stages "
+                "WHERE job = ? AND input = ? AND stage = ?",
+                (job, input_key, stage)
+            ).fetchone()
+        if row is None or row[0] != input_hash:
+            return None
+
+        outputs = json.loads(row[2])
+        recorded_paths = outputs.pop("__paths__", [])
+        if outputs.pop("__released__", False):
+            return outputs, row[1]
+        if any(not os.path.exists(outputs[key]) for key in recorded_paths):
+            return None
+        if self._output_hash(outputs) != row[1]:
+            logger.info(f"[{input_key}] {stage} outputs changed since last run")
+            return None
+        return outputs, row[1]
+
+    def record(self, job: str, input_key: str, stage: str, input_hash: str,
+               outputs: Optional[Dict]) -> str:
+        """Mark a stage complete; returns the hash of its outputs"""
+        outputs = dict(outputs or {})
+        output_hash = self._output_hash(outputs)
+        stored = dict(outputs, __paths__=sorted(_output_paths(outputs)))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job, input_key, stage, input_hash, output_hash,
+                 json.dumps(stored, default=str), time.time())
+            )
+        return output_hash
+
+    def release(self, job: str, input_key: str, stage: str):
+        """Note that a stage's outputs were deleted once every consumer finished.
+
+        Lookups then trust the recorded output hash instead of the missing
+        files, so a rerun still skips the stage (and its completed consumers).
+        If a consumer has to run again, Pipeline re-runs the stage first to
+        bring the files back.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT outputs FROM stages WHERE job = ? AND input = ? AND stage = ?",
+                (job, input_key, stage)
+            ).fetchone()
+            if row is None:
+                return
+            outputs = dict(json.loads(row[0]), __released__=True)
+            self._conn.execute(
+                "UPDATE stages SET outputs = ? WHERE job = ? AND input = ? AND stage = ?",
+                (json.dumps(outputs), job, input_key, stage)
+            )
+
+    def completed(self, job: str) -> Dict[str, list]:
+        """Stage names recorded as complete, per input"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT input, stage FROM stages WHERE job = ? ORDER BY completed_at", (job,)
+            ).fetchall()
+        done: Dict[str, list] = {}
+        for input_key, stage in rows:
+            done.setdefault(input_key, []).append(stage)
+        return done
+
+    def reset(self, job: Optional[str] = None):
+        """Forget completed stages for one job, or all jobs"""
+        with self._lock:
+            if job is None:
+                self._conn.execute("DELETE FROM stages")
+            else:
+                self._conn.execute("DELETE FROM stages WHERE job = ?", (job,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
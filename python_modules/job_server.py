@@ -0,0 +1,520 @@
+#!/usr/bin/env python3
+"""
+Local HTTP job service for VideoProcessor and AIClient work
+
+    python job_server.py --port 8765 --workers 2
+    open http://127.0.0.1:8765/         (the web GUI, served from web-gui/)
+
+Jobs wait in one priority queue and a fixed pool of worker threads runs
+them, so many submitters cannot oversubscribe the machine, and an
+interactive preview submitted behind a long batch starts next. Workers
+live as long as the server: each keeps its provider clients (and their
+HTTP sessions) warm, and the result cache and dedup index are shared.
+
+    POST   /jobs                {"kind": "convert", "params": {...}, "priority": "interactive"}
+    GET    /jobs                all jobs, newest first
+    GET    /jobs/<id>           one job
+    DELETE /jobs/<id>           cancel a queued job
+    GET    /jobs/<id>/events    server-sent events for one job, until it finishes
+    GET    /events              server-sent events for every job
+    GET    /health              worker and queue counts
+"""
+
+import os
+import sys
+import json
+import time
+import heapq
+import uuid
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+import logging
+
+from pipeline_config import DEFAULT_CONFIG_PATH, load_config
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first; equal priorities run in submission order
+PRIORITIES = {"interactive": 0, "preview": 0, "normal": 5, "batch": 10}
+TERMINAL = ("completed", "failed", "cancelled")
+# Event name announcing a job's current status when its history is gone
+STATE_EVENTS = {"running": "progress"}
+WEB_ROOT = Path(__file__).resolve().parent.parent / "web-gui"
+DEFAULT_SPEC = DEFAULT_CONFIG_PATH.parent / "examples" / "example_config.json"
+STATIC_TYPES = {".html": "text/html", ".js": "application/javascript", ".css": "text/css"}
+EVENT_HISTORY = 1000
+
+
+class Job:
+    """One queued unit of work and its progress"""
+
+    def __init__(self, kind: str, params: Dict, priority: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.priority = priority
+        self.status = "queued"
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "priority": self.priority,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class Worker:
+    """State a worker thread keeps between jobs"""
+
+    def __init__(self, server: "JobServer", name: str, threads: int):
+        self.server = server
+        self.name = name
+        # ffmpeg threads per job: the machine's cores split across the pool
+        self.threads = threads
+        self.clients: Dict[str, object] = {}
+        self.job: Optional[Job] = None
+
+    def client(self, provider: str):
+        """This worker's AIClient for a provider, created once and kept warm"""
+        if provider not in self.clients:
+            from ai_client import get_client
+            self.clients[provider] = get_client(provider)
+        return self.clients[provider]
+
+    def progress(self, fraction: float, message: str = ""):
+        """Report progress on the current job"""
+        self.server.update(self.job, progress=max(0.0, min(1.0, fraction)), message=message)
+
+
+def _require(params: Dict, *names: str):
+    missing = [name for name in names if not params.get(name)]
+    if missing:
+        raise ValueError(f"Missing parameters: {', '.join(missing)}")
+
+
+def _video_job(method: str, input_key: str = "input", output_key: str = "output",
+               threaded: bool = True) -> Callable[[Worker, Dict], Dict]:
+    """Job running one VideoProcessor method on input -> output"""
+    def run(worker: Worker, params: Dict) -> Dict:
+        from video_processor import VideoProcessor
+
+        _require(params, input_key, output_key)
+        options = dict(params.get("options", {}))
+        if threaded:
+            options.setdefault("threads", worker.threads)
+        worker.progress(0.0, f"{method} {params[input_key]}")
+        if not getattr(VideoProcessor, method)(params[input_key], params[output_key], **options):
+            raise RuntimeError(f"{method} failed")
+        return {"output": params[output_key]}
+    return run
+
+
+def _ai_process_job(worker: Worker, params: Dict) -> Dict:
+    _require(params, "input", "prompt")
+    worker.progress(0.0, f"{params.get('provider', 'grok')}: {params['input']}")
+    result = worker.client(params.get("provider", "grok")).process_video(params["input"], params["prompt"])
+    if result is None:
+        raise RuntimeError("provider call failed")
+    return {"result": result}
+
+
+def _generate_image_job(worker: Worker, params: Dict) -> Dict:
+    _require(params, "prompt", "output")
+    if not worker.client(params.get("provider", "grok")).generate_image(params["prompt"], params["output"]):
+        raise RuntimeError("image generation failed")
+    return {"output": params["output"]}
+
+
+def _pipeline_job(worker: Worker, params: Dict) -> Dict:
+    """Run a pipeline spec; with "preview" render proxies and queue the full run as a batch job.
+
+    The run's stages share this worker's cores, not the whole machine.
+    """
+    from pipeline_runner import run_preview, run_spec
+
+    spec = params.get("spec") or str(DEFAULT_SPEC)
+    options = (params.get("input"), params.get("pattern"))
+    resume = params.get("resume", True)
+    if params.get("preview"):
+        worker.progress(0.0, f"preview {spec}")
+        results, _ = run_preview(spec, *options, full=False, resume=resume, cores=worker.threads)
+    else:
+        worker.progress(0.0, f"pipeline {spec}")
+        results = run_spec(spec, *options, resume=resume, cores=worker.threads)
+    done = sum(1 for r in results if r["status"] == "completed")
+    summary = [{"name": r["name"], "status": r["status"], "output": r.get("output"),
+                "error": r.get("error")} for r in results]
+    if not results or done < len(results):
+        raise RuntimeError(f"{len(results) - done}/{len(results)} inputs failed")
+    if not params.get("preview"):
+        return {"inputs": summary}
+    full = worker.server.submit("pipeline", dict(params, preview=False), "batch")
+    return {"inputs": summary, "full_job": full.id}
+
+
+# Job kind -> function(worker, params) returning the job's result; raise to fail
+JOB_TYPES: Dict[str, Callable[[Worker, Dict], Dict]] = {
+    "convert": _video_job("convert_video"),
+    "upscale": _video_job("upscale_video"),
+    "extract": _video_job("extract_frames", "input", "output_folder", threaded=False),
+    "stitch": _video_job("stitch_frames", "frame_folder", "output"),
+    "concat": _video_job("concat_videos", "inputs", "output", threaded=False),
+    "ai_process": _ai_process_job,
+    "generate_image": _generate_image_job,
+    "pipeline": _pipeline_job,
+}
+
+
+class JobServer:
+    """Priority queue plus a fixed pool of long-lived worker threads"""
+
+    def __init__(self, workers: int = 2):
+        self.workers = max(1, workers)
+        self.jobs: Dict[str, Job] = {}
+        self._queue: List[tuple] = []
+        self._counter = 0
+        self._cond = threading.Condition()
+        self._events: deque = deque(maxlen=EVENT_HISTORY)
+        self._seq = 0
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> "JobServer":
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        for index in range(self.workers):
+            worker = Worker(self, f"worker-{index}", threads)
+            thread = threading.Thread(target=self._run_worker, args=(worker,), name=worker.name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Job server started with {self.workers} workers x {threads} ffmpeg threads")
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop taking jobs; running jobs finish, queued ones stay queued"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    @staticmethod
+    def parse_priority(priority) -> int:
+        if priority is None:
+            return PRIORITIES["normal"]
+        if isinstance(priority, str) and priority in PRIORITIES:
+            return PRIORITIES[priority]
+        try:
+            return int(priority)
+        except (TypeError, ValueError):
+            raise ValueError(f"Unknown priority: {priority}")
+
+    def submit(self, kind: str, params: Optional[Dict] = None, priority=None) -> Job:
+        if kind not in JOB_TYPES:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = Job(kind, dict(params or {}), self.parse_priority(priority))
+        with self._cond:
+            self.jobs[job.id] = job
+            self._counter += 1
+            heapq.heappush(self._queue, (job.priority, self._counter, job.id))
+            self._publish("queued", job)
+            self._cond.notify_all()
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started yet"""
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if job is None or job.status != "queued":
+                return False
+            job.status = "cancelled"
+            job.finished = time.time()
+            self._publish("cancelled", job)
+            return True
+
+    def update(self, job: Job, **changes):
+        with self._cond:
+            for name, value in changes.items():
+                setattr(job, name, value)
+            self._publish("progress", job)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._cond:
+            job = self.jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def list_jobs(self) -> List[Dict]:
+        """Every job, newest first"""
+        with self._cond:
+            return [job.to_dict() for job in sorted(self.jobs.values(), key=lambda j: j.created, reverse=True)]
+
+    def stats(self) -> Dict:
+        with self._cond:
+            counts: Dict[str, int] = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": self.workers, "jobs": counts}
+
+    def _publish(self, event: str, job: Job):
+        """Record an event (call with the condition held) and wake listeners"""
+        self._seq += 1
+        self._events.append({"seq": self._seq, "event": event, "job": job.to_dict()})
+        self._cond.notify_all()
+
+    def events(self, after: int = 0, job_id: Optional[str] = None,
+               timeout: Optional[float] = None) -> List[Dict]:
+        """Events newer than ``after``, waiting up to ``timeout`` for the next one"""
+        def fresh() -> List[Dict]:
+            return [e for e in self._events
+                    if e["seq"] > after and (job_id is None or e["job"]["id"] == job_id)]
+
+        with self._cond:
+            self._cond.wait_for(lambda: fresh() or self._stopping, timeout)
+            return fresh()
+
+    def snapshot(self, job_id: str) -> Tuple[int, Optional[Dict]]:
+        """(latest event seq, the job's current state)"""
+        with self._cond:
+            job = self.jobs.get(job_id)
+            return self._seq, job.to_dict() if job else None
+
+    def _next_job(self) -> Optional[Job]:
+        with self._cond:
+            while True:
+                while self._queue and self.jobs[self._queue[0][2]].status != "queued":
+                    heapq.heappop(self._queue)
+                if self._stopping:
+                    return None
+                if self._queue:
+                    job = self.jobs[heapq.heappop(self._queue)[2]]
+                    job.status = "running"
+                    job.started = time.time()
+                    self._publish("started", job)
+                    return job
+                self._cond.wait()
+
+    def _run_worker(self, worker: Worker):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            worker.job = job
+            try:
+                result = JOB_TYPES[job.kind](worker, job.params)
+                changes = {"status": "completed", "progress": 1.0, "result": result}
+            except Exception as e:
+                logger.error(f"Job {job.id} ({job.kind}) failed: {e}")
+                changes = {"status": "failed", "error": str(e)}
+            with self._cond:
+                for name, value in dict(changes, finished=time.time()).items():
+                    setattr(job, name, value)
+                self._publish(job.status, job)
+            worker.job = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """JSON API, server-sent events and the static web GUI"""
+
+    server: "JobHTTPServer"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send_json(self, status: int, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _trusted(self) -> bool:
+        """Request addressed to this server by name and, from a browser, from its own pages.
+
+        The server is unauthenticated, so other web pages must not reach it:
+        a cross-origin request carries a foreign Origin, and a DNS-rebound
+        one a foreign Host.
+        """
+        host = self.headers.get("Host", "")
+        if urlparse(f"http://{host}").hostname not in self.server.hostnames:
+            return False
+        origin = self.headers.get("Origin")
+        return origin is None or origin == f"http://{host}"
+
+    def _parts(self) -> List[str]:
+        return [unquote(p) for p in urlparse(self.path).path.strip("/").split("/") if p]
+
+    def do_GET(self):
+        if not self._trusted():
+            return self._send_json(403, {"error": "forbidden"})
+        jobs = self.server.jobs
+        parts = self._parts()
+        if parts == ["health"]:
+            return self._send_json(200, jobs.stats())
+        if parts == ["jobs"]:
+            return self._send_json(200, jobs.list_jobs())
+        if parts == ["events"]:
+            return self._stream(None)
+        if len(parts) >= 2 and parts[0] == "jobs":
+            job = jobs.get(parts[1])
+            if job is None:
+                return self._send_json(404, {"error": "unknown job"})
+            if parts[2:] == ["events"]:
+                return self._stream(job["id"])
+            if len(parts) == 2:
+                return self._send_json(200, job)
+        return self._static(parts)
+
+    def do_POST(self):
+        if not self._trusted():
+            return self._send_json(403, {"error": "forbidden"})
+        if self._parts() != ["jobs"]:
+            return self._send_json(404, {"error": "not found"})
+        # A JSON content type cannot be sent cross-origin without a preflight
+        if self.headers.get("Content-Type", "").split(";")[0].strip().lower() != "application/json":
+            return self._send_json(415, {"error": "expected application/json"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            job = self.server.jobs.submit(body.get("kind"), body.get("params"), body.get("priority"))
+        except (ValueError, AttributeError) as e:
+            return self._send_json(400, {"error": str(e)})
+        self._send_json(202, job.to_dict())
+
+    def do_DELETE(self):
+        if not self._trusted():
+            return self._send_json(403, {"error": "forbidden"})
+        parts = self._parts()
+        jobs = self.server.jobs
+        if len(parts) != 2 or parts[0] != "jobs" or jobs.get(parts[1]) is None:
+            return self._send_json(404, {"error": "unknown job"})
+        if not jobs.cancel(parts[1]):
+            return self._send_json(409, {"error": "job already started"})
+        self._send_json(200, jobs.get(parts[1]))
+
+    def _send_event(self, seq: int, event: str, job: Dict):
+        self.wfile.write(f"id: {seq}\nevent: {event}\ndata: {json.dumps(job)}\n\n".encode())
+
+    def _stream(self, job_id: Optional[str]):
+        """Server-sent events; a job's stream ends once it reaches a terminal state.
+
+        A job's stream starts with its recorded events, or with its current
+        state when none are left in the history.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        jobs = self.server.jobs
+        last = int(self.headers.get("Last-Event-ID") or 0)
+        try:
+            if job_id:
+                seq, job = jobs.snapshot(job_id)
+                events = jobs.events(last, job_id, timeout=0)
+                if not events:
+                    last = seq
+                    self._send_event(seq, STATE_EVENTS.get(job["status"], job["status"]), job)
+                    self.wfile.flush()
+                    if job["status"] in TERMINAL:
+                        return
+            while not self.server.stopping:
+                events = jobs.events(last, job_id, timeout=self.server.keepalive)
+                if not events:
+                    if job_id and jobs.get(job_id)["status"] in TERMINAL:
+                        # Its final events left the history before we saw them
+                        seq, job = jobs.snapshot(job_id)
+                        self._send_event(seq, job["status"], job)
+                        self.wfile.flush()
+                        return
+                    self.wfile.write(b": keepalive\n\n")
+                for event in events:
+                    last = event["seq"]
+                    self._send_event(last, event["event"], event["job"])
+                self.wfile.flush()
+                if job_id and any(e["job"]["status"] in TERMINAL for e in events):
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def _static(self, parts: List[str]):
+        path = (WEB_ROOT / "/".join(parts or ["index.html"])).resolve()
+        if not path.is_relative_to(WEB_ROOT.resolve()) or not path.is_file():
+            return self._send_json(404, {"error": "not found"})
+        data = path.read_bytes()
+        self.send_response(200)
+        self.send_header("Content-Type", STATIC_TYPES.get(path.suffix, "application/octet-stream"))
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class JobHTTPServer(ThreadingHTTPServer):
+    """HTTP front end for a JobServer"""
+
+    daemon_threads = True
+
+    def __init__(self, jobs: JobServer, host: str = "127.0.0.1", port: int = 8765,
+                 keepalive: float = 15.0):
+        self.jobs = jobs
+        self.keepalive = keepalive
+        self.stopping = False
+        # Names a browser may use for this server (checked against Host)
+        self.hostnames = {"localhost", "127.0.0.1", "::1", host}
+        super().__init__((host, port), _Handler)
+
+    def shutdown(self):
+        self.stopping = True
+        super().shutdown()
+
+
+def main() -> int:
+    settings = load_config().get("server", {})
+    parser = argparse.ArgumentParser(description="Local job server for the video pipeline")
+    parser.add_argument("--host", default=settings.get("host", "127.0.0.1"), help="Address to bind")
+    parser.add_argument("--port", type=int, default=settings.get("port", 8765), help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=settings.get("workers", 2),
+                        help="Concurrent jobs (ffmpeg threads are split between them)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from ai_client import AIClient
+    from video_processor import VideoProcessor
+    VideoProcessor.enable_cache()
+    AIClient.enable_dedup()
+
+    jobs = JobServer(args.workers).start()
+    httpd = JobHTTPServer(jobs, args.host, args.port)
+    print(f"Job server on http://{args.host}:{httpd.server_address[1]}/")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        jobs.stop(timeout=5)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
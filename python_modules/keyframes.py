@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Scene-aware frame sampling with perceptual hashes
+
+Instead of writing every frame at a fixed rate, the video is decoded once
+at a tiny 9x8 grayscale size and each frame gets a 64-bit difference hash
+(dHash). A frame only becomes a new keyframe when its hash drifts more than
+``threshold`` bits from the current keyframe, so near-identical runs
+(talking heads, static shots) collapse to one image and scene cuts always
+start a new one. Only keyframes are written at full resolution.
+
+keyframes.json in the output folder maps every keyframe back to the run of
+timeline frames it stands for; stitch_frames() reads it to hold each
+(processed) keyframe for its run, restoring the original duration.
+"""
+
+import os
+import json
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from tracing import run_ffmpeg, span
+
+logger = logging.getLogger(__name__)
+
+TIMELINE_FILE = "keyframes.json"
+FRAME_PATTERN = "frame_%06d.png"
+
+# dHash compares horizontally adjacent pixels of a (HASH_SIZE, HASH_SIZE + 1) image
+HASH_SIZE = 8
+
+
+def dhash(gray: np.ndarray) -> np.ndarray:
+    """64-bit difference hashes of (N, 8, 9) grayscale frames, as uint64"""
+    bits = gray[:, :, 1:] > gray[:, :, :-1]
+    packed = np.packbits(bits.reshape(len(gray), -1), axis=1)
+    return packed.view(">u8").ravel().astype(np.uint64)
+
+
+def image_hash(image_path: str) -> int:
+    """Difference hash of an image file, comparable with frame hashes"""
+    from PIL import Image
+
+    with Image.open(image_path) as image:
+        small = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BOX)
+        gray = np.asarray(small, dtype=np.uint8)
+    return int(dhash(gray[np.newaxis])[0])
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return (int(a) ^ int(b)).bit_count()
+
+
+def frame_hashes(video_path: str, fps: float, threads: Optional[int] = None) -> np.ndarray:
+    """Hash every frame the fps filter would produce, without writing any images"""
+    cmd = [
+        "ffmpeg", "-v", "error",
+        *(["-threads", str(threads)] if threads else []),
+        "-i", video_path,
+        "-vf", f"fps={fps},scale={HASH_SIZE + 1}:{HASH_SIZE}:flags=area,format=gray",
+        "-f", "rawvideo", "-"
+    ]
+    with span("ffmpeg.keyframe_hashes", "ffmpeg", input=video_path) as trace:
+        raw = subprocess.run(cmd, capture_output=True, check=True).stdout
+        gray = np.frombuffer(raw, dtype=np.uint8)
+        gray = gray[:len(gray) - len(gray) % (HASH_SIZE * (HASH_SIZE + 1))]
+        hashes = dhash(gray.reshape(-1, HASH_SIZE, HASH_SIZE + 1))
+        trace.set(frames=len(hashes))
+    return hashes
+
+
+def select_keyframes(hashes: np.ndarray, threshold: int = 10,
+                     max_run: Optional[int] = None) -> List[Tuple[int, int]]:
+    """(first frame, run length) for each keyframe.
+
+    A frame starts a new run when it is more than ``threshold`` bits away
+    from the current keyframe, or when the run already spans ``max_run``
+    frames (bounding how long slow drift can be held on one image).
+    """
+    runs: List[Tuple[int, int]] = []
+    values = hashes.tolist()
+    key, start = None, 0
+    for index, value in enumerate(values):
+        if key is None:
+            key = value
+            continue
+        if hamming(value, key) > threshold or (max_run and index - start >= max_run):
+            runs.append((start, index - start))
+            key, start = value, index
+    if values:
+        runs.append((start, len(values) - start))
+    return runs
+
+
+def sample_keyframes(video_path: str, output_folder: str, fps: float = 24,
+                     threshold: int = 10, max_run: Optional[int] = None,
+                     threads: Optional[int] = None) -> Dict:
+    """Write representative keyframes plus keyframes.json; returns the timeline"""
+    hashes = frame_hashes(video_path, fps, threads)
+    if not len(hashes):
+        raise ValueError(f"No frames decoded from {video_path}")
+    runs = select_keyframes(hashes, threshold, max_run)
+
+    Path(output_folder).mkdir(parents=True, exist_ok=True)
+    for stale in Path(output_folder).glob("frame_*.png"):
+        stale.unlink()
+
+    # Second pass writes only the chosen frames, numbered 1..K in timeline order.
+    # The select expression grows with the keyframe count, so it goes in a
+    # filter script rather than on the command line (which Windows caps at 32K)
+    selected = "+".join(f"eq(n\\,{start})" for start, _ in runs)
+    handle, script = tempfile.mkstemp(prefix="keyframes_", suffix=".txt")
+    with os.fdopen(handle, "w") as f:
+        f.write(f"fps={fps},select='{selected}'")
+    thread_args = ["-threads", str(threads)] if threads else []
+    cmd = [
+        "ffmpeg",
+        *thread_args,
+        "-i", video_path,
+        "-filter_script:v", script,
+        "-vsync", "vfr",
+        *thread_args,
+        "-y",
+        os.path.join(output_folder, FRAME_PATTERN)
+    ]
+    try:
+        run_ffmpeg(cmd, "ffmpeg.extract_keyframes")
+    finally:
+        os.remove(script)
+
+    timeline = {
+        "source": os.path.abspath(video_path),
+        "fps": fps,
+        "frame_count": len(hashes),
+        "threshold": threshold,
+        "keyframes": [
+            {"file": FRAME_PATTERN % (index + 1), "start": start, "count": count}
+            for index, (start, count) in enumerate(runs)
+        ]
+    }
+    with open(os.path.join(output_folder, TIMELINE_FILE), "w") as f:
+        json.dump(timeline, f, indent=2)
+
+    logger.info(f"Kept {len(runs)} of {len(hashes)} frames "
+                f"({len(runs) / len(hashes):.1%}) from {video_path}")
+    return timeline
+
+
+def find_timeline(frame_folder: str) -> Optional[str]:
+    """Path of the folder's keyframes.json, if it was sampled by scene"""
+    path = os.path.join(frame_folder, TIMELINE_FILE)
+    return path if os.path.exists(path) else None
+
+
+def load_timeline(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_concat_list(timeline: Dict, frame_folder: str, list_path: str):
+    """Concat-demuxer script holding each keyframe for its run of frames"""
+    fps = float(timeline["fps"])
+    lines = []
+    for entry in timeline["keyframes"]:
+        image = os.path.abspath(os.path.join(frame_folder, entry["file"]))
+        lines.append(f"file '{image}'\nduration {entry['count'] / fps:.6f}\n")
+    # The demuxer ignores the last entry's duration unless the file is repeated
+    lines.append(f"file '{image}'\n")
+    with open(list_path, "w") as f:
+        f.writelines(lines)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Lazy operation chains compiled into a single ffmpeg pass
+
+    VideoProcessor.chain("in.mp4").fps(30).scale(2).codec("libx264", crf=18).run("out.mp4")
+
+Recorded transforms (frame rate, scale, concat, encoder) become one filter
+graph, so the video is decoded and encoded once instead of once per step.
+When nothing needs re-encoding the chain is a stream-copy remux.
+"""
+
+import os
+import tempfile
+from fractions import Fraction
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from concat_plan import probe_clip, signature
+from encoder_probe import encoder_args, input_args, select_encoder
+from tracing import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# ffmpeg encoder name -> codec_name reported by ffprobe, for stream-copy checks
+ENCODER_CODECS = {
+    "libx264": "h264",
+    "libx265": "hevc",
+    "libsvtav1": "av1",
+    "libaom-av1": "av1",
+    "libvpx-vp9": "vp9",
+    "mpeg4": "mpeg4",
+    "prores_ks": "prores",
+    "h264_nvenc": "h264",
+    "hevc_nvenc": "hevc",
+}
+
+
+def _probe(path: str) -> Dict:
+    """Codec, size, frame rate, audio stream and stream-copy signature of a media file"""
+    clip = probe_clip(path)
+    video = clip["video"]
+    rate = video["fps"] or "0/0"
+    return {
+        "codec": video["codec"],
+        "width": video["width"],
+        "height": video["height"],
+        "fps": float(Fraction(rate)) if not rate.endswith("/0") else None,
+        "duration": clip["duration"],
+        "audio": clip["audio"],
+        "signature": signature(clip),
+    }
+
+
+class OperationChain:
+    """Records video transforms and runs them as one ffmpeg invocation"""
+
+    def __init__(self, inputs: List[str], frame_rate: Optional[float] = None):
+        self.inputs = list(inputs)
+        # Set when the input is an image sequence rather than a video file
+        self.frame_rate = frame_rate
+        self.filters: List[Tuple[str, object]] = []
+        self.encoder: Optional[Dict] = None
+        self.audio_codec = "aac"
+
+    @classmethod
+    def from_frames(cls, frame_folder: str, fps: float = 24,
+                    pattern: str = "frame_%06d.png") -> "OperationChain":
+        """Chain whose source is a numbered frame sequence"""
+        return cls([os.path.join(frame_folder, pattern)], frame_rate=fps)
+
+    def fps(self, fps: float) -> "OperationChain":
+        """Resample to a constant frame rate"""
+        self.filters.append(("fps", fps))
+        return self
+
+    def scale(self, factor: Optional[float] = None, width: Optional[int] = None,
+              height: Optional[int] = None) -> "OperationChain":
+        """Scale by a factor, or to width/height (-2 keeps the aspect ratio)"""
+        if factor is None and width is None and height is None:
+            raise ValueError("scale() needs a factor or a width/height")
+        if factor is not None:
+            self.filters.append(("scale", f"iw*{factor}:ih*{factor}") if factor != 1 else ("noop", None))
+        else:
+            self.filters.append(("scale", f"{width or -2}:{height or -2}"))
+        return self
+
+    def concat(self, others: List[str]) -> "OperationChain":
+        """Append more clips; filters apply to the joined stream"""
+        if self.frame_rate is not None:
+            raise ValueError("concat() is not supported on frame-sequence chains")
+        self.inputs.extend(others)
+        return self
+
+    def codec(self, codec: str = "libx264", preset: Optional[str] = "medium",
+              crf: Optional[int] = None, profile: Optional[str] = None,
+              threads: Optional[int] = None, audio_codec: str = "aac") -> "OperationChain":
+        """Output encoder; a profile picks the fastest measured encoder instead.
+
+        A bare codec matching the source still allows a stream copy; crf or a
+        profile always re-encodes.
+        """
+        self.encoder = {"codec": codec, "preset": preset, "crf": crf,
+                        "profile": profile, "threads": threads}
+        self.audio_codec = audio_codec
+        return self
+
+    def describe(self) -> Dict:
+        """Path-independent description of the recorded operations"""
+        return {"frame_rate": self.frame_rate, "filters": self.filters,
+                "encoder": self.encoder, "audio": self.audio_codec, "inputs": len(self.inputs)}
+
+    def _active_filters(self, probes: List[Dict]) -> List[Tuple[str, object]]:
+        """Recorded filters minus those that would not change the stream"""
+        rates = {p["fps"] for p in probes}
+        rate = rates.pop() if len(rates) == 1 else self.frame_rate
+        active = []
+        for name, value in self.filters:
+            if name == "noop":
+                continue
+            if name == "fps":
+                if rate is not None and float(value) == float(rate):
+                    continue
+                rate = value
+            active.append((name, value))
+        return active
+
+    def _can_copy(self, probes: List[Dict], filters: List) -> bool:
+        if self.frame_rate is not None or filters:
+            return False
+        if self.encoder:
+            if self.encoder["crf"] is not None or self.encoder["profile"]:
+                return False
+            target = ENCODER_CODECS.get(self.encoder["codec"], self.encoder["codec"])
+            if any(p["codec"] != target for p in probes):
+                return False
+        return len({p["signature"] for p in probes}) == 1
+
+    def _encoder_args(self) -> Tuple[List[str], List[str]]:
+        """(decode args, encode args) for the configured or default encoder"""
+        encoder = self.encoder or {"codec": "libx264", "preset": "medium", "crf": None,
+                                   "profile": None, "threads": None}
+        if encoder["profile"]:
+            settings = select_encoder(encoder["profile"], threads=encoder["threads"])
+            return input_args(settings), encoder_args(settings)
+        args = ["-c:v", encoder["codec"]]
+        if encoder["preset"]:
+            args += ["-preset", encoder["preset"]]
+        if encoder["crf"] is not None:
+            args += ["-crf", str(encoder["crf"])]
+        if encoder["threads"]:
+            args += ["-threads", str(encoder["threads"])]
+        return [], args
+
+    def _filter_chain(self, filters: List[Tuple[str, object]]) -> str:
+        return ",".join(f"{name}={value}" for name, value in filters)
+
+    def compile(self, output_path: str, list_file: Optional[str] = None) -> List[str]:
+        """ffmpeg command for the chain; list_file is used for stream-copy concat"""
+        probes = [] if self.frame_rate is not None else [_probe(path) for path in self.inputs]
+        filters = self._active_filters(probes)
+
+        if self._can_copy(probes, filters):
+            if len(self.inputs) == 1:
+                return ["ffmpeg", "-i", self.inputs[0], "-map", "0", "-c", "copy", "-y", output_path]
+            with open(list_file, "w") as f:
+                for path in self.inputs:
+                    f.write(f"file '{os.path.abspath(path)}'\n")
+            return ["ffmpeg", "-f", "concat", "-safe", "0", "-i", list_file,
+                    "-map", "0", "-c", "copy", "-y", output_path]
+
+        decode_args, codec_args = self._encoder_args()
+        cmd = ["ffmpeg"]
+        if self.frame_rate is not None:
+            cmd += ["-framerate", str(self.frame_rate), "-i", self.inputs[0]]
+        else:
+            for path in self.inputs:
+                cmd += [*decode_args, "-i", path]
+
+        audio = next((p["audio"] for p in probes if p["audio"]), None)
+        if len(self.inputs) == 1:
+            if filters:
+                cmd += ["-vf", self._filter_chain(filters)]
+            cmd += ["-map", "0:v:0"] + (["-map", "0:a?"] if probes else [])
+        else:
+            # Normalize every clip to the first one's size so concat accepts them
+            width, height = probes[0]["width"], probes[0]["height"]
+            graph, joined = [], ""
+            silent = [index for index, probe in enumerate(probes) if not probe["audio"]]
+            if audio and silent:
+                logger.info(f"Padding {len(silent)} clip(s) without audio with silence")
+            for index, probe in enumerate(probes):
+                steps = ["setsar=1"]
+                if (probe["width"], probe["height"]) != (width, height):
+                    steps.insert(0, f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                                    f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2")
+                graph.append(f"[{index}:v:0]{','.join(steps)}[v{index}]")
+                if not audio:
+                    joined += f"[v{index}]"
+                elif index in silent:
+                    layout = "mono" if str(audio["channels"]) == "1" else "stereo"
+                    graph.append(f"anullsrc=channel_layout={layout}:sample_rate={audio['sample_rate']},"
+                                 f"atrim=duration={probe['duration']:.6f}[a{index}]")
+                    joined += f"[v{index}][a{index}]"
+                else:
+                    joined += f"[v{index}][{index}:a:0]"
+            tail = f",{self._filter_chain(filters)}" if filters else ""
+            graph.append(f"{joined}concat=n={len(probes)}:v=1:a={int(bool(audio))}[vcat]"
+                         + ("[aout]" if audio else ""))
+            graph.append(f"[vcat]null{tail}[vout]")
+            cmd += ["-filter_complex", ";".join(graph), "-map", "[vout]"]
+            if audio:
+                cmd += ["-map", "[aout]"]
+
+        cmd += codec_args + ["-pix_fmt", "yuv420p"]
+        if probes and (audio or len(self.inputs) == 1):
+            cmd += ["-c:a", self.audio_codec]
+        return cmd + ["-y", output_path]
+
+    def run(self, output_path: str) -> bool:
+        """Execute the chain in one ffmpeg pass (or a remux), caching the output"""
+        from video_processor import VideoProcessor, atomic_output
+
+        cache = VideoProcessor.cache
+        key = None
+        try:
+            if cache is not None:
+                source = [str(Path(self.inputs[0]).parent)] if self.frame_rate else self.inputs
+                key = cache.make_key("chain", source, suffix=Path(output_path).suffix, **self.describe())
+                if cache.get_file(key, output_path):
+                    logger.info(f"Cache hit for chain: {output_path}")
+                    return True
+
+            handle, list_file = tempfile.mkstemp(prefix="chain_", suffix=".txt")
+            os.close(handle)
+            try:
+                cmd = self.compile(output_path, list_file)
+                mode = "remux" if "copy" in cmd else "single-pass encode"
+                with atomic_output(output_path) as partial_path:
+                    run_ffmpeg(cmd[:-1] + [partial_path], "ffmpeg.chain")
+            finally:
+                os.remove(list_file)
+
+            if key:
+                cache.put_file(key, output_path)
+            logger.info(f"Chain complete ({mode}): {output_path}")
+            return True
+        except Exception as e:
+            logger.error(f"Operation chain failed: {e}")
+            return False
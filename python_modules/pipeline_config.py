@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""Shared access to pipeline.config.json for the Python modules"""
+
+import json
+from pathlib import Path
+from typing import Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_PATH = Path(__file__).resolve().parent.parent / "pipeline.config.json"
+
+
+def load_config(config_path: Optional[str] = None) -> Dict:
+    """Load pipeline configuration, returning an empty dict if unavailable"""
+    path = Path(config_path) if config_path else DEFAULT_CONFIG_PATH
+    try:
+        # The shipped config is saved with a BOM by the PowerShell tooling
+        with open(path, encoding="utf-8-sig") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"Config not found: {path}")
+    except json.JSONDecodeError as e:
+        logger.error(f"Invalid config {path}: {e}")
+    return {}
+
+
+def resolve_path(value: str, config_path: Optional[str] = None) -> Path:
+    """Resolve a config path relative to the directory holding the config file"""
+    path = Path(value)
+    if path.is_absolute():
+        return path
+    base = Path(config_path).resolve().parent if config_path else DEFAULT_CONFIG_PATH.parent
+    return base / path
@@ -0,0 +1,910 @@
+#!/usr/bin/env python3
+"""
+DAG pipeline runner for VideoProcessor and AIClient stages
+
+Each input video flows through a graph of stages. A stage starts for an
+input as soon as its upstream stages have finished for that input, and every
+stage has its own worker pool, so ffmpeg stages for one video overlap with
+provider calls for another.
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import shutil
+import hashlib
+import asyncio
+import argparse
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+from ai_client import AIClient, AsyncAIClient, AIProvider
+from job_journal import JobJournal, fingerprint
+from tracing import enable_tracing, span
+from video_processor import VideoProcessor
+from work_queue import WorkQueue
+from workspace import MB, Workspace
+
+logger = logging.getLogger(__name__)
+
+StageFunc = Callable[[Dict], Optional[Dict]]
+
+
+class StageError(Exception):
+    """Raised by a stage function to fail the current input"""
+
+
+class Stage:
+    """One node of the stage graph.
+
+    ``func`` receives the input's context dict and returns a dict of updates
+    (or None). Raising, or returning False, fails that input and skips its
+    downstream stages. ``scope="batch"`` stages run once after every input
+    has finished and receive the list of successful contexts instead.
+
+    Workers are threads: ffmpeg stages spend their time in child processes
+    and provider stages in network I/O, so neither holds the GIL.
+
+    ``fingerprint`` identifies the stage's settings for the job journal;
+    changing it invalidates recorded completions of this stage.
+
+    ``reads`` lists the context keys the stage consumes. A pipeline with a
+    workspace deletes an intermediate once no unfinished stage reads it;
+    None means the stage may read anything, which keeps every current
+    context value alive until it finishes.
+    """
+
+    def __init__(self, name: str, func: Callable, after: Optional[List[str]] = None,
+                 workers: int = 1, scope: str = "item", fingerprint: str = "",
+                 reads: Optional[List[str]] = None):
+        if scope not in ("item", "batch"):
+            raise ValueError(f"Unknown stage scope: {scope}")
+        self.name = name
+        self.func = func
+        self.after = list(after or [])
+        self.workers = max(1, workers)
+        self.scope = scope
+        self.fingerprint = fingerprint
+        self.reads = None if reads is None else list(reads)
+
+
+class Pipeline:
+    """Stage graph executed over many inputs with per-stage worker pools.
+
+    With a ``journal``, each completed (input, stage) is recorded and a rerun
+    of the same ``job`` skips stages whose inputs and outputs are unchanged.
+
+    With a ``workspace``, stage outputs written inside it are tracked as
+    intermediates and deleted as soon as no remaining stage of that input
+    reads them; the first root stage waits for the workspace's disk budget
+    before starting each input. A failed input keeps its intermediates so a
+    rerun can resume from them.
+    """
+
+    def __init__(self, stages: List[Stage], journal: Optional[JobJournal] = None,
+                 job: str = "default", workspace: Optional[Workspace] = None):
+        self.journal = journal
+        self.job = job
+        self.workspace = workspace
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Duplicate stage names")
+        self.order = self._topological_order()
+        self.children = {name: [] for name in self.stages}
+        for stage in self.stages.values():
+            for parent in stage.after:
+                self.children[parent].append(stage.name)
+        for stage in self.stages.values():
+            if stage.scope == "item" and any(
+                    self.stages[parent].scope == "batch" for parent in stage.after):
+                raise ValueError(f"Item stage {stage.name} cannot follow a batch stage")
+
+    def close(self):
+        """Release what stage functions hold between calls (provider clients)"""
+        for stage in self.stages.values():
+            close = getattr(stage.func, "close", None)
+            if callable(close):
+                close()
+
+    def _topological_order(self) -> List[str]:
+        """Stage names in dependency order; rejects unknown deps and cycles"""
+        order, visiting, visited = [], set(), set()
+
+        def visit(name: str):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle in stage graph at: {name}")
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage dependency: {name}")
+            visiting.add(name)
+            for parent in self.stages[name].after:
+                visit(parent)
+            visiting.discard(name)
+            visited.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _input_hash(self, context: Dict, stage: Stage) -> str:
+        """Identity of a stage's inputs: settings, source state and parent outputs"""
+        payload = [
+            stage.name,
+            stage.fingerprint,
+            fingerprint(context["source"]) if context.get("source") else None,
+            [context["output_hashes"].get(parent) for parent in stage.after]
+        ]
+        return hashlib.sha256(json.dumps(payload).encode()).hexdigest()
+
+    def _readers(self, context: Dict, stages: List[Stage]) -> set:
+        """Current context values that any of ``stages`` may still read"""
+        values = set()
+        for stage in stages:
+            keys = context.keys() if stage.reads is None else stage.reads
+            values.update(context.get(key) for key in keys if isinstance(context.get(key), str))
+        return values
+
+    def run(self, inputs: List[Dict]) -> List[Dict]:
+        """Run every input through the graph; returns one context per input"""
+        contexts = [dict(item, status="running", timings={}, output_hashes={}) for item in inputs]
+        item_stages = [name for name in self.order if self.stages[name].scope == "item"]
+        pending = {
+            (index, name): set(self.stages[name].after)
+            for index in range(len(contexts)) for name in item_stages
+        }
+        outstanding = [len(pending)]
+        lock = threading.Lock()
+        finished = threading.Event()
+        executors = {
+            name: ThreadPoolExecutor(self.stages[name].workers, thread_name_prefix=f"stage-{name}")
+            for name in item_stages
+        }
+        # Workspace bookkeeping: stages not yet done, values pinned by running
+        # stages and intermediates (path -> producing stage) per input
+        unfinished = [set(item_stages) for _ in contexts]
+        pinned: List[Dict[str, set]] = [{} for _ in contexts]
+        held: List[Dict[str, str]] = [{} for _ in contexts]
+        admitted = [False] * len(contexts)
+        # Paths restored from the journal, per input: path -> skipped stage, and
+        # per skipped stage the (inputs it read, outputs it recorded)
+        producers: List[Dict[str, str]] = [{} for _ in contexts]
+        skipped_io: List[Dict[str, tuple]] = [{} for _ in contexts]
+        gate = next((name for name in item_stages if not self.stages[name].after), None)
+        batch_stages = [s for s in self.stages.values() if s.scope == "batch"]
+
+        def sweep(index: int) -> List[tuple]:
+            """Intermediates of one input that nothing can read any more (call under lock)"""
+            context = contexts[index]
+            if not held[index] or context["status"] == "failed":
+                return []
+            readers = [self.stages[name] for name in unfinished[index]] + batch_stages
+            values = self._readers(context, readers).union(*pinned[index].values())
+            if not unfinished[index]:
+                # Values still in the context at the end are the input's results
+                values.update(v for v in context.values() if isinstance(v, str))
+            live = {os.path.abspath(value) for value in values}
+            done = [(path, stage) for path, stage in held[index].items() if path not in live]
+            for path, _ in done:
+                del held[index][path]
+            return done
+
+        def discard(index: int, released: List[tuple]):
+            for path, stage in released:
+                if self.workspace.discard(path) and self.journal:
+                    self.journal.release(self.job, contexts[index]["name"], stage)
+
+        def resolve(index: int, name: str):
+            """Mark one (input, stage) task finished and release its children"""
+            ready = []
+            released, kept, closing = [], None, False
+            with lock:
+                unfinished[index].discard(name)
+                pinned[index].pop(name, None)
+                if self.workspace:
+                    released = sweep(index)
+                    if not unfinished[index]:
+                        # Whatever is still held is a final output (or kept for a rerun)
+                        kept, held[index] = list(held[index]), {}
+                        closing = admitted[index]
+                for child in self.children[name]:
+                    waiting = pending.get((index, child))
+                    if waiting is None:
+                        continue
+                    waiting.discard(name)
+                    if not waiting:
+                        ready.append(child)
+            if self.workspace:
+                discard(index, released)
+                if kept is not None:
+                    for path in kept:
+                        self.workspace.untrack(path)
+                    if closing:
+                        self.workspace.release()
+            with lock:
+                outstanding[0] -= 1
+                if outstanding[0] == 0:
+                    finished.set()
+            for child in ready:
+                schedule(index, child)
+
+        def keep(index: int, name: str, updates: Optional[Dict]):
+            """Track a stage's new outputs in the workspace"""
+            for value in (updates or {}).values():
+                if self.workspace.owns(value):
+                    self.workspace.track(value)
+                    with lock:
+                        held[index][os.path.abspath(value)] = name
+
+        def restore(index: int, stage: Stage, view: Dict, visited: set):
+            """Re-run skipped producers whose released outputs ``stage`` is about to read.
+
+            The journal keeps a skipped stage's recorded outputs even after the
+            workspace deleted them; a consumer that has to run again needs the
+            files back. Each producer runs on the inputs it was skipped with
+            (a later stage may have overwritten those keys since). Same inputs
+            and settings give an equivalent output, so the producer's recorded
+            hash (and its journal row) stay as they are.
+            """
+            context = contexts[index]
+            keys = list(view) if stage.reads is None else stage.reads
+            for key in keys:
+                value = view.get(key)
+                if not isinstance(value, str):
+                    continue
+                producer = producers[index].get(os.path.abspath(value))
+                if producer is None or producer in visited:
+                    continue
+                if not self.workspace.contains(value) or os.path.exists(value):
+                    continue
+                visited.add(producer)
+                parent = self.stages[producer]
+                inputs, outputs = skipped_io[index][producer]
+                parent_view = dict(context, **inputs)
+                restore(index, parent, parent_view, visited)
+                if isinstance(parent.func, _ProviderStage):
+                    logger.warning(f"[{context['name']}] re-running provider stage {producer} "
+                                   f"(new API calls): {stage.name} reads its released {key}")
+                else:
+                    logger.info(f"[{context['name']}] re-running {producer}: "
+                                f"{stage.name} reads its released {key}")
+                with span(f"stage.{producer}", "stage", input=context.get("name", index), restored=True):
+                    updates = parent.func(parent_view)
+                if updates is False:
+                    raise StageError(f"Stage {producer} reported failure")
+                with lock:
+                    for name, new in (updates or {}).items():
+                        # Follow a moved output only where the context still holds the old one
+                        if name in outputs and context.get(name) == outputs[name]:
+                            context[name] = new
+                        if name in view and view.get(name) == outputs.get(name):
+                            view[name] = new
+                    for path in [p for p, owner in producers[index].items() if owner == producer]:
+                        del producers[index][path]
+                keep(index, producer, updates)
+
+        def schedule(index: int, name: str):
+            context = contexts[index]
+            if context["status"] == "failed":
+                resolve(index, name)
+                return
+            executors[name].submit(execute, index, name)
+
+        def execute(index: int, name: str):
+            context = contexts[index]
+            stage = self.stages[name]
+            if self.workspace and name == gate:
+                # Backpressure: hold new inputs while the disk budget is spent
+                self.workspace.admit()
+                admitted[index] = True
+            started = time.perf_counter()
+            skipped = False
+            try:
+                if self.workspace:
+                    with lock:
+                        pinned[index][name] = self._readers(context, [stage])
+                input_hash = None
+                if self.journal:
+                    input_hash = self._input_hash(context, stage)
+                    recorded = self.journal.lookup(self.job, context["name"], name, input_hash)
+                    if recorded is not None:
+                        outputs, output_hash = recorded
+                        with lock:
+                            reads = list(context) if stage.reads is None else stage.reads
+                            skipped_io[index][name] = ({key: context.get(key) for key in reads}, outputs)
+                            context.update(outputs)
+                            context["output_hashes"][name] = output_hash
+                            producers[index].update({
+                                os.path.abspath(value): name
+                                for value in outputs.values() if isinstance(value, str)
+                            })
+                        logger.info(f"[{context['name']}] {name} already complete, skipping")
+                        skipped = True
+                        return
+
+                if self.workspace and producers[index]:
+                    restore(index, stage, context, {name})
+                with span(f"stage.{name}", "stage", input=context.get("name", index)):
+                    updates = stage.func(context)
+                if updates is False:
+                    raise StageError(f"Stage {name} reported failure")
+                with lock:
+                    context.update(updates or {})
+                    for value in (updates or {}).values():
+                        if isinstance(value, str):
+                            producers[index].pop(os.path.abspath(value), None)
+                if self.workspace:
+                    keep(index, name, updates)
+                if self.journal:
+                    output_hash = self.journal.record(self.job, context["name"], name, input_hash, updates)
+                    context["output_hashes"][name] = output_hash
+            except Exception as e:
+                logger.error(f"[{context.get('name', index)}] {name} failed: {e}")
+                with lock:
+                    context["status"] = "failed"
+                    context.setdefault("failed_stage", name)
+                    context.setdefault("error", str(e))
+            finally:
+                # Exactly once per task, whether it ran, failed or was skipped
+                if not skipped:
+                    context["timings"][name] = time.perf_counter() - started
+                resolve(index, name)
+
+        started = time.perf_counter()
+        try:
+            if outstanding[0]:
+                for index in range(len(contexts)):
+                    for name in item_stages:
+                        if not self.stages[name].after:
+                            schedule(index, name)
+                finished.wait()
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+
+        for context in contexts:
+            if context["status"] == "running":
+                context["status"] = "completed"
+
+        for name in self.order:
+            stage = self.stages[name]
+            if stage.scope != "batch":
+                continue
+            completed = [c for c in contexts if c["status"] == "completed"]
+            try:
+                with span(f"stage.{name}", "stage", inputs=len(completed)):
+                    result = stage.func(completed)
+                if result is False:
+                    raise StageError(f"Stage {name} reported failure")
+            except Exception as e:
+                logger.error(f"Batch stage {name} failed: {e}")
+                for context in completed:
+                    context["status"] = "failed"
+                    context.setdefault("failed_stage", name)
+                    context.setdefault("error", str(e))
+
+        done = sum(1 for c in contexts if c["status"] == "completed")
+        logger.info(f"Pipeline finished: {done}/{len(contexts)} inputs in {time.perf_counter() - started:.1f}s")
+        return contexts
+
+
+# --- Built-in stages for JSON pipeline specs -------------------------------
+
+def _output_path(context: Dict, stage: str, suffix: str = ".mp4") -> str:
+    return os.path.join(context["work_dir"], f"{stage}{suffix}")
+
+
+def _require(ok: bool, message: str):
+    if not ok:
+        raise StageError(message)
+
+
+def _extract_stage(name: str, params: Dict, spec: Dict) -> StageFunc:
+    processing = spec.get("processing", {})
+    fps = params.get("fps", processing.get("frame_extraction_fps", 24))
+    options = {
+        "sampling": params.get("sampling", processing.get("frame_sampling", "fixed")),
+        "threshold": params.get("threshold", processing.get("keyframe_threshold", 10)),
+        "max_run": params.get("max_run", processing.get("keyframe_max_run")),
+        "threads": _stage_threads(params, spec)
+    }
+
+    def run(context: Dict) -> Dict:
+        frames_dir = os.path.join(context["work_dir"], name)
+        _require(VideoProcessor.extract_frames(context["video"], frames_dir, fps=fps, **options),
+                 "frame extraction failed")
+        return {"frames_dir": frames_dir, "frames_fps": fps}
+    return run
+
+
+def _cores(spec: Dict) -> int:
+    """Cores the run may use: processing.cores, else the whole machine"""
+    return spec.get("processing", {}).get("cores") or os.cpu_count() or 1
+
+
+def _stage_threads(params: Dict, spec: Dict) -> int:
+    """ffmpeg threads per task: the run's cores split across the stage's concurrent workers"""
+    return max(1, _cores(spec) // params.get("workers", 1))
+
+
+def _encoder_options(params: Dict, spec: Dict) -> Dict:
+    """Encoder profile for a stage, with the run's cores split across its concurrent workers"""
+    options = {"threads": _stage_threads(params, spec)}
+    profile = params.get("profile", spec.get("video_defaults", {}).get("profile"))
+    if profile is not None:
+        options["profile"] = profile
+    return options
+
+
+def _segment_options(params: Dict) -> Dict:
+    """Split-encode-merge for convert and upscale; segments go to the work queue when one is enabled"""
+    return {"parallel": True, "segments": params["segments"]} if params.get("segments") else {}
+
+
+def _incremental_options(params: Dict) -> Dict:
+    """Segment-level reuse across reruns (see incremental.py); stitch and convert only"""
+    return {"incremental": True} if params.get("incremental") else {}
+
+
+def _stitch_stage(name: str, params: Dict, spec: Dict) -> StageFunc:
+    encoder = dict(_encoder_options(params, spec), **_incremental_options(params))
+
+    def run(context: Dict) -> Dict:
+        output = _output_path(context, name)
+        fps = params.get("fps", context.get("frames_fps", 24))
+        _require(VideoProcessor.stitch_frames(context["frames_dir"], output, fps=fps, **encoder),
+                 "frame stitching failed")
+        return {"video": output}
+    return run
+
+
+def _convert_stage(name: str, params: Dict, spec: Dict) -> StageFunc:
+    defaults = spec.get("video_defaults", {})
+    options = {
+        "fps": params.get("fps", defaults.get("fps", 24)),
+        "codec": params.get("codec", defaults.get("codec", "libx264")),
+        "preset": params.get("preset", defaults.get("preset", "medium")),
+        **_encoder_options(params, spec),
+        **_segment_options(params),
+        **_incremental_options(params)
+    }
+
+    def run(context: Dict) -> Dict:
+        output = _output_path(context, name)
+        _require(VideoProcessor.convert_video(context["video"], output, **options),
+                 "conversion failed")
+        return {"video": output}
+    return run
+
+
+def _upscale_stage(name: str, params: Dict, spec: Dict) -> StageFunc:
+    factor = params.get("scale_factor", spec.get("quality", {}).get("upscaling_factor", 2))
+    encoder = dict(_encoder_options(params, spec), **_segment_options(params))
+
+    def run(context: Dict) -> Dict:
+        output = _output_path(context, name)
+        _require(VideoProcessor.upscale_video(context["video"], output, scale_factor=factor, **encoder),
+                 "upscale failed")
+        return {"video": output}
+    return run
+
+
+def _proxy_stage(name: str, params: Dict, spec: Dict) -> StageFunc:
+    height = params.get("height", 360)
+    every = params.get("every", 1)
+    threads = max(1, _cores(spec) // params.get("workers", 1))
+
+    def run(context: Dict) -> Dict:
+        output = _output_path(context, name)
+        _require(VideoProcessor.make_proxy(context["video"], output, height=height, every=every, threads=threads),
+                 "proxy render failed")
+        return {"video": output}
+    return run
+
+
+def _pick_provider(params: Dict, spec: Dict) -> str:
+    """Explicit provider, else the highest-priority enabled one in the spec"""
+    if params.get("provider"):
+        return params["provider"]
+    providers = [
+        (settings.get("priority", 99), name)
+        for name, settings in spec.get("ai_providers", {}).items()
+        if settings.get("enabled")
+    ]
+    return min(providers)[1] if providers else "grok"
+
+
+class _ProviderStage:
+    """Provider calls sharing one warm async client across the stage's workers.
+
+    A private event loop thread owns the AsyncAIClient so worker threads can
+    submit calls concurrently without each opening their own connections.
+
+    Per frame, each provider result (a file, or a URL fetched over the
+    client's session) becomes the same-named frame in <work_dir>/<stage>,
+    which replaces ``frames_dir`` for the stages after it. A scene-sampled
+    folder's keyframes.json goes along so stitching keeps the timing.
+    """
+
+    def __init__(self, name: str, provider: str, prompt: str, concurrency: int, per_frame: bool):
+        self.name = name
+        self.prompt = prompt
+        self.per_frame = per_frame
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.client = AsyncAIClient(AIProvider(provider), max_concurrency=concurrency)
+
+    def _submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def close(self):
+        """Close the client's session and executor and stop the loop thread"""
+        if self.loop.is_closed():
+            return
+        self._submit(self.client.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def __call__(self, context: Dict) -> Dict:
+        if not self.per_frame:
+            result = self._submit(self.client.process_video(context["video"], self.prompt))
+            _require(result is not None, "provider call failed")
+            return {"ai_result": result}
+
+        frames = sorted(str(p) for p in Path(context["frames_dir"]).glob("*.png"))
+        results = self._submit(self.client.process_batch([(f, self.prompt) for f in frames]))
+        failed = sum(1 for r in results if r is None)
+        _require(not failed, f"provider call failed on {failed}/{len(frames)} frames")
+
+        frames_dir = os.path.join(context["work_dir"], self.name)
+        Path(frames_dir).mkdir(parents=True, exist_ok=True)
+        jobs = [(result, os.path.join(frames_dir, os.path.basename(frame))) for frame, result in zip(frames, results)]
+        with ThreadPoolExecutor(max_workers=self.client.max_concurrency) as pool:
+            list(pool.map(self._save_frame, jobs))
+        # keyframes pulls in numpy; only needed once the frames are saved
+        from keyframes import find_timeline
+        timeline = find_timeline(context["frames_dir"])
+        if timeline:
+            shutil.copyfile(timeline, os.path.join(frames_dir, os.path.basename(timeline)))
+        return {"frames_dir": frames_dir, "ai_results": results}
+
+    def _save_frame(self, job: Tuple[str, str]):
+        result, path = job
+        if os.path.isfile(result):
+            shutil.copyfile(result, path)
+        elif result.startswith(("http://", "https://")):
+            response = self.client.client.session.get(result, timeout=300)
+            response.raise_for_status()
+            with open(path, "wb") as f:
+                f.write(response.content)
+        else:
+            raise StageError(f"provider returned no image for {os.path.basename(path)}")
+
+
+def _provider_stage(per_frame: bool):
+    def build(name: str, params: Dict, spec: Dict) -> StageFunc:
+        provider = _pick_provider(params, spec)
+        settings = spec.get("ai_providers", {}).get(provider, {})
+        concurrency = params.get(
+            "concurrency",
+            spec.get("api_defaults", {}).get("max_concurrent_requests", settings.get("batch_size", 4))
+        )
+        prompt = params.get("prompt", spec.get("prompt", "Enhance and upscale this video"))
+        return _ProviderStage(name, provider, prompt, concurrency, per_frame)
+    return build
+
+
+def _concat_stage(name: str, params: Dict, spec: Dict) -> Callable[[List[Dict]], bool]:
+    output = params.get("output", os.path.join(spec.get("paths", {}).get("output", "output"), "combined.mp4"))
+
+    def run(contexts: List[Dict]) -> bool:
+        videos = [c["video"] for c in sorted(contexts, key=lambda c: c["name"])]
+        return bool(videos) and VideoProcessor.concat_videos(videos, output)
+    return run
+
+
+# Stage type name -> (builder, default scope, context keys it reads)
+STAGE_TYPES = {
+    "extract_frames": (_extract_stage, "item", ["video"]),
+    "stitch_frames": (_stitch_stage, "item", ["frames_dir"]),
+    "convert_video": (_convert_stage, "item", ["video"]),
+    "upscale_video": (_upscale_stage, "item", ["video"]),
+    "make_proxy": (_proxy_stage, "item", ["video"]),
+    "ai_process": (_provider_stage(per_frame=False), "item", ["video"]),
+    "ai_frames": (_provider_stage(per_frame=True), "item", ["frames_dir"]),
+    "concat_videos": (_concat_stage, "batch", ["video"])
+}
+
+
+def default_stages(spec: Dict) -> List[Dict]:
+    """Extract -> AI -> stitch -> convert, the chain the PowerShell scripts run"""
+    return [
+        {"name": "extract", "type": "extract_frames"},
+        {"name": "ai", "type": "ai_frames", "after": ["extract"]},
+        {"name": "stitch", "type": "stitch_frames", "after": ["ai"]},
+        {"name": "convert", "type": "convert_video", "after": ["stitch"]}
+    ]
+
+
+def build_stage(entry: Dict, spec: Dict) -> Stage:
+    """Build one Stage from an entry of a JSON spec's ``stages`` list"""
+    if entry["type"] not in STAGE_TYPES:
+        raise ValueError(f"Unknown stage type: {entry['type']}")
+    ffmpeg_workers = spec.get("processing", {}).get("parallel_threads") or max(1, _cores(spec) // 2)
+    builder, scope, reads = STAGE_TYPES[entry["type"]]
+    params = entry.get("params", {})
+    # Encoding stages split the machine's cores between their workers
+    func = builder(entry["name"], dict(params, workers=entry.get("workers", ffmpeg_workers)), spec)
+    if isinstance(func, _ProviderStage):
+        workers = entry.get("workers", func.client.max_concurrency)
+    else:
+        workers = entry.get("workers", ffmpeg_workers)
+    return Stage(
+        entry["name"], func, entry.get("after"), workers, entry.get("scope", scope),
+        fingerprint=_stage_fingerprint(entry), reads=entry.get("reads", reads)
+    )
+
+
+def _stage_fingerprint(entry: Dict) -> str:
+    return json.dumps({"type": entry["type"], "params": entry.get("params", {})}, sort_keys=True)
+
+
+def _task_context(context: Dict) -> Dict:
+    """The part of an input's context a remote worker needs"""
+    return {key: value for key, value in context.items()
+            if key not in ("status", "timings", "output_hashes")}
+
+
+def _remote_stage(entry: Dict, spec: Dict, queue: WorkQueue, job: str) -> Stage:
+    """A stage whose every run is a task on the shared work queue.
+
+    The pipeline thread only waits for the result, so the stage's workers
+    bound how many tasks it keeps in flight across the cluster.
+    """
+    if entry["type"] not in STAGE_TYPES:
+        raise ValueError(f"Unknown stage type: {entry['type']}")
+    _, scope, reads = STAGE_TYPES[entry["type"]]
+    settings = spec.get("distributed", {})
+
+    def run(context: Dict) -> Dict:
+        payload = {"spec": spec, "stage": entry, "context": _task_context(context)}
+        return queue.run_tasks("stage", [payload], job, timeout=settings.get("task_timeout"))[0]
+
+    return Stage(
+        entry["name"], run, entry.get("after"), entry.get("workers", settings.get("max_in_flight", 8)),
+        scope, fingerprint=_stage_fingerprint(entry), reads=entry.get("reads", reads)
+    )
+
+
+def build_pipeline(spec: Dict, journal: Optional[JobJournal] = None,
+                   workspace: Optional[Workspace] = None,
+                   queue: Optional[WorkQueue] = None) -> Pipeline:
+    """Build a Pipeline from the ``stages`` list of a JSON spec.
+
+    With a ``queue``, item stages run as tasks on queue workers. Stages with
+    a ``segments`` param stay here and send their segments to the queue
+    instead; batch stages (concat) and publishing always run here.
+    """
+    job = spec.get("pipeline", {}).get("name", "default")
+    stages = []
+    for entry in spec.get("stages") or default_stages(spec):
+        scope = entry.get("scope", STAGE_TYPES.get(entry["type"], (None, None))[1])
+        if queue is not None and scope == "item" and not entry.get("params", {}).get("segments"):
+            stages.append(_remote_stage(entry, spec, queue, job))
+        else:
+            stages.append(build_stage(entry, spec))
+
+    # Publish each input's final video once all of its item stages are done
+    leaves = [s.name for s in stages if s.scope == "item" and not any(
+        s.name in other.after for other in stages if other.scope == "item")]
+    output_dir = spec.get("paths", {}).get("output", "output")
+    stages.append(Stage("publish", _publisher(output_dir), leaves, workers=2,
+                        fingerprint=output_dir, reads=["video"]))
+    return Pipeline(stages, journal=journal, job=job, workspace=workspace)
+
+
+def _publisher(output_dir: str) -> StageFunc:
+    def run(context: Dict) -> Optional[Dict]:
+        if context["video"] == context["source"]:
+            return None
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        target = Path(output_dir) / f"{context['name']}_processed{Path(context['video']).suffix}"
+        # Keep the stage output in place so the journal still sees it on rerun
+        partial = target.with_name(f".{target.name}.partial")
+        try:
+            os.link(context["video"], partial)
+        except OSError:
+            shutil.copy2(context["video"], partial)
+        os.replace(partial, target)
+        return {"video": str(target), "output": str(target)}
+    return run
+
+
+def collect_inputs(spec: Dict, input_folder: Optional[str] = None,
+                   pattern: Optional[str] = None,
+                   workspace: Optional[Workspace] = None) -> List[Dict]:
+    """Initial contexts for every matching video in the input folder.
+
+    Each input's work_dir lives in the job's workspace
+    (paths.temp/pipeline/<job>/<input>).
+    """
+    paths = spec.get("paths", {})
+    folder = Path(input_folder or spec.get("inputs", {}).get("folder", paths.get("input", "input")))
+    pattern = pattern or spec.get("inputs", {}).get("pattern", "*.mp4")
+    workspace = workspace or Workspace.from_spec(spec)
+    return [
+        {
+            "name": video.stem,
+            "source": str(video),
+            "video": str(video),
+            "work_dir": workspace.input_dir(video.stem)
+        }
+        for video in sorted(folder.glob(pattern))
+    ]
+
+
+# Preview settings used where the spec's "preview" section is silent
+PREVIEW_DEFAULTS = {"height": 360, "every": 4}
+
+
+def preview_spec(spec: Dict) -> Dict:
+    """The same stage graph tuned to finish in seconds.
+
+    Every input first becomes a proxy (``preview.height`` lines, every
+    ``preview.every``-th frame); frame rates downstream drop by the same
+    factor so durations match, encoders switch to their fastest settings and
+    outputs go to paths.output/preview. The preview gets its own journal job
+    and workspace, and always runs on this machine.
+    """
+    settings = dict(PREVIEW_DEFAULTS, **spec.get("preview", {}))
+    every = max(1, int(settings["every"]))
+    preview = copy.deepcopy(spec)
+    preview.pop("distributed", None)
+    name = spec.get("pipeline", {}).get("name", "default")
+    preview.setdefault("pipeline", {})["name"] = f"{name} preview"
+    output_dir = os.path.join(spec.get("paths", {}).get("output", "output"), "preview")
+    preview.setdefault("paths", {})["output"] = output_dir
+
+    processing = spec.get("processing", {})
+    fps = spec.get("video_defaults", {}).get("fps", 24)
+    stages = copy.deepcopy(spec.get("stages") or default_stages(spec))
+    proxy = "preview_proxy"
+    for entry in stages:
+        params = entry.setdefault("params", {})
+        kind = entry["type"]
+        params.pop("segments", None)
+        if kind == "extract_frames":
+            params["fps"] = params.get("fps", processing.get("frame_extraction_fps", 24)) / every
+        elif kind == "convert_video":
+            params.update(fps=params.get("fps", fps) / every, preset="ultrafast", profile=None)
+        elif kind in ("stitch_frames", "upscale_video"):
+            params["profile"] = "speed"
+            if "fps" in params:
+                params["fps"] = params["fps"] / every
+        elif kind == "concat_videos" and "output" in params:
+            params["output"] = os.path.join(output_dir, os.path.basename(params["output"]))
+        scope = entry.get("scope", STAGE_TYPES.get(kind, (None, None))[1])
+        if scope == "item" and not entry.get("after"):
+            entry["after"] = [proxy]
+    entry = {"name": proxy, "type": "make_proxy",
+             "params": {"height": settings["height"], "every": every}}
+    preview["stages"] = [entry] + stages
+    return preview
+
+
+def run_spec(spec_path: str, input_folder: Optional[str] = None,
+             pattern: Optional[str] = None, resume: bool = True,
+             queue_path: Optional[str] = None, cores: Optional[int] = None) -> List[Dict]:
+    """Load a JSON spec, build its pipeline and run it over the input folder.
+
+    Progress is journaled under paths.temp; with ``resume`` a rerun skips
+    stages that already completed, otherwise the job starts fresh. Provider
+    requests go through the cache.dedup index when it is enabled.
+    Intermediates are deleted as soon as their consumers finish and new
+    inputs wait while processing.temp_budget_mb of scratch space is in use.
+    With ``queue_path`` (or distributed.enabled in the spec) stages and
+    segment encodes are dispatched to work_queue workers. ``cores`` caps
+    processing.cores, the cores the run's stages split between them.
+    """
+    with open(spec_path, encoding="utf-8-sig") as f:
+        spec = json.load(f)
+    return execute_spec(spec, input_folder, pattern, resume, queue_path, cores)
+
+
+def execute_spec(spec: Dict, input_folder: Optional[str] = None,
+                 pattern: Optional[str] = None, resume: bool = True,
+                 queue_path: Optional[str] = None, cores: Optional[int] = None) -> List[Dict]:
+    """run_spec for an already loaded spec"""
+    if cores:
+        processing = spec.get("processing", {})
+        spec = dict(spec, processing=dict(processing, cores=min(cores, processing.get("cores") or cores)))
+    journal = JobJournal(os.path.join(spec.get("paths", {}).get("temp", "temp"), "job_journal.db"))
+    AIClient.enable_dedup()
+    queue = None
+    if queue_path or spec.get("distributed", {}).get("enabled"):
+        queue = VideoProcessor.enable_work_queue(WorkQueue.from_spec(spec, queue_path))
+        logger.info(f"Dispatching stages to the work queue at {queue.db_path}")
+    workspace = Workspace.from_spec(spec)
+    pipeline = build_pipeline(spec, journal, workspace, queue)
+    try:
+        if not resume:
+            journal.reset(pipeline.job)
+        inputs = collect_inputs(spec, input_folder, pattern, workspace)
+        if not inputs:
+            logger.warning("No input videos found")
+            return []
+        logger.info(f"Running {len(pipeline.stages)} stages over {len(inputs)} inputs")
+        results = pipeline.run(inputs)
+    finally:
+        pipeline.close()
+    logger.info(f"Peak scratch space: {workspace.peak / MB:.1f} MB in {workspace.path}")
+    return results
+
+
+def run_preview(spec_path: str, input_folder: Optional[str] = None,
+                pattern: Optional[str] = None, full: bool = True, resume: bool = True,
+                queue_path: Optional[str] = None,
+                cores: Optional[int] = None) -> Tuple[List[Dict], Optional[Future]]:
+    """Render previews now, then start the full-quality run in the background.
+
+    Returns the preview results and a Future for the full run's results
+    (None with ``full=False``). Both runs come from the same spec; the full
+    run shares the result cache, encoder selection and job journal, so
+    settings probed for the preview are not measured twice and a full run
+    resumed after tweaking the spec redoes only the stages that changed.
+    """
+    with open(spec_path, encoding="utf-8-sig") as f:
+        spec = json.load(f)
+    started = time.perf_counter()
+    previews = execute_spec(preview_spec(spec), input_folder, pattern, resume, cores=cores)
+    logger.info(f"Preview ready in {time.perf_counter() - started:.1f}s")
+    if not full:
+        return previews, None
+    executor = ThreadPoolExecutor(1, thread_name_prefix="full-render")
+    future = executor.submit(execute_spec, spec, input_folder, pattern, resume, queue_path, cores)
+    executor.shutdown(wait=False)
+    return previews, future
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run a video pipeline stage graph")
+    parser.add_argument("spec", help="Pipeline JSON spec (e.g. examples/example_config.json)")
+    parser.add_argument("-i", "--input", help="Input folder (overrides spec paths.input)")
+    parser.add_argument("-p", "--pattern", help="Input glob pattern (default *.mp4)")
+    parser.add_argument("--fresh", action="store_true", help="Ignore the job journal and redo every stage")
+    parser.add_argument("--trace", help="Record spans to this JSONL file (see tracing.py report)")
+    parser.add_argument("--queue", help="Shared work queue database; stages run on work_queue.py workers")
+    parser.add_argument("--preview", action="store_true",
+                        help="Render low-res proxies first, then the full-quality output")
+    parser.add_argument("--preview-only", action="store_true", help="Render the previews and stop")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.trace:
+        enable_tracing(args.trace)
+    if args.preview or args.preview_only:
+        previews, full = run_preview(args.spec, args.input, args.pattern, full=not args.preview_only,
+                                     resume=not args.fresh, queue_path=args.queue)
+        for context in previews:
+            print(f"  preview  {context['name']}  {context.get('output') or context.get('error', '')}")
+        if full is None:
+            return 0 if previews and all(c["status"] == "completed" for c in previews) else 1
+        results = full.result()
+    else:
+        results = run_spec(args.spec, args.input, args.pattern, resume=not args.fresh, queue_path=args.queue)
+    for context in results:
+        detail = context.get("output") or context.get("error", "")
+        print(f"{context['status']:>9}  {context['name']}  {detail}")
+    return 0 if results and all(c["status"] == "completed" for c in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Per-provider rate limiting, retry backoff and throttling metrics"""
+
+import time
+import random
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+import logging
+
+from pipeline_config import load_config
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: rate limited or transient server trouble
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket; callers reserve a token and sleep off any debt"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, blocking until it is available; returns seconds waited"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class ProviderLimiter:
+    """Requests/sec and in-flight limits for one provider, with backoff policy"""
+
+    def __init__(self, name: str, requests_per_second: Optional[float] = None,
+                 max_in_flight: Optional[int] = None, burst: Optional[float] = None,
+                 max_retries: int = 5, backoff_base: float = 1.0, backoff_max: float = 60.0):
+        self.name = name
+        self.bucket = TokenBucket(requests_per_second, burst) if requests_per_second else None
+        self.in_flight = threading.BoundedSemaphore(max_in_flight) if max_in_flight else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "throttled_responses": 0,
+            "throttled_seconds": 0.0,
+            "backoff_seconds": 0.0,
+            "work_seconds": 0.0
+        }
+
+    def _record(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    @contextmanager
+    def slot(self):
+        """Wait for rate and concurrency allowance, then time the work inside"""
+        started = time.monotonic()
+        if self.bucket:
+            self.bucket.acquire()
+        if self.in_flight:
+            self.in_flight.acquire()
+        working = time.monotonic()
+        try:
+            yield
+        finally:
+            if self.in_flight:
+                self.in_flight.release()
+            self._record(
+                requests=1,
+                throttled_seconds=working - started,
+                work_seconds=time.monotonic() - working
+            )
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before retry number attempt+1: Retry-After if given, else full jitter"""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def wait_backoff(self, delay: float, throttled: bool = False):
+        """Sleep before a retry and account for it"""
+        self._record(retries=1, backoff_seconds=delay, throttled_responses=int(throttled))
+        time.sleep(delay)
+
+    def metrics(self) -> Dict:
+        """Snapshot of counters plus the share of wall time spent doing work"""
+        with self._lock:
+            snapshot = dict(self.stats)
+        waited = snapshot["throttled_seconds"] + snapshot["backoff_seconds"]
+        total = waited + snapshot["work_seconds"]
+        snapshot["utilization"] = snapshot["work_seconds"] / total if total else 1.0
+        return snapshot
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def configure_limiter(provider: str, **settings) -> ProviderLimiter:
+    """Create (or replace) the shared limiter for a provider"""
+    limiter = ProviderLimiter(provider, **settings)
+    with _limiters_lock:
+        _limiters[provider] = limiter
+    return limiter
+
+
+def get_limiter(provider: str, config_path: Optional[str] = None) -> ProviderLimiter:
+    """Shared limiter for a provider, built from providers.<name>.rate_limit"""
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+    if limiter is None:
+        provider_config = load_config(config_path).get("providers", {}).get(provider, {})
+        limiter = configure_limiter(provider, **provider_config.get("rate_limit", {}))
+    return limiter
+
+
+def get_metrics() -> Dict[str, Dict]:
+    """Metrics for every provider limiter created so far"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.metrics() for limiter in limiters}
+
+
+def log_metrics():
+    """Log throttled versus work time per provider"""
+    for name, stats in get_metrics().items():
+        logger.info(
+            f"{name}: {stats['requests']} requests, {stats['retries']} retries, "
+            f"work {stats['work_seconds']:.1f}s, throttled {stats['throttled_seconds']:.1f}s, "
+            f"backoff {stats['backoff_seconds']:.1f}s, utilization {stats['utilization']:.0%}"
+        )
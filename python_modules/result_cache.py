@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""Content-addressed on-disk cache for ffprobe metadata and ffmpeg outputs"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Tuple
+import logging
+
+from pipeline_config import load_config, resolve_path
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(path: str) -> str:
+    """sha256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Cache keyed by input content hash plus operation and arguments.
+
+    Entries live under ``<directory>/entries`` and are evicted least recently
+    used first once the total size exceeds ``max_size_mb``. Content hashes of
+    inputs are memoized by path, size and mtime so unchanged multi-GB sources
+    are only read once across runs.
+    """
+
+    def __init__(self, directory: str, max_size_mb: float = 1024,
+                 ttl_minutes: Optional[float] = None, enabled: bool = True):
+        self.directory = Path(directory)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_minutes * 60 if ttl_minutes else None
+        self.enabled = enabled
+        self.entries_dir = self.directory / "entries"
+        self.hashes_dir = self.directory / "hashes"
+        if enabled:
+            self.entries_dir.mkdir(parents=True, exist_ok=True)
+            self.hashes_dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config_path: Optional[str] = None) -> "ResultCache":
+        """Build a cache from the ``cache`` section of pipeline.config.json"""
+        settings = load_config(config_path).get("cache", {})
+        directory = resolve_path(settings.get("directory", "cache"), config_path)
+        return cls(
+            str(directory),
+            max_size_mb=settings.get("max_cache_size_mb", 1024),
+            ttl_minutes=settings.get("cache_ttl_minutes"),
+            enabled=settings.get("enabled", False)
+        )
+
+    def content_hash(self, path: str) -> str:
+        """Hash file contents (or a directory tree) with on-disk memoization"""
+        target = Path(path)
+        if target.is_dir():
+            digest = hashlib.sha256()
+            for child in sorted(p for p in target.rglob("*") if p.is_file()):
+                digest.update(str(child.relative_to(target)).encode())
+                digest.update(self.content_hash(str(child)).encode())
+            return digest.hexdigest()
+
+        stat = target.stat()
+        fingerprint = f"{target.resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+        memo = self.hashes_dir / hashlib.sha256(fingerprint.encode()).hexdigest()
+        try:
+            return memo.read_text().strip()
+        except OSError:
+            pass
+
+        value = file_hash(str(target))
+        self._write_atomic(memo, value.encode())
+        return value
+
+    def make_key(self, operation: str, inputs: Iterable[str], **params) -> str:
+        """Build a cache key from input content, operation name and arguments"""
+        payload = {
+            "operation": operation,
+            "inputs": [self.content_hash(path) for path in inputs],
+            "params": params
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _entry_path(self, key: str, kind: str) -> Path:
+        return self.entries_dir / key[:2] / f"{key}.{kind}"
+
+    def _lookup(self, key: str, kind: str) -> Optional[Path]:
+        """Return a live entry path and mark it recently used"""
+        entry = self._entry_path(key, kind)
+        try:
+            if self.ttl_seconds and time.time() - entry.stat().st_mtime > self.ttl_seconds:
+                entry.unlink()
+                return None
+            os.utime(entry)
+            return entry
+        except OSError:
+            return None
+
+    def get_json(self, key: str) -> Optional[Any]:
+        """Return a cached JSON value or None"""
+        entry = self._lookup(key, "json")
+        if entry is None:
+            return None
+        try:
+            return json.loads(entry.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def put_json(self, key: str, value: Any):
+        """Store a JSON-serializable value"""
+        self._write_atomic(self._entry_path(key, "json"), json.dumps(value).encode())
+        self.evict()
+
+    def get_file(self, key: str, output_path: str) -> bool:
+        """Copy a cached output to output_path; False on miss"""
+        entry = self._lookup(key, "bin")
+        if entry is None:
+            return False
+        target = Path(output_path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(entry, temp_path)
+            os.replace(temp_path, target)
+            return True
+        except OSError as e:
+            logger.warning(f"Cache read failed for {key}: {e}")
+            Path(temp_path).unlink(missing_ok=True)
+            return False
+
+    def put_file(self, key: str, source_path: str):
+        """Store a copy of an output file"""
+        entry = self._entry_path(key, "bin")
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=entry.parent, suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(source_path, temp_path)
+            os.replace(temp_path, entry)
+        except OSError as e:
+            logger.warning(f"Cache write failed for {key}: {e}")
+            Path(temp_path).unlink(missing_ok=True)
+            return
+        self.evict()
+
+    def _write_atomic(self, path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def _entries(self) -> List[Tuple[Path, os.stat_result]]:
+        entries = []
+        for path in self.entries_dir.glob("*/*"):
+            if path.suffix == ".tmp":
+                continue
+            try:
+                entries.append((path, path.stat()))
+            except OSError:
+                continue
+        return entries
+
+    def size_bytes(self) -> int:
+        """Total size of stored entries"""
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def evict(self) -> int:
+        """Drop least recently used entries until under the size limit"""
+        entries = sorted(self._entries(), key=lambda item: item[1].st_mtime)
+        total = sum(stat.st_size for _, stat in entries)
+        removed = 0
+        for path, stat in entries:
+            if total <= self.max_size_bytes:
+                break
+            try:
+                path.unlink()
+                total -= stat.st_size
+                removed += 1
+            except OSError:
+                continue
+        if removed:
+            logger.info(f"Cache evicted {removed} entries")
+        return removed
+
+    def clear(self):
+        """Remove every cached entry and memoized hash"""
+        shutil.rmtree(self.entries_dir, ignore_errors=True)
+        shutil.rmtree(self.hashes_dir, ignore_errors=True)
+        self.entries_dir.mkdir(parents=True, exist_ok=True)
+        self.hashes_dir.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Structured tracing for pipeline stages, ffmpeg runs and provider calls
+
+Spans carry durations plus whatever the instrumented call knows: bytes in
+and out, frames, ffmpeg's live fps/speed from ``-progress`` and the child
+process's CPU time and peak RSS. Tracing is off unless enable_tracing() is
+called or PIPELINE_TRACE names a JSONL file; spans are appended to that
+file as they finish and can be exported to Chrome's trace format.
+
+    python tracing.py report trace.jsonl
+    python tracing.py chrome trace.jsonl trace.json
+"""
+
+import os
+import sys
+import json
+import time
+import itertools
+import threading
+import subprocess
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRACE_ENV = "PIPELINE_TRACE"
+
+_ids = itertools.count(1)
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation"""
+
+    __slots__ = ("name", "category", "span_id", "parent_id", "pid", "tid",
+                 "start", "duration", "attrs", "_started")
+
+    def __init__(self, name: str, category: str, attrs: Dict):
+        parent = _current.get()
+        self.name = name
+        self.category = category
+        self.span_id = f"{os.getpid()}-{next(_ids)}"
+        self.parent_id = parent.span_id if parent else None
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+        self.start = time.time()
+        self.duration = 0.0
+        self.attrs = dict(attrs)
+        self._started = time.perf_counter()
+
+    def set(self, **attrs):
+        """Attach or update attributes"""
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "category": self.category,
+            "id": self.span_id,
+            "parent": self.parent_id,
+            "pid": self.pid,
+            "tid": self.tid,
+            "start": self.start,
+            "duration": self.duration,
+            "attrs": self.attrs,
+        }
+
+
+class _NullSpan:
+    """Stand-in yielded while tracing is disabled"""
+
+    def set(self, **attrs):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Collects finished spans in memory and appends them to a JSONL file"""
+
+    def __init__(self, path: Optional[str] = None, enabled: bool = True):
+        self.path = path
+        self.enabled = enabled
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, category: str = "general", **attrs) -> Iterator[Span]:
+        """Time the enclosed block; exceptions are recorded and re-raised"""
+        if not self.enabled:
+            yield NULL_SPAN
+            return
+        span = Span(name, category, attrs)
+        token = _current.set(span)
+        try:
+            yield span
+            span.attrs.setdefault("status", "ok")
+        except BaseException as e:
+            span.set(status="error", error=str(e) or type(e).__name__)
+            raise
+        finally:
+            span.duration = time.perf_counter() - span._started
+            _current.reset(token)
+            self._finish(span)
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+        if self.path:
+            # One O_APPEND write per line keeps lines whole across processes
+            line = (json.dumps(span.to_dict(), default=str) + "\n").encode()
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+
+_tracer = Tracer(enabled=False)
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """The process-wide tracer, enabled from PIPELINE_TRACE on first use"""
+    global _tracer
+    path = os.environ.get(TRACE_ENV)
+    if path and not _tracer.enabled:
+        with _tracer_lock:
+            if not _tracer.enabled:
+                _tracer = Tracer(path)
+    return _tracer
+
+
+def enable_tracing(path: Optional[str] = None) -> Tracer:
+    """Start recording spans; with a path, worker processes inherit it via PIPELINE_TRACE"""
+    global _tracer
+    with _tracer_lock:
+        if path:
+            os.environ[TRACE_ENV] = os.path.abspath(path)
+            path = os.environ[TRACE_ENV]
+        _tracer = Tracer(path)
+    return _tracer
+
+
+def disable_tracing():
+    """Stop recording spans"""
+    global _tracer
+    with _tracer_lock:
+        os.environ.pop(TRACE_ENV, None)
+        _tracer = Tracer(enabled=False)
+
+
+def span(name: str, category: str = "general", **attrs):
+    """Context manager recording a span on the process-wide tracer"""
+    return get_tracer().span(name, category, **attrs)
+
+
+def request_bytes(prepared) -> Optional[int]:
+    """Size of a prepared requests body, if it is known up front"""
+    body = getattr(prepared, "body", None)
+    if body is None:
+        return 0
+    try:
+        return len(body)
+    except TypeError:
+        return None
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _input_bytes(cmd: List[str]) -> int:
+    """Total size of the files named by -i arguments"""
+    return sum(_file_size(cmd[i + 1]) for i, arg in enumerate(cmd[:-1]) if arg == "-i")
+
+
+def _parse_progress(block: Dict[str, str]) -> Dict:
+    """Span attributes from one -progress key=value block"""
+    attrs = {}
+    if block.get("frame", "").isdigit():
+        attrs["frames"] = int(block["frame"])
+    try:
+        attrs["fps"] = float(block["fps"])
+    except (KeyError, ValueError):
+        pass
+    speed = block.get("speed", "").rstrip("x")
+    try:
+        attrs["speed"] = float(speed)
+    except ValueError:
+        pass
+    if block.get("total_size", "").isdigit():
+        attrs["bytes_out"] = int(block["total_size"])
+    return attrs
+
+
+def run_ffmpeg(cmd: List[str], name: str,
+               progress: Optional[Callable[[Dict], None]] = None) -> subprocess.CompletedProcess:
+    """Run an ffmpeg command, raising CalledProcessError on failure.
+
+    With tracing enabled the run is recorded as a span: ``-progress pipe:1``
+    feeds live frames/fps/speed into it (and to ``progress``), and the
+    child's CPU time and peak RSS are collected with os.wait4 where
+    available.
+    """
+    tracer = get_tracer()
+    if not tracer.enabled:
+        return subprocess.run(cmd, check=True)
+
+    with tracer.span(name, "ffmpeg", command=" ".join(cmd), bytes_in=_input_bytes(cmd)) as trace:
+        traced = [cmd[0], "-progress", "pipe:1", "-nostats"] + cmd[1:]
+        proc = subprocess.Popen(traced, stdout=subprocess.PIPE, text=True)
+        block: Dict[str, str] = {}
+        for line in proc.stdout:
+            key, _, value = line.strip().partition("=")
+            if key != "progress":
+                block[key] = value
+                continue
+            update = _parse_progress(block)
+            trace.set(**update)
+            if progress:
+                progress(update)
+            logger.debug(f"{name}: frame {update.get('frames')} "
+                         f"fps {update.get('fps')} speed {update.get('speed')}x")
+            block = {}
+        proc.stdout.close()
+
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is KB on Linux and bytes on macOS
+            scale = 1 / (1024 * 1024) if sys.platform == "darwin" else 1 / 1024
+            trace.set(cpu_seconds=round(usage.ru_utime + usage.ru_stime, 3),
+                      max_rss_mb=round(usage.ru_maxrss * scale, 1))
+        else:
+            proc.wait()
+
+        trace.set(returncode=proc.returncode)
+        if cmd[-1] != "-":
+            trace.set(bytes_out=_file_size(cmd[-1]))
+        if proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+        return subprocess.CompletedProcess(cmd, proc.returncode)
+
+
+def load_spans(path: str) -> List[Dict]:
+    """Span records from a JSONL trace file"""
+    spans = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                spans.append(json.loads(line))
+    return spans
+
+
+def to_chrome_trace(spans: List[Dict]) -> Dict:
+    """Chrome/Perfetto trace-event JSON (complete "X" events in microseconds)"""
+    events = []
+    for record in spans:
+        events.append({
+            "name": record["name"],
+            "cat": record["category"],
+            "ph": "X",
+            "ts": record["start"] * 1e6,
+            "dur": record["duration"] * 1e6,
+            "pid": record["pid"],
+            "tid": record["tid"],
+            "args": record["attrs"],
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export_chrome(spans: List[Dict], path: str):
+    """Write spans as a Chrome trace file (open in chrome://tracing or Perfetto)"""
+    with open(path, "w") as f:
+        json.dump(to_chrome_trace(spans), f)
+
+
+def summarize(spans: List[Dict]) -> Dict:
+    """Per (category, name) totals plus the traced wall-clock window"""
+    groups: Dict[str, Dict] = {}
+    for record in spans:
+        key = f"{record['category']}/{record['name']}"
+        attrs = record["attrs"]
+        group = groups.setdefault(key, {
+            "count": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0,
+            "cpu_seconds": 0.0, "bytes_in": 0, "bytes_out": 0, "frames": 0, "max_rss_mb": 0.0
+        })
+        group["count"] += 1
+        group["errors"] += attrs.get("status") == "error"
+        group["seconds"] += record["duration"]
+        group["max_seconds"] = max(group["max_seconds"], record["duration"])
+        for field in ("cpu_seconds", "bytes_in", "bytes_out", "frames"):
+            group[field] += attrs.get(field) or 0
+        group["max_rss_mb"] = max(group["max_rss_mb"], attrs.get("max_rss_mb") or 0)
+
+    for group in groups.values():
+        group["fps"] = round(group["frames"] / group["seconds"], 1) if group["frames"] and group["seconds"] else None
+
+    window = 0.0
+    if spans:
+        window = max(s["start"] + s["duration"] for s in spans) - min(s["start"] for s in spans)
+    return {"wall_seconds": window, "groups": groups}
+
+
+def print_report(summary: Dict):
+    """Per-stage breakdown, largest total time first"""
+    window = summary["wall_seconds"] or 1.0
+    print(f"Traced wall time: {summary['wall_seconds']:.1f}s")
+    print(f"{'span':<36} {'count':>6} {'total s':>9} {'% wall':>7} {'max s':>8} "
+          f"{'cpu s':>8} {'fps':>7} {'MB in':>8} {'MB out':>8} {'errors':>6}")
+    groups = sorted(summary["groups"].items(), key=lambda item: item[1]["seconds"], reverse=True)
+    for key, group in groups:
+        fps = f"{group['fps']:.1f}" if group["fps"] else "-"
+        print(f"{key:<36} {group['count']:>6} {group['seconds']:>9.2f} "
+              f"{group['seconds'] / window:>7.0%} {group['max_seconds']:>8.2f} "
+              f"{group['cpu_seconds']:>8.2f} {fps:>7} {group['bytes_in'] / 1e6:>8.1f} "
+              f"{group['bytes_out'] / 1e6:>8.1f} {group['errors']:>6}")
+
+
+def main():
+    """Command-line entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize or convert pipeline traces")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report = commands.add_parser("report", help="Per-stage time breakdown")
+    report.add_argument("trace", help="JSONL trace file")
+    report.add_argument("--json", help="Also write the summary as JSON here")
+    chrome = commands.add_parser("chrome", help="Convert to Chrome trace format")
+    chrome.add_argument("trace", help="JSONL trace file")
+    chrome.add_argument("output", help="Chrome trace JSON to write")
+    args = parser.parse_args()
+
+    spans = load_spans(args.trace)
+    if args.command == "chrome":
+        export_chrome(spans, args.output)
+        print(f"Wrote {len(spans)} spans to {args.output}")
+        return
+
+    summary = summarize(spans)
+    print_report(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Batch entry point: run a VideoProcessor operation over a folder of videos
+
+    python -m video_pipeline batch input/ -o output/ --op convert --profile speed
+    python -m video_pipeline batch input/ -o output/ --op upscale --scale 2 --workers 3
+
+Inputs are probed concurrently and submitted longest first, so the long
+videos start early and the short ones fill the gaps at the end instead of
+one long straggler running alone. Jobs go to a process pool one at a time,
+so whichever worker frees up first takes the next one. The pool is sized
+so that workers x ffmpeg threads per job matches the machine's cores.
+Progress and ETA are reported per finished job, weighted by video duration.
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from encoder_probe import select_encoder
+from tracing import enable_tracing
+from video_processor import VideoProcessor
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+OPERATIONS = ("convert", "upscale", "extract")
+
+
+def scan_inputs(folder: str, pattern: Optional[str] = None, recursive: bool = False) -> List[str]:
+    """Video files in a folder: a glob pattern, or every known video extension"""
+    root = Path(folder)
+    if pattern:
+        matches = root.rglob(pattern) if recursive else root.glob(pattern)
+    else:
+        matches = (p for p in (root.rglob("*") if recursive else root.iterdir())
+                   if p.suffix.lower() in VIDEO_EXTENSIONS)
+    return sorted(str(p) for p in matches if p.is_file())
+
+
+def _duration(path: str) -> float:
+    try:
+        return float(VideoProcessor.get_video_info(path).get("duration") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def plan_jobs(inputs: List[str], output_dir: str, operation: str,
+              probe_workers: int = 8) -> List[Dict]:
+    """One job per input with its duration, longest first (file size breaks ties)"""
+    with ThreadPoolExecutor(max_workers=max(1, min(probe_workers, len(inputs) or 1))) as pool:
+        durations = list(pool.map(_duration, inputs))
+    jobs = []
+    for path, duration in zip(inputs, durations):
+        stem = Path(path).stem
+        if operation == "extract":
+            output = os.path.join(output_dir, f"{stem}_frames")
+        else:
+            output = os.path.join(output_dir, f"{stem}_processed.mp4")
+        jobs.append({
+            "name": Path(path).name,
+            "input": path,
+            "output": output,
+            "duration": duration,
+            "size": os.path.getsize(path)
+        })
+    jobs.sort(key=lambda job: (job["duration"], job["size"]), reverse=True)
+    return jobs
+
+
+def plan_workers(job_count: int, workers: Optional[int] = None,
+                 threads: Optional[int] = None, cores: Optional[int] = None) -> Tuple[int, int]:
+    """(worker processes, ffmpeg threads per job) with workers x threads <= cores.
+
+    Fixing one derives the other; by default each job gets two threads (the
+    usual cores / 2 throttle), and fewer jobs than workers share the spare
+    cores among themselves.
+    """
+    cores = cores or os.cpu_count() or 1
+    if workers is None:
+        workers = max(1, cores // (threads or 2))
+    workers = max(1, min(workers, job_count or 1))
+    if threads is None:
+        threads = max(1, cores // workers)
+    return workers, threads
+
+
+def _run_job(operation: str, job: Dict, options: Dict) -> Tuple[bool, float]:
+    """Process pool entry point: one VideoProcessor call; returns (ok, seconds)"""
+    started = time.perf_counter()
+    if operation == "convert":
+        ok = VideoProcessor.convert_video(job["input"], job["output"], **options)
+    elif operation == "upscale":
+        ok = VideoProcessor.upscale_video(job["input"], job["output"], **options)
+    else:
+        ok = VideoProcessor.extract_frames(job["input"], job["output"], **options)
+    return bool(ok), time.perf_counter() - started
+
+
+def _format_seconds(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class BatchProgress:
+    """Aggregate progress over finished jobs, weighted by video duration"""
+
+    def __init__(self, jobs: List[Dict]):
+        self.total = len(jobs)
+        # Unprobed inputs count as an average-length job
+        known = [job["duration"] for job in jobs if job["duration"] > 0]
+        default = sum(known) / len(known) if known else 1.0
+        self.weights = {job["input"]: job["duration"] or default for job in jobs}
+        self.total_weight = sum(self.weights.values())
+        self.done_weight = 0.0
+        self.done = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+
+    def update(self, job: Dict, ok: bool):
+        self.done += 1
+        self.failed += 0 if ok else 1
+        self.done_weight += self.weights[job["input"]]
+
+    @property
+    def fraction(self) -> float:
+        return self.done_weight / self.total_weight if self.total_weight else 1.0
+
+    def eta(self) -> Optional[float]:
+        """Seconds left at the throughput so far; None before the first job finishes"""
+        if not self.done_weight:
+            return None
+        elapsed = time.perf_counter() - self.started
+        return elapsed * (self.total_weight - self.done_weight) / self.done_weight
+
+    def line(self, job: Dict, ok: bool, seconds: float) -> str:
+        eta = self.eta()
+        status = "ok" if ok else "FAILED"
+        left = f"ETA {_format_seconds(eta)}" if eta is not None and self.done < self.total else "done"
+        return (f"[{self.done}/{self.total}] {self.fraction:4.0%}  {job['name']} {status} "
+                f"in {_format_seconds(seconds)}  |  {left}")
+
+
+def run_batch(jobs: List[Dict], operation: str, options: Dict, workers: int,
+              report=print) -> List[Dict]:
+    """Run jobs on a process pool in the given order; returns each job with ok/seconds"""
+    progress = BatchProgress(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_run_job, operation, job, options): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                ok, seconds = future.result()
+            except Exception as e:
+                logger.error(f"{job['name']} crashed: {e}")
+                ok, seconds = False, 0.0
+            job.update(ok=ok, seconds=seconds)
+            progress.update(job, ok)
+            report(progress.line(job, ok, seconds))
+    report(f"Finished {progress.done - progress.failed}/{progress.total} jobs "
+           f"in {_format_seconds(time.perf_counter() - progress.started)}")
+    return jobs
+
+
+def _operation_options(args: argparse.Namespace, threads: int) -> Dict:
+    if args.op == "extract":
+        return {"fps": args.fps or 24, "threads": threads}
+    options = {"profile": args.profile, "threads": threads}
+    if args.op == "convert":
+        options.update(fps=args.fps or 24, codec=args.codec, preset=args.preset)
+    else:
+        options.update(scale_factor=args.scale)
+    return options
+
+
+def batch(args: argparse.Namespace) -> int:
+    inputs = scan_inputs(args.input, args.pattern, args.recursive)
+    if not inputs:
+        logger.warning(f"No videos found in {args.input}")
+        return 1
+    Path(args.output).mkdir(parents=True, exist_ok=True)
+    jobs = plan_jobs(inputs, args.output, args.op)
+    if not args.force:
+        skipped = [job for job in jobs if os.path.exists(job["output"])]
+        if skipped:
+            print(f"Skipping {len(skipped)} inputs with existing outputs (use --force to redo)")
+        jobs = [job for job in jobs if job not in skipped]
+        if not jobs:
+            return 0
+
+    workers, threads = plan_workers(len(jobs), args.workers, args.threads)
+    if args.profile:
+        # Probe/benchmark once here; workers then read the cached selection
+        select_encoder(args.profile, threads=threads)
+    total = sum(job["duration"] for job in jobs)
+    print(f"{len(jobs)} jobs ({_format_seconds(total)} of video), "
+          f"{workers} workers x {threads} ffmpeg threads")
+    results = run_batch(jobs, args.op, _operation_options(args, threads), workers)
+    return 0 if all(job["ok"] for job in results) else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="video_pipeline", description="Video pipeline command line")
+    parser.add_argument("--trace", help="Record spans to this JSONL file (see tracing.py report)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = commands.add_parser("batch", help="Process every video in a folder on a process pool")
+    batch_parser.add_argument("input", help="Folder of input videos")
+    batch_parser.add_argument("-o", "--output", default="output", help="Output folder (default: output)")
+    batch_parser.add_argument("--op", choices=OPERATIONS, default="convert", help="Operation to run")
+    batch_parser.add_argument("-p", "--pattern", help="Glob pattern (default: common video extensions)")
+    batch_parser.add_argument("-r", "--recursive", action="store_true", help="Scan subfolders too")
+    batch_parser.add_argument("-w", "--workers", type=int, help="Worker processes (default: cores / threads)")
+    batch_parser.add_argument("-t", "--threads", type=int, help="ffmpeg threads per job (default: cores / workers)")
+    batch_parser.add_argument("--profile", choices=("speed", "balanced", "quality"),
+                              help="Pick the fastest measured encoder for this profile")
+    batch_parser.add_argument("--codec", default="libx264", help="Video codec for convert")
+    batch_parser.add_argument("--preset", default="medium", help="Encoder preset for convert")
+    batch_parser.add_argument("--fps", type=int, help="Output (or extraction) frame rate (default: 24)")
+    batch_parser.add_argument("--scale", type=int, default=2, help="Scale factor for upscale")
+    batch_parser.add_argument("--force", action="store_true", help="Redo inputs whose output exists")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.trace:
+        enable_tracing(args.trace)
+    return batch(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
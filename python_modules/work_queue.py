@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Shared work queue for running pipeline stages on several machines
+
+    # on every node, from the same shared checkout
+    python work_queue.py worker --queue /mnt/shared/temp/work_queue.db --concurrency 2
+    # on the coordinator
+    python pipeline_runner.py examples/example_config.json --queue /mnt/shared/temp/work_queue.db
+
+Tasks live in a SQLite file that every node can open. A worker claims a
+task by taking a lease on it and renews the lease with heartbeats while the
+task runs. If a worker dies, its lease runs out and the next claim hands
+the task to another worker; after ``max_attempts`` leases the task fails.
+Results and errors are written back to the same row, where the submitter
+polls for them.
+
+Paths in task payloads are passed through unchanged, so inputs, outputs
+and ``paths.temp`` must be on storage every node mounts at the same path.
+SQLite on a network share depends on the share's file locking; the class's
+methods are the whole interface, so a server-backed queue can replace it.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    job TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_pending ON tasks (status, priority, created);
+"""
+
+TERMINAL = ("done", "failed")
+
+
+class TaskError(Exception):
+    """Raised when dispatched tasks fail or time out"""
+
+
+class WorkQueue:
+    """SQLite-backed task queue with leases"""
+
+    def __init__(self, db_path: str, lease_seconds: float = 60.0, max_attempts: int = 3):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Rollback journal rather than WAL: WAL needs shared memory, which
+        # processes on different machines do not have
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_spec(cls, spec: Dict, db_path: Optional[str] = None) -> "WorkQueue":
+        """Queue for a pipeline spec: distributed.queue (default paths.temp/work_queue.db)
+        with its lease_seconds and max_attempts settings"""
+        settings = spec.get("distributed", {})
+        default = os.path.join(spec.get("paths", {}).get("temp", "temp"), "work_queue.db")
+        return cls(
+            db_path or settings.get("queue", default),
+            lease_seconds=settings.get("lease_seconds", 60.0),
+            max_attempts=settings.get("max_attempts", 3)
+        )
+
+    @property
+    def scratch(self) -> str:
+        """Directory beside the queue file for intermediates every node can reach"""
+        path = Path(self.db_path).resolve().parent / "work_queue"
+        path.mkdir(parents=True, exist_ok=True)
+        return str(path)
+
+    def _write(self, func: Callable[[sqlite3.Connection], object]):
+        """Run func in an immediate (write-locked) transaction"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def submit(self, kind: str, payload: Dict, job: str = "default", priority: int = 5) -> str:
+        """Queue a task; lower priorities are claimed first"""
+        task_id = uuid.uuid4().hex
+        now = time.time()
+        self._write(lambda conn: conn.execute(
+            "INSERT INTO tasks (id, job, kind, payload, priority, status, max_attempts, created, updated) "
+            "VALUES (?, ?, ?, ?, ?, 'pending', ?, ?, ?)",
+            (task_id, job, kind, json.dumps(payload), priority, self.max_attempts, now, now)
+        ))
+        return task_id
+
+    @staticmethod
+    def _expire(conn: sqlite3.Connection, now: float) -> int:
+        """Return tasks whose lease ran out to the queue, or fail them"""
+        conn.execute(
+            "UPDATE tasks SET status = 'failed', worker = NULL, updated = ?, "
+            "error = 'lease expired ' || attempts || ' times' "
+            "WHERE status = 'leased' AND lease_until < ? AND attempts >= max_attempts",
+            (now, now)
+        )
+        return conn.execute(
+            "UPDATE tasks SET status = 'pending', worker = NULL, updated = ? "
+            "WHERE status = 'leased' AND lease_until < ?",
+            (now, now)
+        ).rowcount
+
+    def requeue_expired(self) -> int:
+        """Re-dispatch tasks held by workers that stopped heartbeating"""
+        count = self._write(lambda conn: self._expire(conn, time.time()))
+        if count:
+            logger.warning(f"Re-dispatching {count} tasks from unresponsive workers")
+        return count
+
+    def claim(self, worker: str, kinds: Optional[List[str]] = None) -> Optional[Dict]:
+        """Lease the next pending task (of the given kinds) to a worker"""
+        def take(conn: sqlite3.Connection) -> Optional[Dict]:
+            now = time.time()
+            requeued = self._expire(conn, now)
+            if requeued:
+                logger.warning(f"Re-dispatching {requeued} tasks from unresponsive workers")
+            query = "SELECT id, job, kind, payload, attempts FROM tasks WHERE status = 'pending'"
+            args: list = []
+            if kinds:
+                query += f" AND kind IN ({', '.join('?' for _ in kinds)})"
+                args += kinds
+            row = conn.execute(query + " ORDER BY priority, created LIMIT 1", args).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = 'leased', worker = ?, lease_until = ?, "
+                "attempts = attempts + 1, updated = ? WHERE id = ?",
+                (worker, now + self.lease_seconds, now, row[0])
+            )
+            return {"id": row[0], "job": row[1], "kind": row[2],
+                    "payload": json.loads(row[3]), "attempt": row[4] + 1}
+
+        return self._write(take)
+
+    def heartbeat(self, task_id: str, worker: str) -> bool:
+        """Extend a lease; False if the worker no longer holds it"""
+        now = time.time()
+        return self._write(lambda conn: conn.execute(
+            "UPDATE tasks SET lease_until = ?, updated = ? "
+            "WHERE id = ? AND worker = ? AND status = 'leased'",
+            (now + self.lease_seconds, now, task_id, worker)
+        ).rowcount) == 1
+
+    def complete(self, task_id: str, worker: str, result=None) -> bool:
+        """Store a task's result; False if its lease was lost (the result is dropped)"""
+        return self._write(lambda conn: conn.execute(
+            "UPDATE tasks SET status = 'done', result = ?, worker = NULL, updated = ? "
+            "WHERE id = ? AND worker = ? AND status = 'leased'",
+            (json.dumps(result), time.time(), task_id, worker)
+        ).rowcount) == 1
+
+    def fail(self, task_id: str, worker: str, error: str) -> bool:
+        """Record a failed attempt; the task is retried until it runs out of attempts"""
+        return self._write(lambda conn: conn.execute(
+            "UPDATE tasks SET status = CASE WHEN attempts < max_attempts THEN 'pending' ELSE 'failed' END, "
+            "error = ?, worker = NULL, updated = ? "
+            "WHERE id = ? AND worker = ? AND status = 'leased'",
+            (error, time.time(), task_id, worker)
+        ).rowcount) == 1
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, job, kind, status, attempts, worker, result, error FROM tasks WHERE id = ?",
+                (task_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "job": row[1], "kind": row[2], "status": row[3], "attempts": row[4],
+                "worker": row[5], "result": json.loads(row[6]) if row[6] else None, "error": row[7]}
+
+    def wait(self, task_ids: List[str], timeout: Optional[float] = None,
+             poll: float = 0.2) -> List[Dict]:
+        """Block until every task is done or failed.
+
+        Raises TaskError on timeout, or when a task has been purged before
+        its result was read.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            tasks = [self.get(task_id) for task_id in task_ids]
+            missing = [task_id for task_id, task in zip(task_ids, tasks) if task is None]
+            if missing:
+                raise TaskError(f"{len(missing)}/{len(task_ids)} tasks are no longer in the queue "
+                                f"(purged before their results were read), e.g. {missing[0]}")
+            if all(task["status"] in TERMINAL for task in tasks):
+                return tasks
+            if deadline is not None and time.monotonic() > deadline:
+                waiting = sum(1 for task in tasks if task["status"] not in TERMINAL)
+                raise TaskError(f"Timed out waiting for {waiting}/{len(task_ids)} tasks")
+            time.sleep(poll)
+
+    def run_tasks(self, kind: str, payloads: List[Dict], job: str = "default",
+                  priority: int = 5, timeout: Optional[float] = None) -> List:
+        """Submit tasks, wait for all of them and return their results in order"""
+        task_ids = [self.submit(kind, payload, job, priority) for payload in payloads]
+        tasks = self.wait(task_ids, timeout)
+        failed = [task for task in tasks if task["status"] != "done"]
+        if failed:
+            raise TaskError(f"{len(failed)}/{len(tasks)} {kind} tasks failed: {failed[0]['error']}")
+        return [task["result"] for task in tasks]
+
+    def counts(self, job: Optional[str] = None) -> Dict[str, int]:
+        """Tasks per status, for one job or all"""
+        query = "SELECT status, COUNT(*) FROM tasks"
+        args = ()
+        if job is not None:
+            query += " WHERE job = ?"
+            args = (job,)
+        with self._lock:
+            return dict(self._conn.execute(query + " GROUP BY status", args).fetchall())
+
+    def purge(self, job: Optional[str] = None) -> int:
+        """Delete finished tasks (of one job)"""
+        query = "DELETE FROM tasks WHERE status IN ('done', 'failed')"
+        args = ()
+        if job is not None:
+            query += " AND job = ?"
+            args = (job,)
+        return self._write(lambda conn: conn.execute(query, args).rowcount)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- Task kinds ------------------------------------------------------------
+
+def _stage_task(worker: "QueueWorker", payload: Dict) -> Dict:
+    """One pipeline stage for one input, built from the spec's stage entry"""
+    from pipeline_runner import StageError, build_stage
+
+    key = json.dumps([payload["spec"], payload["stage"]], sort_keys=True)
+    with worker.lock:
+        if key not in worker.stages:
+            # Kept for the worker's lifetime so provider clients stay warm
+            worker.stages[key] = build_stage(payload["stage"], payload["spec"])
+        stage = worker.stages[key]
+    updates = stage.func(payload["context"])
+    if updates is False:
+        raise StageError(f"Stage {stage.name} reported failure")
+    return updates or {}
+
+
+def _encode_segment_task(worker: "QueueWorker", payload: Dict) -> bool:
+    """One segment of a segmented convert/upscale"""
+    from video_processor import uncached
+
+    method = uncached(payload["method"])
+    if not method(payload["input"], payload["output"], **payload["kwargs"]):
+        raise RuntimeError(f"{payload['method']} failed on {payload['input']}")
+    return True
+
+
+# Task kind -> function(worker, payload) returning a JSON-serializable result; raise to fail
+TASK_TYPES: Dict[str, Callable[["QueueWorker", Dict], object]] = {
+    "stage": _stage_task,
+    "encode_segment": _encode_segment_task,
+}
+
+
+class QueueWorker:
+    """Pulls tasks from a WorkQueue and runs them on a few threads"""
+
+    def __init__(self, queue: WorkQueue, name: Optional[str] = None,
+                 kinds: Optional[List[str]] = None, concurrency: int = 1, poll: float = 1.0):
+        self.queue = queue
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.kinds = kinds or list(TASK_TYPES)
+        self.concurrency = max(1, concurrency)
+        self.poll = poll
+        self.stages: Dict[str, object] = {}
+        self.lock = threading.Lock()
+        self.completed = 0
+
+    def run_once(self, slot: int = 0) -> bool:
+        """Claim and run one task; False if the queue had nothing to claim"""
+        name = f"{self.name}-{slot}"
+        task = self.queue.claim(name, self.kinds)
+        if task is None:
+            return False
+        stop = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(task, name, stop), daemon=True)
+        beat.start()
+        try:
+            result = TASK_TYPES[task["kind"]](self, task["payload"])
+        except Exception as e:
+            logger.error(f"Task {task['id']} ({task['kind']}, attempt {task['attempt']}) failed: {e}")
+            self.queue.fail(task["id"], name, str(e))
+        else:
+            if self.queue.complete(task["id"], name, result):
+                with self.lock:
+                    self.completed += 1
+            else:
+                logger.warning(f"Task {task['id']} finished after its lease was lost; result dropped")
+        finally:
+            stop.set()
+            beat.join()
+        return True
+
+    def _heartbeat(self, task: Dict, name: str, stop: threading.Event):
+        while not stop.wait(self.queue.lease_seconds / 3):
+            if not self.queue.heartbeat(task["id"], name):
+                logger.warning(f"Lost the lease on task {task['id']}; another worker may take it")
+                return
+
+    def _loop(self, slot: int, stop: threading.Event, idle_exit: Optional[float]):
+        idle_since = time.monotonic()
+        while not stop.is_set():
+            if self.run_once(slot):
+                idle_since = time.monotonic()
+            elif idle_exit is not None and time.monotonic() - idle_since >= idle_exit:
+                return
+            else:
+                stop.wait(self.poll)
+
+    def run(self, stop: Optional[threading.Event] = None, idle_exit: Optional[float] = None):
+        """Work until ``stop`` is set, or the queue has been empty for ``idle_exit`` seconds"""
+        stop = stop or threading.Event()
+        threads = [
+            threading.Thread(target=self._loop, args=(slot, stop, idle_exit),
+                             name=f"{self.name}-{slot}", daemon=True)
+            for slot in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Shared work queue for distributed pipeline stages")
+    parser.add_argument("--queue", default=os.path.join("temp", "work_queue.db"),
+                        help="Queue database on shared storage (default: temp/work_queue.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    worker_parser = commands.add_parser("worker", help="Pull and run tasks until interrupted")
+    worker_parser.add_argument("-c", "--concurrency", type=int, default=1, help="Tasks run at once")
+    worker_parser.add_argument("--kinds", nargs="+", choices=sorted(TASK_TYPES),
+                               help="Only take these task kinds (e.g. encode_segment on encode nodes)")
+    worker_parser.add_argument("--lease", type=float, default=60.0, help="Lease length in seconds")
+    worker_parser.add_argument("--idle-exit", type=float, help="Exit after this many idle seconds")
+
+    commands.add_parser("status", help="Task counts per status")
+    purge_parser = commands.add_parser("purge", help="Delete finished tasks")
+    purge_parser.add_argument("--job", help="Only this job's tasks")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "worker":
+        queue = WorkQueue(args.queue, lease_seconds=args.lease)
+        worker = QueueWorker(queue, kinds=args.kinds, concurrency=args.concurrency)
+        logger.info(f"Worker {worker.name} taking {', '.join(worker.kinds)} from {args.queue}")
+        try:
+            worker.run(idle_exit=args.idle_exit)
+        except KeyboardInterrupt:
+            pass
+        print(f"{worker.completed} tasks completed")
+        return 0
+
+    queue = WorkQueue(args.queue)
+    if args.command == "status":
+        queue.requeue_expired()
+        for status, count in sorted(queue.counts().items()):
+            print(f"{status:>8}  {count}")
+    else:
+        print(f"Removed {queue.purge(args.job)} finished tasks")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Persistent worker: run job server commands read as JSON lines on stdin
+
+    python worker.py --threads 8
+    {"id": 1, "kind": "convert", "params": {"input": "a.mp4", "output": "b.mp4"}}
+    {"id": 2, "kind": "generate_image", "params": {"prompt": "...", "output": "f.png"}}
+    {"kind": "shutdown"}
+
+Scripts that call Python once per frame or clip pay interpreter startup
+and imports every time. One worker process started per script run
+answers every command instead, with its provider clients (and their
+HTTP sessions), the result cache and the dedup index kept warm.
+
+Commands use the job server's kinds and params (see JOB_TYPES in
+job_server.py), plus "ping" and "shutdown". Each one is answered by one
+line on stdout: the finished job (id, status "completed" or "failed",
+result, error). Commands run one at a time in the order received; a
+preview pipeline answers for its full run as a second job. Log output,
+and anything else printed or written by ffmpeg, goes to stderr so stdout
+carries only replies. The worker exits on "shutdown" or end of input.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from typing import IO, Dict, Optional
+import logging
+
+from job_server import JOB_TYPES, Job, JobServer, Worker
+
+logger = logging.getLogger(__name__)
+
+
+class StdioSession:
+    """Runs commands one at a time on a single warm Worker.
+
+    Stands in for JobServer towards the job functions: ``submit`` queues a
+    follow-up job (a preview's full run) to run after the current command.
+    """
+
+    def __init__(self, out: IO[str], threads: int):
+        self.out = out
+        self.worker = Worker(self, "stdio", threads)
+        self.pending = deque()
+        self.handled = 0
+        self.started = time.time()
+
+    def submit(self, kind: str, params: Optional[Dict] = None, priority=None) -> Job:
+        if kind not in JOB_TYPES:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = Job(kind, dict(params or {}), JobServer.parse_priority(priority))
+        self.pending.append(job)
+        return job
+
+    def update(self, job: Job, **changes):
+        for name, value in changes.items():
+            setattr(job, name, value)
+        if changes.get("message"):
+            logger.info(f"{job.id}: {changes['message']}")
+
+    def reply(self, body: Dict):
+        self.out.write(json.dumps(body, default=str) + "\n")
+        self.out.flush()
+
+    def run(self, job: Job):
+        self.worker.job = job
+        self.update(job, status="running", started=time.time())
+        try:
+            result = JOB_TYPES[job.kind](self.worker, job.params)
+            changes = {"status": "completed", "progress": 1.0, "result": result}
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) failed: {e}")
+            changes = {"status": "failed", "error": str(e)}
+        self.update(job, finished=time.time(), **changes)
+        self.worker.job = None
+        self.handled += 1
+        self.reply(job.to_dict())
+
+    def handle(self, line: str) -> bool:
+        """Run one command line and any jobs it queued; False after "shutdown" """
+        try:
+            command = json.loads(line)
+            if not isinstance(command, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as e:
+            self.reply({"id": None, "status": "failed", "error": f"Invalid command: {e}"})
+            return True
+
+        command_id = command.get("id")
+        kind = command.get("kind")
+        if kind in ("ping", "shutdown"):
+            self.reply({"id": command_id, "kind": kind, "status": "completed", "result": {
+                "pid": os.getpid(), "handled": self.handled, "uptime": time.time() - self.started
+            }})
+            return kind == "ping"
+        try:
+            job = self.submit(kind, command.get("params"), command.get("priority"))
+        except ValueError as e:
+            self.reply({"id": command_id, "kind": kind, "status": "failed", "error": str(e)})
+            return True
+        if command_id is not None:
+            job.id = command_id
+        while self.pending:
+            self.run(self.pending.popleft())
+        return True
+
+    def serve(self, commands: IO[str]):
+        for line in commands:
+            if line.strip() and not self.handle(line):
+                return
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run pipeline commands read as JSON lines on stdin")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1,
+                        help="ffmpeg threads per command")
+    parser.add_argument("--no-cache", action="store_true", help="Do not reuse cached results")
+    args = parser.parse_args()
+
+    # Replies get the real stdout; everything else written to fd 1, by this
+    # process or an ffmpeg child, lands on stderr
+    out = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    logging.basicConfig(level=logging.INFO)
+    if not args.no_cache:
+        from ai_client import AIClient
+        from video_processor import VideoProcessor
+        VideoProcessor.enable_cache()
+        AIClient.enable_dedup()
+
+    session = StdioSession(out, args.threads)
+    try:
+        session.serve(sys.stdin)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
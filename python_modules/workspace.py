@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Per-job scratch space with byte accounting and a disk budget
+
+Each job gets its own directory under ``paths.temp/pipeline`` and every
+input a subdirectory in it, so concurrent jobs never share scratch files.
+Stages write intermediates (frame folders, partial encodes) there; the
+pipeline tracks each one here once it is written and discards it when its
+last downstream consumer has finished.
+
+``admit()`` is the backpressure point: it blocks new inputs from starting
+while the tracked bytes are over budget and in-flight inputs can still
+free space. With nothing in flight it lets one input through, so a budget
+smaller than a single input slows a job down instead of stalling it.
+"""
+
+import os
+import re
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+def disk_usage(path: str) -> int:
+    """Bytes allocated to a file or directory tree; 0 if it is missing"""
+    def allocated(stat: os.stat_result) -> int:
+        # Block counts keep sparse files (preallocated frame stores) honest
+        blocks = getattr(stat, "st_blocks", None)
+        return blocks * 512 if blocks is not None else stat.st_size
+
+    if os.path.isfile(path):
+        return allocated(os.stat(path))
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += allocated(os.lstat(os.path.join(root, name)))
+            except OSError:
+                continue
+    return total
+
+
+class Workspace:
+    """Scratch directory for one job with tracked intermediates"""
+
+    def __init__(self, root: str, job: str = "default", budget_mb: Optional[float] = None,
+                 cleanup: bool = True):
+        self.path = Path(root) / (re.sub(r"[^\w.-]+", "_", job) or "default")
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.budget = int(budget_mb * MB) if budget_mb else None
+        self.cleanup = cleanup
+        self.sizes: Dict[str, int] = {}
+        self.used = 0
+        self.peak = 0
+        self.active = 0
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_spec(cls, spec: Dict) -> "Workspace":
+        """Workspace for a pipeline spec: paths.temp, pipeline.name and the
+        processing.temp_budget_mb / cleanup_intermediates settings"""
+        processing = spec.get("processing", {})
+        return cls(
+            os.path.join(spec.get("paths", {}).get("temp", "temp"), "pipeline"),
+            spec.get("pipeline", {}).get("name", "default"),
+            budget_mb=processing.get("temp_budget_mb"),
+            cleanup=processing.get("cleanup_intermediates", True)
+        )
+
+    def input_dir(self, name: str) -> str:
+        """Scratch directory for one input of this job"""
+        path = self.path / name
+        path.mkdir(parents=True, exist_ok=True)
+        return str(path)
+
+    def contains(self, path) -> bool:
+        """True for paths inside this workspace, whether or not they exist"""
+        if not isinstance(path, str) or not path:
+            return False
+        return Path(path).resolve().is_relative_to(self.path.resolve())
+
+    def owns(self, path) -> bool:
+        """True for existing paths inside this workspace"""
+        return isinstance(path, str) and os.path.exists(path) and self.contains(path)
+
+    def track(self, path: str) -> int:
+        """Count a path's current size against the budget; returns its bytes"""
+        key = os.path.abspath(path)
+        size = disk_usage(key)
+        with self._cond:
+            self.used += size - self.sizes.get(key, 0)
+            self.sizes[key] = size
+            self.peak = max(self.peak, self.used)
+            self._cond.notify_all()
+        return size
+
+    def untrack(self, path: str) -> int:
+        """Stop counting a path (it stays on disk); returns the bytes freed from the budget"""
+        with self._cond:
+            size = self.sizes.pop(os.path.abspath(path), 0)
+            self.used -= size
+            self._cond.notify_all()
+        return size
+
+    def discard(self, path: str) -> bool:
+        """Delete a tracked intermediate; returns False when cleanup is disabled"""
+        size = self.untrack(path)
+        if not self.cleanup:
+            return False
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+        logger.debug(f"Discarded {path} ({size / MB:.1f} MB)")
+        return True
+
+    def admit(self, timeout: Optional[float] = None) -> bool:
+        """Wait for room in the budget, then count one more input in flight.
+
+        Returns False if ``timeout`` expired first (the input is not counted).
+        """
+        with self._cond:
+            if self.budget is not None and self.used >= self.budget and self.active:
+                logger.info(f"Disk budget reached ({self.used / MB:.0f}/{self.budget / MB:.0f} MB), "
+                            f"pausing until {self.active} in-flight inputs free space")
+            if not self._cond.wait_for(self._has_room, timeout):
+                return False
+            self.active += 1
+        return True
+
+    def _has_room(self) -> bool:
+        return self.budget is None or self.used < self.budget or not self.active
+
+    def release(self):
+        """An admitted input has finished"""
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def remove(self):
+        """Delete the whole job directory"""
+        with self._cond:
+            self.sizes.clear()
+            self.used = 0
+            self._cond.notify_all()
+        shutil.rmtree(self.path, ignore_errors=True)
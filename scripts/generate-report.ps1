@@ -16,8 +16,16 @@ Directory containing log files
 .PARAMETER OutputFormat
 Output format: HTML, CSV, or JSON
 
+.PARAMETER TraceFile
+JSONL span trace (pipeline_runner.py --trace or PIPELINE_TRACE). When given,
+prints the per-stage time breakdown from python_modules/tracing.py instead
+of parsing logs.
+
 .EXAMPLE
 .\generate-report.ps1 -LogDirectory logs -OutputFormat HTML
+
+.EXAMPLE
+.\generate-report.ps1 -TraceFile logs\trace.jsonl
 #>
 
 param(
@@ -26,9 +34,25 @@ param(
     
     [Parameter(Mandatory=$false)]
     [ValidateSet("HTML", "CSV", "JSON")]
-    [string]$OutputFormat = "HTML"
+    [string]$OutputFormat = "HTML",
+    
+    [Parameter(Mandatory=$false)]
+    [string]$TraceFile
 )
 
+if ($TraceFile) {
+    if (-not (Test-Path $TraceFile)) {
+        Write-Host "Trace file not found: $TraceFile" -ForegroundColor Red
+        exit 1
+    }
+    $tracingScript = Join-Path $PSScriptRoot "..\python_modules\tracing.py"
+    $reportFile = "trace_report_$(Get-Date -Format 'yyyyMMdd_HHmmss').json"
+    python $tracingScript report $TraceFile --json $reportFile
+    python $tracingScript chrome $TraceFile ([System.IO.Path]::ChangeExtension($TraceFile, ".chrome.json"))
+    Write-Host "Report generated: $reportFile" -ForegroundColor Green
+    exit $LASTEXITCODE
+}
+
 Write-Host "Generating report from logs..." -ForegroundColor Cyan
 
 if (-not (Test-Path $LogDirectory)) {
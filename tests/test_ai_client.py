@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Test suite for ai_client.py
+
+Tests the provider clients against a local stand-in HTTP server so no
+API keys or network access are needed.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+import ai_client
+import rate_limiter
+from ai_client import AIClient, AIProvider, AsyncAIClient, ChunkedUploader
+from rate_limiter import configure_limiter
+
+
+class MockProviderHandler(BaseHTTPRequestHandler):
+    """Echoes request bodies (plus a "result" field) after a configurable delay"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            server.requests.append((self.path, body))
+            server.peers.add(self.client_address)
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+
+        try:
+            payload = json.loads(body)
+            body = json.dumps({**payload, "result": payload.get("prompt")}).encode()
+        except ValueError:
+            pass
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class UploadHandler(BaseHTTPRequestHandler):
+    """Resumable upload endpoint that streams chunks to a sink file"""
+
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status: int, payload=None, headers=None):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _reply_progress(self):
+        server = self.server
+        if server.received == server.size:
+            return self._reply(201, {"file_id": "file-1"})
+        headers = {"Range": f"bytes=0-{server.received - 1}"} if server.received else {}
+        self._reply(308, headers=headers)
+
+    def _drain(self, length: int, sink=None):
+        while length:
+            block = self.rfile.read(min(length, 64 * 1024))
+            length -= len(block)
+            if sink:
+                sink.write(block)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path == "/upload":
+            self.server.size = body["size"]
+            return self._reply(200, {"upload_url": f"{self.server.url}/session"})
+        self.server.requests.append((self.path, body))
+        self._reply(200, {"job": "done"})
+
+    def do_PUT(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        content_range = self.headers["Content-Range"]
+        server.puts += 1
+        if content_range.startswith("bytes */"):
+            return self._reply_progress()
+        if server.puts in server.fail_on:
+            self._drain(length)
+            return self._reply(503)
+        if server.stalled:
+            self._drain(length)
+            return self._reply_progress()
+
+        start = int(content_range.split()[1].split("-")[0])
+        if start != server.received:
+            self._drain(length)
+            return self._reply(416)
+        with open(server.sink, "ab") as sink:
+            self._drain(length, sink)
+        server.received += length
+        server.bytes_received += length
+        self._reply_progress()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FlakyHandler(MockProviderHandler):
+    """Returns scripted error statuses before echoing normally"""
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            status = server.script.pop(0) if server.script else None
+        if status is None:
+            return super().do_POST()
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server.requests.append((self.path, status))
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class MockProviderServer(ThreadingHTTPServer):
+    """Local stand-in for a provider API"""
+
+    daemon_threads = True
+
+    def __init__(self, handler=MockProviderHandler, delay: float = 0.0):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = []
+        self.peers = set()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class ServerTestCase(unittest.TestCase):
+    """Base class starting a mock provider and scratch directory"""
+
+    handler = MockProviderHandler
+    delay = 0.0
+
+    def setUp(self):
+        # Unthrottled limiters so configured provider rates don't slow tests
+        for provider in AIProvider:
+            configure_limiter(provider.value, max_retries=3, backoff_base=0.01)
+        self.addCleanup(rate_limiter._limiters.clear)
+        self.server = MockProviderServer(self.handler, self.delay)
+        self.addCleanup(self.server.stop)
+        self.temp_dir = tempfile.mkdtemp(prefix="ai_client_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+
+
+class TestAIClient(ServerTestCase):
+    """Test cases for the blocking client"""
+
+    def test_generate_image_writes_response(self):
+        """generate_image saves the provider response body"""
+        client = AIClient(AIProvider.GROK, api_key="test")
+        client.endpoints = {"imagine": f"{self.server.url}/imagine"}
+        output = os.path.join(self.temp_dir, "img.png")
+        self.assertTrue(client.generate_image("a sunset", output))
+        with open(output) as f:
+            self.assertEqual(json.load(f)["prompt"], "a sunset")
+
+    def test_session_reuses_connection(self):
+        """Sequential calls share one keep-alive connection"""
+        client = AIClient(AIProvider.GROK, api_key="test")
+        client.endpoints = {"imagine": f"{self.server.url}/imagine"}
+        for i in range(5):
+            client.generate_image(f"prompt {i}", os.path.join(self.temp_dir, f"{i}.png"))
+        self.assertEqual(len(self.server.peers), 1)
+
+
+class TestRetries(ServerTestCase):
+    """Test cases for 429/5xx retry handling"""
+
+    handler = FlakyHandler
+
+    def make_client(self) -> AIClient:
+        client = AIClient(AIProvider.GROK, api_key="test")
+        client.endpoints = {"imagine": f"{self.server.url}/imagine"}
+        return client
+
+    def test_retries_throttled_and_server_errors(self):
+        """429 and 503 responses are retried until success"""
+        self.server.script = [429, 503]
+        output = os.path.join(self.temp_dir, "img.png")
+        self.assertTrue(self.make_client().generate_image("retry me", output))
+        metrics = rate_limiter.get_metrics()["grok"]
+        self.assertEqual(metrics["retries"], 2)
+        self.assertEqual(metrics["throttled_responses"], 1)
+        self.assertEqual(metrics["requests"], 3)
+
+    def test_gives_up_after_max_retries(self):
+        """Persistent failures stop after max_retries and report failure"""
+        self.server.script = [500] * 10
+        output = os.path.join(self.temp_dir, "img.png")
+        self.assertFalse(self.make_client().generate_image("never", output))
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_client_errors_are_not_retried(self):
+        """A 400 is returned immediately"""
+        self.server.script = [400]
+        output = os.path.join(self.temp_dir, "img.png")
+        self.assertFalse(self.make_client().generate_image("bad", output))
+        self.assertEqual(len(self.server.requests), 1)
+
+
+class TestAsyncAIClient(ServerTestCase):
+    """Test cases for the asyncio client"""
+
+    delay = 0.05
+
+    def test_batch_is_concurrent_bounded_and_ordered(self):
+        """A batch saturates but never exceeds the concurrency limit"""
+        prompts = [f"prompt {i}" for i in range(20)]
+
+        async def run():
+            async with AsyncAIClient(AIProvider.MIDJOURNEY, api_key="test", max_concurrency=5) as client:
+                client.client.endpoints = {"imagine": f"{self.server.url}/imagine"}
+                return await client.generate_images(prompts, self.temp_dir)
+
+        started = time.perf_counter()
+        results = asyncio.run(run())
+        elapsed = time.perf_counter() - started
+
+        self.assertTrue(all(results))
+        self.assertEqual(self.server.max_in_flight, 5)
+        self.assertLess(elapsed, 20 * self.delay)
+        self.assertLessEqual(len(self.server.peers), 5)
+        with open(os.path.join(self.temp_dir, "image_0007.png")) as f:
+            self.assertEqual(json.load(f)["prompt"], "prompt 6")
+
+    def test_process_batch_preserves_order(self):
+        """process_batch returns results in input order"""
+        items = [(f"clip_{i}.mp4", f"prompt {i}") for i in range(8)]
+
+        async def run():
+            async with AsyncAIClient(AIProvider.MIDJOURNEY, api_key="test", max_concurrency=4) as client:
+                client.client.endpoints = {"imagine": f"{self.server.url}/imagine"}
+                return await client.process_batch(items)
+
+        self.assertEqual(asyncio.run(run()), [prompt for _, prompt in items])
+        self.assertEqual(len(self.server.requests), 8)
+
+
+class TestChunkedUpload(ServerTestCase):
+    """Test cases for the resumable chunked upload path"""
+
+    handler = UploadHandler
+    chunk_size = 256 * 1024
+
+    def setUp(self):
+        super().setUp()
+        self.server.received = 0
+        self.server.bytes_received = 0
+        self.server.puts = 0
+        self.server.fail_on = set()
+        self.server.stalled = False
+        self.server.sink = os.path.join(self.temp_dir, "received.bin")
+        self.source = os.path.join(self.temp_dir, "video.mp4")
+        with open(self.source, "wb") as f:
+            f.write(os.urandom(5 * self.chunk_size + 123))
+        sleep = mock.patch("ai_client.time.sleep")
+        sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def make_uploader(self, max_retries: int = 3) -> ChunkedUploader:
+        return ChunkedUploader(
+            ai_client._build_session(1), f"{self.server.url}/upload",
+            chunk_size=self.chunk_size, max_retries=max_retries
+        )
+
+    def assert_uploaded_once(self):
+        size = os.path.getsize(self.source)
+        self.assertEqual(self.server.bytes_received, size)
+        with open(self.source, "rb") as a, open(self.server.sink, "rb") as b:
+            self.assertEqual(a.read(), b.read())
+        with open(f"{self.source}.upload.json") as f:
+            self.assertEqual(json.load(f)["result"], {"file_id": "file-1"})
+
+    def test_failed_chunk_resumes_without_restart(self):
+        """A transient failure resends only the failed chunk"""
+        self.server.fail_on = {3}
+        self.assertEqual(self.make_uploader().upload(self.source), {"file_id": "file-1"})
+        self.assert_uploaded_once()
+
+    def test_new_run_resumes_recorded_session(self):
+        """An aborted upload continues from its recorded offset on rerun"""
+        self.server.fail_on = set(range(3, 100))
+        self.assertIsNone(self.make_uploader(max_retries=0).upload(self.source))
+        self.assertTrue(os.path.exists(f"{self.source}.upload.json"))
+
+        self.server.fail_on = set()
+        self.assertEqual(self.make_uploader().upload(self.source), {"file_id": "file-1"})
+        self.assert_uploaded_once()
+
+    def test_completed_upload_is_not_sent_again(self):
+        """A rerun for an uploaded file returns the recorded result"""
+        self.make_uploader().upload(self.source)
+        puts = self.server.puts
+        self.assertEqual(self.make_uploader().upload(self.source), {"file_id": "file-1"})
+        self.assertEqual(self.server.puts, puts)
+
+    def test_resume_of_completed_upload_returns_stored_file(self):
+        """A session the server finished before we saw its reply yields its file"""
+        with open(self.source, "rb") as f:
+            data = f.read()
+        stat = os.stat(self.source)
+        self.make_uploader()._save_state(self.source, {
+            "upload_url": f"{self.server.url}/session", "size": stat.st_size,
+            "mtime": stat.st_mtime, "offset": 0
+        })
+        self.server.size = self.server.received = len(data)
+        self.assertEqual(self.make_uploader().upload(self.source), {"file_id": "file-1"})
+        self.assertEqual(self.server.puts, 1)
+
+    def test_uploads_without_progress_give_up(self):
+        """308 replies that commit nothing count as failures"""
+        self.server.stalled = True
+        self.assertIsNone(self.make_uploader(max_retries=2).upload(self.source))
+        # the first chunk, then an offset query and the chunk again per retry
+        self.assertEqual(self.server.puts, 5)
+
+    def test_peak_memory_independent_of_chunk_size(self):
+        """Chunks stream from disk instead of being read into memory"""
+        uploader = self.make_uploader()
+        uploader.chunk_size = 4 * 1024 * 1024
+        tracemalloc.start()
+        try:
+            uploader.upload(self.source)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, self.chunk_size)
+        self.assert_uploaded_once()
+
+    def test_grok_uses_chunked_path_for_large_files(self):
+        """_process_grok uploads large files first, then references them"""
+        client = AIClient(AIProvider.GROK, api_key="test")
+        client.endpoints = {"upload": f"{self.server.url}/upload", "video": f"{self.server.url}/video"}
+        with mock.patch.object(ai_client, "CHUNKED_UPLOAD_THRESHOLD", 1024):
+            self.assertIsNotNone(client.process_video(self.source, "enhance"))
+        self.assertEqual(self.server.requests, [("/video", {"file_id": "file-1", "prompt": "enhance"})])
+        self.assert_uploaded_once()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
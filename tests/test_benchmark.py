@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test suite for benchmark.py
+
+Tests measurement records, regression comparison, the mock-provider AI
+benchmark and the entry points' import-time budget; the ffmpeg cases run
+only when ffmpeg is installed.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+import rate_limiter
+from benchmark import STARTUP_BUDGETS, benchmark_ai, benchmark_video, compare, import_cost, measure
+
+
+def report(**wall_seconds):
+    return {"results": {case: {"wall_seconds": wall, "ok": True} for case, wall in wall_seconds.items()}}
+
+
+class TestMeasure(unittest.TestCase):
+    """Test cases for measure()"""
+
+    def test_records_timings_and_throughput(self):
+        result = measure(lambda: time.sleep(0.05), items=10)
+        self.assertTrue(result["ok"])
+        self.assertGreaterEqual(result["wall_seconds"], 0.05)
+        self.assertLess(result["cpu_seconds"], result["wall_seconds"])
+        self.assertAlmostEqual(result["throughput"], 10 / result["wall_seconds"], delta=1)
+
+    def test_keeps_fastest_repeat(self):
+        delays = [0.08, 0.01, 0.05]
+        result = measure(lambda: time.sleep(delays.pop(0)), repeat=3)
+        self.assertLess(result["wall_seconds"], 0.05)
+
+    def test_false_result_marks_failure(self):
+        self.assertFalse(measure(lambda: False)["ok"])
+
+
+class TestCompare(unittest.TestCase):
+    """Test cases for regression detection"""
+
+    def test_flags_slowdowns_over_threshold(self):
+        regressions = compare(report(a=1.0, b=1.0, c=1.0), report(a=1.05, b=1.5, d=9.0), threshold=0.1)
+        self.assertEqual([r["case"] for r in regressions], ["b"])
+        self.assertAlmostEqual(regressions[0]["change"], 0.5)
+
+    def test_new_failure_is_a_regression(self):
+        current = report(a=0.5)
+        current["results"]["a"]["ok"] = False
+        self.assertEqual(len(compare(report(a=1.0), current)), 1)
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Test cases for the benchmark cases themselves"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="bench_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        self.addCleanup(rate_limiter._limiters.clear)
+
+    def test_ai_batch_against_mock_provider(self):
+        results = benchmark_ai(self.temp_dir, requests=16, concurrency=8, latency=0.05)
+        (case, result), = results.items()
+        self.assertEqual(case, "ai_batch/grok_16x8")
+        self.assertTrue(result["ok"])
+        # 16 requests at 8-way concurrency: about two latency periods, not sixteen
+        self.assertLess(result["wall_seconds"], 16 * 0.05 / 2)
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg not available")
+    def test_video_operations(self):
+        results = benchmark_video(self.temp_dir, "160x120", 1)
+        self.assertEqual(sorted(case.split("/")[0] for case in results),
+                         ["concat", "convert", "extract", "stitch", "upscale"])
+        self.assertTrue(all(r["ok"] and r["throughput"] for r in results.values()))
+
+
+class TestStartup(unittest.TestCase):
+    """Test cases for entry point import cost"""
+
+    def test_entry_points_import_within_budget(self):
+        for module, budget in STARTUP_BUDGETS.items():
+            with self.subTest(module=module):
+                # Fastest of three fresh interpreters, so one slow start is not a failure
+                costs = [import_cost(module) for _ in range(3)]
+                self.assertEqual(costs[0]["loaded"], [])
+                self.assertLess(min(cost["seconds"] for cost in costs), budget)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
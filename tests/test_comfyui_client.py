@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Test suite for comfyui_client.py
+
+Tests batch submission, websocket completion tracking and concurrent
+downloads against a stub ComfyUI server, so no GPU is needed.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import queue
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+from ai_client import AIClient, AIProvider
+from comfyui_client import WEBSOCKET_GUID, ComfyUIClient
+
+TEMPLATE = {
+    "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "model.safetensors"}},
+    "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "", "clip": ["4", 1]}},
+    "10": {"class_type": "LoadImage", "inputs": {"image": ""}},
+    "3": {"class_type": "KSampler", "inputs": {"seed": 0, "positive": ["6", 0]}}
+}
+
+
+def ws_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    """Unmasked server-to-client frame"""
+    if len(payload) < 126:
+        header = bytes([0x80 | opcode, len(payload)])
+    else:
+        header = bytes([0x80 | opcode, 126]) + struct.pack("!H", len(payload))
+    return header + payload
+
+
+class StubComfyUIHandler(BaseHTTPRequestHandler):
+    """Just enough of the ComfyUI HTTP and websocket API"""
+
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, payload, status: int = 200, content_type: str = "application/json"):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/prompt":
+            request = json.loads(body)
+            with server.lock:
+                prompt_id = f"p{len(server.submitted)}"
+                server.submitted.append(request["prompt"])
+                server.max_pending = max(server.max_pending, len(server.submitted) - server.finished)
+            server.jobs.put((prompt_id, request["client_id"], request["prompt"]))
+            self._reply({"prompt_id": prompt_id, "number": len(server.submitted)})
+        elif self.path == "/upload/image":
+            name = body.split(b'filename="')[1].split(b'"')[0].decode()
+            with server.lock:
+                server.uploads.append(name)
+            self._reply({"name": name, "subfolder": "", "type": "input"})
+        else:
+            self._reply({}, 404)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        if url.path == "/ws":
+            return self._websocket(parse_qs(url.query)["clientId"][0])
+        if url.path.startswith("/history/"):
+            prompt_id = url.path.rsplit("/", 1)[1]
+            with server.lock:
+                record = server.history.get(prompt_id)
+            return self._reply({prompt_id: record} if record else {})
+        if url.path == "/view":
+            filename = parse_qs(url.query)["filename"][0]
+            return self._reply(server.files[filename], content_type="image/png")
+        self._reply({}, 404)
+
+    def _websocket(self, client_id: str):
+        server = self.server
+        messages = queue.Queue()
+        with server.lock:
+            server.sockets[client_id] = messages
+            server.connections += 1
+        accept = base64.b64encode(
+            hashlib.sha1((self.headers["Sec-WebSocket-Key"] + WEBSOCKET_GUID).encode()).digest()
+        ).decode()
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.wfile.write(ws_frame(json.dumps({"type": "status", "data": {}}).encode()))
+        self.wfile.flush()
+        while not server.closing:
+            try:
+                frame = messages.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            try:
+                self.wfile.write(frame)
+                self.wfile.flush()
+            except OSError:
+                break
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubComfyUIServer:
+    """Serial "GPU" worker executing queued prompts like ComfyUI does"""
+
+    def __init__(self, step_delay: float = 0.02):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubComfyUIHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self.httpd.jobs = queue.Queue()
+        self.httpd.submitted = []
+        self.httpd.uploads = []
+        self.httpd.history = {}
+        self.httpd.files = {}
+        self.httpd.sockets = {}
+        self.httpd.connections = 0
+        self.httpd.max_pending = 0
+        self.httpd.finished = 0
+        self.httpd.closing = False
+        self.step_delay = step_delay
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        threading.Thread(target=self._execute, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def _send(self, client_id: str, payload, opcode: int = 0x1):
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.httpd.sockets[client_id].put(ws_frame(data, opcode))
+
+    def _execute(self):
+        while True:
+            prompt_id, client_id, workflow = self.httpd.jobs.get()
+            if prompt_id is None:
+                return
+            text = workflow["6"]["inputs"]["text"]
+            self._send(client_id, {"type": "executing", "data": {"node": "3", "prompt_id": prompt_id}})
+            for step in (1, 2):
+                time.sleep(self.step_delay)
+                self._send(client_id, {"type": "progress",
+                                       "data": {"value": step, "max": 2, "prompt_id": prompt_id}})
+            self._send(client_id, b"\x00\x00\x00\x01preview", opcode=0x2)
+            with self.httpd.lock:
+                self.httpd.finished += 1
+            if text == "fail":
+                self._send(client_id, {"type": "execution_error",
+                                       "data": {"prompt_id": prompt_id, "exception_message": "OOM"}})
+                continue
+            filename = f"{prompt_id}.png"
+            with self.httpd.lock:
+                self.httpd.files[filename] = text.encode()
+                self.httpd.history[prompt_id] = {
+                    "outputs": {"9": {"images": [{"filename": filename, "subfolder": "", "type": "output"}]}},
+                    "status": {"completed": True}
+                }
+            self._send(client_id, {"type": "executing", "data": {"node": None, "prompt_id": prompt_id}})
+
+    def close(self):
+        self.httpd.closing = True
+        self.httpd.jobs.put((None, None, None))
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class ComfyUITestCase(unittest.TestCase):
+    """Base class with a stub server and scratch directory"""
+
+    def setUp(self):
+        self.server = StubComfyUIServer()
+        self.addCleanup(self.server.close)
+        self.temp_dir = tempfile.mkdtemp(prefix="comfyui_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        self.output_dir = os.path.join(self.temp_dir, "out")
+
+
+class TestComfyUIClient(ComfyUITestCase):
+    """Test cases for ComfyUIClient"""
+
+    def test_batch_completes_over_websocket(self):
+        prompts = ["a cat", "a dog", "a fox", "an owl"]
+        workflows = ComfyUIClient.workflows_from_template(TEMPLATE, prompts, "6")
+        progress = []
+        client = ComfyUIClient(self.server.url)
+        results = client.run_batch(workflows, self.output_dir,
+                                   progress=lambda pid, value, total: progress.append((pid, value)))
+
+        self.assertEqual(len(results), 4)
+        for prompt, paths in zip(prompts, results):
+            self.assertEqual(len(paths), 1)
+            with open(paths[0]) as f:
+                self.assertEqual(f.read(), prompt)
+        self.assertEqual(len(progress), 8)
+        self.assertEqual(self.server.httpd.connections, 1)
+        self.assertGreater(self.server.httpd.max_pending, 1, "prompts should be queued up front")
+
+    def test_failed_prompt_yields_no_outputs(self):
+        workflows = ComfyUIClient.workflows_from_template(TEMPLATE, ["ok", "fail", "fine"], "6")
+        results = ComfyUIClient(self.server.url).run_batch(workflows, self.output_dir)
+        self.assertEqual([len(paths) for paths in results], [1, 0, 1])
+
+    def test_template_is_shared_not_mutated(self):
+        workflows = ComfyUIClient.workflows_from_template(
+            TEMPLATE, ["one", "two"], "6", seed_node="3", seed=7
+        )
+        self.assertEqual([w["6"]["inputs"]["text"] for w in workflows], ["one", "two"])
+        self.assertEqual([w["3"]["inputs"]["seed"] for w in workflows], [7, 8])
+        self.assertEqual(TEMPLATE["6"]["inputs"]["text"], "")
+        self.assertEqual(workflows[0]["4"], workflows[1]["4"])
+
+
+class TestAIClientComfyUI(ComfyUITestCase):
+    """Test cases for the ComfyUI provider path of AIClient"""
+
+    def test_process_batch_uploads_and_queues_once(self):
+        workflow_path = os.path.join(self.temp_dir, "workflow.json")
+        with open(workflow_path, "w") as f:
+            json.dump(TEMPLATE, f)
+        frames = []
+        for i in range(3):
+            frames.append(os.path.join(self.temp_dir, f"frame_{i:04d}.png"))
+            with open(frames[-1], "wb") as f:
+                f.write(b"png")
+
+        config = {"providers": {"comfyui": {
+            "server": self.server.url, "workflow": workflow_path,
+            "prompt_node": "6", "input_node": "10"
+        }}}
+        with mock.patch("comfyui_client.load_config", return_value=config):
+            client = AIClient(AIProvider.COMFYUI)
+            results = client.process_comfyui_batch([(f, f"prompt {i}") for i, f in enumerate(frames)])
+
+        self.assertTrue(all(r and os.path.exists(r) for r in results))
+        self.assertEqual(sorted(self.server.httpd.uploads), [os.path.basename(f) for f in frames])
+        submitted = self.server.httpd.submitted
+        self.assertEqual([w["10"]["inputs"]["image"] for w in submitted],
+                         [os.path.basename(f) for f in frames])
+        self.assertEqual(self.server.httpd.connections, 1)
+
+    def test_missing_workflow_fails_cleanly(self):
+        with mock.patch("comfyui_client.load_config", return_value={}):
+            client = AIClient(AIProvider.COMFYUI)
+            self.assertIsNone(client.process_video(os.path.join(self.temp_dir, "in.mp4"), "x"))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
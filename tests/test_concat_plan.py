@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test suite for concat_plan.py
+
+Tests target selection, keyframe-aligned trim planning, re-encode commands
+and the single copy pass that joins the pieces.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+import concat_plan
+from concat_plan import encode_command, plan_concat
+
+
+def probe(duration=10.0, width=1920, codec="h264", audio=True):
+    return {
+        "duration": duration,
+        "video": {"codec": codec, "profile": "High", "width": width, "height": 1080,
+                  "pix_fmt": "yuv420p", "sar": "1:1", "fps": "30/1", "time_base": "1/15360"},
+        "audio": {"codec": "aac", "sample_rate": "48000", "channels": 2} if audio else None,
+    }
+
+
+class TestPlan(unittest.TestCase):
+    """Test cases for grouping and trim planning"""
+
+    def test_majority_format_is_copied(self):
+        target, pieces = plan_concat(
+            ["a.mp4", "b.mp4", "c.mp4"],
+            [probe(5), probe(20, width=1280), probe(5)]
+        )
+        # 20s at 720p outweighs 2 x 5s at 1080p
+        self.assertEqual(target["video"]["width"], 1280)
+        self.assertEqual([p["copy"] for p in pieces], [False, True, False])
+
+    def test_trim_copies_whole_gops_only(self):
+        _, pieces = plan_concat(["a.mp4"], [probe(20)], [(3.0, 15.0)],
+                                {"a.mp4": [0.0, 4.0, 8.0, 12.0, 16.0]})
+        self.assertEqual(
+            [(p["start"], p["end"], p["copy"]) for p in pieces],
+            [(3.0, 4.0, False), (4.0, 12.0, True), (12.0, 15.0, False)]
+        )
+
+    def test_trim_on_keyframes_needs_no_encode(self):
+        _, pieces = plan_concat(["a.mp4"], [probe(20)], [(4.0, None)], {"a.mp4": [0.0, 4.0, 8.0]})
+        self.assertEqual([(p["start"], p["end"], p["copy"]) for p in pieces], [(4.0, None, True)])
+
+    def test_trim_inside_one_gop_is_encoded(self):
+        _, pieces = plan_concat(["a.mp4"], [probe(20)], [(5.0, 7.0)], {"a.mp4": [0.0, 4.0, 8.0]})
+        self.assertEqual([(p["start"], p["end"], p["copy"]) for p in pieces], [(5.0, 7.0, False)])
+
+
+class TestCommands(unittest.TestCase):
+    """Test cases for re-encode commands and the copy pass"""
+
+    def test_encode_matches_target(self):
+        piece = {"path": "b.mov", "start": 2.0, "end": 5.0, "copy": False}
+        cmd = encode_command(piece, probe(width=1280, audio=False), probe(), "piece.mp4", threads=4)
+        self.assertEqual(cmd[:7], ["ffmpeg", "-ss", "2.000000", "-i", "b.mov", "-f", "lavfi"])
+        self.assertIn("scale=1920:1080:force_original_aspect_ratio=decrease", cmd[cmd.index("-vf") + 1])
+        self.assertEqual(cmd[cmd.index("-t") + 1], "3.000000")
+        self.assertEqual(cmd[cmd.index("-c:v") + 1], "libx264")
+        self.assertEqual(cmd[cmd.index("-profile:v") + 1], "high")
+        self.assertEqual(cmd[cmd.index("-video_track_timescale") + 1], "15360")
+        self.assertIn("-shortest", cmd)
+
+    def test_one_copy_pass_over_mixed_pieces(self):
+        temp_dir = tempfile.mkdtemp(prefix="concat_test_")
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        commands, lists = [], []
+
+        def fake_ffmpeg(cmd, check):
+            commands.append(cmd)
+            if "concat" in cmd:
+                with open(cmd[cmd.index("-i") + 1]) as f:
+                    lists.append(f.read())
+            Path(cmd[-1]).touch()
+
+        probes = {"a.mp4": probe(20), "b.mp4": probe(5, codec="hevc")}
+        with mock.patch.object(concat_plan, "probe_clip", side_effect=probes.get), \
+             mock.patch.object(concat_plan, "keyframe_times", return_value=[0.0, 4.0, 8.0, 12.0]), \
+             mock.patch("tracing.subprocess.run", side_effect=fake_ffmpeg):
+            output = os.path.join(temp_dir, "out.mp4")
+            self.assertTrue(concat_plan.concat(["a.mp4", "b.mp4"], output, [(2.0, 20.0), None]))
+
+        encodes = [cmd for cmd in commands if "concat" not in cmd]
+        self.assertEqual(len(encodes), 2)
+        self.assertEqual(commands[-1][commands[-1].index("-c") + 1], "copy")
+        self.assertIn(f"file '{os.path.abspath('a.mp4')}'\ninpoint 4.000000\n", lists[0])
+        self.assertEqual(lists[0].count("file "), 3)
+        self.assertTrue(os.path.exists(output))
+
+    @unittest.skipUnless(shutil.which("ffmpeg") and shutil.which("ffprobe"), "ffmpeg not available")
+    def test_mixed_inputs_end_to_end(self):
+        temp_dir = tempfile.mkdtemp(prefix="concat_test_")
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        clips = []
+        for name, size in (("a.mp4", "320x240"), ("b.mp4", "320x240"), ("c.mp4", "160x120")):
+            clips.append(os.path.join(temp_dir, name))
+            subprocess.run(["ffmpeg", "-f", "lavfi", "-i", f"testsrc=duration=4:size={size}:rate=24",
+                            "-g", "24", "-pix_fmt", "yuv420p", "-y", clips[-1]],
+                           check=True, capture_output=True)
+        output = os.path.join(temp_dir, "out.mp4")
+        self.assertTrue(concat_plan.concat(clips, output, [(0.5, 3.5), None, None]))
+        duration = concat_plan.probe_clip(output)["duration"]
+        self.assertAlmostEqual(duration, 11.0, delta=0.3)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
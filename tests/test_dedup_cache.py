@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Test suite for dedup_cache.py
+
+Tests prompt normalization, perceptual-hash matching, LRU eviction and the
+AIClient paths that answer repeated requests without a network call.
+"""
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+from ai_client import AIClient, AIProvider, AsyncAIClient
+import dedup_cache
+from dedup_cache import DedupIndex, normalize_prompt
+
+
+class DedupTestCase(unittest.TestCase):
+    """Base class with a scratch index and image helpers"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="dedup_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        self.index = DedupIndex(os.path.join(self.temp_dir, "dedup"), threshold=6)
+        self.addCleanup(self.index.close)
+
+    def image(self, name: str, seed: int = 0, noise: int = 0) -> str:
+        """A smooth 64x64 test image, optionally with light pixel noise"""
+        rng = np.random.default_rng(seed)
+        base = np.add.outer(np.arange(64), rng.integers(0, 64, 64)).astype(np.int16) * 2
+        if noise:
+            base += rng.integers(-noise, noise + 1, base.shape).astype(np.int16)
+        path = os.path.join(self.temp_dir, name)
+        Image.fromarray(np.clip(base, 0, 255).astype(np.uint8)).save(path)
+        return path
+
+    def asset(self, name: str, content: bytes = b"result") -> str:
+        path = os.path.join(self.temp_dir, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+
+class TestDedupIndex(DedupTestCase):
+    """Test cases for DedupIndex"""
+
+    def test_normalize_prompt(self):
+        self.assertEqual(normalize_prompt("  A Sunset,  over the SEA! "), "a sunset over the sea")
+
+    def test_prompt_only_entries(self):
+        self.index.store("grok", "A sunset, over the sea", asset_path=self.asset("img.png"))
+        hit = self.index.lookup("grok", "a sunset over the sea!")
+        with open(hit["asset"], "rb") as f:
+            self.assertEqual(f.read(), b"result")
+        self.assertIsNone(self.index.lookup("grok", "a sunrise over the sea"))
+        self.assertIsNone(self.index.lookup("midjourney", "a sunset over the sea"))
+
+    def test_near_identical_frames_match(self):
+        self.index.store("grok", "enhance", self.image("a.png"), result="enhanced a")
+        self.assertEqual(self.index.lookup("grok", "enhance", self.image("b.png", noise=2))["result"], "enhanced a")
+        self.assertIsNone(self.index.lookup("grok", "enhance", self.image("c.png", seed=7)))
+        self.assertIsNone(self.index.lookup("grok", "sharpen", self.image("d.png")))
+
+    def test_other_inputs_match_by_content(self):
+        video = self.asset("clip.mp4", b"video bytes")
+        self.index.store("grok", "enhance", video, result={"id": 3})
+        self.assertEqual(self.index.lookup("grok", "enhance", self.asset("copy.mp4", b"video bytes"))["result"], {"id": 3})
+        self.assertIsNone(self.index.lookup("grok", "enhance", self.asset("other.mp4", b"changed")))
+
+    def test_inputs_are_hashed_once_per_file_version(self):
+        video = self.asset("clip.mp4", b"video bytes")
+        with mock.patch("dedup_cache.file_hash", wraps=dedup_cache.file_hash) as file_hash:
+            self.assertIsNone(self.index.lookup("grok", "enhance", video))
+            self.index.store("grok", "enhance", video, result={"id": 3})
+            reopened = DedupIndex(str(self.index.directory))
+            self.addCleanup(reopened.close)
+            self.assertEqual(reopened.lookup("grok", "enhance", video)["result"], {"id": 3})
+            self.assertEqual(file_hash.call_count, 1)
+            self.asset("clip.mp4", b"edited video")
+            os.utime(video, ns=(1, 1))
+            self.assertIsNone(self.index.lookup("grok", "enhance", video))
+            self.assertEqual(file_hash.call_count, 2)
+
+    def test_store_replaces_previous_entry(self):
+        self.index.store("grok", "p", result="old")
+        self.index.store("grok", "p", result="new")
+        self.assertEqual(self.index.lookup("grok", "p")["result"], "new")
+        self.assertEqual(self.index._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0], 1)
+
+    def test_lru_eviction(self):
+        self.index.max_entries = 2
+        self.index.store("grok", "first", asset_path=self.asset("1.png"))
+        self.index.store("grok", "second", result="2")
+        self.index.lookup("grok", "first")
+        self.index.store("grok", "third", result="3")
+        self.assertIsNotNone(self.index.lookup("grok", "first"))
+        self.assertIsNone(self.index.lookup("grok", "second"))
+
+        self.index.max_size_bytes = 0
+        self.index.evict()
+        self.assertIsNone(self.index.lookup("grok", "first"))
+        self.assertEqual(os.listdir(self.index.assets_dir), [])
+
+
+class TestClientDedup(DedupTestCase):
+    """Test cases for AIClient requests answered from the index"""
+
+    def setUp(self):
+        super().setUp()
+        AIClient.enable_dedup(self.index)
+        self.addCleanup(setattr, AIClient, "dedup", None)
+
+    def test_generate_image_reuses_stored_image(self):
+        client = AIClient(AIProvider.GROK, "key")
+        response = mock.Mock(status_code=200, content=b"png bytes")
+        with mock.patch.object(client, "_request", return_value=response) as request:
+            self.assertTrue(client.generate_image("A red fox", os.path.join(self.temp_dir, "1.png")))
+            self.assertTrue(client.generate_image("a red fox.", os.path.join(self.temp_dir, "2.png")))
+        self.assertEqual(request.call_count, 1)
+        with open(os.path.join(self.temp_dir, "2.png"), "rb") as f:
+            self.assertEqual(f.read(), b"png bytes")
+
+    def test_process_video_skips_near_duplicate_frames(self):
+        client = AIClient(AIProvider.GROK, "key")
+        with mock.patch.object(client, "_process_grok", return_value="styled") as process:
+            self.assertEqual(client.process_video(self.image("f1.png"), "style"), "styled")
+            self.assertEqual(client.process_video(self.image("f2.png", noise=2), "style"), "styled")
+        self.assertEqual(process.call_count, 1)
+
+    def test_comfyui_batch_only_queues_misses(self):
+        client = AIClient(AIProvider.COMFYUI)
+        frames = [self.image("f1.png"), self.image("f2.png", seed=5)]
+        self.index.store("comfyui", "style", frames[0], result="out_1.png", asset_path=self.asset("out_1.png"))
+        with mock.patch.object(client, "_run_comfyui_batch", return_value=[None]) as run:
+            results = client.process_comfyui_batch([(frames[0], "style"), (frames[1], "style")])
+        run.assert_called_once_with([(frames[1], "style")])
+        self.assertEqual(results[0], os.path.join(self.temp_dir, "comfyui_outputs", "out_1.png"))
+        self.assertTrue(os.path.exists(results[0]))
+        self.assertIsNone(results[1])
+
+    def test_overlapping_prompts_in_a_batch_generate_once(self):
+        calls = []
+
+        def generate(prompt, output_path):
+            calls.append(prompt)
+            with open(output_path, "wb") as f:
+                f.write(prompt.encode())
+            return True
+
+        async def run():
+            async with AsyncAIClient(AIProvider.MIDJOURNEY, api_key="key", max_concurrency=2) as client:
+                with mock.patch.object(client.client, "generate_image", side_effect=generate):
+                    return await client.generate_images(["A cat", "a cat!", "A dog"], self.temp_dir)
+
+        self.assertEqual(asyncio.run(run()), [True, True, True])
+        self.assertEqual(sorted(calls), ["A cat", "A dog"])
+        with open(os.path.join(self.temp_dir, "image_0002.png")) as f:
+            self.assertEqual(f.read(), "A cat")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test suite for encoder_probe.py
+
+Tests ffmpeg listing parsers, profile-based encoder selection and the
+on-disk probe cache, with ffmpeg itself mocked out.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+import encoder_probe
+from encoder_probe import EncoderSelector, encoder_args, input_args
+from video_processor import VideoProcessor
+
+ENCODERS_OUTPUT = """Encoders:
+ V..... = Video
+ A..... = Audio
+ ------
+ V....D libx264              libx264 H.264 / AVC / MPEG-4 AVC (codec h264)
+ V....D libx265              libx265 H.265 / HEVC (codec hevc)
+ V....D libsvtav1            SVT-AV1(Scalable Video Technology for AV1) encoder (codec av1)
+ V....D h264_nvenc           NVIDIA NVENC H.264 encoder (codec h264)
+ A....D aac                  AAC (Advanced Audio Coding)
+"""
+
+FILTERS_OUTPUT = """Filters:
+  T.. = Timeline support
+  | = Source or sink filter
+ ... abuffer           |->A       Buffer audio frames, and make them accessible to the filterchain.
+ TSC scale             V->V       Scale the input video size and/or convert the image format.
+ ..C zscale            V->V       Apply resizing, colorspace and bit depth conversion.
+"""
+
+CAPABILITIES = {
+    "version": "ffmpeg version 6.1",
+    "encoders": ["libx264", "libx265", "libsvtav1", "h264_nvenc", "aac"],
+    "filters": ["scale"],
+    "hwaccels": ["cuda", "vaapi"],
+}
+
+
+class TestParsers(unittest.TestCase):
+    """Test cases for ffmpeg listing parsers"""
+
+    def test_parse_encoders(self):
+        self.assertEqual(
+            encoder_probe._parse_table(ENCODERS_OUTPUT, 1),
+            ["libx264", "libx265", "libsvtav1", "h264_nvenc", "aac"]
+        )
+
+    def test_parse_filters(self):
+        self.assertEqual(encoder_probe._parse_filters(FILTERS_OUTPUT), ["abuffer", "scale", "zscale"])
+
+
+class TestEncoderSelector(unittest.TestCase):
+    """Test cases for EncoderSelector"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="encoder_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        self.cache_path = os.path.join(self.temp_dir, "encoder_capabilities.json")
+        self.throughput = {"libx264": 120.0, "libx265": 40.0, "libsvtav1": 150.0, "h264_nvenc": 400.0}
+        patches = [
+            mock.patch.object(EncoderSelector, "_binary_id", return_value="ffmpeg-6.1"),
+            mock.patch("encoder_probe.probe_capabilities", return_value=CAPABILITIES),
+            mock.patch("encoder_probe.benchmark_encoder",
+                       side_effect=lambda codec, *args: self.throughput[codec]),
+        ]
+        self.binary_id, self.probe, self.benchmark = (p.start() for p in patches)
+        for patch in patches:
+            self.addCleanup(patch.stop)
+
+    def selector(self, **options) -> EncoderSelector:
+        return EncoderSelector(self.cache_path, threads=8, **options)
+
+    def test_picks_fastest_measured_encoder(self):
+        settings = self.selector(hwaccel="none").select("balanced")
+        self.assertEqual((settings["codec"], settings["preset"]), ("libsvtav1", "8"))
+        self.assertEqual(settings["fps"], 150.0)
+
+    def test_hardware_encoder_used_when_allowed(self):
+        self.assertEqual(self.selector().select("speed")["codec"], "h264_nvenc")
+        self.assertEqual(self.selector(hwaccel="none").select("speed")["codec"], "libsvtav1")
+
+    def test_failed_benchmark_is_skipped(self):
+        self.throughput["h264_nvenc"] = None
+        self.assertEqual(self.selector().select("speed")["codec"], "libsvtav1")
+
+    def test_results_cached_on_disk(self):
+        self.selector().select("quality")
+        self.assertEqual(self.benchmark.call_count, 3)
+        self.selector().select("quality")
+        self.assertEqual(self.probe.call_count, 1)
+        self.assertEqual(self.benchmark.call_count, 3)
+
+        self.binary_id.return_value = "ffmpeg-7.0"
+        self.selector().select("quality")
+        self.assertEqual(self.probe.call_count, 2)
+        self.assertEqual(self.benchmark.call_count, 6)
+
+    def test_threads_split_across_jobs(self):
+        settings = self.selector().select("balanced", jobs=3)
+        self.assertEqual((settings["threads"], settings["filter_threads"]), (2, 2))
+        self.assertEqual(self.selector().select("balanced", threads=5)["threads"], 5)
+
+    def test_hwaccel_decode_only_when_named_and_present(self):
+        self.assertEqual(input_args(self.selector().select("speed")), [])
+        self.assertEqual(input_args(self.selector(hwaccel="cuda").select("speed")), ["-hwaccel", "cuda"])
+        self.assertEqual(input_args(self.selector(hwaccel="qsv").select("speed")), [])
+
+    def test_fallback_without_ffmpeg(self):
+        self.binary_id.return_value = None
+        settings = self.selector().select("quality")
+        self.assertEqual((settings["codec"], settings["preset"]), ("libx264", "slow"))
+        self.benchmark.assert_not_called()
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            self.selector().select("ludicrous")
+
+
+class TestProfileEncoding(unittest.TestCase):
+    """Test cases for profile-driven VideoProcessor commands"""
+
+    def test_convert_uses_selected_encoder(self):
+        output_folder = tempfile.mkdtemp(prefix="encoder_test_")
+        self.addCleanup(shutil.rmtree, output_folder, True)
+        settings = {"codec": "libx265", "preset": "fast", "extra": ["-crf", "26"],
+                    "threads": 4, "filter_threads": 4, "hwaccel": "cuda", "fps": 60.0}
+
+        def fake_ffmpeg(cmd, check):
+            Path(cmd[-1]).touch()
+
+        with mock.patch("video_processor.select_encoder", return_value=settings) as select, \
+             mock.patch("video_processor.subprocess.run", side_effect=fake_ffmpeg) as run:
+            self.assertTrue(VideoProcessor.convert_video(
+                "in.mp4", os.path.join(output_folder, "out.mp4"), profile="balanced"
+            ))
+        select.assert_called_once_with("balanced", threads=None)
+        cmd = run.call_args[0][0]
+        self.assertEqual(cmd[1:3], ["-hwaccel", "cuda"])
+        joined = " ".join(cmd)
+        self.assertIn(" ".join(encoder_args(settings)), joined)
+        self.assertNotIn("libx264", joined)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
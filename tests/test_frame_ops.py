@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test suite for frame_ops.py
+
+Tests the batched operations against straightforward per-pixel reference
+results, in-place use of ``out`` and consistency across worker counts.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+from frame_ops import (allocate, batches, color_grade, crossfade, grade_lut, letterbox,
+                       load_images, overlay, resize, save_images)
+
+
+def random_frames(count: int = 4, height: int = 6, width: int = 8, channels: int = 3,
+                  seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 256, (count, height, width, channels), dtype=np.uint8)
+
+
+class TestOverlay(unittest.TestCase):
+    """Test cases for overlay compositing"""
+
+    def test_alpha_and_opacity_blend(self):
+        base = np.zeros((2, 4, 4, 3), dtype=np.uint8)
+        top = np.full((1, 2, 2, 4), 200, dtype=np.uint8)
+        top[..., 3] = 255
+        result = overlay(base, top, x=1, y=1, opacity=0.5)
+        self.assertEqual(result[0, 1, 1, 0], 100)
+        self.assertEqual(result[1, 2, 2, 2], 100)
+        self.assertEqual(result[0, 0, 0, 0], 0)
+        self.assertEqual(int(result.sum()), 2 * 4 * 3 * 100)
+
+    def test_clipped_in_place(self):
+        base = random_frames()
+        expected = base.copy()
+        top = random_frames(count=4, height=3, width=3, seed=1)
+        expected[:, :2, 6:] = top[:, 1:, :2]
+        result = overlay(base, top, x=6, y=-1, out=base)
+        self.assertIs(result, base)
+        np.testing.assert_array_equal(base, expected)
+
+    def test_outside_frame_is_a_copy(self):
+        base = random_frames()
+        np.testing.assert_array_equal(overlay(base, random_frames(count=1), x=50), base)
+
+
+class TestCrossfade(unittest.TestCase):
+    """Test cases for crossfades"""
+
+    def test_default_ramp_and_endpoints(self):
+        black = np.zeros((1, 2, 2, 3), dtype=np.uint8)
+        white = np.full((1, 2, 2, 3), 255, dtype=np.uint8)
+        result = crossfade(black, white, weights=[0, 0.5, 1])
+        self.assertEqual(result[:, 0, 0, 0].tolist(), [0, 128, 255])
+        ramp = crossfade(black, np.repeat(white, 3, axis=0))
+        self.assertEqual(ramp[:, 0, 0, 0].tolist(), [64, 128, 191])
+
+    def test_mismatched_batches_rejected(self):
+        with self.assertRaises(ValueError):
+            crossfade(random_frames(count=2), random_frames(count=3))
+
+
+class TestResizeAndLetterbox(unittest.TestCase):
+    """Test cases for resizing"""
+
+    def test_nearest_doubles_pixels(self):
+        frames = random_frames(count=2, height=2, width=3)
+        result = resize(frames, (6, 4), method="nearest")
+        np.testing.assert_array_equal(result, frames.repeat(2, axis=1).repeat(2, axis=2))
+
+    def test_bilinear_into_preallocated_buffer(self):
+        frames = random_frames(count=3)
+        out = allocate(3, 3, 4)
+        self.assertIs(resize(frames, (4, 3), out=out), out)
+        single = np.full((1, 4, 4, 1), 90, dtype=np.uint8)
+        self.assertTrue((resize(single, (2, 2)) == 90).all())
+
+    def test_letterbox_pads_with_color(self):
+        frames = np.full((2, 4, 8, 3), 255, dtype=np.uint8)
+        result = letterbox(frames, (8, 8), color=(10, 20, 30), method="nearest")
+        self.assertEqual(result.shape, (2, 8, 8, 3))
+        self.assertEqual(result[0, 0, 0].tolist(), [10, 20, 30])
+        self.assertEqual(result[1, 7, 7].tolist(), [10, 20, 30])
+        self.assertTrue((result[:, 2:6] == 255).all())
+
+
+class TestColorGrade(unittest.TestCase):
+    """Test cases for color grading"""
+
+    def test_identity_and_lut(self):
+        frames = random_frames()
+        np.testing.assert_array_equal(color_grade(frames), frames)
+        self.assertEqual(grade_lut(brightness=0.2)[0], 51)
+        graded = color_grade(frames, contrast=0.0)
+        self.assertTrue((graded == 128).all())
+
+    def test_zero_saturation_is_gray_in_place(self):
+        frames = random_frames()
+        color_grade(frames, saturation=0.0, out=frames)
+        self.assertTrue((np.abs(frames.astype(int) - frames[..., :1]) <= 1).all())
+
+    def test_per_channel_lut(self):
+        frames = random_frames()
+        lut = np.stack([np.arange(256), np.zeros(256), np.full(256, 255)], axis=1)
+        result = color_grade(frames, lut=lut)
+        np.testing.assert_array_equal(result[..., 0], frames[..., 0])
+        self.assertTrue((result[..., 1] == 0).all() and (result[..., 2] == 255).all())
+
+
+class TestBatching(unittest.TestCase):
+    """Test cases for batching, threading and image I/O"""
+
+    def test_worker_counts_agree(self):
+        frames = random_frames(count=9, height=16, width=16)
+        logo = random_frames(count=1, height=5, width=5, channels=4, seed=3)
+        serial = color_grade(overlay(frames, logo, 3, 3, 0.7, workers=1), contrast=1.3, saturation=1.4, workers=1)
+        threaded = color_grade(overlay(frames, logo, 3, 3, 0.7, workers=4), contrast=1.3, saturation=1.4, workers=4)
+        np.testing.assert_array_equal(serial, threaded)
+
+    def test_batches_reuse_one_buffer(self):
+        frames = [np.full((2, 2, 3), i, dtype=np.uint8) for i in range(5)]
+        seen = [(batch, len(batch), int(batch[-1, 0, 0, 0])) for batch in batches(frames, 2)]
+        self.assertEqual([s[1:] for s in seen], [(2, 1), (2, 3), (1, 4)])
+        self.assertIs(seen[0][0], seen[1][0])
+        self.assertIs(seen[2][0].base, seen[0][0])
+
+    def test_image_round_trip(self):
+        temp_dir = tempfile.mkdtemp(prefix="frame_ops_test_")
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        frames = random_frames(count=3)
+        paths = [os.path.join(temp_dir, f"frame_{i:06d}.png") for i in range(1, 4)]
+        save_images(frames, paths, workers=2)
+        np.testing.assert_array_equal(load_images(paths, workers=2), frames)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
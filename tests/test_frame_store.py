@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test suite for frame_store.py
+
+Tests the on-disk layout, zero-copy access, read-only sharing with worker
+processes and PNG/video export.
+"""
+
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+from frame_store import HEADER_SIZE, FrameStore
+
+
+def frame_checksum(store: FrameStore, index: int) -> int:
+    """Process pool entry point: read one frame from the worker's own mapping"""
+    return int(store[index].sum(dtype=np.int64))
+
+
+def fill_frame(store: FrameStore, index: int):
+    """Process pool entry point: write one slot of a shared writable store"""
+    store.write(index, np.full(store.shape, index, dtype=np.uint8))
+    store.flush()
+
+
+class FrameStoreTestCase(unittest.TestCase):
+    """Base class with a scratch directory and sample frames"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="frame_store_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        self.path = os.path.join(self.temp_dir, "frames.vpf")
+        rng = np.random.default_rng(0)
+        self.frames = rng.integers(0, 256, (5, 6, 8, 3), dtype=np.uint8)
+
+
+class TestFrameStore(FrameStoreTestCase):
+    """Test cases for writing and reading stores"""
+
+    def test_sequential_pack_layout(self):
+        store = FrameStore.from_frames(self.path, iter(self.frames), fps=12, batch_size=2,
+                                       metadata={"stage": "ai"})
+        self.assertEqual(len(store), 5)
+        self.assertEqual(os.path.getsize(self.path), HEADER_SIZE + self.frames.nbytes + 5)
+        np.testing.assert_array_equal(store[3], self.frames[3])
+        self.assertIsInstance(store[1:4], np.memmap)
+        self.assertEqual(store.missing(), [])
+        self.assertEqual((store.fps, store.metadata), (12, {"stage": "ai"}))
+        self.assertFalse(os.path.exists(self.path + ".partial"))
+
+    def test_read_only_mapping(self):
+        FrameStore.from_batches(self.path, [self.frames])
+        store = FrameStore.open(self.path)
+        with self.assertRaises(ValueError):
+            store[0][0, 0, 0] = 1
+
+    def test_random_access_fill_tracks_gaps(self):
+        with FrameStore.create(self.path, 4, (2, 2, 1), fps=24) as store:
+            store.write(2, np.full((2, 2, 1), 7, dtype=np.uint8))
+            self.assertEqual(store.missing(), [0, 1, 3])
+        reopened = FrameStore.open(self.path)
+        self.assertEqual(reopened.missing(), [0, 1, 3])
+        self.assertEqual(int(reopened[2].max()), 7)
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a store")
+        with self.assertRaises(ValueError):
+            FrameStore.open(self.path)
+
+    def test_mismatched_frames_leave_nothing_behind(self):
+        with self.assertRaises(ValueError):
+            FrameStore.from_batches(self.path, [self.frames, self.frames[:, :3]])
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+
+class TestSharingAndExport(FrameStoreTestCase):
+    """Test cases for worker processes and compatibility exports"""
+
+    def test_pickles_by_path(self):
+        store = FrameStore.from_batches(self.path, [self.frames])
+        self.assertLess(len(pickle.dumps(store)), 200)
+
+    def test_workers_share_the_file(self):
+        store = FrameStore.from_batches(self.path, [self.frames])
+        writable = FrameStore.create(os.path.join(self.temp_dir, "out.vpf"), 3, (2, 2, 1))
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            sums = list(pool.map(frame_checksum, [store] * 5, range(5)))
+            list(pool.map(fill_frame, [writable] * 3, range(3)))
+        self.assertEqual(sums, [int(f.sum(dtype=np.int64)) for f in self.frames])
+        self.assertEqual(writable.missing(), [])
+        self.assertEqual(writable[:, 0, 0, 0].tolist(), [0, 1, 2])
+
+    def test_png_round_trip(self):
+        store = FrameStore.from_batches(self.path, [self.frames])
+        folder = os.path.join(self.temp_dir, "png")
+        paths = store.export_images(folder, batch_size=2)
+        self.assertEqual(os.path.basename(paths[0]), "frame_000001.png")
+        np.testing.assert_array_equal(np.asarray(Image.open(paths[4])), self.frames[4])
+
+        repacked = FrameStore.from_images(folder, os.path.join(self.temp_dir, "repacked.vpf"), batch_size=2)
+        np.testing.assert_array_equal(repacked[:], self.frames)
+
+    @unittest.skipUnless(shutil.which("ffmpeg") and shutil.which("ffprobe"), "ffmpeg not available")
+    def test_video_round_trip(self):
+        video = os.path.join(self.temp_dir, "in.mp4")
+        subprocess.run(["ffmpeg", "-f", "lavfi", "-i", "testsrc=duration=1:size=64x48:rate=12",
+                        "-pix_fmt", "yuv420p", "-y", video], check=True, capture_output=True)
+        store = FrameStore.from_video(video, self.path)
+        self.assertEqual((len(store), store.shape, store.fps), (12, (48, 64, 3), 12.0))
+        self.assertTrue(store.export_video(os.path.join(self.temp_dir, "out.mp4"), preset="ultrafast"))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
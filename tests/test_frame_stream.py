@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test suite for frame_stream.py
+
+Tests raw frame decoding into NumPy arrays and streaming frames back
+into an encoder without intermediate files.
+"""
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+from frame_stream import FrameWriter, read_frames, transform_video
+from video_processor import VideoProcessor
+
+
+class FakeProcess:
+    """Stand-in for an ffmpeg Popen emitting raw frames on stdout"""
+
+    def __init__(self, payload: bytes):
+        self.stdout = io.BufferedReader(io.BytesIO(payload), buffer_size=7)
+        self.returncode = 0
+
+    def poll(self):
+        return 0
+
+    def kill(self):
+        pass
+
+    def wait(self):
+        return 0
+
+
+class TestReadFrames(unittest.TestCase):
+    """Test cases for the rawvideo frame generator"""
+
+    def test_yields_one_array_per_frame(self):
+        """Raw bytes are split into (H, W, C) frames"""
+        frames = np.arange(2 * 4 * 6 * 3, dtype=np.uint8).reshape(2, 4, 6, 3)
+        with mock.patch("frame_stream.subprocess.Popen", return_value=FakeProcess(frames.tobytes())):
+            result = list(read_frames("in.mp4", size=(6, 4)))
+        self.assertEqual(len(result), 2)
+        self.assertEqual(result[0].shape, (4, 6, 3))
+        np.testing.assert_array_equal(result[1], frames[1])
+
+    def test_truncated_tail_is_dropped(self):
+        """A partial frame at EOF is not yielded"""
+        payload = bytes(4 * 6 * 3) + bytes(10)
+        with mock.patch("frame_stream.subprocess.Popen", return_value=FakeProcess(payload)):
+            result = list(read_frames("in.mp4", size=(6, 4)))
+        self.assertEqual(len(result), 1)
+
+    def test_unknown_size_raises(self):
+        """Without a size or probe result there is nothing to reshape into"""
+        with mock.patch.object(VideoProcessor, "get_video_info", return_value={}):
+            with self.assertRaises(ValueError):
+                next(read_frames("missing.mp4"))
+
+
+@unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg not available")
+class TestFrameRoundTrip(unittest.TestCase):
+    """Integration tests that run real ffmpeg pipes"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="frame_stream_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+
+    def test_write_then_read(self):
+        """Frames written by FrameWriter decode back with the same count and size"""
+        output = os.path.join(self.temp_dir, "out.mp4")
+        with FrameWriter(output, fps=12, preset="ultrafast") as writer:
+            for value in range(12):
+                writer.write(np.full((48, 64, 3), value * 20, dtype=np.uint8))
+        frames = list(read_frames(output))
+        self.assertEqual(len(frames), 12)
+        self.assertEqual(frames[0].shape, (48, 64, 3))
+
+    def test_transform_video(self):
+        """transform_video applies a per-frame function end to end"""
+        source = os.path.join(self.temp_dir, "source.mp4")
+        with FrameWriter(source, fps=12, preset="ultrafast") as writer:
+            for _ in range(6):
+                writer.write(np.full((32, 32, 3), 200, dtype=np.uint8))
+        output = os.path.join(self.temp_dir, "dark.mp4")
+        self.assertTrue(transform_video(source, output, lambda f: f // 4, preset="ultrafast"))
+        self.assertLess(next(read_frames(output)).mean(), 100)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Test suite for incremental.py
+
+Tests that reruns re-encode only the segments whose frames or source
+pieces changed, and that the spliced output is rebuilt from the rest.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+import incremental
+from incremental import SegmentStore, convert_incremental
+from video_processor import VideoProcessor
+
+
+class FakeFFmpeg:
+    """Records ffmpeg commands and writes their outputs"""
+
+    def __init__(self, pieces=None):
+        self.commands = []
+        # Contents of the pieces the segment muxer "writes"
+        self.pieces = pieces or []
+
+    def __call__(self, cmd, check):
+        self.commands.append(cmd)
+        if "segment" in cmd:
+            pattern = cmd[-1]
+            for index, content in enumerate(self.pieces):
+                Path(pattern.replace("%05d", f"{index:05d}")).write_bytes(content)
+            return
+        Path(cmd[-1]).write_bytes(b"encoded")
+
+    def count(self, marker: str) -> int:
+        return sum(1 for cmd in self.commands if marker in cmd)
+
+
+class IncrementalTestCase(unittest.TestCase):
+    """Base class with a scratch directory"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="incremental_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+
+
+class TestSegmentStore(IncrementalTestCase):
+    """Test cases for content hashes and the manifest"""
+
+    def test_hash_follows_content_not_timestamps(self):
+        path = os.path.join(self.temp_dir, "frame_000001.png")
+        Path(path).write_bytes(b"a")
+        store = SegmentStore(os.path.join(self.temp_dir, "out.mp4"))
+        first = store.content_hash(path)
+        os.utime(path, ns=(1, 1))
+        self.assertEqual(store.content_hash(path), first)
+        Path(path).write_bytes(b"b")
+        self.assertNotEqual(store.content_hash(path), first)
+
+    def test_save_drops_unused_segments(self):
+        store = SegmentStore(os.path.join(self.temp_dir, "out.mp4"))
+        kept, stale = store.segment_path("a" * 64), store.segment_path("b" * 64)
+        for path in (kept, stale):
+            Path(path).touch()
+        store.save([kept])
+        self.assertTrue(os.path.exists(kept))
+        self.assertFalse(os.path.exists(stale))
+        self.assertEqual(SegmentStore(os.path.join(self.temp_dir, "out.mp4")).manifest["segments"],
+                         [os.path.basename(kept)])
+
+
+class TestStitchIncremental(IncrementalTestCase):
+    """Test cases for frame sequences"""
+
+    def frames(self, count: int) -> str:
+        folder = os.path.join(self.temp_dir, "frames")
+        os.makedirs(folder, exist_ok=True)
+        for i in range(1, count + 1):
+            Path(folder, f"frame_{i:06d}.png").write_bytes(f"frame {i}".encode())
+        return folder
+
+    def stitch(self, folder: str, output: str, **options) -> FakeFFmpeg:
+        ffmpeg = FakeFFmpeg()
+        with mock.patch("incremental.SEGMENT_FRAMES", 4), \
+             mock.patch("video_processor.subprocess.run", side_effect=ffmpeg):
+            self.assertTrue(VideoProcessor.stitch_frames(folder, output, incremental=True, **options))
+        return ffmpeg
+
+    def test_only_changed_segments_are_reencoded(self):
+        folder = self.frames(10)
+        output = os.path.join(self.temp_dir, "out.mp4")
+        first = self.stitch(folder, output)
+        self.assertEqual(first.count("-start_number"), 3)
+        self.assertEqual(first.count("concat"), 1)
+        self.assertTrue(os.path.exists(output))
+
+        self.assertEqual(self.stitch(folder, output).count("-start_number"), 0)
+
+        Path(folder, "frame_000006.png").write_bytes(b"edited")
+        edited = self.stitch(folder, output)
+        starts = [cmd[cmd.index("-start_number") + 1] for cmd in edited.commands if "-start_number" in cmd]
+        self.assertEqual(starts, ["5"])
+        self.assertEqual(len(os.listdir(os.path.join(self.temp_dir, ".segments", "out.mp4"))), 4)
+
+    def test_thread_count_does_not_invalidate_segments(self):
+        folder = self.frames(4)
+        output = os.path.join(self.temp_dir, "out.mp4")
+        with mock.patch("video_processor._codec_args",
+                        side_effect=lambda profile, threads, default: ([], default + ["-threads", str(threads)])):
+            self.stitch(folder, output, threads=2)
+            self.assertEqual(self.stitch(folder, output, threads=8).count("-start_number"), 0)
+
+    def test_gaps_fall_back_to_single_pass(self):
+        folder = self.frames(3)
+        os.remove(os.path.join(folder, "frame_000002.png"))
+        ffmpeg = self.stitch(folder, os.path.join(self.temp_dir, "out.mp4"))
+        self.assertEqual(len(ffmpeg.commands), 1)
+        self.assertEqual(ffmpeg.count("-start_number"), 0)
+
+
+class TestConvertIncremental(IncrementalTestCase):
+    """Test cases for keyframe-aligned pieces of a video"""
+
+    def convert(self, pieces, output: str) -> list:
+        encoded = []
+
+        def fake_convert(input_path, output_path, **options):
+            encoded.append(Path(input_path).read_bytes())
+            Path(output_path).write_bytes(b"encoded")
+            return True
+
+        with mock.patch("video_processor.subprocess.run", side_effect=FakeFFmpeg(pieces)), \
+             mock.patch.object(VideoProcessor, "convert_video", side_effect=fake_convert):
+            self.assertTrue(convert_incremental("in.mp4", output, {"fps": 24, "threads": 4}))
+        return encoded
+
+    def test_only_changed_pieces_are_reencoded(self):
+        output = os.path.join(self.temp_dir, "out.mp4")
+        self.assertEqual(self.convert([b"a", b"b", b"c"], output), [b"a", b"b", b"c"])
+        self.assertEqual(self.convert([b"a", b"b", b"c"], output), [])
+        self.assertEqual(self.convert([b"a", b"B", b"c"], output), [b"B"])
+        # Split pieces are scratch; only encoded segments and the manifest stay
+        store = Path(self.temp_dir, ".segments", "out.mp4")
+        self.assertEqual(sorted(p.suffix for p in store.iterdir()), [".json", ".mp4", ".mp4", ".mp4"])
+
+    def test_source_audio_is_muxed_once_at_the_splice(self):
+        ffmpeg = FakeFFmpeg([b"a", b"b"])
+        with mock.patch("video_processor.subprocess.run", side_effect=ffmpeg), \
+             mock.patch.object(VideoProcessor, "convert_video", return_value=True):
+            convert_incremental("in.mp4", os.path.join(self.temp_dir, "out.mp4"), {})
+        split = next(cmd for cmd in ffmpeg.commands if "segment" in cmd)
+        self.assertNotIn("0:a?", split)
+        splice = next(cmd for cmd in ffmpeg.commands if "concat" in cmd)
+        audio = splice.index("in.mp4")
+        self.assertEqual(splice[audio - 1:audio + 9], ["-i", "in.mp4", "-map", "0:v:0", "-map", "1:a?",
+                                                       "-c:v", "copy", "-c:a", "aac"])
+
+    def test_cold_convert_splits_cores_across_pieces(self):
+        threads, barrier = [], threading.Barrier(2, timeout=5)
+
+        def fake_convert(input_path, output_path, **options):
+            threads.append(options["threads"])
+            barrier.wait()
+            Path(output_path).write_bytes(b"encoded")
+            return True
+
+        ffmpeg = FakeFFmpeg([b"a", b"b"])
+        with mock.patch("video_processor.subprocess.run", side_effect=ffmpeg), \
+             mock.patch.object(VideoProcessor, "convert_video", side_effect=fake_convert):
+            self.assertTrue(convert_incremental(
+                "in.mp4", os.path.join(self.temp_dir, "out.mp4"),
+                {"fps": 24, "audio_codec": "libopus", "audio_bitrate": "96k"}, workers=8
+            ))
+        # Both pieces were in flight together, with half the cores each
+        self.assertEqual(threads, [4, 4])
+        splice = next(cmd for cmd in ffmpeg.commands if "concat" in cmd)
+        self.assertEqual(splice[splice.index("-c:a") + 1:splice.index("-c:a") + 4], ["libopus", "-b:a", "96k"])
+
+    def test_failed_segment_fails_the_conversion(self):
+        with mock.patch("video_processor.subprocess.run", side_effect=FakeFFmpeg([b"a"])), \
+             mock.patch.object(VideoProcessor, "convert_video", return_value=False):
+            self.assertFalse(convert_incremental("in.mp4", os.path.join(self.temp_dir, "out.mp4"), {}))
+
+    @unittest.skipUnless(shutil.which("ffmpeg") and shutil.which("ffprobe"), "ffmpeg not available")
+    def test_real_convert_keeps_duration(self):
+        source = os.path.join(self.temp_dir, "source.mp4")
+        subprocess.run([
+            "ffmpeg", "-f", "lavfi", "-i", "testsrc=duration=6:size=320x240:rate=24",
+            "-g", "24", "-y", source
+        ], check=True, capture_output=True)
+        output = os.path.join(self.temp_dir, "out.mp4")
+        with mock.patch.object(incremental, "SEGMENT_SECONDS", 2):
+            self.assertTrue(VideoProcessor.convert_video(source, output, preset="ultrafast", incremental=True))
+        self.assertAlmostEqual(float(VideoProcessor.get_video_info(output)["duration"]), 6.0, delta=0.5)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
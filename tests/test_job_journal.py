@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test suite for job_journal.py
+
+Tests stage completion records, output verification, pipeline resume
+and atomic output writes.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+from job_journal import JobJournal
+from pipeline_runner import Pipeline, Stage
+from video_processor import atomic_output
+
+
+class JournalTestCase(unittest.TestCase):
+    """Base class with a scratch directory and journal"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="journal_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        self.journal = JobJournal(os.path.join(self.temp_dir, "job_journal.db"))
+        self.addCleanup(self.journal.close)
+
+    def write(self, name: str, data: str = "x") -> str:
+        path = os.path.join(self.temp_dir, name)
+        with open(path, "w") as f:
+            f.write(data)
+        return path
+
+
+class TestJobJournal(JournalTestCase):
+    """Test cases for JobJournal"""
+
+    def test_round_trip(self):
+        output = self.write("out.mp4")
+        self.journal.record("job", "clip", "convert", "h1", {"video": output, "frames": 3})
+        outputs, _ = self.journal.lookup("job", "clip", "convert", "h1")
+        self.assertEqual(outputs, {"video": output, "frames": 3})
+
+    def test_input_change_is_a_miss(self):
+        self.journal.record("job", "clip", "convert", "h1", {"video": self.write("out.mp4")})
+        self.assertIsNone(self.journal.lookup("job", "clip", "convert", "h2"))
+
+    def test_missing_or_modified_output_is_a_miss(self):
+        output = self.write("out.mp4")
+        self.journal.record("job", "clip", "convert", "h1", {"video": output})
+        time.sleep(0.01)
+        self.write("out.mp4", "truncated?")
+        self.assertIsNone(self.journal.lookup("job", "clip", "convert", "h1"))
+
+        self.journal.record("job", "clip", "convert", "h1", {"video": output})
+        os.remove(output)
+        self.assertIsNone(self.journal.lookup("job", "clip", "convert", "h1"))
+
+    def test_survives_reopen(self):
+        output = self.write("out.mp4")
+        self.journal.record("job", "clip", "convert", "h1", {"video": output})
+        reopened = JobJournal(self.journal.db_path)
+        self.addCleanup(reopened.close)
+        self.assertIsNotNone(reopened.lookup("job", "clip", "convert", "h1"))
+        self.assertEqual(reopened.completed("job"), {"clip": ["convert"]})
+
+
+class TestPipelineResume(JournalTestCase):
+    """Test cases for journaled pipeline reruns"""
+
+    def make_pipeline(self, calls, fail_on=()):
+        def encode(context):
+            calls.append(("encode", context["name"]))
+            return {"video": self.write(f"{context['name']}.mp4", context["name"])}
+
+        def finish(context):
+            calls.append(("finish", context["name"]))
+            if context["name"] in fail_on:
+                raise RuntimeError("crash")
+            return {"done": True}
+
+        return Pipeline([
+            Stage("encode", encode, workers=2),
+            Stage("finish", finish, ["encode"])
+        ], journal=self.journal, job="batch")
+
+    def test_rerun_picks_up_where_it_stopped(self):
+        inputs = [{"name": name, "source": self.write(f"{name}.src")} for name in "abc"]
+        first_calls = []
+        results = self.make_pipeline(first_calls, fail_on={"b"}).run(inputs)
+        self.assertEqual([r["status"] for r in results], ["completed", "failed", "completed"])
+
+        second_calls = []
+        results = self.make_pipeline(second_calls).run(inputs)
+        self.assertTrue(all(r["status"] == "completed" for r in results))
+        self.assertEqual(second_calls, [("finish", "b")])
+
+    def test_changed_source_reruns_stage(self):
+        source = self.write("a.src", "v1")
+        self.make_pipeline([]).run([{"name": "a", "source": source}])
+        time.sleep(0.01)
+        self.write("a.src", "version 2")
+        calls = []
+        self.make_pipeline(calls).run([{"name": "a", "source": source}])
+        self.assertEqual(calls, [("encode", "a"), ("finish", "a")])
+
+
+class TestAtomicOutput(unittest.TestCase):
+    """Test cases for atomic_output"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="atomic_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+
+    def test_failure_leaves_nothing(self):
+        target = os.path.join(self.temp_dir, "out.mp4")
+        with self.assertRaises(RuntimeError):
+            with atomic_output(target) as partial:
+                with open(partial, "w") as f:
+                    f.write("half")
+                raise RuntimeError("ffmpeg died")
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+    def test_success_renames_into_place(self):
+        target = os.path.join(self.temp_dir, "out.mp4")
+        with atomic_output(target) as partial:
+            self.assertTrue(partial.endswith(".mp4"))
+            with open(partial, "w") as f:
+                f.write("done")
+        self.assertEqual(os.listdir(self.temp_dir), ["out.mp4"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Test suite for job_server.py
+
+Tests priority ordering, the fixed worker pool, cancellation and the HTTP
+API with server-sent progress events.
+"""
+
+import json
+import os
+import sys
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+import job_server
+from job_server import JobHTTPServer, JobServer
+
+
+class RecordingJobs:
+    """Job kinds that record their order and can be held on a gate"""
+
+    def __init__(self):
+        self.order = []
+        self.gate = threading.Event()
+        self.holding = threading.Event()
+        self.lock = threading.Lock()
+
+    def hold(self, worker, params):
+        self.holding.set()
+        self.gate.wait(5)
+        return self.record(worker, params)
+
+    def record(self, worker, params):
+        worker.progress(0.5, "halfway")
+        with self.lock:
+            self.order.append(params["name"])
+        return {"name": params["name"], "worker": worker.name}
+
+    def fail(self, worker, params):
+        raise RuntimeError("boom")
+
+
+class JobServerTestCase(unittest.TestCase):
+    """Base class registering test job kinds"""
+
+    def setUp(self):
+        self.kinds = RecordingJobs()
+        patcher = mock.patch.dict(job_server.JOB_TYPES, {
+            "hold": self.kinds.hold, "record": self.kinds.record, "fail": self.kinds.fail
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def wait_for(self, jobs, job_id):
+        """Follow a job's events until it finishes; returns the final job"""
+        last = 0
+        while True:
+            events = jobs.events(last, job_id, timeout=5)
+            self.assertTrue(events, "timed out waiting for job events")
+            last = events[-1]["seq"]
+            if events[-1]["job"]["status"] in job_server.TERMINAL:
+                return events[-1]["job"]
+
+
+class TestJobServer(JobServerTestCase):
+    """Test cases for the queue and worker pool"""
+
+    def test_interactive_jobs_jump_the_queue(self):
+        jobs = JobServer(workers=1).start()
+        self.addCleanup(jobs.stop, 5)
+        jobs.submit("hold", {"name": "blocker"}, "batch")
+        self.assertTrue(self.kinds.holding.wait(5))
+        queued = [jobs.submit("record", {"name": name}, priority) for name, priority in
+                  (("bulk-1", "batch"), ("bulk-2", "batch"), ("preview", "interactive"), ("n", 5))]
+        self.kinds.gate.set()
+        for job in queued:
+            self.wait_for(jobs, job.id)
+        self.assertEqual(self.kinds.order, ["blocker", "preview", "n", "bulk-1", "bulk-2"])
+
+    def test_results_failures_and_cancellation(self):
+        jobs = JobServer(workers=1).start()
+        self.addCleanup(jobs.stop, 5)
+        blocker = jobs.submit("hold", {"name": "blocker"})
+        self.assertTrue(self.kinds.holding.wait(5))
+        queued = jobs.submit("record", {"name": "never"})
+        failing = jobs.submit("fail", priority="interactive")
+        self.assertTrue(jobs.cancel(queued.id))
+        self.assertFalse(jobs.cancel(queued.id))
+        self.kinds.gate.set()
+
+        self.assertEqual(self.wait_for(jobs, blocker.id)["result"]["name"], "blocker")
+        failed = self.wait_for(jobs, failing.id)
+        self.assertEqual((failed["status"], failed["error"]), ("failed", "boom"))
+        self.assertNotIn("never", self.kinds.order)
+        self.assertEqual(jobs.stats()["jobs"], {"completed": 1, "failed": 1, "cancelled": 1})
+
+    def test_rejects_unknown_kinds_and_priorities(self):
+        jobs = JobServer()
+        with self.assertRaises(ValueError):
+            jobs.submit("teleport")
+        with self.assertRaises(ValueError):
+            jobs.submit("record", priority="urgent")
+
+    def test_preview_queues_the_full_render(self):
+        result = [{"name": "clip", "status": "completed", "output": "out.mp4"}]
+        jobs = JobServer(workers=1).start()
+        self.addCleanup(jobs.stop, 5)
+        with mock.patch("pipeline_runner.run_preview", return_value=(result, None)) as preview, \
+             mock.patch("pipeline_runner.run_spec", return_value=result) as full:
+            job = jobs.submit("pipeline", {"input": "in", "preview": True}, "preview")
+            finished = self.wait_for(jobs, job.id)
+            final = self.wait_for(jobs, finished["result"]["full_job"])
+        self.assertEqual(final["status"], "completed")
+        self.assertEqual(final["priority"], job_server.PRIORITIES["batch"])
+        self.assertFalse(preview.call_args.kwargs["full"])
+        self.assertEqual(full.call_count, 1)
+        # Pipeline runs get the worker's share of the cores
+        cores = max(1, (os.cpu_count() or 1))
+        self.assertEqual((preview.call_args.kwargs["cores"], full.call_args.kwargs["cores"]), (cores, cores))
+
+    def test_workers_split_the_cores(self):
+        with mock.patch("job_server.os.cpu_count", return_value=8):
+            jobs = JobServer(workers=3).start()
+        self.addCleanup(jobs.stop, 5)
+        job = jobs.submit("record", {"name": "x"})
+        self.assertIn(self.wait_for(jobs, job.id)["result"]["worker"], {"worker-0", "worker-1", "worker-2"})
+
+
+class TestHTTP(JobServerTestCase):
+    """Test cases for the HTTP API"""
+
+    def setUp(self):
+        super().setUp()
+        self.jobs = JobServer(workers=2).start()
+        self.httpd = JobHTTPServer(self.jobs, port=0, keepalive=0.2)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.addCleanup(self.jobs.stop, 5)
+        self.addCleanup(self.httpd.server_close)
+        self.addCleanup(self.httpd.shutdown)
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def test_submit_and_stream_progress(self):
+        status, job = self.request("POST", "/jobs", {"kind": "record", "params": {"name": "clip"},
+                                                     "priority": "interactive"})
+        self.assertEqual(status, 202)
+        with urllib.request.urlopen(f"{self.url}/jobs/{job['id']}/events", timeout=5) as stream:
+            body = stream.read().decode()
+        events = [line.split(": ", 1)[1] for line in body.splitlines() if line.startswith("event: ")]
+        self.assertEqual(events[0], "queued")
+        self.assertIn("progress", events)
+        self.assertEqual(events[-1], "completed")
+
+        status, finished = self.request("GET", f"/jobs/{job['id']}")
+        self.assertEqual((status, finished["progress"], finished["result"]["name"]), (200, 1.0, "clip"))
+        self.assertEqual(self.request("GET", "/jobs")[1][0]["id"], job["id"])
+        self.assertEqual(self.request("GET", "/health")[1]["workers"], 2)
+
+    def test_errors(self):
+        self.assertEqual(self.request("POST", "/jobs", {"kind": "teleport"})[0], 400)
+        self.assertEqual(self.request("GET", "/jobs/missing")[0], 404)
+        self.assertEqual(self.request("DELETE", "/jobs/missing")[0], 404)
+        self.assertEqual(self.request("GET", "/../../etc/passwd")[0], 404)
+
+    def test_rejects_other_origins_and_non_json_bodies(self):
+        body = json.dumps({"kind": "record", "params": {"name": "x"}}).encode()
+
+        def post(headers):
+            request = urllib.request.Request(self.url + "/jobs", data=body, method="POST", headers=headers)
+            try:
+                with urllib.request.urlopen(request, timeout=5) as response:
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+
+        self.assertEqual(post({"Content-Type": "text/plain"}), 415)
+        self.assertEqual(post({"Content-Type": "application/json", "Origin": "http://evil.example"}), 403)
+        self.assertEqual(post({"Content-Type": "application/json", "Host": "evil.example"}), 403)
+        self.assertEqual(post({"Content-Type": "application/json", "Origin": self.url}), 202)
+        self.assertEqual(len(self.jobs.jobs), 1)
+
+    def test_stream_of_finished_job_with_no_history_closes(self):
+        status, job = self.request("POST", "/jobs", {"kind": "record", "params": {"name": "clip"}})
+        self.wait_for(self.jobs, job["id"])
+        self.jobs._events.clear()
+        with urllib.request.urlopen(f"{self.url}/jobs/{job['id']}/events", timeout=5) as stream:
+            body = stream.read().decode()
+        events = [line.split(": ", 1)[1] for line in body.splitlines() if line.startswith("event: ")]
+        self.assertEqual(events, ["completed"])
+        self.assertIn('"result"', body)
+
+    def test_serves_web_gui(self):
+        with urllib.request.urlopen(self.url + "/", timeout=5) as response:
+            self.assertIn("text/html", response.headers["Content-Type"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
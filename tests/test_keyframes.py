@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Test suite for keyframes.py
+
+Tests perceptual hashing, keyframe run selection, the timeline written by
+scene sampling and its expansion when stitching.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+from keyframes import dhash, hamming, image_hash, sample_keyframes, select_keyframes, write_concat_list
+from video_processor import VideoProcessor
+
+
+def gradient(reverse: bool = False) -> np.ndarray:
+    """An (8, 9) frame brightening left to right (or right to left)"""
+    row = np.arange(9, dtype=np.uint8) * 20
+    return np.tile(row[::-1] if reverse else row, (8, 1))
+
+
+class TestHashing(unittest.TestCase):
+    """Test cases for dHash computation"""
+
+    def test_dhash_bits(self):
+        hashes = dhash(np.stack([gradient(), gradient(reverse=True)]))
+        self.assertEqual(hashes.dtype, np.uint64)
+        self.assertEqual(int(hashes[0]), 2 ** 64 - 1)
+        self.assertEqual(int(hashes[1]), 0)
+        self.assertEqual(hamming(hashes[0], hashes[1]), 64)
+
+    def test_image_hash_matches_frame_hash(self):
+        temp_dir = tempfile.mkdtemp(prefix="keyframes_test_")
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        path = os.path.join(temp_dir, "frame.png")
+        Image.fromarray(gradient()).resize((90, 80), Image.Resampling.NEAREST).save(path)
+        self.assertEqual(image_hash(path), 2 ** 64 - 1)
+
+
+class TestSelectKeyframes(unittest.TestCase):
+    """Test cases for grouping frames into keyframe runs"""
+
+    def test_near_duplicates_collapse_and_cuts_split(self):
+        hashes = np.array([0, 1, 3, 0, 2 ** 40 - 1, 2 ** 40 - 1, 0], dtype=np.uint64)
+        self.assertEqual(select_keyframes(hashes, threshold=4), [(0, 4), (4, 2), (6, 1)])
+
+    def test_max_run_bounds_held_frames(self):
+        hashes = np.zeros(5, dtype=np.uint64)
+        self.assertEqual(select_keyframes(hashes, max_run=2), [(0, 2), (2, 2), (4, 1)])
+
+    def test_empty(self):
+        self.assertEqual(select_keyframes(np.array([], dtype=np.uint64)), [])
+
+
+class TestTimeline(unittest.TestCase):
+    """Test cases for scene sampling and stitching from a timeline"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="keyframes_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        self.frames = os.path.join(self.temp_dir, "frames")
+
+    def test_sample_writes_keyframes_and_timeline(self):
+        # Three near-identical frames, then a cut held for two frames
+        raw = np.stack([gradient(), gradient(), gradient(), gradient(True), gradient(True)]).tobytes()
+        commands = []
+
+        def fake_ffmpeg(cmd, name):
+            with open(cmd[cmd.index("-filter_script:v") + 1]) as f:
+                commands.append(f.read())
+            for index in (1, 2):
+                Path(cmd[-1] % index).touch()
+
+        with mock.patch("keyframes.subprocess.run", return_value=mock.Mock(stdout=raw)), \
+                mock.patch("keyframes.run_ffmpeg", side_effect=fake_ffmpeg):
+            self.assertTrue(VideoProcessor.extract_frames("in.mp4", self.frames, fps=12, sampling="scene"))
+
+        (script,) = commands
+        self.assertEqual(script, "fps=12,select='eq(n\\,0)+eq(n\\,3)'")
+        with open(os.path.join(self.frames, "keyframes.json")) as f:
+            timeline = json.load(f)
+        self.assertEqual(timeline["frame_count"], 5)
+        self.assertEqual(timeline["keyframes"], [
+            {"file": "frame_000001.png", "start": 0, "count": 3},
+            {"file": "frame_000002.png", "start": 3, "count": 2}
+        ])
+
+    def test_fixed_extraction_clears_an_earlier_scene_sample(self):
+        os.makedirs(self.frames)
+        for name in ("keyframes.json", "frame_000001.png", "frame_000009.png"):
+            Path(self.frames, name).touch()
+
+        def fake_ffmpeg(cmd, check):
+            Path(cmd[-1] % 1).touch()
+
+        with mock.patch("tracing.subprocess.run", side_effect=fake_ffmpeg):
+            self.assertTrue(VideoProcessor.extract_frames("in.mp4", self.frames, fps=12))
+        self.assertEqual(os.listdir(self.frames), ["frame_000001.png"])
+
+    def test_unknown_sampling_mode_fails(self):
+        self.assertFalse(VideoProcessor.extract_frames("in.mp4", self.frames, sampling="random"))
+
+    def test_concat_list_holds_each_keyframe(self):
+        timeline = {"fps": 24, "keyframes": [
+            {"file": "frame_000001.png", "start": 0, "count": 48},
+            {"file": "frame_000002.png", "start": 48, "count": 6}
+        ]}
+        list_path = os.path.join(self.temp_dir, "list.txt")
+        write_concat_list(timeline, self.frames, list_path)
+        with open(list_path) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[1], "duration 2.000000")
+        self.assertEqual(lines[3], "duration 0.250000")
+        self.assertEqual(lines[4], lines[2])
+
+    def test_stitch_uses_timeline_from_frame_folder(self):
+        os.makedirs(self.frames)
+        with open(os.path.join(self.frames, "keyframes.json"), "w") as f:
+            json.dump({"fps": 24, "frame_count": 54, "keyframes": [
+                {"file": "frame_000001.png", "start": 0, "count": 54}]}, f)
+        commands = []
+
+        def fake_ffmpeg(cmd, check):
+            commands.append(cmd)
+            Path(cmd[-1]).touch()
+
+        output = os.path.join(self.temp_dir, "out.mp4")
+        with mock.patch("tracing.subprocess.run", side_effect=fake_ffmpeg):
+            self.assertTrue(VideoProcessor.stitch_frames(self.frames, output, fps=12))
+        (cmd,) = commands
+        self.assertEqual(cmd[cmd.index("-f") + 1], "concat")
+        self.assertEqual(cmd[cmd.index("-vf") + 1], "fps=24")
+        self.assertEqual(cmd[cmd.index("-frames:v") + 1], "54")
+        self.assertTrue(os.path.exists(output))
+
+
+@unittest.skipUnless(shutil.which("ffmpeg") and shutil.which("ffprobe"), "ffmpeg not available")
+class TestKeyframesWithFfmpeg(unittest.TestCase):
+    """End-to-end sampling and stitching against real ffmpeg"""
+
+    def test_two_scenes_round_trip(self):
+        temp_dir = tempfile.mkdtemp(prefix="keyframes_test_")
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        video = os.path.join(temp_dir, "scenes.mp4")
+        subprocess.run([
+            "ffmpeg", "-f", "lavfi", "-i", "testsrc=duration=1:size=160x120:rate=24",
+            "-f", "lavfi", "-i", "smptebars=duration=1:size=160x120:rate=24",
+            "-filter_complex", "[0:v]trim=end_frame=1,loop=23:1[a];[1:v]trim=end_frame=1,loop=23:1[b];"
+                               "[a][b]concat=n=2:v=1[out]",
+            "-map", "[out]", "-pix_fmt", "yuv420p", "-y", video
+        ], check=True, capture_output=True)
+
+        frames = os.path.join(temp_dir, "frames")
+        self.assertTrue(VideoProcessor.extract_frames(video, frames, fps=24, sampling="scene"))
+        self.assertEqual(len(list(Path(frames).glob("*.png"))), 2)
+
+        output = os.path.join(temp_dir, "out.mp4")
+        self.assertTrue(VideoProcessor.stitch_frames(frames, output))
+        info = VideoProcessor.get_video_info(output)
+        self.assertAlmostEqual(float(info["duration"]), 2.0, delta=0.1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test suite for op_chain.py
+
+Tests compilation of chained operations into a single ffmpeg command,
+the stream-copy fast paths, and an end-to-end run when ffmpeg exists.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+from video_processor import VideoProcessor
+
+STEREO = {"codec": "aac", "sample_rate": "48000", "channels": 2}
+
+
+def probe(width: int, height: int, pix_fmt: str = "yuv420p", audio=STEREO) -> dict:
+    """Fake _probe result; the signature covers every stream-copy property"""
+    return {"codec": "h264", "width": width, "height": height, "fps": 24.0, "duration": 2.0,
+            "audio": audio, "signature": f"{width}x{height}/{pix_fmt}/{audio}"}
+
+
+H264_720 = probe(1280, 720)
+H264_480 = probe(854, 480)
+
+
+class ChainTestCase(unittest.TestCase):
+    """Base class that fakes ffprobe results per input name"""
+
+    probes = {"a.mp4": H264_720, "b.mp4": H264_720, "small.mp4": H264_480,
+              "yuv444.mp4": probe(1280, 720, pix_fmt="yuv444p"), "silent.mp4": probe(1280, 720, audio=None)}
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="chain_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        self.list_file = os.path.join(self.temp_dir, "list.txt")
+        patch = mock.patch("op_chain._probe", side_effect=lambda path: self.probes[path])
+        patch.start()
+        self.addCleanup(patch.stop)
+
+
+class TestCompile(ChainTestCase):
+    """Test cases for OperationChain.compile"""
+
+    def test_transforms_fuse_into_one_filter_chain(self):
+        cmd = (VideoProcessor.chain("a.mp4").fps(30).scale(2)
+               .codec("libx264", preset="slow", crf=18).compile("out.mp4"))
+        self.assertEqual(cmd.count("-i"), 1)
+        self.assertEqual(cmd[cmd.index("-vf") + 1], "fps=30,scale=iw*2:ih*2")
+        self.assertEqual(cmd[cmd.index("-crf") + 1], "18")
+        self.assertEqual(cmd[-1], "out.mp4")
+
+    def test_noop_operations_become_stream_copy(self):
+        cmd = VideoProcessor.chain("a.mp4").fps(24).scale(1).codec("libx264").compile("out.mkv")
+        self.assertEqual(cmd, ["ffmpeg", "-i", "a.mp4", "-map", "0", "-c", "copy", "-y", "out.mkv"])
+
+    def test_quality_setting_forces_encode(self):
+        cmd = VideoProcessor.chain("a.mp4").codec("libx264", crf=30).compile("out.mp4")
+        self.assertNotIn("copy", cmd)
+
+    def test_compatible_concat_uses_demuxer_copy(self):
+        cmd = VideoProcessor.chain("a.mp4").concat(["b.mp4"]).compile("out.mp4", self.list_file)
+        self.assertEqual(cmd[cmd.index("-c") + 1], "copy")
+        self.assertIn("concat", cmd)
+        with open(self.list_file) as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+    def test_mismatched_concat_normalizes_then_filters_once(self):
+        cmd = VideoProcessor.chain("a.mp4").concat(["small.mp4"]).scale(width=640).compile("out.mp4")
+        graph = cmd[cmd.index("-filter_complex") + 1]
+        self.assertIn("[1:v:0]scale=1280:720:force_original_aspect_ratio=decrease,pad=1280:720", graph)
+        self.assertNotIn("[0:v:0]scale", graph)
+        self.assertIn("concat=n=2:v=1:a=1[vcat][aout]", graph)
+        self.assertIn("[vcat]null,scale=640:-2[vout]", graph)
+        self.assertEqual(cmd.count("-map"), 2)
+
+    def test_concat_copy_needs_matching_signature(self):
+        """Same codec and size is not enough when the pixel format differs"""
+        cmd = VideoProcessor.chain("a.mp4").concat(["yuv444.mp4"]).compile("out.mp4", self.list_file)
+        self.assertNotIn("copy", cmd)
+        self.assertIn("-filter_complex", cmd)
+
+    def test_concat_pads_clips_without_audio(self):
+        cmd = VideoProcessor.chain("a.mp4").concat(["silent.mp4"]).compile("out.mp4")
+        graph = cmd[cmd.index("-filter_complex") + 1]
+        self.assertIn("anullsrc=channel_layout=stereo:sample_rate=48000,atrim=duration=2.000000[a1]", graph)
+        self.assertIn("[v0][0:a:0][v1][a1]concat=n=2:v=1:a=1[vcat][aout]", graph)
+        self.assertIn("[aout]", cmd)
+
+    def test_frame_sequence_source(self):
+        cmd = VideoProcessor.chain_frames("frames", fps=24).fps(24).scale(2).compile("out.mp4")
+        self.assertEqual(cmd[1:5], ["-framerate", "24", "-i", os.path.join("frames", "frame_%06d.png")])
+        self.assertEqual(cmd[cmd.index("-vf") + 1], "scale=iw*2:ih*2")
+        self.assertNotIn("-c:a", cmd)
+
+
+class TestRun(ChainTestCase):
+    """Test cases for OperationChain.run"""
+
+    def test_single_ffmpeg_invocation(self):
+        output = os.path.join(self.temp_dir, "out.mp4")
+
+        def fake_ffmpeg(cmd, check):
+            Path(cmd[-1]).touch()
+
+        with mock.patch("tracing.subprocess.run", side_effect=fake_ffmpeg) as run:
+            self.assertTrue(VideoProcessor.chain("a.mp4").fps(30).scale(2).run(output))
+        self.assertEqual(run.call_count, 1)
+        self.assertTrue(os.path.exists(output))
+
+    def test_failure_returns_false(self):
+        error = subprocess.CalledProcessError(1, "ffmpeg")
+        with mock.patch("tracing.subprocess.run", side_effect=error):
+            self.assertFalse(VideoProcessor.chain("a.mp4").scale(2).run(os.path.join(self.temp_dir, "x.mp4")))
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+
+@unittest.skipUnless(shutil.which("ffmpeg") and shutil.which("ffprobe"), "ffmpeg not available")
+class TestChainWithFfmpeg(unittest.TestCase):
+    """End-to-end chain against real ffmpeg"""
+
+    def test_fps_scale_concat_in_one_pass(self):
+        temp_dir = tempfile.mkdtemp(prefix="chain_test_")
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        clips = []
+        for size in ("320x240", "160x120"):
+            clips.append(os.path.join(temp_dir, f"{size}.mp4"))
+            subprocess.run(["ffmpeg", "-f", "lavfi", "-i", f"testsrc=duration=1:size={size}:rate=24",
+                            "-pix_fmt", "yuv420p", "-y", clips[-1]], check=True, capture_output=True)
+        output = os.path.join(temp_dir, "out.mp4")
+        chain = VideoProcessor.chain(clips[0]).concat(clips[1:]).fps(12).scale(2).codec(preset="ultrafast")
+        self.assertTrue(chain.run(output))
+        info = VideoProcessor.get_video_info(output)
+        self.assertEqual((info["width"], info["height"]), (640, 480))
+        self.assertAlmostEqual(float(info["duration"]), 2.0, delta=0.3)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
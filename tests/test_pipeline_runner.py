@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Test suite for pipeline_runner.py
+
+Tests stage graph validation, overlapping execution across inputs,
+failure propagation and JSON spec handling.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+from ai_client import AIClient
+from pipeline_runner import (Pipeline, Stage, build_pipeline, collect_inputs, execute_spec, preview_spec,
+                             run_preview)
+from video_processor import VideoProcessor
+
+
+def sleeper(seconds: float, key: str):
+    """Stage function that sleeps and records its name"""
+    def run(context):
+        time.sleep(seconds)
+        return {key: True}
+    return run
+
+
+class TestPipeline(unittest.TestCase):
+    """Test cases for the stage graph executor"""
+
+    def test_rejects_cycles_and_unknown_dependencies(self):
+        with self.assertRaises(ValueError):
+            Pipeline([Stage("a", sleeper(0, "a"), ["b"]), Stage("b", sleeper(0, "b"), ["a"])])
+        with self.assertRaises(ValueError):
+            Pipeline([Stage("a", sleeper(0, "a"), ["missing"])])
+
+    def test_stages_overlap_across_inputs(self):
+        """Batch time approaches the slowest stage, not the sum of stages"""
+        pipeline = Pipeline([
+            Stage("encode", sleeper(0.1, "encoded"), workers=4),
+            Stage("provider", sleeper(0.1, "provided"), ["encode"], workers=4),
+            Stage("stitch", sleeper(0.1, "stitched"), ["provider"], workers=4)
+        ])
+        started = time.perf_counter()
+        results = pipeline.run([{"name": str(i)} for i in range(4)])
+        elapsed = time.perf_counter() - started
+        self.assertTrue(all(r["status"] == "completed" and r["stitched"] for r in results))
+        self.assertLess(elapsed, 4 * 3 * 0.1 / 2)
+
+    def test_parallel_branches_join(self):
+        """A stage waits for all of its parents"""
+        order = []
+        lock = threading.Lock()
+
+        def record(name):
+            def run(context):
+                with lock:
+                    order.append(name)
+            return run
+
+        pipeline = Pipeline([
+            Stage("extract", record("extract")),
+            Stage("ai", record("ai"), ["extract"]),
+            Stage("probe", record("probe"), ["extract"]),
+            Stage("stitch", record("stitch"), ["ai", "probe"])
+        ])
+        pipeline.run([{"name": "clip"}])
+        self.assertEqual(order[0], "extract")
+        self.assertEqual(order[-1], "stitch")
+
+    def test_failure_skips_downstream_only_for_that_input(self):
+        def flaky(context):
+            if context["name"] == "bad":
+                raise RuntimeError("boom")
+
+        ran = []
+        pipeline = Pipeline([
+            Stage("first", flaky, workers=2),
+            Stage("second", lambda c: ran.append(c["name"]), ["first"])
+        ])
+        results = pipeline.run([{"name": "good"}, {"name": "bad"}])
+        self.assertEqual([r["status"] for r in results], ["completed", "failed"])
+        self.assertEqual(results[1]["failed_stage"], "first")
+        self.assertEqual(ran, ["good"])
+
+    def test_batch_stage_sees_completed_inputs(self):
+        seen = []
+        pipeline = Pipeline([
+            Stage("work", lambda c: False if c["name"] == "x" else None),
+            Stage("combine", lambda contexts: seen.extend(c["name"] for c in contexts),
+                  ["work"], scope="batch")
+        ])
+        pipeline.run([{"name": "a"}, {"name": "x"}, {"name": "b"}])
+        self.assertEqual(sorted(seen), ["a", "b"])
+
+
+class TestSpec(unittest.TestCase):
+    """Test cases for building pipelines from JSON specs"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="pipeline_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+
+    def test_example_config_builds(self):
+        """The shipped example spec produces the expected graph"""
+        path = os.path.join(os.path.dirname(__file__), '..', 'examples', 'example_config.json')
+        with open(path) as f:
+            spec = json.load(f)
+        pipeline = build_pipeline(spec)
+        self.assertEqual(pipeline.order, ["extract", "ai", "stitch", "convert", "publish"])
+        self.assertEqual(pipeline.stages["extract"].workers, 2)
+
+    def test_unknown_stage_type(self):
+        with self.assertRaises(ValueError):
+            build_pipeline({"stages": [{"name": "x", "type": "teleport"}]})
+
+    def test_encode_options_reach_video_processor(self):
+        spec = {"stages": [
+            {"name": "stitch", "type": "stitch_frames", "params": {"incremental": True}},
+            {"name": "convert", "type": "convert_video", "after": ["stitch"],
+             "params": {"segments": 4, "incremental": True}}
+        ]}
+        pipeline = build_pipeline(spec)
+        context = {"frames_dir": "frames", "video": "in.mp4", "work_dir": self.temp_dir}
+        with mock.patch.object(VideoProcessor, "stitch_frames", return_value=True) as stitch, \
+             mock.patch.object(VideoProcessor, "convert_video", return_value=True) as convert:
+            pipeline.stages["stitch"].func(dict(context))
+            pipeline.stages["convert"].func(dict(context))
+        self.assertTrue(stitch.call_args.kwargs["incremental"])
+        self.assertNotIn("segments", stitch.call_args.kwargs)
+        self.assertEqual((convert.call_args.kwargs["segments"], convert.call_args.kwargs["incremental"]), (4, True))
+
+    def run_default_chain(self, processing: dict) -> tuple:
+        """Default graph with faked ffmpeg steps and provider; returns (context, stitched files)"""
+        def fake_extract(video_path, output_folder, **options):
+            os.makedirs(output_folder)
+            for i in (1, 2):
+                Path(output_folder, f"frame_{i:06d}.png").write_bytes(b"original")
+            if options.get("sampling") == "scene":
+                Path(output_folder, "keyframes.json").write_text('{"fps": 24}')
+            return True
+
+        async def fake_batch(client, items):
+            results = []
+            for frame, _ in items:
+                result = os.path.join(self.temp_dir, "provider_" + os.path.basename(frame))
+                Path(result).write_bytes(b"enhanced")
+                results.append(result)
+            return results
+
+        stitched = {}
+
+        def fake_stitch(frame_folder, output_video, **options):
+            stitched.update({p.name: p.read_bytes() for p in Path(frame_folder).iterdir()})
+            Path(output_video).touch()
+            return True
+
+        pipeline = build_pipeline({"ai_providers": {"comfyui": {"enabled": True}},
+                                   "processing": processing,
+                                   "paths": {"output": os.path.join(self.temp_dir, "output")}})
+        with mock.patch.object(VideoProcessor, "extract_frames", side_effect=fake_extract), \
+             mock.patch("pipeline_runner.AsyncAIClient.process_batch", fake_batch), \
+             mock.patch.object(VideoProcessor, "stitch_frames", side_effect=fake_stitch), \
+             mock.patch.object(VideoProcessor, "convert_video",
+                               side_effect=lambda i, o, **options: Path(o).touch() or True):
+            context = pipeline.run([{"name": "clip", "source": "", "video": "in.mp4",
+                                    "work_dir": self.temp_dir}])[0]
+        self.assertEqual(context["status"], "completed", context.get("error"))
+        return context, stitched
+
+    def test_default_chain_stitches_the_ai_frames(self):
+        _, stitched = self.run_default_chain({})
+        self.assertEqual(stitched, {"frame_000001.png": b"enhanced", "frame_000002.png": b"enhanced"})
+
+    def test_scene_timeline_follows_the_ai_frames(self):
+        """Stitching the AI frames of a scene-sampled clip still finds its timeline"""
+        _, stitched = self.run_default_chain({"frame_sampling": "scene"})
+        self.assertEqual(stitched["keyframes.json"], b'{"fps": 24}')
+        self.assertEqual(stitched["frame_000001.png"], b"enhanced")
+
+    def test_spec_run_closes_provider_clients(self):
+        """Each run's provider loop thread and session are released when it ends"""
+        spec = {"ai_providers": {"comfyui": {"enabled": True}},
+                "paths": {"input": os.path.join(self.temp_dir, "none"),
+                          "temp": os.path.join(self.temp_dir, "temp")}}
+        built = []
+
+        def build(*args):
+            built.append(build_pipeline(*args))
+            return built[-1]
+
+        with mock.patch.object(AIClient, "enable_dedup"), \
+             mock.patch("pipeline_runner.build_pipeline", side_effect=build):
+            self.assertEqual(execute_spec(spec), [])
+        stage = built[0].stages["ai"].func
+        self.assertFalse(stage.thread.is_alive())
+        self.assertTrue(stage.loop.is_closed())
+        self.assertTrue(stage.client._executor._shutdown)
+
+    def test_core_budget_splits_across_stage_workers(self):
+        spec = {"processing": {"cores": 4}, "stages": [
+            {"name": "convert", "type": "convert_video", "workers": 2}
+        ]}
+        pipeline = build_pipeline(spec)
+        with mock.patch.object(VideoProcessor, "convert_video", return_value=True) as convert:
+            pipeline.stages["convert"].func({"video": "in.mp4", "work_dir": self.temp_dir})
+        self.assertEqual(convert.call_args.kwargs["threads"], 2)
+
+    def test_extract_threads_split_across_stage_workers(self):
+        spec = {"processing": {"cores": 8}, "stages": [
+            {"name": "extract", "type": "extract_frames", "workers": 4}
+        ]}
+        pipeline = build_pipeline(spec)
+        with mock.patch.object(VideoProcessor, "extract_frames", return_value=True) as extract:
+            pipeline.stages["extract"].func({"video": "in.mp4", "work_dir": self.temp_dir})
+        self.assertEqual(extract.call_args.kwargs["threads"], 2)
+
+    def test_collect_inputs(self):
+        input_dir = os.path.join(self.temp_dir, "input")
+        os.makedirs(input_dir)
+        for name in ("b.mp4", "a.mp4", "notes.txt"):
+            open(os.path.join(input_dir, name), "w").close()
+        spec = {"paths": {"input": input_dir, "temp": os.path.join(self.temp_dir, "temp")}}
+        contexts = collect_inputs(spec)
+        self.assertEqual([c["name"] for c in contexts], ["a", "b"])
+        self.assertTrue(os.path.isdir(contexts[0]["work_dir"]))
+
+
+class TestPreview(unittest.TestCase):
+    """Test cases for preview renders from the same spec"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="pipeline_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+
+    def test_preview_spec_prepends_a_proxy(self):
+        spec = {
+            "pipeline": {"name": "job"},
+            "paths": {"output": "out"},
+            "processing": {"frame_extraction_fps": 12},
+            "preview": {"every": 3},
+            "distributed": {"enabled": True}
+        }
+        preview = preview_spec(spec)
+        stages = {entry["name"]: entry for entry in preview["stages"]}
+        self.assertEqual(preview["stages"][0]["type"], "make_proxy")
+        self.assertEqual(stages["preview_proxy"]["params"], {"height": 360, "every": 3})
+        self.assertEqual(stages["extract"]["after"], ["preview_proxy"])
+        self.assertEqual(stages["extract"]["params"]["fps"], 4)
+        self.assertEqual(stages["convert"]["params"]["preset"], "ultrafast")
+        self.assertEqual(stages["stitch"]["params"]["profile"], "speed")
+        self.assertEqual(preview["paths"]["output"], os.path.join("out", "preview"))
+        self.assertNotEqual(preview["pipeline"]["name"], "job")
+        self.assertNotIn("distributed", preview)
+        # The spec itself is untouched and still builds the same graph
+        self.assertNotIn("stages", spec)
+        self.assertEqual(build_pipeline(preview).order[0], "preview_proxy")
+
+    def test_preview_then_full_render(self):
+        input_dir = os.path.join(self.temp_dir, "input")
+        os.makedirs(input_dir)
+        Path(input_dir, "clip.mp4").touch()
+        spec_path = os.path.join(self.temp_dir, "spec.json")
+        with open(spec_path, "w") as f:
+            json.dump({
+                "pipeline": {"name": "job"},
+                "paths": {name: os.path.join(self.temp_dir, name) for name in ("input", "output", "temp")},
+                "stages": [{"name": "convert", "type": "convert_video"}]
+            }, f)
+        calls = []
+
+        def fake(method):
+            def run(input_path, output_path, **options):
+                calls.append((method, Path(input_path).name, options))
+                Path(output_path).touch()
+                return True
+            return run
+
+        with mock.patch.object(AIClient, "enable_dedup"), \
+             mock.patch.object(VideoProcessor, "make_proxy", side_effect=fake("proxy")), \
+             mock.patch.object(VideoProcessor, "convert_video", side_effect=fake("convert")):
+            previews, full = run_preview(spec_path)
+            results = full.result(timeout=10)
+
+        self.assertEqual(previews[0]["output"], os.path.join(self.temp_dir, "output", "preview", "clip_processed.mp4"))
+        self.assertEqual(results[0]["output"], os.path.join(self.temp_dir, "output", "clip_processed.mp4"))
+        (_, proxy_input, _), (_, preview_input, preview), (_, full_input, final) = calls
+        self.assertEqual((proxy_input, preview_input, full_input), ("clip.mp4", "preview_proxy.mp4", "clip.mp4"))
+        self.assertEqual((preview["preset"], preview["fps"]), ("ultrafast", 6))
+        self.assertEqual((final["preset"], final["fps"]), ("medium", 24))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
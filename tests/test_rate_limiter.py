@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test suite for rate_limiter.py
+
+Tests token bucket pacing, in-flight caps, backoff policy and
+Retry-After parsing.
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from email.utils import formatdate
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+from rate_limiter import ProviderLimiter, TokenBucket, parse_retry_after
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Test cases for TokenBucket"""
+
+    def test_burst_then_paced(self):
+        """Capacity is available immediately, the rest arrives at the rate"""
+        bucket = TokenBucket(rate=50, capacity=5)
+        started = time.monotonic()
+        for _ in range(10):
+            bucket.acquire()
+        elapsed = time.monotonic() - started
+        self.assertGreaterEqual(elapsed, 5 / 50 * 0.8)
+        self.assertLess(elapsed, 1.0)
+
+
+class TestProviderLimiter(unittest.TestCase):
+    """Test cases for ProviderLimiter"""
+
+    def test_in_flight_cap(self):
+        """No more than max_in_flight slots are held at once"""
+        limiter = ProviderLimiter("test", max_in_flight=3)
+        lock = threading.Lock()
+        state = {"current": 0, "peak": 0}
+
+        def work():
+            with limiter.slot():
+                with lock:
+                    state["current"] += 1
+                    state["peak"] = max(state["peak"], state["current"])
+                time.sleep(0.02)
+                with lock:
+                    state["current"] -= 1
+
+        threads = [threading.Thread(target=work) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(state["peak"], 3)
+        metrics = limiter.metrics()
+        self.assertEqual(metrics["requests"], 12)
+        self.assertGreater(metrics["throttled_seconds"], 0)
+        self.assertLess(metrics["utilization"], 1.0)
+
+    def test_backoff_is_bounded_jitter(self):
+        """Backoff stays within the exponential ceiling and backoff_max"""
+        limiter = ProviderLimiter("test", backoff_base=1.0, backoff_max=8.0)
+        for attempt in range(10):
+            delay = limiter.backoff(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(8.0, 2 ** attempt))
+
+    def test_backoff_honors_retry_after(self):
+        """Retry-After overrides jitter but is capped"""
+        limiter = ProviderLimiter("test", backoff_max=30.0)
+        self.assertEqual(limiter.backoff(0, retry_after=12), 12)
+        self.assertEqual(limiter.backoff(0, retry_after=120), 30.0)
+
+
+class TestRetryAfter(unittest.TestCase):
+    """Test cases for parse_retry_after"""
+
+    def test_seconds(self):
+        self.assertEqual(parse_retry_after("7"), 7.0)
+
+    def test_http_date(self):
+        delay = parse_retry_after(formatdate(time.time() + 30, usegmt=True))
+        self.assertAlmostEqual(delay, 30, delta=2)
+
+    def test_missing_or_invalid(self):
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test suite for result_cache.py
+
+Tests content-addressed keys, LRU eviction and the VideoProcessor
+integration that skips ffprobe/ffmpeg on cache hits.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+from result_cache import ResultCache
+from video_processor import VideoProcessor
+
+
+class CacheTestCase(unittest.TestCase):
+    """Base class providing a scratch directory and cache"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="cache_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        self.cache = ResultCache(os.path.join(self.temp_dir, "cache"), max_size_mb=1)
+
+    def make_file(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.temp_dir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+
+class TestResultCache(CacheTestCase):
+    """Test cases for ResultCache"""
+
+    def test_key_depends_on_content_not_path(self):
+        """Identical content under different names shares a key"""
+        first = self.make_file("a.mp4", b"same bytes")
+        second = self.make_file("b.mp4", b"same bytes")
+        self.assertEqual(
+            self.cache.make_key("convert_video", [first], fps=24),
+            self.cache.make_key("convert_video", [second], fps=24)
+        )
+
+    def test_key_depends_on_params(self):
+        """Changing an argument changes the key"""
+        source = self.make_file("a.mp4", b"data")
+        self.assertNotEqual(
+            self.cache.make_key("convert_video", [source], fps=24),
+            self.cache.make_key("convert_video", [source], fps=30)
+        )
+
+    def test_key_changes_when_content_changes(self):
+        """Rewriting the input invalidates the memoized hash"""
+        source = self.make_file("a.mp4", b"version one")
+        before = self.cache.make_key("op", [source])
+        time.sleep(0.01)
+        self.make_file("a.mp4", b"version two!")
+        self.assertNotEqual(before, self.cache.make_key("op", [source]))
+
+    def test_file_round_trip(self):
+        """put_file then get_file restores the output"""
+        output = self.make_file("out.mp4", b"encoded")
+        self.cache.put_file("ab" * 32, output)
+        restored = os.path.join(self.temp_dir, "restored.mp4")
+        self.assertTrue(self.cache.get_file("ab" * 32, restored))
+        with open(restored, "rb") as f:
+            self.assertEqual(f.read(), b"encoded")
+
+    def test_lru_eviction(self):
+        """Oldest unused entries are evicted once over the limit"""
+        blob = self.make_file("blob", b"x" * 400 * 1024)
+        for index, key in enumerate(["aa" * 32, "bb" * 32, "cc" * 32]):
+            self.cache.put_file(key, blob)
+            entry = self.cache._entry_path(key, "bin")
+            os.utime(entry, (index, index))
+        self.cache.put_file("dd" * 32, blob)
+        self.assertLessEqual(self.cache.size_bytes(), self.cache.max_size_bytes)
+        self.assertFalse(self.cache.get_file("aa" * 32, os.path.join(self.temp_dir, "x")))
+        self.assertTrue(self.cache.get_file("dd" * 32, os.path.join(self.temp_dir, "y")))
+
+    def test_ttl_expiry(self):
+        """Entries idle longer than the TTL are misses"""
+        cache = ResultCache(os.path.join(self.temp_dir, "ttl"), ttl_minutes=1)
+        cache.put_json("ee" * 32, {"a": 1})
+        entry = cache._entry_path("ee" * 32, "json")
+        os.utime(entry, (time.time() - 120, time.time() - 120))
+        self.assertIsNone(cache.get_json("ee" * 32))
+
+    def test_from_config(self):
+        """Limits come from the cache section of the config"""
+        config_path = os.path.join(self.temp_dir, "pipeline.config.json")
+        with open(config_path, "w") as f:
+            json.dump({"cache": {"enabled": True, "directory": "c", "max_cache_size_mb": 2}}, f)
+        cache = ResultCache.from_config(config_path)
+        self.assertTrue(cache.enabled)
+        self.assertEqual(cache.max_size_bytes, 2 * 1024 * 1024)
+        self.assertEqual(str(cache.directory), os.path.join(self.temp_dir, "c"))
+
+
+class TestVideoProcessorCache(CacheTestCase):
+    """Test cases for cache use inside VideoProcessor"""
+
+    def setUp(self):
+        super().setUp()
+        VideoProcessor.enable_cache(self.cache)
+        self.addCleanup(setattr, VideoProcessor, "cache", None)
+
+    def test_get_video_info_runs_ffprobe_once(self):
+        """Repeated metadata queries hit the cache"""
+        source = self.make_file("in.mp4", b"video")
+        probe = mock.Mock(stdout=json.dumps({
+            "format": {"duration": "1.0", "size": "5"},
+            "streams": [{"codec_type": "video", "width": 2, "height": 2}]
+        }))
+        with mock.patch("video_processor.subprocess.run", return_value=probe) as run:
+            first = VideoProcessor.get_video_info(source)
+            second = VideoProcessor.get_video_info(source)
+        self.assertEqual(run.call_count, 1)
+        self.assertEqual(first, second)
+
+    def test_convert_video_skips_on_hit(self):
+        """A second identical convert copies the cached output"""
+        source = self.make_file("in.mp4", b"video")
+        output = os.path.join(self.temp_dir, "out.mp4")
+
+        def fake_ffmpeg(cmd, check):
+            with open(cmd[-1], "wb") as f:
+                f.write(b"converted")
+
+        with mock.patch("video_processor.subprocess.run", side_effect=fake_ffmpeg) as run:
+            self.assertTrue(VideoProcessor.convert_video(source, output))
+            os.remove(output)
+            self.assertTrue(VideoProcessor.convert_video(source, output))
+        self.assertEqual(run.call_count, 1)
+        with open(output, "rb") as f:
+            self.assertEqual(f.read(), b"converted")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
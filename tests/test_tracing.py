@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Test suite for tracing.py
+
+Tests span recording and export, ffmpeg progress parsing against a fake
+ffmpeg executable, and the provider/stage instrumentation points.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+from ai_client import AIClient, AIProvider
+from pipeline_runner import Pipeline, Stage
+from tracing import (NULL_SPAN, disable_tracing, enable_tracing, load_spans, run_ffmpeg,
+                     span, summarize, to_chrome_trace)
+
+FAKE_FFMPEG = """\
+#!{python}
+import sys
+args = sys.argv[1:]
+assert args[:3] == ["-progress", "pipe:1", "-nostats"], args
+sum(i * i for i in range(200000))
+for frame in (12, 24):
+    print(f"frame={{frame}}\\nfps=48.0\\ntotal_size={{frame * 100}}\\nspeed=2.0x")
+    print("progress=" + ("end" if frame == 24 else "continue"), flush=True)
+with open(args[-1], "wb") as f:
+    f.write(b"x" * 2400)
+sys.exit(1 if "--fail" in args else 0)
+"""
+
+
+class TracingTestCase(unittest.TestCase):
+    """Base class that records spans into a scratch JSONL file"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="tracing_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        self.trace_path = os.path.join(self.temp_dir, "trace.jsonl")
+        self.tracer = enable_tracing(self.trace_path)
+        self.addCleanup(disable_tracing)
+
+
+class TestSpans(TracingTestCase):
+    """Test cases for span recording and export"""
+
+    def test_disabled_tracing_records_nothing(self):
+        disable_tracing()
+        with span("quiet") as s:
+            self.assertIs(s, NULL_SPAN)
+        self.assertFalse(os.path.exists(self.trace_path))
+
+    def test_nesting_errors_and_jsonl(self):
+        with span("outer", "stage", input="clip") as outer:
+            with span("inner", "ffmpeg") as inner:
+                inner.set(frames=10)
+        with self.assertRaises(ValueError):
+            with span("broken"):
+                raise ValueError("bad input")
+
+        records = {r["name"]: r for r in load_spans(self.trace_path)}
+        self.assertEqual(records["inner"]["parent"], records["outer"]["id"])
+        self.assertIsNone(records["outer"]["parent"])
+        self.assertEqual(records["inner"]["attrs"]["frames"], 10)
+        self.assertEqual(records["broken"]["attrs"]["status"], "error")
+        self.assertEqual(records["broken"]["attrs"]["error"], "bad input")
+        self.assertEqual(outer.attrs["input"], "clip")
+
+    def test_chrome_trace_and_summary(self):
+        with span("convert", "ffmpeg") as s:
+            s.set(frames=48, cpu_seconds=0.5)
+        with span("convert", "ffmpeg") as s:
+            s.set(frames=24, cpu_seconds=0.25)
+        records = load_spans(self.trace_path)
+
+        event = to_chrome_trace(records)["traceEvents"][0]
+        self.assertEqual((event["ph"], event["cat"]), ("X", "ffmpeg"))
+        self.assertAlmostEqual(event["ts"], records[0]["start"] * 1e6)
+
+        group = summarize(records)["groups"]["ffmpeg/convert"]
+        self.assertEqual((group["count"], group["frames"]), (2, 72))
+        self.assertAlmostEqual(group["cpu_seconds"], 0.75)
+
+
+@unittest.skipUnless(hasattr(os, "wait4"), "os.wait4 not available")
+class TestRunFfmpeg(TracingTestCase):
+    """Test cases for traced ffmpeg runs"""
+
+    def setUp(self):
+        super().setUp()
+        self.ffmpeg = os.path.join(self.temp_dir, "ffmpeg")
+        with open(self.ffmpeg, "w") as f:
+            f.write(FAKE_FFMPEG.format(python=sys.executable))
+        os.chmod(self.ffmpeg, 0o755)
+        self.source = os.path.join(self.temp_dir, "in.mp4")
+        with open(self.source, "wb") as f:
+            f.write(b"y" * 5000)
+
+    def test_progress_and_rusage(self):
+        updates = []
+        output = os.path.join(self.temp_dir, "out.mp4")
+        run_ffmpeg([self.ffmpeg, "-i", self.source, output], "ffmpeg.convert", progress=updates.append)
+
+        self.assertEqual([u["frames"] for u in updates], [12, 24])
+        (record,) = load_spans(self.trace_path)
+        attrs = record["attrs"]
+        self.assertEqual((attrs["frames"], attrs["fps"], attrs["speed"]), (24, 48.0, 2.0))
+        self.assertEqual((attrs["bytes_in"], attrs["bytes_out"]), (5000, 2400))
+        self.assertGreater(attrs["cpu_seconds"], 0)
+        self.assertGreater(attrs["max_rss_mb"], 0)
+        self.assertEqual(attrs["returncode"], 0)
+
+    def test_failure_raises_and_is_recorded(self):
+        output = os.path.join(self.temp_dir, "out.mp4")
+        with self.assertRaises(subprocess.CalledProcessError):
+            run_ffmpeg([self.ffmpeg, "--fail", output], "ffmpeg.convert")
+        (record,) = load_spans(self.trace_path)
+        self.assertEqual(record["attrs"]["status"], "error")
+
+
+class TestInstrumentation(TracingTestCase):
+    """Test cases for provider and stage spans"""
+
+    def test_provider_request_span(self):
+        client = AIClient(AIProvider.GROK, "key")
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b"0123456789"
+        response.request = requests.Request("POST", "http://provider/imagine", json={"prompt": "x"}).prepare()
+        with mock.patch.object(client.session, "request", return_value=response):
+            client._request("post", "http://provider/imagine", json={"prompt": "x"})
+
+        (record,) = load_spans(self.trace_path)
+        self.assertEqual((record["name"], record["category"]), ("grok.post", "provider"))
+        self.assertEqual(record["attrs"]["bytes_in"], 10)
+        self.assertEqual(record["attrs"]["bytes_out"], len(json.dumps({"prompt": "x"})))
+        self.assertEqual(record["attrs"]["status_code"], 200)
+
+    def test_pipeline_stage_spans(self):
+        pipeline = Pipeline([
+            Stage("work", lambda c: {"done": True}),
+            Stage("combine", lambda contexts: None, ["work"], scope="batch")
+        ])
+        pipeline.run([{"name": "a"}, {"name": "b"}])
+        names = sorted((r["name"], r["attrs"].get("input")) for r in load_spans(self.trace_path))
+        self.assertEqual(names, [("stage.combine", None), ("stage.work", "a"), ("stage.work", "b")])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test suite for video_pipeline.py
+
+Tests input scanning, longest-first planning, worker sizing and the
+batch runner's progress reporting.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+import video_pipeline
+from video_pipeline import BatchProgress, plan_jobs, plan_workers, run_batch, scan_inputs
+
+
+class TestPlanning(unittest.TestCase):
+    """Test cases for scanning and scheduling decisions"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="video_pipeline_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        for name, size in (("short.mp4", 10), ("long.MOV", 20), ("mid.mkv", 30), ("notes.txt", 1)):
+            with open(os.path.join(self.temp_dir, name), "wb") as f:
+                f.write(b"\0" * size)
+
+    def test_scan_finds_video_extensions(self):
+        names = [os.path.basename(p) for p in scan_inputs(self.temp_dir)]
+        self.assertEqual(names, ["long.MOV", "mid.mkv", "short.mp4"])
+        self.assertEqual(len(scan_inputs(self.temp_dir, "*.mp4")), 1)
+
+    def test_longest_first(self):
+        durations = {"short.mp4": "5.0", "long.MOV": "600.0", "mid.mkv": ""}
+        with mock.patch.object(video_pipeline.VideoProcessor, "get_video_info",
+                               side_effect=lambda p: {"duration": durations[os.path.basename(p)]}):
+            jobs = plan_jobs(scan_inputs(self.temp_dir), "out", "convert")
+        self.assertEqual([job["name"] for job in jobs], ["long.MOV", "short.mp4", "mid.mkv"])
+        self.assertEqual(jobs[0]["output"], os.path.join("out", "long_processed.mp4"))
+        self.assertEqual(jobs[2]["duration"], 0.0)
+
+    def test_worker_sizing_never_oversubscribes(self):
+        self.assertEqual(plan_workers(100, cores=16), (8, 2))
+        self.assertEqual(plan_workers(100, threads=4, cores=16), (4, 4))
+        self.assertEqual(plan_workers(100, workers=3, cores=16), (3, 5))
+        # Fewer jobs than workers: the spare cores go to each job
+        self.assertEqual(plan_workers(2, cores=16), (2, 8))
+        self.assertEqual(plan_workers(5, threads=32, cores=8), (1, 32))
+
+
+class TestBatch(unittest.TestCase):
+    """Test cases for running and reporting a batch"""
+
+    def jobs(self):
+        return [
+            {"name": f"{n}.mp4", "input": f"{n}.mp4", "output": f"{n}_processed.mp4", "duration": d, "size": 1}
+            for n, d in (("a", 30.0), ("b", 10.0), ("c", 0.0))
+        ]
+
+    def test_progress_is_weighted_by_duration(self):
+        jobs = self.jobs()
+        progress = BatchProgress(jobs)
+        self.assertIsNone(progress.eta())
+        progress.update(jobs[0], True)
+        # The unprobed job counts as the average (20s): 30 of 60 seconds done
+        self.assertAlmostEqual(progress.fraction, 0.5)
+        self.assertIsNotNone(progress.eta())
+        progress.update(jobs[1], False)
+        self.assertIn("[2/3]", progress.line(jobs[1], False, 1.0))
+        self.assertEqual(progress.failed, 1)
+
+    def test_run_batch_reports_every_job(self):
+        lines = []
+
+        def convert(input_path, output_path, **options):
+            return input_path != "b.mp4"
+
+        with mock.patch.object(video_pipeline, "ProcessPoolExecutor", ThreadPoolExecutor), \
+             mock.patch.object(video_pipeline.VideoProcessor, "convert_video", side_effect=convert) as call:
+            results = run_batch(self.jobs(), "convert", {"threads": 2}, workers=2, report=lines.append)
+        self.assertEqual([job["ok"] for job in results], [True, False, True])
+        self.assertEqual(call.call_args.kwargs, {"threads": 2})
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[-1].startswith("Finished 2/3 jobs"))
+
+
+    def test_extract_jobs_get_their_thread_share(self):
+        args = mock.Mock(op="extract", fps=None)
+        options = video_pipeline._operation_options(args, threads=3)
+        output = tempfile.mkdtemp(prefix="video_pipeline_test_")
+        self.addCleanup(shutil.rmtree, output, True)
+        with mock.patch("video_processor.subprocess.run") as run:
+            ok, _ = video_pipeline._run_job("extract", {"input": "a.mp4", "output": output}, options)
+        self.assertTrue(ok)
+        cmd = run.call_args[0][0]
+        self.assertEqual(cmd[1:4], ["-threads", "3", "-i"])
+        self.assertEqual(cmd[-4:-2], ["-threads", "3"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -8,14 +8,19 @@ codec conversion, and upscaling operations.
 
 import unittest
 import os
+import shutil
+import subprocess
 import sys
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from unittest import mock
 
 # Add parent directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
 
 try:
+    import video_processor
     from video_processor import VideoProcessor
 except ImportError:
     print("ERROR: Could not import VideoProcessor. Ensure python_modules are in path.")
@@ -136,6 +141,158 @@ class TestVideoProcessorIntegration(unittest.TestCase):
         self.assertIsNotNone(processor)
 
 
+class TestSegmentedEncoding(unittest.TestCase):
+    """Tests for split-encode-merge mode of convert_video/upscale_video"""
+    
+    def test_short_input_falls_back_to_single_pass(self):
+        """Inputs too short to split run one ffmpeg process"""
+        info = {"duration": "12.0"}
+        output_folder = tempfile.mkdtemp(prefix="video_test_")
+        self.addCleanup(shutil.rmtree, output_folder, True)
+        output = os.path.join(output_folder, "out.mp4")
+        
+        def fake_ffmpeg(cmd, check):
+            Path(cmd[-1]).touch()
+        
+        with mock.patch.object(VideoProcessor, "get_video_info", return_value=info), \
+             mock.patch("video_processor.subprocess.run", side_effect=fake_ffmpeg) as run:
+            self.assertTrue(VideoProcessor.convert_video("in.mp4", output, parallel=True))
+        self.assertEqual(run.call_count, 1)
+        self.assertNotIn("segment", run.call_args[0][0])
+    
+    def test_segments_split_cores_and_share_one_audio_encode(self):
+        """Segments encode video only with a share of the cores; audio is added at the splice"""
+        info = {"duration": "120.0"}
+        output_folder = tempfile.mkdtemp(prefix="video_test_")
+        self.addCleanup(shutil.rmtree, output_folder, True)
+        commands = []
+        
+        def fake_ffmpeg(cmd, check):
+            commands.append(cmd)
+            if "segment" in cmd:
+                for i in range(4):
+                    Path(cmd[-1].replace("%04d", f"{i:04d}")).touch()
+            else:
+                Path(cmd[-1]).touch()
+        
+        with mock.patch.object(VideoProcessor, "get_video_info", return_value=info), \
+             mock.patch("video_processor.os.cpu_count", return_value=8), \
+             mock.patch("video_processor.ProcessPoolExecutor", ThreadPoolExecutor), \
+             mock.patch("video_processor.subprocess.run", side_effect=fake_ffmpeg):
+            self.assertTrue(VideoProcessor.convert_video(
+                "in.mp4", os.path.join(output_folder, "out.mp4"), parallel=True, segments=4
+            ))
+        split, *encodes, joined = commands
+        self.assertNotIn("0:a?", split)
+        self.assertEqual(len(encodes), 4)
+        self.assertTrue(all(cmd[cmd.index("-threads") + 1] == "2" for cmd in encodes))
+        self.assertIn("concat", joined)
+        self.assertEqual(joined[joined.index("in.mp4") + 1:joined.index("in.mp4") + 5],
+                         ["-map", "0:v:0", "-map", "1:a?"])
+    
+    def test_segment_encodes_bypass_the_cache(self):
+        """Only the merged output is keyed; segments and the fallback skip the cache"""
+        output_folder = tempfile.mkdtemp(prefix="video_test_")
+        self.addCleanup(shutil.rmtree, output_folder, True)
+        cache = mock.MagicMock()
+        cache.get_file.return_value = False
+        self.addCleanup(setattr, VideoProcessor, "cache", None)
+
+        def fake_ffmpeg(cmd, check):
+            if "segment" in cmd:
+                for i in range(4):
+                    Path(cmd[-1].replace("%04d", f"{i:04d}")).touch()
+            else:
+                Path(cmd[-1]).touch()
+
+        for duration in ("12.0", "120.0"):
+            VideoProcessor.cache = cache
+            cache.make_key.reset_mock()
+            with mock.patch.object(VideoProcessor, "get_video_info", return_value={"duration": duration}), \
+                 mock.patch("video_processor.ProcessPoolExecutor", ThreadPoolExecutor), \
+                 mock.patch("video_processor.subprocess.run", side_effect=fake_ffmpeg):
+                self.assertTrue(VideoProcessor.convert_video(
+                    "in.mp4", os.path.join(output_folder, "out.mp4"), parallel=True, segments=4
+                ))
+            self.assertEqual(cache.make_key.call_count, 1)
+            self.assertIs(VideoProcessor.cache, cache)
+
+    def test_split_points_are_evenly_spaced(self):
+        """split_video asks the segment muxer for N-1 evenly spaced cuts"""
+        info = {"duration": "120.0"}
+        output_folder = tempfile.mkdtemp(prefix="video_test_")
+        self.addCleanup(shutil.rmtree, output_folder, True)
+        with mock.patch.object(VideoProcessor, "get_video_info", return_value=info), \
+             mock.patch("video_processor.subprocess.run") as run:
+            VideoProcessor.split_video("in.mp4", output_folder, 4)
+        cmd = run.call_args[0][0]
+        self.assertIn("-c", cmd)
+        self.assertEqual(cmd[cmd.index("-c") + 1], "copy")
+        self.assertEqual(cmd[cmd.index("-segment_times") + 1], "30.000,60.000,90.000")
+    
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg not available")
+    def test_parallel_convert_matches_duration(self):
+        """Segmented convert produces one file with the source duration"""
+        temp_dir = tempfile.mkdtemp(prefix="video_test_")
+        try:
+            source = os.path.join(temp_dir, "source.mp4")
+            subprocess.run([
+                "ffmpeg", "-f", "lavfi", "-i", "testsrc=duration=8:size=320x240:rate=24",
+                "-g", "24", "-y", source
+            ], check=True, capture_output=True)
+            output = os.path.join(temp_dir, "converted.mp4")
+            with mock.patch.object(video_processor, "MIN_SEGMENT_SECONDS", 2):
+                self.assertTrue(VideoProcessor.convert_video(
+                    source, output, parallel=True, segments=4, preset="ultrafast"
+                ))
+            duration = float(VideoProcessor.get_video_info(output)["duration"])
+            self.assertAlmostEqual(duration, 8.0, delta=0.5)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+class TestProxy(unittest.TestCase):
+    """Tests for make_proxy"""
+    
+    def test_proxy_drops_frames_and_scales_down(self):
+        output_folder = tempfile.mkdtemp(prefix="video_test_")
+        self.addCleanup(shutil.rmtree, output_folder, True)
+        output = os.path.join(output_folder, "proxy.mp4")
+        
+        def fake_ffmpeg(cmd, check):
+            Path(cmd[-1]).touch()
+        
+        with mock.patch("video_processor.subprocess.run", side_effect=fake_ffmpeg) as run:
+            self.assertTrue(VideoProcessor.make_proxy("in.mp4", output, height=360, every=4))
+        cmd = run.call_args[0][0]
+        self.assertEqual(cmd[cmd.index("-vf") + 1], "framestep=4,scale=-2:'min(360,ih)'")
+        self.assertEqual(cmd[cmd.index("-preset") + 1], "ultrafast")
+        self.assertTrue(os.path.exists(output))
+
+
+class TestConcat(unittest.TestCase):
+    """Tests for concat_videos"""
+    
+    def test_list_file_is_private_and_removed(self):
+        """The concat list never lands in the CWD and is removed even on failure"""
+        output_folder = tempfile.mkdtemp(prefix="video_test_")
+        self.addCleanup(shutil.rmtree, output_folder, True)
+        lists = []
+        
+        def failing_ffmpeg(cmd, check):
+            lists.append(cmd[cmd.index("-i") + 1])
+            raise subprocess.CalledProcessError(1, cmd)
+        
+        probe = {"duration": 1.0, "video": {"codec": "h264"}, "audio": None}
+        with mock.patch("concat_plan.probe_clips", return_value=[probe, probe]), \
+             mock.patch("video_processor.subprocess.run", side_effect=failing_ffmpeg):
+            self.assertFalse(VideoProcessor.concat_videos(
+                ["a.mp4", "b.mp4"], os.path.join(output_folder, "out.mp4")))
+        self.assertNotEqual(os.path.dirname(os.path.abspath(lists[0])), os.getcwd())
+        self.assertFalse(os.path.exists(lists[0]))
+        self.assertFalse(os.path.exists("concat_list.txt"))
+
+
 def run_system_checks():
     """Run system checks before tests"""
     print("\n" + "="*50)
@@ -186,6 +343,8 @@ if __name__ == '__main__':
     # Add tests
     suite.addTests(unittest.TestLoader().loadTestsFromTestCase(TestVideoProcessor))
     suite.addTests(unittest.TestLoader().loadTestsFromTestCase(TestVideoProcessorIntegration))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(TestSegmentedEncoding))
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(TestConcat))
     
     # Run tests with verbose output
     runner = unittest.TextTestRunner(verbosity=2)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Test suite for work_queue.py
+
+Tests leases and re-dispatch, retries, queue workers and running pipeline
+stages and segment encodes as queued tasks.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+import pipeline_runner
+import work_queue
+from pipeline_runner import build_pipeline
+from video_processor import VideoProcessor
+from work_queue import QueueWorker, TaskError, WorkQueue
+
+
+class WorkQueueTestCase(unittest.TestCase):
+    """Base class with a queue in a scratch directory"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="work_queue_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+
+    def queue(self, **options) -> WorkQueue:
+        queue = WorkQueue(os.path.join(self.temp_dir, "queue.db"), **options)
+        self.addCleanup(queue.close)
+        return queue
+
+    def start_worker(self, queue: WorkQueue, **options) -> QueueWorker:
+        """Run a worker on its own queue connection until the test ends"""
+        worker = QueueWorker(WorkQueue(queue.db_path, queue.lease_seconds), poll=0.02, **options)
+        stop = threading.Event()
+        thread = threading.Thread(target=worker.run, args=(stop,), daemon=True)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(stop.set)
+        return worker
+
+
+class TestWorkQueue(WorkQueueTestCase):
+    """Test cases for claiming, leases and results"""
+
+    def test_claims_by_priority_then_age(self):
+        queue = self.queue()
+        late = queue.submit("echo", {"n": 1})
+        urgent = queue.submit("echo", {"n": 2}, priority=0)
+        queue.submit("other", {"n": 3}, priority=0)
+        self.assertEqual(queue.claim("w", ["echo"])["id"], urgent)
+        task = queue.claim("w", ["echo"])
+        self.assertEqual((task["id"], task["payload"], task["attempt"]), (late, {"n": 1}, 1))
+        self.assertIsNone(queue.claim("w", ["echo"]))
+
+        self.assertTrue(queue.complete(late, "w", {"ok": True}))
+        self.assertEqual(queue.get(late)["result"], {"ok": True})
+        self.assertEqual(queue.counts(), {"done": 1, "leased": 1, "pending": 1})
+
+    def test_expired_lease_is_redispatched(self):
+        queue = self.queue(lease_seconds=0.05)
+        task_id = queue.submit("echo", {})
+        self.assertEqual(queue.claim("dead")["id"], task_id)
+        self.assertIsNone(queue.claim("alive"))
+        time.sleep(0.1)
+
+        task = queue.claim("alive")
+        self.assertEqual((task["id"], task["attempt"]), (task_id, 2))
+        # The dead worker's late result is rejected
+        self.assertFalse(queue.heartbeat(task_id, "dead"))
+        self.assertFalse(queue.complete(task_id, "dead", "stale"))
+        self.assertTrue(queue.complete(task_id, "alive", "fresh"))
+        self.assertEqual(queue.get(task_id)["result"], "fresh")
+
+    def test_heartbeat_keeps_the_lease(self):
+        queue = self.queue(lease_seconds=0.1)
+        task_id = queue.submit("echo", {})
+        queue.claim("w")
+        for _ in range(3):
+            time.sleep(0.05)
+            self.assertTrue(queue.heartbeat(task_id, "w"))
+        self.assertIsNone(queue.claim("other"))
+
+    def test_failures_retry_until_attempts_run_out(self):
+        queue = self.queue(lease_seconds=0.05, max_attempts=2)
+        task_id = queue.submit("echo", {})
+        queue.claim("w")
+        self.assertTrue(queue.fail(task_id, "w", "boom"))
+        self.assertEqual(queue.get(task_id)["status"], "pending")
+        queue.claim("w")
+        time.sleep(0.1)
+        self.assertEqual(queue.requeue_expired(), 0)
+        task = queue.get(task_id)
+        self.assertEqual((task["status"], task["error"]), ("failed", "lease expired 2 times"))
+        self.assertEqual(queue.purge(), 1)
+
+    def test_purged_task_fails_the_wait(self):
+        queue = self.queue()
+        task_id = queue.submit("echo", {})
+        queue.claim("w")
+        queue.complete(task_id, "w", "result")
+        queue.purge()
+        with self.assertRaises(TaskError) as raised:
+            queue.wait([task_id], timeout=1)
+        self.assertIn("no longer in the queue", str(raised.exception))
+
+
+class TestQueueWorker(WorkQueueTestCase):
+    """Test cases for workers running queued tasks"""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict(work_queue.TASK_TYPES, {
+            "square": lambda worker, payload: payload["n"] ** 2,
+            "fail": lambda worker, payload: 1 / 0
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_workers_run_tasks_in_parallel(self):
+        queue = self.queue()
+        first = self.start_worker(queue, name="a", concurrency=2)
+        second = self.start_worker(queue, name="b", concurrency=2)
+        self.assertEqual(queue.run_tasks("square", [{"n": n} for n in range(20)], timeout=10),
+                         [n * n for n in range(20)])
+        self.assertEqual(first.completed + second.completed, 20)
+
+    def test_failed_tasks_raise(self):
+        queue = self.queue(max_attempts=2)
+        self.start_worker(queue)
+        with self.assertRaises(TaskError) as raised:
+            queue.run_tasks("fail", [{}], timeout=10)
+        self.assertIn("division by zero", str(raised.exception))
+
+    def test_wait_times_out_without_workers(self):
+        queue = self.queue()
+        with self.assertRaises(TaskError):
+            queue.run_tasks("square", [{"n": 1}], timeout=0.1)
+
+
+class TestDistributedPipeline(WorkQueueTestCase):
+    """Test cases for stages and segment encodes dispatched to workers"""
+
+    def test_item_stages_run_on_workers(self):
+        def build_tag(name, params, spec):
+            def run(context):
+                return {"tag": f"{context['name']}:{threading.current_thread().name}"}
+            return run
+
+        queue = self.queue()
+        self.start_worker(queue, name="node", kinds=["stage"])
+        spec = {
+            "paths": {"output": os.path.join(self.temp_dir, "output")},
+            "stages": [{"name": "tag", "type": "tag"}]
+        }
+        with mock.patch.dict(pipeline_runner.STAGE_TYPES, {"tag": (build_tag, "item", [])}):
+            pipeline = build_pipeline(spec, queue=queue)
+            results = pipeline.run([
+                {"name": f"clip{i}", "source": "", "video": "", "work_dir": self.temp_dir} for i in range(3)
+            ])
+        self.assertTrue(all(r["status"] == "completed" for r in results))
+        self.assertEqual([r["tag"].split("-")[0] for r in results], ["clip0:node", "clip1:node", "clip2:node"])
+        self.assertEqual(queue.counts(), {"done": 3})
+
+    def test_segments_are_encoded_by_workers(self):
+        queue = self.queue()
+        self.start_worker(queue, kinds=["encode_segment"])
+        VideoProcessor.enable_work_queue(queue)
+        self.addCleanup(setattr, VideoProcessor, "work_queue", None)
+
+        def fake_split(input_path, output_folder, segments, audio=True):
+            Path(output_folder).mkdir(parents=True)
+            parts = [os.path.join(output_folder, f"segment_{i:04d}.mp4") for i in range(segments)]
+            for part in parts:
+                Path(part).touch()
+            return parts
+
+        def fake_ffmpeg(cmd, check):
+            Path(cmd[-1]).touch()
+
+        splice = mock.MagicMock()
+        output = os.path.join(self.temp_dir, "out.mp4")
+        with mock.patch.object(VideoProcessor, "get_video_info", return_value={"duration": "120.0"}), \
+             mock.patch.object(VideoProcessor, "split_video", side_effect=fake_split), \
+             mock.patch("video_processor.splice", splice), \
+             mock.patch("video_processor.subprocess.run", side_effect=fake_ffmpeg):
+            self.assertTrue(VideoProcessor.convert_video("in.mp4", output, parallel=True, segments=4))
+        self.assertEqual(queue.counts(), {"done": 4})
+        encoded = splice.call_args[0][0]
+        self.assertEqual(len(encoded), 4)
+        self.assertTrue(all(path.startswith(queue.scratch) for path in encoded))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test suite for worker.py
+
+Tests JSON-lines commands answered by one warm worker, follow-up jobs,
+and that stdout carries only replies when jobs or their children print.
+"""
+
+import io
+import json
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+MODULE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python_modules')
+sys.path.insert(0, MODULE_DIR)
+
+import job_server
+from worker import StdioSession
+
+
+def replies(out: io.StringIO) -> list:
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+class TestStdioSession(unittest.TestCase):
+    """Test cases for commands run in process"""
+
+    def setUp(self):
+        self.workers = []
+
+        def record(worker, params):
+            self.workers.append(worker)
+            worker.progress(0.5, "halfway")
+            return {"name": params["name"], "threads": worker.threads}
+
+        def follow_up(worker, params):
+            full = worker.server.submit("record", {"name": "full"}, "batch")
+            return {"full_job": full.id}
+
+        patcher = mock.patch.dict(job_server.JOB_TYPES, {
+            "record": record, "follow_up": follow_up, "fail": lambda worker, params: 1 / 0
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.out = io.StringIO()
+        self.session = StdioSession(self.out, threads=3)
+
+    def serve(self, *commands):
+        self.session.serve(io.StringIO("".join(
+            (c if isinstance(c, str) else json.dumps(c)) + "\n" for c in commands
+        )))
+        return replies(self.out)
+
+    def test_commands_answered_in_order_by_one_worker(self):
+        answers = self.serve(
+            {"id": 1, "kind": "record", "params": {"name": "a"}},
+            "",
+            {"id": "two", "kind": "record", "params": {"name": "b"}},
+            {"id": 3, "kind": "fail"}
+        )
+        self.assertEqual([a["id"] for a in answers], [1, "two", 3])
+        self.assertEqual([a["status"] for a in answers], ["completed", "completed", "failed"])
+        self.assertEqual(answers[0]["result"], {"name": "a", "threads": 3})
+        self.assertEqual(answers[1]["message"], "halfway")
+        self.assertIn("division by zero", answers[2]["error"])
+        self.assertIs(self.workers[0], self.workers[1])
+
+    def test_bad_commands_do_not_stop_the_worker(self):
+        answers = self.serve("not json", "[1]", {"id": 1, "kind": "bogus"}, {"id": 2, "kind": "ping"})
+        self.assertEqual([a["status"] for a in answers], ["failed", "failed", "failed", "completed"])
+        self.assertIn("Unknown job kind", answers[2]["error"])
+        self.assertEqual(answers[3]["result"]["pid"], os.getpid())
+
+    def test_shutdown_stops_reading(self):
+        answers = self.serve({"id": 1, "kind": "shutdown"}, {"id": 2, "kind": "ping"})
+        self.assertEqual([a["id"] for a in answers], [1])
+
+    def test_follow_up_jobs_are_answered_after_their_command(self):
+        answers = self.serve({"id": 1, "kind": "follow_up"})
+        self.assertEqual(len(answers), 2)
+        self.assertEqual(answers[0]["result"]["full_job"], answers[1]["id"])
+        self.assertEqual(answers[1]["result"]["name"], "full")
+
+
+class TestWorkerProcess(unittest.TestCase):
+    """Test cases for the worker as a separate process"""
+
+    def test_stdout_carries_only_replies(self):
+        code = (
+            "import os, sys, job_server, worker\n"
+            "def noisy(w, params):\n"
+            "    print('stray print')\n"
+            "    os.system('echo child output')\n"
+            "    return {'ok': True}\n"
+            "job_server.JOB_TYPES['noisy'] = noisy\n"
+            "sys.argv = ['worker.py', '--no-cache']\n"
+            "sys.exit(worker.main())\n"
+        )
+        commands = "".join(json.dumps(c) + "\n" for c in [
+            {"id": 1, "kind": "noisy"}, {"id": 2, "kind": "ping"}, {"id": 3, "kind": "noisy"}
+        ])
+        process = subprocess.run([sys.executable, "-c", code], cwd=MODULE_DIR, input=commands,
+                                 capture_output=True, text=True, timeout=30)
+        self.assertEqual(process.returncode, 0, process.stderr)
+        answers = [json.loads(line) for line in process.stdout.splitlines()]
+        self.assertEqual([(a["id"], a["status"]) for a in answers],
+                         [(1, "completed"), (2, "completed"), (3, "completed")])
+        self.assertIn("stray print", process.stderr)
+        self.assertIn("child output", process.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
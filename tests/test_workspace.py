@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Test suite for workspace.py
+
+Tests byte accounting, the disk budget's backpressure and the pipeline's
+deletion of intermediates once their consumers are done.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_modules'))
+
+from job_journal import JobJournal
+from pipeline_runner import Pipeline, Stage
+from workspace import Workspace, disk_usage
+
+
+class WorkspaceTestCase(unittest.TestCase):
+    """Base class with a scratch directory"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="workspace_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+
+    def workspace(self, **options) -> Workspace:
+        return Workspace(self.temp_dir, "job", **options)
+
+
+def writer(key: str, size: int = 4096, folder: bool = False):
+    """Stage function writing one intermediate into the input's work_dir"""
+    def run(context):
+        path = os.path.join(context["work_dir"], key)
+        if folder:
+            os.makedirs(path, exist_ok=True)
+            path_file = os.path.join(path, "frame_000001.png")
+        else:
+            path_file = path
+        with open(path_file, "wb") as f:
+            f.write(os.urandom(size))
+        return {key: path}
+    return run
+
+
+class TestWorkspace(WorkspaceTestCase):
+    """Test cases for accounting and budgets"""
+
+    def test_tracks_and_discards(self):
+        workspace = self.workspace()
+        frames = os.path.join(workspace.input_dir("clip"), "frames")
+        os.makedirs(frames)
+        for i in range(3):
+            with open(os.path.join(frames, f"{i}.png"), "wb") as f:
+                f.write(b"\1" * 10000)
+        size = workspace.track(frames)
+        self.assertEqual(size, disk_usage(frames))
+        self.assertGreaterEqual(size, 30000)
+        self.assertEqual(workspace.used, size)
+        self.assertTrue(workspace.owns(frames))
+        self.assertFalse(workspace.owns(self.temp_dir))
+
+        self.assertTrue(workspace.discard(frames))
+        self.assertFalse(os.path.exists(frames))
+        self.assertEqual((workspace.used, workspace.peak), (0, size))
+
+    def test_jobs_get_separate_directories(self):
+        first = Workspace(self.temp_dir, "Batch 1/retry")
+        second = Workspace(self.temp_dir, "other")
+        self.assertNotEqual(first.input_dir("clip"), second.input_dir("clip"))
+        self.assertEqual(first.path.parent, second.path.parent)
+
+    def test_admit_waits_for_space(self):
+        workspace = self.workspace(budget_mb=0.001)
+        path = os.path.join(workspace.path, "big.bin")
+        with open(path, "wb") as f:
+            f.write(b"\0" * 8192)
+        self.assertTrue(workspace.admit())
+        workspace.track(path)
+        # Over budget with one input in flight: the next one waits
+        self.assertFalse(workspace.admit(timeout=0.05))
+
+        threading.Timer(0.05, workspace.discard, [path]).start()
+        self.assertTrue(workspace.admit(timeout=2))
+        self.assertEqual(workspace.active, 2)
+
+    def test_admit_never_stalls_with_nothing_in_flight(self):
+        workspace = self.workspace(budget_mb=0.001)
+        path = os.path.join(workspace.path, "kept.bin")
+        with open(path, "wb") as f:
+            f.write(b"\0" * 8192)
+        workspace.track(path)
+        self.assertTrue(workspace.admit(timeout=0))
+
+
+class TestPipelineCleanup(WorkspaceTestCase):
+    """Test cases for intermediates in a pipeline"""
+
+    def inputs(self, workspace: Workspace, count: int = 1):
+        return [{"name": f"clip{i}", "work_dir": workspace.input_dir(f"clip{i}")} for i in range(count)]
+
+    def test_intermediates_deleted_after_last_reader(self):
+        workspace = self.workspace()
+        seen = {}
+
+        def check(key):
+            def run(context):
+                seen[key] = os.path.exists(context["frames_dir"])
+                return writer("video")(context)
+            return run
+
+        pipeline = Pipeline([
+            Stage("extract", writer("frames_dir", folder=True), reads=[]),
+            Stage("ai", lambda c: {"ai": os.path.exists(c["frames_dir"])}, ["extract"], reads=["frames_dir"]),
+            Stage("stitch", check("stitch"), ["ai"], reads=["frames_dir"]),
+            Stage("convert", lambda c: {"checked": os.path.exists(c["video"])}, ["stitch"], reads=["video"])
+        ], workspace=workspace)
+        context = pipeline.run(self.inputs(workspace))[0]
+        self.assertEqual(context["status"], "completed")
+        self.assertTrue(context["ai"] and seen["stitch"] and context["checked"])
+        # Frames went once stitch finished; the final video is kept but no longer counted
+        self.assertFalse(os.path.exists(context["frames_dir"]))
+        self.assertTrue(os.path.exists(context["video"]))
+        self.assertEqual((workspace.used, workspace.active), (0, 0))
+
+    def test_overwritten_outputs_are_released(self):
+        workspace = self.workspace()
+        pipeline = Pipeline([
+            Stage("stitch", writer("video"), reads=[]),
+            Stage("convert", lambda c: dict(writer("video2")(c), video=os.path.join(c["work_dir"], "video2")),
+                  ["stitch"], reads=["video"]),
+            Stage("publish", lambda c: None, ["convert"], reads=["video"])
+        ], workspace=workspace)
+        context = pipeline.run(self.inputs(workspace))[0]
+        self.assertFalse(os.path.exists(os.path.join(context["work_dir"], "video")))
+        self.assertTrue(os.path.exists(context["video"]))
+
+    def test_failed_input_keeps_intermediates(self):
+        workspace = self.workspace()
+        pipeline = Pipeline([
+            Stage("extract", writer("frames_dir", folder=True), reads=[]),
+            Stage("stitch", lambda c: False, ["extract"], reads=["frames_dir"])
+        ], workspace=workspace)
+        context = pipeline.run(self.inputs(workspace))[0]
+        self.assertEqual(context["status"], "failed")
+        self.assertTrue(os.path.isdir(context["frames_dir"]))
+        self.assertEqual(workspace.used, 0)
+
+    def test_unknown_readers_keep_values_alive(self):
+        workspace = self.workspace()
+        pipeline = Pipeline([
+            Stage("extract", writer("frames_dir", folder=True), reads=[]),
+            Stage("custom", lambda c: {"count": len(os.listdir(c["frames_dir"]))}, ["extract"])
+        ], workspace=workspace)
+        context = pipeline.run(self.inputs(workspace))[0]
+        self.assertEqual(context["count"], 1)
+
+    def test_budget_pauses_extraction(self):
+        workspace = self.workspace(budget_mb=0.001)
+        events = []
+        lock = threading.Lock()
+
+        def log(stage, func):
+            def run(context):
+                with lock:
+                    events.append((stage, context["name"]))
+                time.sleep(0.02)
+                return func(context)
+            return run
+
+        pipeline = Pipeline([
+            Stage("extract", log("extract", writer("frames_dir", 8192, folder=True)), reads=[]),
+            Stage("stitch", log("stitch", writer("video")), ["extract"], reads=["frames_dir"])
+        ], workspace=workspace)
+        results = pipeline.run(self.inputs(workspace, 3))
+        self.assertTrue(all(r["status"] == "completed" for r in results))
+        # Each extraction fills the budget, so the next one waits for the previous
+        # input to finish instead of running ahead of stitch
+        for earlier, later in zip(results, results[1:]):
+            self.assertLess(events.index(("stitch", earlier["name"])),
+                            events.index(("extract", later["name"])))
+
+    def test_released_stage_still_skipped_on_rerun(self):
+        workspace = self.workspace()
+        journal = JobJournal(os.path.join(self.temp_dir, "journal.db"))
+        self.addCleanup(journal.close)
+        calls = []
+
+        def extract(context):
+            calls.append("extract")
+            return writer("frames_dir", folder=True)(context)
+
+        def stitch(context):
+            calls.append("stitch")
+            return writer("video")(context)
+
+        def make():
+            return Pipeline([
+                Stage("extract", extract, reads=[]),
+                Stage("stitch", stitch, ["extract"], reads=["frames_dir"])
+            ], journal=journal, workspace=workspace)
+
+        make().run(self.inputs(workspace))
+        results = make().run(self.inputs(workspace))
+        self.assertEqual(results[0]["status"], "completed")
+        self.assertEqual(calls, ["extract", "stitch"])
+
+    def test_changed_consumer_reruns_released_producer(self):
+        workspace = self.workspace()
+        journal = JobJournal(os.path.join(self.temp_dir, "journal.db"))
+        self.addCleanup(journal.close)
+        calls = []
+
+        def extract(context):
+            calls.append("extract")
+            return writer("frames_dir", folder=True)(context)
+
+        def stitch(context):
+            calls.append("stitch")
+            self.assertTrue(os.path.isdir(context["frames_dir"]))
+            return writer("video")(context)
+
+        def make(params: str):
+            return Pipeline([
+                Stage("extract", extract, reads=[]),
+                Stage("stitch", stitch, ["extract"], fingerprint=params, reads=["frames_dir"]),
+                Stage("convert", writer("converted"), ["stitch"], reads=["video"])
+            ], journal=journal, workspace=workspace)
+
+        make("crf=23").run(self.inputs(workspace))
+        context = make("crf=18").run(self.inputs(workspace))[0]
+        self.assertEqual(context["status"], "completed", context.get("error"))
+        self.assertEqual(calls, ["extract", "stitch", "extract", "stitch"])
+        # The restored frames are released again, and the next run skips everything
+        self.assertFalse(os.path.exists(context["frames_dir"]))
+        self.assertEqual(make("crf=18").run(self.inputs(workspace))[0]["status"], "completed")
+        self.assertEqual(len(calls), 4)
+
+
+    def test_restore_follows_stages_that_overwrite_their_input(self):
+        """A stage replacing frames_dir is restored on the frames it was given"""
+        workspace = self.workspace()
+        journal = JobJournal(os.path.join(self.temp_dir, "journal.db"))
+        self.addCleanup(journal.close)
+        calls = []
+
+        def extract(context):
+            calls.append("extract")
+            return writer("frames_dir", folder=True)(context)
+
+        def ai(context):
+            calls.append("ai")
+            self.assertTrue(os.path.isdir(context["frames_dir"]))
+            ai_dir = os.path.join(context["work_dir"], "ai")
+            shutil.copytree(context["frames_dir"], ai_dir, dirs_exist_ok=True)
+            return {"frames_dir": ai_dir}
+
+        def stitch(context):
+            calls.append("stitch")
+            self.assertEqual(os.path.basename(context["frames_dir"]), "ai")
+            self.assertTrue(os.path.isdir(context["frames_dir"]))
+            return writer("video")(context)
+
+        def make(params: str):
+            return Pipeline([
+                Stage("extract", extract, reads=[]),
+                Stage("ai", ai, ["extract"], reads=["frames_dir"]),
+                Stage("stitch", stitch, ["ai"], fingerprint=params, reads=["frames_dir"]),
+                Stage("convert", writer("converted"), ["stitch"], reads=["video"])
+            ], journal=journal, workspace=workspace)
+
+        make("crf=23").run(self.inputs(workspace))
+        context = make("crf=18").run(self.inputs(workspace))[0]
+        self.assertEqual(context["status"], "completed", context.get("error"))
+        self.assertEqual(calls, ["extract", "ai", "stitch"] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -64,4 +64,62 @@ function Process-WithAI {
     return $true
 }
 
-Export-ModuleMember -Function Initialize-AIEnvironment, Test-VideoFile, Get-VideoDuration, Process-WithAI
+function Start-PythonWorker {
+    # One long-lived python_modules\worker.py; send it commands with
+    # Invoke-PythonWorker instead of starting python once per item
+    param(
+        [string]$Python = "python",
+        [int]$Threads = [Environment]::ProcessorCount
+    )
+    
+    $worker = Join-Path $PSScriptRoot "python_modules\worker.py"
+    $info = New-Object System.Diagnostics.ProcessStartInfo
+    $info.FileName = $Python
+    $info.Arguments = "`"$worker`" --threads $Threads"
+    $info.UseShellExecute = $false
+    $info.RedirectStandardInput = $true
+    $info.RedirectStandardOutput = $true
+    
+    return [System.Diagnostics.Process]::Start($info)
+}
+
+function Invoke-PythonWorker {
+    # Run one command (a job server kind and its params) and return the reply
+    param(
+        [System.Diagnostics.Process]$Worker,
+        [string]$Kind,
+        [hashtable]$Params = @{}
+    )
+    
+    $command = @{ id = [guid]::NewGuid().ToString("N"); kind = $Kind; params = $Params }
+    $Worker.StandardInput.WriteLine(($command | ConvertTo-Json -Compress -Depth 10))
+    $Worker.StandardInput.Flush()
+    
+    # A preview pipeline also answers for the full run it queued
+    do {
+        $line = $Worker.StandardOutput.ReadLine()
+        if ($null -eq $line) {
+            throw "Python worker exited"
+        }
+        $reply = $line | ConvertFrom-Json
+    } while ($reply.id -ne $command.id)
+    
+    if ($reply.status -ne "completed") {
+        Write-Host "ERROR: $Kind failed: $($reply.error)"
+    }
+    return $reply
+}
+
+function Stop-PythonWorker {
+    param(
+        [System.Diagnostics.Process]$Worker
+    )
+    
+    if (-not $Worker.HasExited) {
+        $Worker.StandardInput.WriteLine('{"kind": "shutdown"}')
+        $Worker.StandardInput.Close()
+        $Worker.WaitForExit(10000) | Out-Null
+    }
+}
+
+Export-ModuleMember -Function Initialize-AIEnvironment, Test-VideoFile, Get-VideoDuration, Process-WithAI, Start-PythonWorker, Invoke-PythonWorker, Stop-PythonWorker
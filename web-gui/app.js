@@ -72,19 +72,50 @@ function processVideo() {
     log(`FPS: ${fps}`, 'info');
     log(`Codec: ${codec}`, 'info');
     
-    // Simulate processing
-    setTimeout(() => {
-        log('Extracting frames...', 'info');
-        setTimeout(() => {
-            log('Processing frames...', 'info');
-            setTimeout(() => {
-                log('Re-encoding video...', 'info');
-                setTimeout(() => {
-                    log('Process complete!', 'success');
-                }, 1000);
-            }, 1000);
-        }, 1000);
-    }, 500);
+    submitJob('convert', {
+        input: input,
+        output: output,
+        options: { fps: parseInt(fps, 10), codec: codec }
+    }, 'interactive', log);
+}
+
+function submitJob(kind, params, priority, report) {
+    fetch('/jobs', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ kind: kind, params: params, priority: priority })
+    })
+        .then(response => response.json().then(body => {
+            if (!response.ok) throw new Error(body.error || response.statusText);
+            return body;
+        }))
+        .then(job => {
+            report(`Queued job ${job.id} (${kind})`, 'info');
+            followJob(job.id, report);
+        })
+        .catch(error => report(`Job server unavailable: ${error.message}`, 'error'));
+}
+
+function followJob(jobId, report) {
+    // The stream closes itself once the job completes, fails or is cancelled
+    const events = new EventSource(`/jobs/${jobId}/events`);
+    events.addEventListener('started', () => report('Processing...', 'info'));
+    events.addEventListener('progress', e => {
+        const job = JSON.parse(e.data);
+        if (job.message) report(`${Math.round(job.progress * 100)}% ${job.message}`, 'info');
+    });
+    events.addEventListener('completed', () => {
+        report('Process complete!', 'success');
+        events.close();
+    });
+    events.addEventListener('failed', e => {
+        report(`Failed: ${JSON.parse(e.data).error}`, 'error');
+        events.close();
+    });
+    events.addEventListener('cancelled', () => {
+        report('Cancelled', 'error');
+        events.close();
+    });
 }
 
 function processBatch() {
@@ -105,6 +136,12 @@ function processBatch() {
     logBox.innerHTML += `[${new Date().toLocaleTimeString()}] ℹ Output: ${output}<br>`;
     logBox.innerHTML += `[${new Date().toLocaleTimeString()}] ℹ Provider: ${provider}<br>`;
     logBox.scrollTop = logBox.scrollHeight;
+
+    submitJob('pipeline', { input: input }, 'batch', (message, type) => {
+        const prefix = type === 'error' ? '❌' : type === 'success' ? '✓' : 'ℹ';
+        logBox.innerHTML += `[${new Date().toLocaleTimeString()}] ${prefix} ${message}<br>`;
+        logBox.scrollTop = logBox.scrollHeight;
+    });
 }
 
 function saveGrokKey() {
@@ -161,6 +198,16 @@ function checkStatus() {
     
     document.getElementById('statusComfyUI').innerHTML = ' Checking...';
     document.getElementById('statusComfyUI').className = 'status-value warning';
+
+    fetch('/health')
+        .then(response => response.json())
+        .then(health => {
+            document.getElementById('statusPS').innerHTML = ` Job server: ${health.workers} workers`;
+        })
+        .catch(() => {
+            document.getElementById('statusPS').innerHTML = ' Job server not running';
+            document.getElementById('statusPS').className = 'status-value warning';
+        });
 }
 
 // Initialize on page load